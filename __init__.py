@@ -4,25 +4,33 @@ Módulo de modelos do ERP ROMA
 
 from app.models.usuario import Usuario
 from app.models.cliente import Cliente
-from app.models.produto import Produto, ComposicaoProduto
-from app.models.material import Material, MovimentacaoEstoque
+from app.models.produto import Produto, ComposicaoProduto, ComposicaoExplodida, HistoricoCustoProduto
+from app.models.material import Material, MovimentacaoEstoque, FechamentoEstoque
 from app.models.producao import Producao, ItemProducao
-from app.models.fornecedor import Fornecedor, Pedido, ItemPedido
+from app.models.fornecedor import Fornecedor, Pedido, ItemPedido, PedidoCompra, ItemPedidoCompra
 from app.models.financeiro import Movimentacao, NotaFiscal
+from app.models.resumo import ResumoFinanceiroDiario, ResumoProducaoDiario
 
 __all__ = [
     'Usuario',
     'Cliente',
     'Produto',
     'ComposicaoProduto',
+    'ComposicaoExplodida',
+    'HistoricoCustoProduto',
     'Material',
     'MovimentacaoEstoque',
+    'FechamentoEstoque',
     'Producao',
     'ItemProducao',
     'Fornecedor',
     'Pedido',
     'ItemPedido',
+    'PedidoCompra',
+    'ItemPedidoCompra',
     'Movimentacao',
-    'NotaFiscal'
+    'NotaFiscal',
+    'ResumoFinanceiroDiario',
+    'ResumoProducaoDiario'
 ]
 
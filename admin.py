@@ -5,6 +5,9 @@ Módulo de administração do ERP ROMA
 from flask import Blueprint, render_template, request, jsonify, flash, redirect, url_for, send_file
 from flask_login import login_required, current_user
 from app.utils.security import backup_manager, security_manager
+from app.utils.monitoramento import monitor_sql
+from app.utils.cache_dados import cache_dados
+from app.services.indicadores_service import totais_usuarios
 from app.models.usuario import Usuario
 from app import db
 import os
@@ -20,7 +23,7 @@ def admin_required(f):
     
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        if not current_user.is_authenticated or current_user.perfil != 'administrador':
+        if not current_user.is_authenticated or not current_user.is_admin():
             flash('Acesso negado. Apenas administradores podem acessar esta área.', 'error')
             return redirect(url_for('main.dashboard'))
         return f(*args, **kwargs)
@@ -32,8 +35,7 @@ def admin_required(f):
 def index():
     """Página principal de administração."""
     # Estatísticas do sistema
-    total_usuarios = Usuario.query.count()
-    usuarios_ativos = Usuario.query.filter_by(ativo=True).count()
+    total_usuarios, usuarios_ativos = totais_usuarios()
     
     # Informações de backup
     backups = backup_manager.list_backups()
@@ -52,7 +54,17 @@ def index():
                          usuarios_ativos=usuarios_ativos,
                          backups=backups[:5],  # Últimos 5 backups
                          ultimo_backup=ultimo_backup,
-                         logs_security=logs_security)
+                         logs_security=logs_security,
+                         cache=cache_dados.estatisticas())
+
+@admin.route('/cache/clear', methods=['POST'])
+@login_required
+@admin_required
+def clear_cache():
+    """Esvazia o cache de dados da aplicação."""
+    cache_dados.limpar()
+    flash('Cache de dados esvaziado.', 'success')
+    return redirect(url_for('admin.index'))
 
 @admin.route('/backup')
 @login_required
@@ -270,6 +282,25 @@ def system():
                          db_info=db_info,
                          config_info=config_info)
 
+@admin.route('/performance')
+@login_required
+@admin_required
+def performance():
+    """Página de performance das consultas SQL."""
+    return render_template('admin/performance.html',
+                         resumo=monitor_sql.resumo(),
+                         monitor_ativo=monitor_sql.ativo,
+                         cache=cache_dados.estatisticas())
+
+@admin.route('/performance/clear', methods=['POST'])
+@login_required
+@admin_required
+def clear_performance():
+    """Descarta as estatísticas de performance coletadas."""
+    monitor_sql.limpar()
+    flash('Estatísticas de performance descartadas.', 'success')
+    return redirect(url_for('admin.performance'))
+
 @admin.route('/logs')
 @login_required
 @admin_required
@@ -417,6 +448,13 @@ def api_system_status():
     
     return jsonify(status)
 
+@admin.route('/api/performance')
+@login_required
+@admin_required
+def api_performance():
+    """API com as estatísticas de SQL por requisição e do cache de dados."""
+    return jsonify(dict(monitor_sql.resumo(), cache=cache_dados.estatisticas()))
+
 @admin.route('/api/backup-status')
 @login_required
 @admin_required
@@ -428,7 +466,8 @@ def api_backup_status():
         'total_backups': len(backups),
         'last_backup': backups[0]['timestamp'].isoformat() if backups else None,
         'total_size_mb': sum(backup.get('size_mb', 0) for backup in backups),
-        'icloud_enabled': backup_manager.icloud_sync
+        'icloud_enabled': backup_manager.icloud_sync,
+        'progress': backup_manager.backup_status()
     }
     
     return jsonify(status)
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Script para analisar os planos de execução das consultas mais frequentes do ERP ROMA.
+
+Aponta as consultas que fazem varredura completa de tabela (SCAN sem índice).
+
+Uso:
+    python analisar_consultas.py                  # analisa todas as consultas registradas
+    python analisar_consultas.py producao.index   # analisa apenas as consultas informadas
+    python analisar_consultas.py --plano          # mostra o plano completo de cada consulta
+"""
+
+import os
+import sys
+import argparse
+
+# Adiciona o diretório raiz ao path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app, db
+from app.services.plano_consultas import analisar_consultas, consultas_com_varredura
+
+def main():
+    """Função principal."""
+    parser = argparse.ArgumentParser(description='Executa EXPLAIN QUERY PLAN nas consultas das rotas.')
+    parser.add_argument('consultas', nargs='*', help='Nomes das consultas (padrão: todas)')
+    parser.add_argument('--plano', action='store_true', help='Mostra o plano completo de cada consulta')
+    args = parser.parse_args()
+
+    app = create_app()
+
+    with app.app_context():
+        try:
+            resultados = analisar_consultas(args.consultas or None)
+        except ValueError as e:
+            print(f"Erro: {e}")
+            return 1
+
+        for resultado in resultados:
+            if resultado['erro']:
+                situacao = f"ERRO: {resultado['erro']}"
+            elif resultado['varreduras']:
+                situacao = f"VARREDURA COMPLETA: {', '.join(resultado['varreduras'])}"
+            else:
+                situacao = 'ok'
+
+            if resultado['ordenacoes']:
+                situacao += f" (ordenação temporária: {', '.join(resultado['ordenacoes'])})"
+
+            print(f"{resultado['nome']}: {situacao}")
+
+            if args.plano:
+                for linha in resultado['plano']:
+                    print(f"    {linha}")
+
+        problemas = consultas_com_varredura(resultados)
+        print(f"\n{len(resultados)} consultas analisadas, {len(problemas)} com varredura completa.")
+
+    return 1 if problemas else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
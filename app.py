@@ -21,13 +21,20 @@ def create_app(config_name=None):
     if config_name is None:
         config_name = os.environ.get('FLASK_CONFIG') or 'default'
     
+    # Aceita o nome da configuração ou a própria classe (testes)
+    configuracao = config[config_name] if isinstance(config_name, str) else config_name
+    
     app = Flask(__name__)
-    app.config.from_object(config[config_name])
-    config[config_name].init_app(app)
+    app.config.from_object(configuracao)
+    configuracao.init_app(app)
     
     # Inicialização das extensões
     db.init_app(app)
     migrate.init_app(app, db)
+    
+    # PRAGMAs do SQLite aplicados em cada conexão
+    from app.utils.perfil_sqlite import configurar_sqlite
+    configurar_sqlite(app, db)
     login_manager.init_app(app)
     
     # Configurações do Flask-Login
@@ -57,12 +64,69 @@ def create_app(config_name=None):
     from app.routes.estoque import estoque as estoque_blueprint
     app.register_blueprint(estoque_blueprint, url_prefix='/estoque')
     
+    from app.routes.fornecedores import fornecedores as fornecedores_blueprint
+    app.register_blueprint(fornecedores_blueprint, url_prefix='/fornecedores')
+    
     from app.routes.financeiro import financeiro as financeiro_blueprint
     app.register_blueprint(financeiro_blueprint, url_prefix='/financeiro')
     
     from app.routes.relatorios import relatorios as relatorios_blueprint
     app.register_blueprint(relatorios_blueprint, url_prefix='/relatorios')
     
+    from app.routes.dashboard import dashboard as dashboard_blueprint
+    app.register_blueprint(dashboard_blueprint)
+    
+    from app.routes.admin import admin as admin_blueprint
+    app.register_blueprint(admin_blueprint)
+    
+    # Manutenção incremental dos resumos diários
+    from app.services.resumo_service import registrar_eventos_resumo
+    registrar_eventos_resumo()
+    
+    # Recálculo do custo dos produtos a partir dos materiais da composição
+    from app.services.custo_service import registrar_eventos_custo
+    registrar_eventos_custo()
+    
+    # Composição em vários níveis: vetores de materiais e detecção de ciclos
+    from app.services.bom_service import registrar_eventos_composicao, garantir_composicao_explodida
+    registrar_eventos_composicao()
+    with app.app_context():
+        garantir_composicao_explodida()
+    
+    # Índices de busca textual (FTS5) criados junto com as tabelas
+    from app.services.busca_service import registrar_indices_busca, garantir_indices_busca
+    registrar_indices_busca()
+    with app.app_context():
+        garantir_indices_busca()
+    
+    # Índices em memória do autocompletar de materiais e produtos
+    from app.utils.autocompletar import (
+        autocompletar_materiais, autocompletar_produtos, registrar_eventos_autocompletar
+    )
+    autocompletar_materiais.init_app(app)
+    autocompletar_produtos.init_app(app)
+    registrar_eventos_autocompletar()
+    
+    # Cache de dados (contagens e listas) invalidado no commit
+    from app.utils.cache_dados import cache_dados
+    cache_dados.init_app(app)
+    
+    # Cache dos gráficos renderizados
+    from app.utils.graficos import cache_graficos
+    cache_graficos.init_app(app)
+    
+    # Previsão de ruptura de estoque
+    from app.services.previsao_service import previsao_ruptura
+    previsao_ruptura.init_app(app)
+    
+    # Fila de relatórios gerados em segundo plano
+    from app.services.relatorio_jobs import fila_relatorios
+    fila_relatorios.init_app(app)
+    
+    # Monitoramento de SQL por requisição
+    from app.utils.monitoramento import monitor_sql
+    monitor_sql.init_app(app)
+    
     return app
 
 
@@ -0,0 +1,202 @@
+"""
+Índice de prefixos em memória para o autocompletar do ERP ROMA
+
+Os selects de materiais e produtos consultam a API a cada tecla digitada. Em vez
+de um LIKE por requisição, cada processo mantém um vetor ordenado com as palavras
+normalizadas (sem acentos, minúsculas) de código e nome dos cadastros ativos,
+cada uma com a posição do registro na ordem de nome. Cada palavra digitada é uma
+faixa desse vetor, localizada por bissecção, O(log n); as posições das faixas são
+intersectadas e as menores formam o resultado.
+
+O índice é reconstruído quando o contador de versão do cadastro muda (incrementado
+no commit de alterações em código, nome ou ativo) ou após AUTOCOMPLETE_TTL
+segundos, o que cobre alterações feitas por outros processos.
+"""
+
+import re
+import time
+import heapq
+import bisect
+import threading
+import unicodedata
+from collections import namedtuple
+from flask import current_app, jsonify
+from sqlalchemy import event, inspect
+from app import db
+from app.models.material import Material
+from app.models.produto import Produto
+
+_RE_PALAVRA = re.compile(r'\w+', re.UNICODE)
+
+# Chave usada em session.info para guardar os cadastros alterados até o commit
+_CHAVE_SESSAO = 'autocompletar_pendentes'
+
+# Alterações nestes campos mudam o conteúdo do índice
+CAMPOS_INDEXADOS = ('codigo', 'nome', 'ativo')
+
+# Vetores do índice; substituídos de uma vez a cada reconstrução
+_Indice = namedtuple('_Indice', 'tokens posicoes ids rotulos palavras')
+
+
+def normalizar(texto):
+    """Remove acentos e converte para minúsculas."""
+    texto = unicodedata.normalize('NFKD', texto or '')
+    return ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+
+
+def palavras(texto):
+    """Palavras normalizadas do texto."""
+    return _RE_PALAVRA.findall(normalizar(texto))
+
+
+class IndiceAutocompletar:
+    """Índice de prefixos de um cadastro (código e nome dos registros ativos)."""
+
+    def __init__(self, modelo, app=None, ttl=300):
+        self.modelo = modelo
+        self.ttl = ttl
+        self.versao = 0
+        self._indice = _Indice([], [], [], [], [])
+        self._versao_indice = None
+        self._criado_em = 0.0
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Inicializa o índice com a configuração da aplicação."""
+        self.ttl = app.config.get('AUTOCOMPLETE_TTL', self.ttl)
+
+    def invalidar(self):
+        """Incrementa o contador de versão; o índice é refeito na próxima busca."""
+        with self._lock:
+            self.versao += 1
+
+    def _construir(self):
+        """Monta os vetores ordenados a partir do banco."""
+        linhas = (
+            db.session.query(self.modelo.id, self.modelo.codigo, self.modelo.nome)
+            .filter(self.modelo.ativo == True)
+            .order_by(self.modelo.nome)
+            .all()
+        )
+
+        ids, rotulos, conjuntos, entradas = [], [], [], []
+        for posicao, (registro_id, codigo, nome) in enumerate(linhas):
+            # O código entra pelas partes ("mat-001" -> "mat", "001"), como o termo digitado
+            tokens = set(palavras(nome)) | set(palavras(codigo))
+
+            ids.append(registro_id)
+            rotulos.append(f'{codigo} - {nome}')
+            conjuntos.append(tuple(tokens))
+            entradas.extend((token, posicao) for token in tokens)
+
+        entradas.sort()
+        return _Indice(
+            [token for token, _ in entradas],
+            [posicao for _, posicao in entradas],
+            ids, rotulos, conjuntos
+        )
+
+    def _atual(self):
+        """Retorna o índice, reconstruindo-o se a versão mudou ou o TTL expirou."""
+        with self._lock:
+            expirado = time.monotonic() - self._criado_em > self.ttl
+            if self._versao_indice != self.versao or expirado:
+                versao = self.versao
+                self._indice = self._construir()
+                self._versao_indice = versao
+                self._criado_em = time.monotonic()
+            return self._indice
+
+    def buscar(self, termo, limite=10):
+        """Retorna [(id, rótulo)] dos registros com palavras que começam com as do termo.
+
+        Todas as palavras do termo precisam casar. As posições das faixas são
+        intersectadas a partir da menor; quando restam poucos candidatos diante
+        de uma faixa grande, as palavras de cada candidato são conferidas
+        diretamente. O resultado traz as `limite` primeiras na ordem de nome.
+        """
+        indice = self._atual()
+        termos = palavras(termo)
+
+        if not termos:
+            return list(zip(indice.ids[:limite], indice.rotulos[:limite]))
+
+        faixas = []
+        for t in termos:
+            inicio = bisect.bisect_left(indice.tokens, t)
+            fim = bisect.bisect_left(indice.tokens, t + '\uffff')
+            faixas.append((fim - inicio, inicio, fim, t))
+        faixas.sort()
+
+        _, inicio, fim, _ = faixas[0]
+        if len(faixas) == 1 and fim > inicio and indice.tokens[inicio] == indice.tokens[fim - 1]:
+            # Faixa de uma só palavra: posições já em ordem e sem repetição
+            encontrados = indice.posicoes[inicio:min(fim, inicio + limite)]
+        else:
+            candidatos = set(indice.posicoes[inicio:fim])
+            for tamanho, inicio, fim, t in faixas[1:]:
+                if len(candidatos) * 32 < tamanho:
+                    candidatos = {p for p in candidatos if any(w.startswith(t) for w in indice.palavras[p])}
+                else:
+                    candidatos.intersection_update(indice.posicoes[inicio:fim])
+            encontrados = heapq.nsmallest(limite, candidatos)
+
+        return [(indice.ids[p], indice.rotulos[p]) for p in encontrados]
+
+    def __len__(self):
+        return len(self._indice.ids)
+
+
+def resposta_autocompletar(resultados):
+    """Resposta JSON com cache HTTP curto (AUTOCOMPLETE_MAX_AGE segundos)."""
+    response = jsonify(resultados)
+    response.cache_control.private = True
+    response.cache_control.max_age = current_app.config.get('AUTOCOMPLETE_MAX_AGE', 10)
+    return response
+
+
+# Instâncias globais
+autocompletar_materiais = IndiceAutocompletar(Material)
+autocompletar_produtos = IndiceAutocompletar(Produto)
+
+INDICES_AUTOCOMPLETAR = {
+    Material: autocompletar_materiais,
+    Produto: autocompletar_produtos,
+}
+
+
+# Eventos de sessão
+
+def _antes_flush(session, flush_context, instances):
+    """Anota os cadastros cujo conteúdo indexado foi alterado."""
+    pendentes = session.info.setdefault(_CHAVE_SESSAO, set())
+
+    for obj in list(session.new) + list(session.deleted):
+        if type(obj) in INDICES_AUTOCOMPLETAR:
+            pendentes.add(type(obj))
+
+    for obj in session.dirty:
+        if type(obj) in INDICES_AUTOCOMPLETAR and type(obj) not in pendentes:
+            estado = inspect(obj)
+            if any(estado.attrs[campo].history.has_changes() for campo in CAMPOS_INDEXADOS):
+                pendentes.add(type(obj))
+
+
+def _apos_commit(session):
+    """Invalida os índices dos cadastros alterados na transação."""
+    for modelo in session.info.pop(_CHAVE_SESSAO, ()):
+        INDICES_AUTOCOMPLETAR[modelo].invalidar()
+
+
+def _apos_rollback(session):
+    session.info.pop(_CHAVE_SESSAO, None)
+
+
+def registrar_eventos_autocompletar():
+    """Registra os eventos de sessão que invalidam os índices de autocompletar."""
+    if not event.contains(db.session, 'before_flush', _antes_flush):
+        event.listen(db.session, 'before_flush', _antes_flush)
+        event.listen(db.session, 'after_commit', _apos_commit)
+        event.listen(db.session, 'after_rollback', _apos_rollback)
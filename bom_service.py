@@ -0,0 +1,288 @@
+"""
+Serviço de estrutura de produtos (composição em vários níveis) do ERP ROMA
+
+Uma linha de composição aponta para um material ou para outro produto usado
+como componente. Para não percorrer a árvore a cada consulta, o vetor de
+materiais de cada produto, já expandido através dos componentes, fica
+memorizado na tabela composicao_explodida. Finalização de produções, cálculo
+de custo e necessidades de materiais usam esse vetor com joins simples.
+
+Quando a composição de um produto muda, o vetor dele e de todos os produtos que
+o usam direta ou indiretamente (ascendentes) é refeito no flush, nível a nível
+de baixo para cima: cada produto soma os seus materiais diretos com os vetores
+já expandidos dos componentes. Ciclos (um produto que acaba contendo a si
+mesmo) são rejeitados no mesmo momento com CicloComposicao.
+
+Inserções em lote que não passam pelo flush devem chamar
+reconstruir_composicao_explodida. Bancos anteriores aos componentes são
+atualizados na inicialização da aplicação (garantir_composicao_explodida).
+"""
+
+import logging
+from collections import defaultdict
+from sqlalchemy import event, inspect, select, insert, delete, func, union_all
+from app import db
+from app.utils.sessao import em_lotes, valor_original
+from app.models.produto import Produto, ComposicaoProduto, ComposicaoExplodida, HistoricoCustoProduto
+from app.services.custo_service import recalcular_custos, anotar_recalculados, recalcular_todos_custos
+
+logger = logging.getLogger(__name__)
+
+# Chave usada em session.info para guardar o estado entre before_flush e after_flush
+_CHAVE_SESSAO = 'composicoes_pendentes'
+
+# Campos da composição que alteram o vetor de materiais
+CAMPOS_COMPOSICAO = ('produto_id', 'material_id', 'componente_id', 'quantidade')
+
+
+class CicloComposicao(ValueError):
+    """A composição faria um produto conter a si mesmo."""
+
+    def __init__(self, produto_ids):
+        self.produto_ids = produto_ids
+        super().__init__(f'Ciclo na composição dos produtos: {", ".join(map(str, produto_ids))}')
+
+
+def ascendentes(conn, produto_ids):
+    """Produtos informados mais todos os que os usam como componente, em qualquer nível."""
+    afetados = set(produto_ids)
+    fronteira = set(produto_ids)
+
+    while fronteira:
+        pais = set()
+        for lote in em_lotes(fronteira):
+            pais.update(conn.execute(
+                select(ComposicaoProduto.produto_id).where(ComposicaoProduto.componente_id.in_(lote)).distinct()
+            ).scalars())
+        fronteira = pais - afetados
+        afetados |= fronteira
+
+    return afetados
+
+
+def niveis(conn, produto_ids):
+    """Ordena os produtos em níveis: cada nível depende apenas dos anteriores.
+
+    Componentes fora do conjunto são considerados já expandidos. Lança
+    CicloComposicao se sobrarem produtos que dependem uns dos outros.
+    """
+    dependencias = {produto_id: set() for produto_id in produto_ids}
+    usado_por = defaultdict(set)
+
+    for lote in em_lotes(produto_ids):
+        for produto_id, componente_id in conn.execute(
+            select(ComposicaoProduto.produto_id, ComposicaoProduto.componente_id).where(
+                ComposicaoProduto.produto_id.in_(lote),
+                ComposicaoProduto.componente_id.isnot(None)
+            )
+        ):
+            if componente_id in dependencias:
+                dependencias[produto_id].add(componente_id)
+                usado_por[componente_id].add(produto_id)
+
+    resultado = []
+    nivel = [produto_id for produto_id, componentes in dependencias.items() if not componentes]
+    while nivel:
+        resultado.append(nivel)
+        proximo = []
+        for componente_id in nivel:
+            for produto_id in usado_por[componente_id]:
+                dependencias[produto_id].discard(componente_id)
+                if not dependencias[produto_id]:
+                    proximo.append(produto_id)
+        nivel = proximo
+
+    restantes = sorted(produto_id for produto_id, componentes in dependencias.items() if componentes)
+    if restantes:
+        raise CicloComposicao(restantes)
+
+    return resultado
+
+
+def _expandir(conn, produto_ids):
+    """Refaz o vetor de materiais dos produtos a partir dos vetores dos componentes."""
+    for lote in em_lotes(produto_ids):
+        conn.execute(delete(ComposicaoExplodida).where(ComposicaoExplodida.produto_id.in_(lote)))
+
+        diretos = select(
+            ComposicaoProduto.produto_id,
+            ComposicaoProduto.material_id,
+            ComposicaoProduto.quantidade
+        ).where(
+            ComposicaoProduto.produto_id.in_(lote),
+            ComposicaoProduto.material_id.isnot(None)
+        )
+        componentes = select(
+            ComposicaoProduto.produto_id,
+            ComposicaoExplodida.material_id,
+            ComposicaoProduto.quantidade * ComposicaoExplodida.quantidade
+        ).join(
+            ComposicaoExplodida, ComposicaoExplodida.produto_id == ComposicaoProduto.componente_id
+        ).where(
+            ComposicaoProduto.produto_id.in_(lote)
+        )
+        itens = union_all(diretos, componentes).subquery()
+        colunas = list(itens.c)
+
+        conn.execute(
+            insert(ComposicaoExplodida).from_select(
+                ['produto_id', 'material_id', 'quantidade'],
+                select(colunas[0], colunas[1], func.sum(colunas[2])).group_by(colunas[0], colunas[1])
+            )
+        )
+
+
+def atualizar_explosao(conn, produto_ids):
+    """Refaz os vetores dos produtos alterados e dos seus ascendentes.
+
+    Retorna os ids de todos os produtos cujo vetor foi refeito.
+    """
+    afetados = ascendentes(conn, produto_ids)
+    for nivel in niveis(conn, afetados):
+        _expandir(conn, nivel)
+    return afetados
+
+
+def reconstruir_composicao_explodida():
+    """Refaz os vetores de materiais de todos os produtos e confirma a transação."""
+    try:
+        conn = db.session.connection()
+        conn.execute(delete(ComposicaoExplodida))
+        produto_ids = conn.execute(select(ComposicaoProduto.produto_id).distinct()).scalars().all()
+        for nivel in niveis(conn, produto_ids):
+            _expandir(conn, nivel)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    logger.info(f"Composição explodida reconstruída: {len(produto_ids)} produtos")
+    return len(produto_ids)
+
+
+def _colunas(conn, tabela):
+    return {linha[1] for linha in conn.exec_driver_sql(f'PRAGMA table_info({tabela})')}
+
+
+def atualizar_tabela_composicao(conn):
+    """Recria composicao_produtos de bancos anteriores aos componentes.
+
+    A tabela antiga não tem componente_id, exige material_id e não tem o CHECK
+    de material ou componente. Como o SQLite não altera colunas nem restrições,
+    ela é renomeada, recriada a partir do modelo (com os índices) e as linhas
+    são copiadas. Retorna True se a tabela foi recriada.
+    """
+    tabela = ComposicaoProduto.__tablename__
+    colunas = _colunas(conn, tabela)
+    if not colunas or 'componente_id' in colunas:
+        return False
+
+    antiga = f'{tabela}_antiga'
+    conn.exec_driver_sql(f'ALTER TABLE {tabela} RENAME TO {antiga}')
+    for indice in ComposicaoProduto.__table__.indexes:
+        conn.exec_driver_sql(f'DROP INDEX IF EXISTS {indice.name}')
+    ComposicaoProduto.__table__.create(conn)
+
+    copiadas = ', '.join(c.name for c in ComposicaoProduto.__table__.columns if c.name in colunas)
+    conn.exec_driver_sql(f'INSERT INTO {tabela} ({copiadas}) SELECT {copiadas} FROM {antiga}')
+    conn.exec_driver_sql(f'DROP TABLE {antiga}')
+    return True
+
+
+def garantir_composicao_explodida():
+    """Prepara bancos anteriores à composição em vários níveis; chamado na inicialização.
+
+    Atualiza a tabela de composição, cria as tabelas de vetores e de histórico
+    de custo e, se há composição sem nenhum vetor, refaz os vetores e o custo
+    dos produtos (como o recalcular_custos.py). Retorna o número de produtos
+    com composição refeitos.
+    """
+    if db.engine.dialect.name != 'sqlite':
+        return 0
+
+    with db.engine.begin() as conn:
+        if not _colunas(conn, ComposicaoProduto.__tablename__):
+            return 0
+        if atualizar_tabela_composicao(conn):
+            logger.warning("Tabela composicao_produtos atualizada para a composição com componentes")
+        ComposicaoExplodida.__table__.create(conn, checkfirst=True)
+        HistoricoCustoProduto.__table__.create(conn, checkfirst=True)
+
+        sem_vetores = (
+            conn.execute(select(ComposicaoProduto.id).limit(1)).first() is not None
+            and conn.execute(select(ComposicaoExplodida.produto_id).limit(1)).first() is None
+        )
+
+    if not sem_vetores:
+        return 0
+
+    logger.warning("Composição explodida vazia: reconstruindo vetores e custos")
+    produtos = reconstruir_composicao_explodida()
+    recalcular_todos_custos()
+    return produtos
+
+
+def vetor_materiais(produto_id):
+    """Vetor de materiais do produto por unidade: {material_id: quantidade}."""
+    return dict(db.session.execute(
+        select(ComposicaoExplodida.material_id, ComposicaoExplodida.quantidade)
+        .where(ComposicaoExplodida.produto_id == produto_id)
+    ).all())
+
+
+# Eventos da sessão
+
+def _antes_flush(session, flush_context, instances):
+    """Anota os produtos cuja composição foi alterada."""
+    produto_ids = set()
+
+    for obj in session.dirty:
+        if isinstance(obj, ComposicaoProduto):
+            estado = inspect(obj)
+            if any(estado.attrs[campo].history.has_changes() for campo in CAMPOS_COMPOSICAO):
+                produto_ids.add(valor_original(obj, 'produto_id'))
+                produto_ids.add(obj.produto_id)
+
+    for obj in session.deleted:
+        if isinstance(obj, ComposicaoProduto):
+            produto_ids.add(valor_original(obj, 'produto_id'))
+        elif isinstance(obj, Produto):
+            # Remove o vetor do produto e refaz o dos que o usavam
+            produto_ids.add(obj.id)
+
+    # O produto_id dos itens novos pode ser conhecido só após o flush
+    novos = [obj for obj in session.new if isinstance(obj, ComposicaoProduto)]
+    produto_ids.discard(None)
+
+    if produto_ids or novos:
+        session.info[_CHAVE_SESSAO] = {'produtos': produto_ids, 'novos': novos}
+
+
+def _apos_flush(session, flush_context):
+    """Atualiza os vetores e o custo dos produtos afetados, na mesma transação do flush."""
+    pendentes = session.info.pop(_CHAVE_SESSAO, None)
+    if not pendentes:
+        return
+
+    produto_ids = set(pendentes['produtos'])
+    produto_ids.update(obj.produto_id for obj in pendentes['novos'])
+    produto_ids.discard(None)
+
+    conn = session.connection()
+    afetados = atualizar_explosao(conn, produto_ids)
+
+    recalcular_custos(conn, afetados, 'composicao')
+    anotar_recalculados(session, afetados)
+
+
+def _apos_rollback(session):
+    """Descarta alterações capturadas de um flush que falhou."""
+    session.info.pop(_CHAVE_SESSAO, None)
+
+
+def registrar_eventos_composicao():
+    """Registra os eventos de sessão que mantêm a composição explodida atualizada."""
+    if not event.contains(db.session, 'before_flush', _antes_flush):
+        event.listen(db.session, 'before_flush', _antes_flush)
+        event.listen(db.session, 'after_flush', _apos_flush)
+        event.listen(db.session, 'after_soft_rollback', lambda session, previous_transaction: _apos_rollback(session))
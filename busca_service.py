@@ -0,0 +1,176 @@
+"""
+Serviço de busca textual (FTS5) do ERP ROMA
+
+Cada cadastro pesquisável (clientes, produtos, materiais e fornecedores) tem uma
+tabela virtual FTS5 de conteúdo externo, mantida por triggers na própria tabela.
+Assim o índice acompanha qualquer INSERT/UPDATE/DELETE, inclusive os feitos em
+lote ou fora do ORM.
+
+O tokenizador unicode61 com remove_diacritics ignora acentos ("confeccoes" acha
+"Confecções") e cada palavra digitada é buscada como prefixo. As listagens
+filtram pelos registros encontrados e mantêm a própria ordenação (nome); os selects
+(limite) trazem os mais relevantes (bm25).
+
+Em bancos que não são SQLite, ou enquanto o índice não existir, a busca volta a
+usar LIKE nas mesmas colunas.
+"""
+
+import re
+import logging
+from sqlalchemy import event, DDL, or_, table, column, text
+from app import db
+from app.models.cliente import Cliente
+from app.models.produto import Produto
+from app.models.material import Material
+from app.models.fornecedor import Fornecedor
+
+logger = logging.getLogger(__name__)
+
+# Modelo -> colunas indexadas
+COLUNAS_BUSCA = {
+    Cliente: ('nome', 'cnpj', 'email'),
+    Produto: ('codigo', 'nome', 'modelo'),
+    Material: ('codigo', 'nome'),
+    Fornecedor: ('nome', 'cnpj', 'email'),
+}
+
+_RE_PALAVRA = re.compile(r'\w+', re.UNICODE)
+
+# Índices FTS já verificados, por banco
+_indices_existentes = set()
+
+
+def _tabela_fts(modelo):
+    return f'{modelo.__tablename__}_fts'
+
+
+def _ddl_criacao(modelo):
+    """Comandos que criam a tabela FTS5 e os triggers de sincronização."""
+    tabela = modelo.__tablename__
+    fts = _tabela_fts(modelo)
+    colunas = COLUNAS_BUSCA[modelo]
+    lista = ', '.join(colunas)
+    novos = ', '.join(f'new.{c}' for c in colunas)
+    antigos = ', '.join(f'old.{c}' for c in colunas)
+
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({lista}, "
+        f"content='{tabela}', content_rowid='id', "
+        f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {tabela} BEGIN "
+        f"INSERT INTO {fts}(rowid, {lista}) VALUES (new.id, {novos}); END",
+
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {tabela} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {lista}) VALUES ('delete', old.id, {antigos}); END",
+
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {lista} ON {tabela} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {lista}) VALUES ('delete', old.id, {antigos}); "
+        f"INSERT INTO {fts}(rowid, {lista}) VALUES (new.id, {novos}); END",
+    ]
+
+
+def registrar_indices_busca():
+    """Cria os índices de busca junto com as tabelas (db.create_all) e os remove no drop_all."""
+    for modelo in COLUNAS_BUSCA:
+        tabela = modelo.__table__
+        if tabela.info.get('busca_fts'):
+            continue
+
+        for comando in _ddl_criacao(modelo):
+            event.listen(tabela, 'after_create', DDL(comando).execute_if(dialect='sqlite'))
+        event.listen(
+            tabela, 'before_drop',
+            DDL(f'DROP TABLE IF EXISTS {_tabela_fts(modelo)}').execute_if(dialect='sqlite')
+        )
+        tabela.info['busca_fts'] = True
+
+
+def reconstruir_indices_busca():
+    """Cria (se preciso) e repopula os índices de busca a partir das tabelas.
+
+    Necessário em bancos criados antes dos índices, já que o create_all não
+    recria tabelas existentes.
+    """
+    if db.engine.dialect.name != 'sqlite':
+        return 0
+
+    with db.engine.begin() as conn:
+        for modelo in COLUNAS_BUSCA:
+            for comando in _ddl_criacao(modelo):
+                conn.exec_driver_sql(comando)
+            fts = _tabela_fts(modelo)
+            conn.exec_driver_sql(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+    logger.info(f"Índices de busca reconstruídos: {len(COLUNAS_BUSCA)}")
+    return len(COLUNAS_BUSCA)
+
+
+def _tabelas_existentes(conn):
+    return {nome for (nome,) in conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+
+def garantir_indices_busca():
+    """Reconstrói os índices de busca de um banco antigo, em que as tabelas existem sem o FTS.
+
+    Chamado na inicialização da aplicação; bancos novos (ou vazios) não são alterados.
+    """
+    if db.engine.dialect.name != 'sqlite':
+        return 0
+
+    with db.engine.connect() as conn:
+        existentes = _tabelas_existentes(conn)
+    faltando = [
+        modelo for modelo in COLUNAS_BUSCA
+        if modelo.__tablename__ in existentes and _tabela_fts(modelo) not in existentes
+    ]
+    if not faltando:
+        return 0
+
+    logger.warning(f"Índices de busca ausentes: {', '.join(_tabela_fts(m) for m in faltando)}")
+    return reconstruir_indices_busca()
+
+
+def _indice_disponivel(modelo):
+    """Indica se a tabela FTS do modelo existe no banco atual (verificado uma vez)."""
+    chave = (str(db.engine.url), _tabela_fts(modelo))
+    if chave not in _indices_existentes:
+        with db.engine.connect() as conn:
+            if chave[1] not in _tabelas_existentes(conn):
+                return False
+        _indices_existentes.add(chave)
+    return True
+
+
+def expressao_busca(termo):
+    """Converte o texto digitado em uma expressão FTS5: todas as palavras, como prefixo."""
+    palavras = _RE_PALAVRA.findall(termo or '')
+    return ' '.join(f'"{p}"*' for p in palavras)
+
+
+def aplicar_busca(query, modelo, termo, limite=None):
+    """Filtra a query pelos registros que casam com o termo.
+
+    Sem limite, a query só é filtrada pelos registros encontrados e a ordenação
+    fica com a rota (as listagens ordenam por nome): o bm25 não é calculado para
+    todos os resultados. Com limite (selects e autocompletar), retorna os
+    `limite` registros mais relevantes entre os que passam pelos filtros da
+    query, do mais ao menos relevante.
+    """
+    expressao = expressao_busca(termo)
+    if not expressao:
+        return query
+
+    if db.engine.dialect.name != 'sqlite' or not _indice_disponivel(modelo):
+        query = query.filter(or_(*(getattr(modelo, c).contains(termo) for c in COLUNAS_BUSCA[modelo])))
+        return query.limit(limite) if limite else query
+
+    fts = _tabela_fts(modelo)
+    indice = table(fts, column('rowid'), column('rank'))
+    casamento = text(f'{fts} MATCH :expressao_busca').bindparams(expressao_busca=expressao)
+
+    query = query.join(indice, indice.c.rowid == modelo.id).filter(casamento)
+    if not limite:
+        return query
+
+    return query.order_by(indice.c.rank).limit(limite)
@@ -0,0 +1,315 @@
+"""
+Cache de dados da aplicação do ERP ROMA
+
+Contagens e listas usadas em várias telas (clientes e produtos ativos, materiais
+abaixo do mínimo, categorias dos filtros) são calculadas uma vez e reaproveitadas
+até expirarem (DATA_CACHE_TTL) ou até um commit alterar as tabelas consultadas.
+
+Cada valor é guardado com etiquetas (nomes das tabelas de que depende). Os
+eventos de sessão anotam as tabelas alteradas na transação, tanto no flush dos
+objetos quanto em insert/update/delete executados pela sessão, e no commit a
+versão dessas etiquetas é incrementada: valores gravados com uma versão anterior
+deixam de ser usados.
+
+São dois níveis:
+
+- local: LRU em memória de cada processo (DATA_CACHE_SIZE itens);
+- compartilhado (opcional): arquivo SQLite em DATA_CACHE_SHARED_PATH, comum aos
+  workers do gunicorn, com os valores (pickle) e as versões das etiquetas. Um
+  commit em um worker invalida também o cache dos demais.
+
+    @cache_dados.memorizar(Material)
+    def categorias_materiais():
+        ...
+"""
+
+import os
+import json
+import time
+import pickle
+import sqlite3
+import functools
+import threading
+from itertools import chain
+from collections import OrderedDict
+from flask import has_app_context
+from sqlalchemy import event
+from app import db
+
+# Chave usada em session.info para guardar as tabelas alteradas até o commit
+_CHAVE_SESSAO = 'cache_dados_tabelas'
+
+# Marca de valor ausente (None é um valor válido em cache)
+_AUSENTE = object()
+
+_ESQUEMA = (
+    'CREATE TABLE IF NOT EXISTS cache_itens ('
+    ' chave TEXT PRIMARY KEY, valor BLOB NOT NULL, versoes TEXT NOT NULL, expira_em REAL NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS ix_cache_itens_expira_em ON cache_itens (expira_em)',
+    'CREATE TABLE IF NOT EXISTS cache_versoes (etiqueta TEXT PRIMARY KEY, versao INTEGER NOT NULL)',
+)
+
+
+def etiquetas(*origens):
+    """Nomes das tabelas, a partir de modelos ou de nomes, sem repetição e ordenados."""
+    return tuple(sorted({getattr(origem, '__tablename__', origem) for origem in origens}))
+
+
+def _tabelas_pendentes(session):
+    """Tabelas dos objetos incluídos, alterados ou excluídos ainda sem flush."""
+    return {obj.__table__.name for obj in chain(session.new, session.dirty, session.deleted)}
+
+
+def _alteradas_na_transacao(tags):
+    """Indica se a transação da sessão atual alterou alguma das tabelas, ainda sem commit."""
+    if not has_app_context():
+        return False
+    session = db.session()
+    alteradas = session.info.get(_CHAVE_SESSAO, set()) | _tabelas_pendentes(session)
+    return not alteradas.isdisjoint(tags)
+
+
+class CacheDados:
+    """Cache LRU com TTL por processo e, opcionalmente, compartilhado em SQLite."""
+
+    def __init__(self, app=None, max_itens=1024, ttl=300):
+        self.max_itens = max_itens
+        self.ttl = ttl
+        self.caminho_compartilhado = None
+        self._itens = OrderedDict()
+        self._versoes = {}
+        self._lock = threading.Lock()
+        self._conexoes = threading.local()
+        self._zerar_contadores()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Inicializa o cache com a configuração da aplicação."""
+        self.max_itens = app.config.get('DATA_CACHE_SIZE', self.max_itens)
+        self.ttl = app.config.get('DATA_CACHE_TTL', self.ttl)
+        self.caminho_compartilhado = app.config.get('DATA_CACHE_SHARED_PATH')
+        if self.caminho_compartilhado:
+            os.makedirs(os.path.dirname(os.path.abspath(self.caminho_compartilhado)), exist_ok=True)
+            conexao = self._conexao()
+            for comando in _ESQUEMA:
+                conexao.execute(comando)
+
+        # Os dados do processo não valem para outro banco
+        with self._lock:
+            self._itens.clear()
+            self._versoes.clear()
+            self._zerar_contadores()
+        registrar_eventos_cache()
+
+    def _zerar_contadores(self):
+        self.hits = 0
+        self.hits_compartilhado = 0
+        self.misses = 0
+        self.invalidacoes = 0
+
+    # Nível compartilhado
+
+    def _conexao(self):
+        """Conexão SQLite da thread atual com o arquivo compartilhado."""
+        conexoes = self._conexoes.__dict__
+        conexao = conexoes.get(self.caminho_compartilhado)
+        if conexao is None:
+            conexao = sqlite3.connect(self.caminho_compartilhado, timeout=5, isolation_level=None)
+            conexao.execute('PRAGMA journal_mode=WAL')
+            conexao.execute('PRAGMA synchronous=NORMAL')
+            conexoes[self.caminho_compartilhado] = conexao
+        return conexao
+
+    def _ler_compartilhado(self, chave, versoes, agora):
+        linha = self._conexao().execute(
+            'SELECT valor, versoes, expira_em FROM cache_itens WHERE chave = ?', (chave,)
+        ).fetchone()
+        if linha is None or linha[2] <= agora or tuple(json.loads(linha[1])) != versoes:
+            return _AUSENTE, None
+        return pickle.loads(linha[0]), linha[2]
+
+    def _gravar_compartilhado(self, chave, valor, versoes, expira_em):
+        self._conexao().execute(
+            'INSERT OR REPLACE INTO cache_itens (chave, valor, versoes, expira_em) VALUES (?, ?, ?, ?)',
+            (chave, pickle.dumps(valor, pickle.HIGHEST_PROTOCOL), json.dumps(versoes), expira_em)
+        )
+
+    # Versões das etiquetas
+
+    def _versoes_atuais(self, tags):
+        """Versão atual de cada etiqueta, na ordem das etiquetas."""
+        if not tags:
+            return ()
+        if self.caminho_compartilhado:
+            marcadores = ','.join('?' * len(tags))
+            versoes = dict(self._conexao().execute(
+                f'SELECT etiqueta, versao FROM cache_versoes WHERE etiqueta IN ({marcadores})', tags
+            ).fetchall())
+        else:
+            versoes = self._versoes
+        return tuple(versoes.get(tag, 0) for tag in tags)
+
+    def invalidar(self, *origens):
+        """Incrementa a versão das etiquetas; os valores que dependem delas expiram."""
+        tags = etiquetas(*origens)
+        if not tags:
+            return
+        if self.caminho_compartilhado:
+            conexao = self._conexao()
+            conexao.executemany(
+                'INSERT INTO cache_versoes (etiqueta, versao) VALUES (?, 1) '
+                'ON CONFLICT (etiqueta) DO UPDATE SET versao = versao + 1',
+                [(tag,) for tag in tags]
+            )
+            conexao.execute('DELETE FROM cache_itens WHERE expira_em <= ?', (time.time(),))
+        with self._lock:
+            for tag in tags:
+                self._versoes[tag] = self._versoes.get(tag, 0) + 1
+            self.invalidacoes += 1
+
+    # Leitura e gravação
+
+    def _guardar_local(self, chave, expira_em, versoes, valor):
+        with self._lock:
+            self._itens[chave] = (expira_em, versoes, valor)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+
+    def obter(self, chave, calcular, tags=(), ttl=None):
+        """Retorna o valor em cache ou o calcula, guarda e retorna.
+
+        `tags` são as etiquetas (modelos ou nomes de tabelas) de que o valor
+        depende. As versões são lidas antes do cálculo: um commit feito durante
+        o cálculo já deixa o valor gravado desatualizado. Se a transação atual
+        alterou essas tabelas, o valor é calculado sem passar pelo cache.
+        """
+        tags = etiquetas(*tags)
+        if _alteradas_na_transacao(tags):
+            with self._lock:
+                self.misses += 1
+            return calcular()
+
+        versoes = self._versoes_atuais(tags)
+        agora = time.time()
+
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is not None:
+                expira_em, versoes_item, valor = item
+                if expira_em > agora and versoes_item == versoes:
+                    self._itens.move_to_end(chave)
+                    self.hits += 1
+                    return valor
+                del self._itens[chave]
+
+        if self.caminho_compartilhado:
+            valor, expira_em = self._ler_compartilhado(chave, versoes, agora)
+            if valor is not _AUSENTE:
+                self._guardar_local(chave, expira_em, versoes, valor)
+                with self._lock:
+                    self.hits_compartilhado += 1
+                return valor
+
+        with self._lock:
+            self.misses += 1
+        valor = calcular()
+        if _alteradas_na_transacao(tags):
+            # O cálculo enviou alterações pendentes ao banco (autoflush)
+            return valor
+
+        expira_em = agora + (self.ttl if ttl is None else ttl)
+        self._guardar_local(chave, expira_em, versoes, valor)
+        if self.caminho_compartilhado:
+            self._gravar_compartilhado(chave, valor, versoes, expira_em)
+        return valor
+
+    def memorizar(self, *tags, ttl=None):
+        """Decorator: guarda o resultado da função por argumentos, com as etiquetas dadas.
+
+        O resultado precisa ser serializável com pickle (números, textos, listas,
+        dicionários) para o nível compartilhado; objetos do ORM não devem ser guardados.
+        """
+        def decorator(funcao):
+            prefixo = f'{funcao.__module__}.{funcao.__qualname__}'
+
+            @functools.wraps(funcao)
+            def decorated_function(*args, **kwargs):
+                chave = prefixo
+                if args or kwargs:
+                    chave += repr((args, sorted(kwargs.items())))
+                return self.obter(chave, lambda: funcao(*args, **kwargs), tags, ttl)
+            return decorated_function
+        return decorator
+
+    def limpar(self):
+        """Esvazia os dois níveis e zera os contadores."""
+        if self.caminho_compartilhado:
+            self._conexao().execute('DELETE FROM cache_itens')
+        with self._lock:
+            self._itens.clear()
+            self._zerar_contadores()
+
+    def __len__(self):
+        return len(self._itens)
+
+    def estatisticas(self):
+        """Retorna os contadores do cache (página /admin)."""
+        itens_compartilhados = None
+        if self.caminho_compartilhado:
+            itens_compartilhados = self._conexao().execute('SELECT count(*) FROM cache_itens').fetchone()[0]
+
+        with self._lock:
+            consultas = self.hits + self.hits_compartilhado + self.misses
+            return {
+                'itens': len(self._itens),
+                'max_itens': self.max_itens,
+                'ttl': self.ttl,
+                'compartilhado': self.caminho_compartilhado,
+                'itens_compartilhados': itens_compartilhados,
+                'hits': self.hits,
+                'hits_compartilhado': self.hits_compartilhado,
+                'misses': self.misses,
+                'invalidacoes': self.invalidacoes,
+                'taxa_acerto': round((self.hits + self.hits_compartilhado) / consultas, 3) if consultas else None
+            }
+
+
+# Instância global
+cache_dados = CacheDados()
+
+
+# Eventos de sessão
+
+def _antes_flush(session, flush_context, instances):
+    """Anota as tabelas dos objetos incluídos, alterados ou excluídos."""
+    session.info.setdefault(_CHAVE_SESSAO, set()).update(_tabelas_pendentes(session))
+
+
+def _execucao_orm(estado):
+    """Anota a tabela de insert/update/delete executados diretamente na sessão."""
+    if estado.is_insert or estado.is_update or estado.is_delete:
+        tabela = getattr(estado.statement, 'table', None)
+        if tabela is not None:
+            estado.session.info.setdefault(_CHAVE_SESSAO, set()).add(tabela.name)
+
+
+def _apos_commit(session):
+    """Invalida as etiquetas das tabelas alteradas na transação."""
+    tabelas = session.info.pop(_CHAVE_SESSAO, None)
+    if tabelas:
+        cache_dados.invalidar(*tabelas)
+
+
+def _apos_rollback(session):
+    session.info.pop(_CHAVE_SESSAO, None)
+
+
+def registrar_eventos_cache():
+    """Registra os eventos de sessão que invalidam o cache de dados."""
+    if not event.contains(db.session, 'before_flush', _antes_flush):
+        event.listen(db.session, 'before_flush', _antes_flush)
+        event.listen(db.session, 'do_orm_execute', _execucao_orm)
+        event.listen(db.session, 'after_commit', _apos_commit)
+        event.listen(db.session, 'after_rollback', _apos_rollback)
@@ -0,0 +1,66 @@
+"""
+Carregamento sob demanda das bibliotecas pesadas do ERP ROMA
+
+NumPy, pandas e matplotlib levam centenas de milissegundos para importar e só
+são usados em relatórios, gráficos e previsões. Os módulos do sistema importam
+daqui substitutos que carregam a biblioteca no primeiro acesso a um atributo,
+de modo que create_app() (scripts, testes e cada worker) não paga esse custo.
+
+    from app.utils.carregador import numpy as np, pandas as pd
+
+O matplotlib é configurado (backend sem interface e fontes com acentos) antes
+do primeiro uso, qualquer que seja o submódulo carregado.
+"""
+
+import importlib
+import threading
+
+_lock = threading.RLock()
+_matplotlib_configurado = False
+
+
+def _configurar_matplotlib():
+    """Backend não interativo e fonte com caracteres em português."""
+    global _matplotlib_configurado
+    if _matplotlib_configurado:
+        return
+    import matplotlib
+    matplotlib.use('Agg')
+    matplotlib.rcParams['font.family'] = 'DejaVu Sans'
+    matplotlib.rcParams['axes.unicode_minus'] = False
+    _matplotlib_configurado = True
+
+
+class ModuloSobDemanda:
+    """Substituto de um módulo, importado no primeiro acesso a um atributo."""
+
+    def __init__(self, nome):
+        self._nome = nome
+        self._modulo = None
+
+    def carregar(self):
+        """Importa o módulo (uma vez) e o retorna."""
+        if self._modulo is None:
+            with _lock:
+                if self._modulo is None:
+                    if self._nome.split('.')[0] == 'matplotlib':
+                        _configurar_matplotlib()
+                    self._modulo = importlib.import_module(self._nome)
+        return self._modulo
+
+    @property
+    def carregado(self):
+        return self._modulo is not None
+
+    def __getattr__(self, atributo):
+        return getattr(self.carregar(), atributo)
+
+    def __repr__(self):
+        estado = 'carregado' if self.carregado else 'não carregado'
+        return f'<ModuloSobDemanda {self._nome} ({estado})>'
+
+
+# Bibliotecas carregadas sob demanda
+numpy = ModuloSobDemanda('numpy')
+pandas = ModuloSobDemanda('pandas')
+matplotlib_figure = ModuloSobDemanda('matplotlib.figure')
@@ -9,6 +9,9 @@ class Cliente(db.Model):
     """Modelo de cliente para o ERP ROMA."""
     
     __tablename__ = 'clientes'
+    __table_args__ = (
+        db.Index('idx_clientes_nome', 'nome'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     nome = db.Column(db.String(100), nullable=False)
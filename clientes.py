@@ -7,6 +7,7 @@ from flask_login import login_required, current_user
 from app import db
 from app.models.cliente import Cliente
 from app.forms import ClienteForm
+from app.services.busca_service import aplicar_busca
 
 # Criação do Blueprint
 clientes = Blueprint('clientes', __name__, url_prefix='/clientes')
@@ -22,11 +23,7 @@ def index():
     query = Cliente.query
     
     if search:
-        query = query.filter(
-            Cliente.nome.contains(search) | 
-            Cliente.cnpj.contains(search) |
-            Cliente.email.contains(search)
-        )
+        query = aplicar_busca(query, Cliente, search)
     
     if status == 'ativo':
         query = query.filter_by(ativo=True)
@@ -172,10 +169,7 @@ def api_buscar():
     """API para buscar clientes (usado em selects)."""
     term = request.args.get('term', '')
     
-    clientes = Cliente.query.filter(
-        Cliente.ativo == True,
-        Cliente.nome.contains(term)
-    ).limit(10).all()
+    clientes = aplicar_busca(Cliente.query.filter(Cliente.ativo == True), Cliente, term, limite=10).all()
     
     results = []
     for cliente in clientes:
@@ -0,0 +1,165 @@
+"""
+Sugestões de compra do ERP ROMA
+
+A partir da previsão de consumo (previsao_service), calcula para todos os
+materiais ativos de uma vez, com operações vetorizadas:
+
+- estoque de segurança: z × desvio do consumo diário × √prazo de entrega, com z
+  do nível de serviço desejado (PURCHASE_SERVICE_LEVEL);
+- ponto de pedido: consumo previsto durante o prazo + estoque de segurança (no
+  mínimo o estoque mínimo cadastrado);
+- lote econômico (EOQ): √(2 × consumo anual × custo do pedido / custo anual de
+  manter uma unidade), com PURCHASE_ORDER_COST e PURCHASE_HOLDING_RATE.
+
+Um material é sugerido quando o estoque atual mais o que está a receber
+(pedidos de compra enviados) chega ao ponto de pedido; a quantidade leva a
+posição até o ponto de pedido mais um lote econômico. As sugestões são
+agrupadas por fornecedor e podem ser gravadas como pedidos de compra em
+rascunho, que substituem os rascunhos anteriores.
+"""
+
+from datetime import date, datetime, timedelta
+from statistics import NormalDist
+from flask import current_app
+from sqlalchemy import select, insert, delete, func
+from app import db
+from app.utils.carregador import numpy as np, pandas as pd
+from app.models.fornecedor import PedidoCompra, ItemPedidoCompra
+from app.services.previsao_service import previsao_ruptura, previsao_para_lista
+
+# Pedidos de compra cujas quantidades ainda vão entrar no estoque
+STATUS_A_RECEBER = ('enviado',)
+
+
+def quantidades_a_receber():
+    """Quantidade em pedidos de compra enviados, por material (Series indexada por material_id)."""
+    linhas = db.session.execute(
+        select(ItemPedidoCompra.material_id, func.sum(ItemPedidoCompra.quantidade))
+        .join(PedidoCompra, PedidoCompra.id == ItemPedidoCompra.pedido_compra_id)
+        .where(PedidoCompra.status.in_(STATUS_A_RECEBER))
+        .group_by(ItemPedidoCompra.material_id)
+    ).all()
+    return pd.Series({material_id: float(quantidade) for material_id, quantidade in linhas}, dtype=float)
+
+
+def calcular_sugestoes():
+    """Materiais a comprar, com ponto de pedido, lote econômico e quantidade sugerida.
+
+    Retorna um DataFrame indexado por material_id, com as colunas da previsão de
+    ruptura e as da sugestão, do mais grave para o menos grave.
+    """
+    config = current_app.config
+    z = NormalDist().inv_cdf(config.get('PURCHASE_SERVICE_LEVEL', 0.95))
+    custo_pedido = config.get('PURCHASE_ORDER_COST', 50.0)
+    taxa_manutencao = config.get('PURCHASE_HOLDING_RATE', 0.25)
+
+    previsao = previsao_ruptura.previsao()
+    a_receber = quantidades_a_receber().reindex(previsao.index, fill_value=0.0).to_numpy()
+
+    consumo = previsao['consumo_previsto'].to_numpy(dtype=float)
+    desvio = previsao['desvio_consumo'].to_numpy(dtype=float)
+    prazo = previsao['prazo_entrega'].to_numpy(dtype=float)
+    estoque = previsao['estoque_atual'].to_numpy(dtype=float)
+    minimo = previsao['estoque_minimo'].fillna(0).astype(float).to_numpy()
+    custo = previsao['custo_unitario'].fillna(0).astype(float).to_numpy()
+
+    seguranca = z * desvio * np.sqrt(prazo)
+    ponto_pedido = np.maximum(consumo * prazo + seguranca, minimo)
+
+    # Sem custo cadastrado não há custo de manutenção: o lote cobre o prazo de entrega
+    manutencao = custo * taxa_manutencao
+    with np.errstate(divide='ignore', invalid='ignore'):
+        lote = np.where(
+            manutencao > 0,
+            np.sqrt(2 * consumo * 365 * custo_pedido / manutencao),
+            consumo * prazo
+        )
+
+    posicao = estoque + a_receber
+    comprar = (ponto_pedido > 0) & (posicao <= ponto_pedido)
+    quantidade = np.ceil(np.maximum(ponto_pedido + lote - posicao, 0.0))
+
+    sugestoes = previsao.assign(
+        a_receber=a_receber.round(3),
+        estoque_seguranca=seguranca.round(3),
+        ponto_pedido=ponto_pedido.round(3),
+        lote_economico=lote.round(3),
+        quantidade_sugerida=quantidade,
+        valor_compra=(quantidade * custo).round(2)
+    )
+    return sugestoes[comprar]
+
+
+def agrupar_por_fornecedor(sugestoes):
+    """Agrupa as sugestões por fornecedor, maior valor de compra primeiro."""
+    fornecedores = {}
+    for item in previsao_para_lista(sugestoes):
+        grupo = fornecedores.setdefault(item['fornecedor_id'], {
+            'fornecedor_id': item['fornecedor_id'],
+            'fornecedor': item['fornecedor'] or 'Sem fornecedor',
+            'prazo_entrega': item['prazo_entrega'],
+            'valor_compra': 0.0,
+            'materiais': [],
+        })
+        grupo['materiais'].append(item)
+        grupo['valor_compra'] = round(grupo['valor_compra'] + item['valor_compra'], 2)
+
+    return sorted(fornecedores.values(), key=lambda f: -f['valor_compra'])
+
+
+def sugestoes_compra():
+    """Sugestões de compra agrupadas por fornecedor."""
+    return agrupar_por_fornecedor(calcular_sugestoes())
+
+
+def gerar_rascunhos(usuario_id=None):
+    """Grava um pedido de compra em rascunho por fornecedor e confirma a transação.
+
+    Os rascunhos anteriores são descartados. Materiais sem fornecedor ficam
+    apenas nas sugestões. Retorna os pedidos criados.
+    """
+    grupos = [grupo for grupo in sugestoes_compra() if grupo['fornecedor_id'] is not None]
+    hoje = date.today()
+    agora = datetime.utcnow()
+
+    try:
+        rascunhos = select(PedidoCompra.id).where(PedidoCompra.status == 'rascunho')
+        db.session.execute(delete(ItemPedidoCompra).where(ItemPedidoCompra.pedido_compra_id.in_(rascunhos)))
+        db.session.execute(delete(PedidoCompra).where(PedidoCompra.status == 'rascunho'))
+
+        pedidos = []
+        for grupo in grupos:
+            pedido = PedidoCompra(
+                numero=f'PC{agora.strftime("%Y%m%d%H%M%S")}-{grupo["fornecedor_id"]}',
+                fornecedor_id=grupo['fornecedor_id'],
+                data_pedido=hoje,
+                data_prevista=hoje + timedelta(days=grupo['prazo_entrega']),
+                valor_total=grupo['valor_compra'],
+                status='rascunho',
+                usuario_id=usuario_id
+            )
+            db.session.add(pedido)
+            pedidos.append(pedido)
+        db.session.flush()
+
+        itens = [
+            {
+                'pedido_compra_id': pedido.id,
+                'material_id': item['material_id'],
+                'quantidade': item['quantidade_sugerida'],
+                'custo_unitario': item['custo_unitario'],
+                'ponto_pedido': item['ponto_pedido'],
+                'lote_economico': item['lote_economico'],
+            }
+            for pedido, grupo in zip(pedidos, grupos)
+            for item in grupo['materiais']
+        ]
+        if itens:
+            db.session.execute(insert(ItemPedidoCompra), itens)
+
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return pedidos
@@ -10,6 +10,17 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///app.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # Perfil do SQLite aplicado em cada conexão nova (app/utils/perfil_sqlite.py)
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',  # Leitores e escritores não se bloqueiam
+        'synchronous': 'NORMAL',  # Seguro em WAL; o fsync fica para os checkpoints
+        'busy_timeout': 5000,  # Milissegundos aguardando um lock antes de "database is locked"
+        'cache_size': -16000,  # Cache de páginas por conexão (negativo = KiB)
+        'mmap_size': 64 * 1024 * 1024,
+        'temp_store': 'MEMORY',
+        'foreign_keys': 'ON'
+    }
+    
     # Configurações de upload de arquivos
     UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app/static/uploads')
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB
@@ -19,6 +30,51 @@ class Config:
     
     # Configurações de backup
     BACKUP_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backups')
+    BACKUP_PAGES_PER_STEP = 1024  # Páginas do SQLite copiadas por passo do backup online
+    BACKUP_STEP_SLEEP = 0.05  # Pausa (segundos) entre os passos, liberando o banco para escrita
+    
+    # Autocompletar de materiais e produtos (índice em memória por processo)
+    AUTOCOMPLETE_TTL = 300  # Segundos até reconstruir o índice (alterações de outros processos)
+    AUTOCOMPLETE_MAX_AGE = 10  # Cache HTTP das respostas, em segundos
+    
+    # Fechamentos de estoque (saldos por material ao fim de cada dia)
+    STOCK_SNAPSHOT_RETENTION_DAYS = 90  # Fechamentos diários mantidos; os mensais são permanentes
+    
+    # Previsão de ruptura de estoque (consumo diário das saídas)
+    FORECAST_HISTORY_DAYS = 90  # Dias de histórico de consumo usados na previsão
+    FORECAST_SMOOTHING = 0.3  # Fator da suavização exponencial (peso do dia mais recente)
+    FORECAST_SAFETY_DAYS = 7  # Margem além do prazo de entrega para o alerta de atenção
+    FORECAST_DEFAULT_LEAD_TIME = 7  # Prazo de entrega (dias) de materiais sem fornecedor ou prazo
+    FORECAST_TTL = 300  # Segundos até recalcular a previsão sem novas movimentações
+    
+    # Sugestões de compra (ponto de pedido e lote econômico)
+    PURCHASE_SERVICE_LEVEL = 0.95  # Probabilidade de não faltar material durante o prazo de entrega
+    PURCHASE_ORDER_COST = 50.0  # Custo de emitir e receber um pedido de compra (R$)
+    PURCHASE_HOLDING_RATE = 0.25  # Custo anual de manter o estoque, em fração do custo unitário
+    
+    # Configurações de gráficos (quantidade máxima de gráficos mantidos em memória)
+    CHART_CACHE_SIZE = int(os.environ.get('CHART_CACHE_SIZE') or 256)
+    CHART_MAX_POINTS = int(os.environ.get('CHART_MAX_POINTS') or 366)  # Pontos por série na API JSON
+    
+    # Cache de dados da aplicação (contagens e listas de filtros)
+    DATA_CACHE_SIZE = 1024  # Valores mantidos em memória por processo
+    DATA_CACHE_TTL = 300  # Segundos até recalcular mesmo sem alterações
+    DATA_CACHE_SHARED_PATH = os.environ.get('DATA_CACHE_SHARED_PATH')  # Arquivo SQLite comum aos workers
+    
+    # Configurações de relatórios gerados em segundo plano
+    REPORT_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'relatorios')
+    REPORT_WORKERS = int(os.environ.get('REPORT_WORKERS', 2))  # 0 gera na própria requisição
+    REPORT_MAX_PENDING = int(os.environ.get('REPORT_MAX_PENDING') or 8)
+    REPORT_TTL = 3600  # Segundos até o PDF gerado ser removido
+    REPORT_SYNC_WAIT = 2  # Segundos aguardando antes de responder com o id do job
+    REPORT_SPOOL_THRESHOLD = 5 * 1024 * 1024  # Acima disso o arquivo vai para o disco
+    
+    # Monitoramento de SQL por requisição (/admin/performance)
+    SQL_MONITOR_ENABLED = True
+    SQL_MONITOR_SAMPLE_RATE = 1.0  # Fração das requisições monitoradas
+    SQL_SLOW_QUERY_MS = 100  # Comandos acima deste tempo entram no log de lentos
+    SQL_MONITOR_BUFFER = 500  # Requisições mantidas em memória
+    SQL_MONITOR_TOP = 20
     
     # Configurações de e-mail
     MAIL_SERVER = os.environ.get('MAIL_SERVER') or 'smtp.gmail.com'
@@ -33,6 +89,7 @@ class Config:
         # Cria diretórios necessários se não existirem
         os.makedirs(Config.UPLOAD_FOLDER, exist_ok=True)
         os.makedirs(Config.BACKUP_FOLDER, exist_ok=True)
+        os.makedirs(Config.REPORT_FOLDER, exist_ok=True)
 
 
 class DevelopmentConfig(Config):
@@ -50,6 +107,31 @@ class TestingConfig(Config):
 class ProductionConfig(Config):
     """Configuração para ambiente de produção."""
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///app_prod.db'
+    
+    # Cache e mmap maiores e mais tolerância a locks entre os workers do gunicorn
+    SQLITE_PRAGMAS = dict(
+        Config.SQLITE_PRAGMAS,
+        busy_timeout=15000,
+        cache_size=-64000,
+        mmap_size=256 * 1024 * 1024
+    )
+    
+    # Pool de conexões por worker
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE') or 10),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW') or 5),
+        'pool_timeout': 30,
+        'pool_recycle': 3600
+    }
+    
+    # Cache de dados compartilhado entre os workers do gunicorn
+    DATA_CACHE_SHARED_PATH = os.environ.get('DATA_CACHE_SHARED_PATH') or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), 'instance', 'cache_dados.db'
+    )
+    
+    # Em produção apenas uma amostra das requisições é monitorada
+    SQL_MONITOR_SAMPLE_RATE = float(os.environ.get('SQL_MONITOR_SAMPLE_RATE') or 0.05)
+    SQL_SLOW_QUERY_MS = int(os.environ.get('SQL_SLOW_QUERY_MS') or 200)
 
 
 # Dicionário de configurações disponíveis
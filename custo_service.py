@@ -0,0 +1,158 @@
+"""
+Serviço de cálculo do custo dos produtos do ERP ROMA
+
+O custo unitário de um produto com composição é a soma de quantidade × custo
+unitário dos materiais do seu vetor expandido (composicao_explodida, mantida
+pelo bom_service), o que inclui os materiais dos componentes intermediários.
+Ele é recalculado no flush da sessão, na mesma transação das alterações que o
+afetam:
+
+- mudança no custo de um material: os produtos que o utilizam, em qualquer
+  nível, são encontrados pelo índice reverso idx_composicao_explodida_material
+  (material -> produtos);
+- alteração de composição: o bom_service recalcula o produto e os ascendentes.
+
+O recálculo é feito com um único UPDATE em conjunto por lote de produtos e cada
+custo alterado é registrado em HistoricoCustoProduto. UPDATEs em conjunto em
+materiais, que não passam pelo flush, devem chamar recalcular_custos_materiais.
+Produtos sem composição mantêm o custo digitado.
+"""
+
+import logging
+from datetime import datetime
+from sqlalchemy import event, inspect, select, update, insert, func, or_, literal
+from app import db
+from app.utils.sessao import em_lotes
+from app.models.produto import Produto, ComposicaoExplodida, HistoricoCustoProduto
+from app.models.material import Material
+
+logger = logging.getLogger(__name__)
+
+# Chaves usadas em session.info entre before_flush, after_flush e after_flush_postexec
+_CHAVE_SESSAO = 'custos_pendentes'
+_CHAVE_RECALCULADOS = 'custos_recalculados'
+
+
+def custo_calculado():
+    """Subconsulta correlacionada com o custo do produto a partir do vetor de materiais."""
+    return select(
+        func.round(func.coalesce(func.sum(ComposicaoExplodida.quantidade * Material.custo_unitario), 0), 2)
+    ).join(
+        Material, Material.id == ComposicaoExplodida.material_id
+    ).where(
+        ComposicaoExplodida.produto_id == Produto.id
+    ).scalar_subquery()
+
+
+def produtos_que_usam(conn, material_ids):
+    """Ids dos produtos que usam os materiais informados (índice reverso)."""
+    produtos = set()
+    for lote in em_lotes(material_ids):
+        produtos.update(conn.execute(
+            select(ComposicaoExplodida.produto_id).where(ComposicaoExplodida.material_id.in_(lote))
+        ).scalars())
+    return produtos
+
+
+def _recalcular(conn, filtro, origem, agora):
+    """Registra o histórico e atualiza o custo dos produtos do filtro cujo custo mudou."""
+    calculado = custo_calculado()
+    alterados = or_(Produto.custo_unitario.is_(None), Produto.custo_unitario != calculado)
+
+    conn.execute(
+        insert(HistoricoCustoProduto).from_select(
+            ['produto_id', 'custo_anterior', 'custo_novo', 'origem', 'data'],
+            select(Produto.id, Produto.custo_unitario, calculado, literal(origem), literal(agora))
+            .where(filtro, alterados)
+        )
+    )
+
+    return conn.execute(
+        update(Produto).where(filtro, alterados).values(
+            custo_unitario=calculado, ultima_atualizacao=agora
+        ).execution_options(synchronize_session=False)
+    ).rowcount
+
+
+def recalcular_custos(conn, produto_ids, origem):
+    """Recalcula o custo dos produtos informados. Retorna quantos custos mudaram."""
+    agora = datetime.utcnow()
+    return sum(
+        _recalcular(conn, Produto.id.in_(lote), origem, agora)
+        for lote in em_lotes(produto_ids)
+    )
+
+
+def recalcular_custos_materiais(material_ids):
+    """Recalcula o custo dos produtos que usam os materiais (após UPDATEs em conjunto)."""
+    conn = db.session.connection()
+    return recalcular_custos(conn, produtos_que_usam(conn, material_ids), 'material')
+
+
+def recalcular_todos_custos():
+    """Recalcula o custo de todos os produtos com composição e confirma a transação."""
+    com_composicao = Produto.id.in_(select(ComposicaoExplodida.produto_id).distinct())
+
+    try:
+        alterados = _recalcular(db.session.connection(), com_composicao, 'recalculo', datetime.utcnow())
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    logger.info(f"Custos recalculados: {alterados} produtos alterados")
+    return alterados
+
+
+# Eventos da sessão
+
+def anotar_recalculados(session, produto_ids):
+    """Anota produtos recalculados no flush para expirar o custo carregado na sessão."""
+    session.info.setdefault(_CHAVE_RECALCULADOS, set()).update(produto_ids)
+
+
+def _antes_flush(session, flush_context, instances):
+    """Anota os materiais cujo custo foi alterado."""
+    material_ids = set(
+        obj.id for obj in session.dirty
+        if isinstance(obj, Material) and inspect(obj).attrs['custo_unitario'].history.has_changes()
+    )
+    material_ids.discard(None)
+
+    if material_ids:
+        session.info[_CHAVE_SESSAO] = material_ids
+
+
+def _apos_flush(session, flush_context):
+    """Recalcula o custo dos produtos que usam os materiais, na mesma transação do flush."""
+    material_ids = session.info.pop(_CHAVE_SESSAO, None)
+    if not material_ids:
+        return
+
+    conn = session.connection()
+    produto_ids = produtos_que_usam(conn, material_ids)
+    recalcular_custos(conn, produto_ids, 'material')
+    anotar_recalculados(session, produto_ids)
+
+
+def _apos_flush_postexec(session, flush_context):
+    """Expira o custo dos produtos recalculados que estão carregados na sessão."""
+    for produto_id in session.info.pop(_CHAVE_RECALCULADOS, ()):
+        produto = session.identity_map.get(inspect(Produto).identity_key_from_primary_key((produto_id,)))
+        if produto is not None:
+            session.expire(produto, ['custo_unitario', 'ultima_atualizacao'])
+
+
+def _apos_rollback(session):
+    """Descarta recálculos capturados de um flush que falhou."""
+    session.info.pop(_CHAVE_SESSAO, None)
+    session.info.pop(_CHAVE_RECALCULADOS, None)
+
+
+def registrar_eventos_custo():
+    """Registra os eventos de sessão que mantêm o custo dos produtos atualizado."""
+    if not event.contains(db.session, 'before_flush', _antes_flush):
+        event.listen(db.session, 'before_flush', _antes_flush)
+        event.listen(db.session, 'after_flush', _apos_flush)
+        event.listen(db.session, 'after_flush_postexec', _apos_flush_postexec)
+        event.listen(db.session, 'after_soft_rollback', lambda session, previous_transaction: _apos_rollback(session))
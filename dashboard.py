@@ -2,7 +2,7 @@
 Módulo de dashboard e relatórios do ERP ROMA
 """
 
-from flask import Blueprint, render_template, request, jsonify, send_file
+from flask import Blueprint, render_template, request, jsonify, send_file, redirect, url_for, current_app
 from flask_login import login_required, current_user
 from app import db
 from app.models.cliente import Cliente
@@ -10,26 +10,28 @@ from app.models.produto import Produto
 from app.models.producao import Producao, ItemProducao
 from app.models.estoque import Material, MovimentacaoEstoque
 from app.models.financeiro import Movimentacao, NotaFiscal
-from sqlalchemy import func, and_, or_, desc, extract
+from app.models.resumo import ResumoFinanceiroDiario, ResumoProducaoDiario
+from app.models.perfis_carga import perfil_carga
+from app.services.resumo_service import totais_financeiros, totais_producao
+from app.services.mrp_service import calcular_necessidades
+from app.services.saldo_estoque_service import consulta_saldos, limite_do_dia
+from app.services.previsao_service import previsao_ruptura
+from app.services.indicadores_service import (
+    total_clientes_ativos, total_produtos_ativos, total_materiais_estoque_baixo,
+    categorias_movimentacoes, categorias_materiais, categorias_produtos
+)
+from sqlalchemy import func, and_, or_, desc, extract, select
 from datetime import datetime, timedelta
-import calendar
-import json
 import os
-import tempfile
 from decimal import Decimal
-import matplotlib
-matplotlib.use('Agg')  # Usar backend não interativo
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
-import numpy as np
-import pandas as pd
-import seaborn as sns
-from io import BytesIO
-import base64
-
-# Configuração para gráficos com caracteres em português
-plt.rcParams['font.family'] = 'DejaVu Sans'
-plt.rcParams['axes.unicode_minus'] = False
+from app.utils.carregador import numpy as np
+from app.utils.graficos import (
+    responder_grafico, responder_dados_grafico, versao_dados,
+    serie_diaria, reduzir_serie, colunas_json, dia_epoca
+)
+from app.services.relatorio_jobs import fila_relatorios, FilaRelatoriosCheia
+from app.services.relatorios_pdf import gerar_relatorio_pdf
+from app.utils.exportacao import FORMATOS_EXPORTACAO, exportar, buffer_relatorio, enviar_buffer
 
 # Criação do Blueprint
 dashboard = Blueprint('dashboard', __name__, url_prefix='/dashboard')
@@ -66,51 +68,24 @@ def index():
                 pass
     
     # Indicadores principais
-    total_clientes = Cliente.query.filter_by(ativo=True).count()
-    total_produtos = Produto.query.filter_by(ativo=True).count()
-    
-    # Produção no período
-    producao_periodo = db.session.query(
-        func.count(Producao.id).label('total'),
-        func.sum(Producao.valor_total).label('valor')
-    ).filter(
-        and_(
-            Producao.data >= data_inicio,
-            Producao.data <= data_fim,
-            Producao.status == 'finalizada'
-        )
-    ).first()
+    total_clientes = total_clientes_ativos()
+    total_produtos = total_produtos_ativos()
     
-    total_producoes = producao_periodo.total or 0
-    valor_producoes = producao_periodo.valor or Decimal('0.00')
+    # Produção no período (lida do resumo diário)
+    total_producoes, valor_producoes = totais_producao(data_inicio, data_fim, status='finalizada')
     
-    # Movimentações financeiras no período
-    receitas = db.session.query(
-        func.sum(Movimentacao.valor)
-    ).filter(
-        and_(
-            Movimentacao.data >= data_inicio,
-            Movimentacao.data <= data_fim,
-            Movimentacao.tipo == 'receita'
-        )
-    ).scalar() or Decimal('0.00')
-    
-    despesas = db.session.query(
-        func.sum(Movimentacao.valor)
-    ).filter(
-        and_(
-            Movimentacao.data >= data_inicio,
-            Movimentacao.data <= data_fim,
-            Movimentacao.tipo == 'despesa'
-        )
-    ).scalar() or Decimal('0.00')
+    # Movimentações financeiras no período, em uma única consulta ao resumo
+    totais = totais_financeiros(data_inicio, data_fim)
+    receitas = totais.get('receita', Decimal('0.00'))
+    despesas = totais.get('despesa', Decimal('0.00'))
     
     saldo = receitas - despesas
     
     # Alertas de estoque
-    alertas_estoque = Material.query.filter(
-        Material.estoque_atual <= Material.estoque_minimo
-    ).count()
+    alertas_estoque = total_materiais_estoque_baixo()
+    
+    # Rupturas previstas antes da chegada de uma compra feita hoje
+    previsoes_ruptura = previsao_ruptura.alertas(limite=5)
     
     # Últimas produções
     ultimas_producoes = Producao.query.filter_by(
@@ -141,30 +116,36 @@ def index():
                          despesas=despesas,
                          saldo=saldo,
                          alertas_estoque=alertas_estoque,
+                         previsoes_ruptura=previsoes_ruptura,
                          ultimas_producoes=ultimas_producoes,
                          ultimas_movimentacoes=ultimas_movimentacoes,
                          dados_grafico_producao=dados_grafico_producao,
                          dados_grafico_financeiro=dados_grafico_financeiro,
                          dados_grafico_produtos=dados_grafico_produtos)
 
-def obter_dados_grafico_producao(data_inicio, data_fim):
-    """Obtém dados para o gráfico de produção."""
-    # Produção por dia
-    producao_diaria = db.session.query(
-        func.date(Producao.data).label('data'),
-        func.count(Producao.id).label('total'),
-        func.sum(Producao.valor_total).label('valor')
+def _producao_diaria(data_inicio, data_fim):
+    """Produções finalizadas por dia: (data, total, valor)."""
+    return db.session.query(
+        ResumoProducaoDiario.data.label('data'),
+        func.sum(ResumoProducaoDiario.producoes).label('total'),
+        func.sum(ResumoProducaoDiario.valor).label('valor')
     ).filter(
         and_(
-            Producao.data >= data_inicio,
-            Producao.data <= data_fim,
-            Producao.status == 'finalizada'
+            ResumoProducaoDiario.data >= data_inicio,
+            ResumoProducaoDiario.data <= data_fim,
+            ResumoProducaoDiario.status == 'finalizada',
+            ResumoProducaoDiario.produto_id.is_(None)
         )
     ).group_by(
-        func.date(Producao.data)
+        ResumoProducaoDiario.data
     ).order_by(
-        func.date(Producao.data)
+        ResumoProducaoDiario.data
     ).all()
+
+def obter_dados_grafico_producao(data_inicio, data_fim):
+    """Obtém dados para o gráfico de produção."""
+    # Produção por dia
+    producao_diaria = _producao_diaria(data_inicio, data_fim)
     
     # Formata os dados para o gráfico
     datas = [p.data.strftime('%d/%m/%Y') for p in producao_diaria]
@@ -177,24 +158,28 @@ def obter_dados_grafico_producao(data_inicio, data_fim):
         'valores': valores
     }
 
-def obter_dados_grafico_financeiro(data_inicio, data_fim):
-    """Obtém dados para o gráfico financeiro."""
-    # Movimentações por dia
-    movimentacoes_diarias = db.session.query(
-        func.date(Movimentacao.data).label('data'),
-        Movimentacao.tipo,
-        func.sum(Movimentacao.valor).label('valor')
+def _financeiro_diario(data_inicio, data_fim):
+    """Movimentações financeiras por dia e tipo: (data, tipo, valor)."""
+    return db.session.query(
+        ResumoFinanceiroDiario.data.label('data'),
+        ResumoFinanceiroDiario.tipo,
+        func.sum(ResumoFinanceiroDiario.total).label('valor')
     ).filter(
         and_(
-            Movimentacao.data >= data_inicio,
-            Movimentacao.data <= data_fim
+            ResumoFinanceiroDiario.data >= data_inicio,
+            ResumoFinanceiroDiario.data <= data_fim
         )
     ).group_by(
-        func.date(Movimentacao.data),
-        Movimentacao.tipo
+        ResumoFinanceiroDiario.data,
+        ResumoFinanceiroDiario.tipo
     ).order_by(
-        func.date(Movimentacao.data)
+        ResumoFinanceiroDiario.data
     ).all()
+
+def obter_dados_grafico_financeiro(data_inicio, data_fim):
+    """Obtém dados para o gráfico financeiro."""
+    # Movimentações por dia
+    movimentacoes_diarias = _financeiro_diario(data_inicio, data_fim)
     
     # Organiza os dados por data e tipo
     datas_unicas = sorted(set(m.data for m in movimentacoes_diarias))
@@ -219,27 +204,29 @@ def obter_dados_grafico_financeiro(data_inicio, data_fim):
         'despesas': despesas
     }
 
-def obter_dados_grafico_produtos(data_inicio, data_fim):
-    """Obtém dados para o gráfico de produtos mais produzidos."""
-    # Produtos mais produzidos
-    produtos_mais_produzidos = db.session.query(
+def _produtos_mais_produzidos(data_inicio, data_fim, limite=5):
+    """Produtos com maior quantidade produzida no período: (nome, quantidade)."""
+    return db.session.query(
         Produto.nome,
-        func.sum(ItemProducao.quantidade).label('quantidade')
-    ).join(
-        ItemProducao, ItemProducao.produto_id == Produto.id
+        func.sum(ResumoProducaoDiario.quantidade).label('quantidade')
     ).join(
-        Producao, Producao.id == ItemProducao.producao_id
+        ResumoProducaoDiario, ResumoProducaoDiario.produto_id == Produto.id
     ).filter(
         and_(
-            Producao.data >= data_inicio,
-            Producao.data <= data_fim,
-            Producao.status == 'finalizada'
+            ResumoProducaoDiario.data >= data_inicio,
+            ResumoProducaoDiario.data <= data_fim,
+            ResumoProducaoDiario.status == 'finalizada'
         )
     ).group_by(
         Produto.id
     ).order_by(
-        func.sum(ItemProducao.quantidade).desc()
-    ).limit(5).all()
+        func.sum(ResumoProducaoDiario.quantidade).desc()
+    ).limit(limite).all()
+
+def obter_dados_grafico_produtos(data_inicio, data_fim):
+    """Obtém dados para o gráfico de produtos mais produzidos."""
+    # Produtos mais produzidos
+    produtos_mais_produzidos = _produtos_mais_produzidos(data_inicio, data_fim)
     
     # Formata os dados para o gráfico
     produtos = [p.nome for p in produtos_mais_produzidos]
@@ -298,8 +285,31 @@ def relatorio_producao():
                 ItemProducao.produto_id == int(produto_id)
             )
         
+        # Exportação linha a linha, sem carregar os objetos
+        formato = request.form.get('formato')
+        if formato in FORMATOS_EXPORTACAO:
+            valor_total = select(
+                func.sum(ItemProducao.quantidade * ItemProducao.valor_unitario)
+            ).where(
+                ItemProducao.producao_id == Producao.id
+            ).scalar_subquery()
+            
+            consulta = query.outerjoin(
+                Cliente, Cliente.id == Producao.cliente_id
+            ).with_entities(
+                Producao.id, Producao.data, Cliente.nome, Producao.status, valor_total
+            ).distinct().order_by(Producao.data.desc(), Producao.id.desc())
+            
+            return exportar(
+                formato, consulta,
+                ['Produção', 'Data', 'Cliente', 'Status', 'Valor Total'],
+                f'relatorio_producao_{data_inicio.strftime("%Y%m%d")}_{data_fim.strftime("%Y%m%d")}',
+                'Produção'
+            )
+        
         # Executa a consulta
-        producoes = query.order_by(Producao.data.desc()).all()
+        perfil = 'producao_pdf' if formato == 'pdf' else 'producao_lista'
+        producoes = query.options(*perfil_carga(perfil)).order_by(Producao.data.desc()).all()
         
         # Gera o relatório
         if request.form.get('formato') == 'pdf':
@@ -360,6 +370,22 @@ def relatorio_financeiro():
         if categoria and categoria != 'todas':
             query = query.filter_by(categoria=categoria)
         
+        # Exportação linha a linha, sem carregar os objetos
+        formato = request.form.get('formato')
+        if formato in FORMATOS_EXPORTACAO:
+            consulta = query.with_entities(
+                Movimentacao.data, Movimentacao.tipo, Movimentacao.categoria,
+                Movimentacao.descricao, Movimentacao.valor,
+                Movimentacao.forma_pagamento, Movimentacao.status
+            ).order_by(Movimentacao.data.desc(), Movimentacao.id.desc())
+            
+            return exportar(
+                formato, consulta,
+                ['Data', 'Tipo', 'Categoria', 'Descrição', 'Valor', 'Forma de Pagamento', 'Status'],
+                f'relatorio_financeiro_{data_inicio.strftime("%Y%m%d")}_{data_fim.strftime("%Y%m%d")}',
+                'Financeiro'
+            )
+        
         # Executa a consulta
         movimentacoes = query.order_by(Movimentacao.data.desc()).all()
         
@@ -376,8 +402,7 @@ def relatorio_financeiro():
                              categoria=categoria)
     
     # Carrega dados para os filtros
-    categorias = db.session.query(Movimentacao.categoria).distinct().all()
-    categorias = [c[0] for c in categorias if c[0]]
+    categorias = categorias_movimentacoes()
     
     return render_template('dashboard/relatorio_financeiro.html',
                          categorias=categorias,
@@ -394,12 +419,43 @@ def relatorio_estoque():
         categoria = request.form.get('categoria')
         
         if tipo_relatorio == 'atual':
-            # Relatório de estoque atual
-            query = Material.query
+            # Relatório de estoque atual ou, com data de referência, do saldo ao fim dessa data
+            data_referencia = None
+            try:
+                data_referencia = datetime.strptime(request.form.get('data_referencia'), '%Y-%m-%d').date()
+            except (ValueError, TypeError):
+                pass
+            
+            if data_referencia:
+                query = consulta_saldos(data_referencia)
+            else:
+                query = Material.query
             
             if categoria and categoria != 'todas':
-                query = query.filter_by(categoria=categoria)
+                query = query.filter(Material.categoria == categoria)
             
+            # Exportação linha a linha, sem carregar os objetos
+            formato = request.form.get('formato')
+            if formato in FORMATOS_EXPORTACAO:
+                if data_referencia:
+                    consulta = query.order_by(Material.nome)
+                    nome_arquivo = f'relatorio_estoque_{data_referencia.strftime("%Y%m%d")}'
+                else:
+                    consulta = query.with_entities(
+                        Material.codigo, Material.nome, Material.categoria, Material.unidade_medida,
+                        Material.estoque_atual, Material.estoque_minimo, Material.custo_unitario
+                    ).order_by(Material.nome)
+                    nome_arquivo = f'relatorio_estoque_atual_{datetime.now().strftime("%Y%m%d")}'
+                
+                return exportar(
+                    formato, consulta,
+                    ['Código', 'Material', 'Categoria', 'Unidade', 'Estoque Atual', 'Estoque Mínimo', 'Custo Unitário'],
+                    nome_arquivo,
+                    'Estoque'
+                )
+            
+            if data_referencia:
+                query = query.add_columns(Material.id)
             materiais = query.order_by(Material.nome).all()
             
             # Gera o relatório
@@ -409,7 +465,8 @@ def relatorio_estoque():
             return render_template('dashboard/relatorio_estoque.html',
                                  materiais=materiais,
                                  tipo_relatorio=tipo_relatorio,
-                                 categoria=categoria)
+                                 categoria=categoria,
+                                 data_referencia=data_referencia)
         
         elif tipo_relatorio == 'movimentacoes':
             # Relatório de movimentações de estoque
@@ -428,11 +485,11 @@ def relatorio_estoque():
             except (ValueError, TypeError):
                 pass
             
-            # Consulta base
+            # Consulta base (data_movimentacao guarda data e hora: o dia final entra inteiro)
             query = MovimentacaoEstoque.query.filter(
                 and_(
-                    MovimentacaoEstoque.data >= data_inicio,
-                    MovimentacaoEstoque.data <= data_fim
+                    MovimentacaoEstoque.data_movimentacao >= datetime.combine(data_inicio, datetime.min.time()),
+                    MovimentacaoEstoque.data_movimentacao < limite_do_dia(data_fim)
                 )
             )
             
@@ -443,8 +500,29 @@ def relatorio_estoque():
             if tipo_movimentacao and tipo_movimentacao != 'todos':
                 query = query.filter_by(tipo=tipo_movimentacao)
             
+            # Exportação linha a linha, sem carregar os objetos
+            formato = request.form.get('formato')
+            if formato in FORMATOS_EXPORTACAO:
+                consulta = query.join(
+                    Material, Material.id == MovimentacaoEstoque.material_id
+                ).with_entities(
+                    MovimentacaoEstoque.data_movimentacao, Material.codigo, Material.nome,
+                    MovimentacaoEstoque.tipo, MovimentacaoEstoque.quantidade,
+                    MovimentacaoEstoque.quantidade_anterior, MovimentacaoEstoque.quantidade_atual,
+                    MovimentacaoEstoque.observacao
+                ).order_by(MovimentacaoEstoque.data_movimentacao.desc(), MovimentacaoEstoque.id.desc())
+                
+                return exportar(
+                    formato, consulta,
+                    ['Data', 'Código', 'Material', 'Tipo', 'Quantidade', 'Saldo Anterior', 'Saldo Atual', 'Observação'],
+                    f'relatorio_movimentacoes_estoque_{data_inicio.strftime("%Y%m%d")}_{data_fim.strftime("%Y%m%d")}',
+                    'Movimentações'
+                )
+            
             # Executa a consulta
-            movimentacoes = query.order_by(MovimentacaoEstoque.data.desc()).all()
+            movimentacoes = query.options(
+                *perfil_carga('movimentacao_estoque_lista')
+            ).order_by(MovimentacaoEstoque.data_movimentacao.desc(), MovimentacaoEstoque.id.desc()).all()
             
             # Gera o relatório
             if request.form.get('formato') == 'pdf':
@@ -459,8 +537,7 @@ def relatorio_estoque():
                                  tipo_movimentacao=tipo_movimentacao)
     
     # Carrega dados para os filtros
-    categorias = db.session.query(Material.categoria).distinct().all()
-    categorias = [c[0] for c in categorias if c[0]]
+    categorias = categorias_materiais()
     
     materiais = Material.query.order_by(Material.nome).all()
     
@@ -468,6 +545,15 @@ def relatorio_estoque():
                          categorias=categorias,
                          materiais=materiais)
 
+@dashboard.route('/relatorio/necessidades-materiais')
+@login_required
+def relatorio_necessidades_materiais():
+    """Relatório de necessidades de materiais dos pedidos em aberto (MRP)."""
+    necessidades = calcular_necessidades()
+    
+    return render_template('dashboard/relatorio_necessidades_materiais.html',
+                         necessidades=necessidades)
+
 @dashboard.route('/relatorio/clientes', methods=['GET', 'POST'])
 @login_required
 def relatorio_clientes():
@@ -485,6 +571,21 @@ def relatorio_clientes():
         elif ativo == 'nao':
             query = query.filter_by(ativo=False)
         
+        # Exportação linha a linha, sem carregar os objetos
+        formato = request.form.get('formato')
+        if formato in FORMATOS_EXPORTACAO:
+            consulta = query.with_entities(
+                Cliente.nome, Cliente.cnpj, Cliente.telefone, Cliente.email,
+                Cliente.cidade, Cliente.estado, Cliente.ativo
+            ).order_by(Cliente.nome)
+            
+            return exportar(
+                formato, consulta,
+                ['Nome', 'CNPJ', 'Telefone', 'Email', 'Cidade', 'UF', 'Ativo'],
+                f'relatorio_clientes_{datetime.now().strftime("%Y%m%d")}',
+                'Clientes'
+            )
+        
         # Executa a consulta
         clientes = query.order_by(Cliente.nome).all()
         
@@ -520,13 +621,31 @@ def relatorio_produtos():
         elif ativo == 'nao':
             query = query.filter_by(ativo=False)
         
+        # Exportação linha a linha, sem carregar os objetos
+        formato = request.form.get('formato')
+        if formato in FORMATOS_EXPORTACAO:
+            consulta = query.with_entities(
+                Produto.codigo, Produto.nome, Produto.modelo, Produto.categoria,
+                Produto.custo_unitario, Produto.preco_sugerido, Produto.estoque_atual, Produto.ativo
+            ).order_by(Produto.nome)
+            
+            return exportar(
+                formato, consulta,
+                ['Código', 'Nome', 'Modelo', 'Categoria', 'Custo Unitário', 'Preço Sugerido', 'Estoque', 'Ativo'],
+                f'relatorio_produtos_{datetime.now().strftime("%Y%m%d")}',
+                'Produtos'
+            )
+        
+        # Gera o relatório a partir das colunas usadas no PDF
+        if formato == 'pdf':
+            return gerar_pdf_produtos(query.with_entities(
+                Produto.codigo, Produto.nome, Produto.categoria,
+                Produto.preco_sugerido, Produto.estoque_atual, Produto.ativo
+            ).order_by(Produto.nome).all())
+        
         # Executa a consulta
         produtos = query.order_by(Produto.nome).all()
         
-        # Gera o relatório
-        if request.form.get('formato') == 'pdf':
-            return gerar_pdf_produtos(produtos)
-        
         # Renderiza a página com os resultados
         return render_template('dashboard/relatorio_produtos.html',
                              produtos=produtos,
@@ -534,163 +653,149 @@ def relatorio_produtos():
                              ativo=ativo)
     
     # Carrega dados para os filtros
-    categorias = db.session.query(Produto.categoria).distinct().all()
-    categorias = [c[0] for c in categorias if c[0]]
+    categorias = categorias_produtos()
     
     return render_template('dashboard/relatorio_produtos.html',
                          categorias=categorias)
 
+MESES_ABREV = ['Jan', 'Fev', 'Mar', 'Abr', 'Mai', 'Jun', 'Jul', 'Ago', 'Set', 'Out', 'Nov', 'Dez']
+
+def _ano_grafico():
+    """Obtém o ano atual ou o ano especificado na requisição."""
+    ano = request.args.get('ano', datetime.now().year)
+    try:
+        return int(ano)
+    except ValueError:
+        return datetime.now().year
+
+def _inicio_periodo(periodo, hoje):
+    """Retorna a data inicial do período informado."""
+    if periodo == 'mes':
+        return hoje.replace(day=1)
+    elif periodo == 'trimestre':
+        return hoje - timedelta(days=90)
+    elif periodo == 'semestre':
+        return hoje - timedelta(days=180)
+    else:  # ano
+        return hoje.replace(month=1, day=1)
+
 @dashboard.route('/grafico/producao-mensal')
 @login_required
 def grafico_producao_mensal():
     """Gera gráfico de produção mensal."""
-    # Obtém o ano atual ou o ano especificado
-    ano = request.args.get('ano', datetime.now().year)
-    try:
-        ano = int(ano)
-    except ValueError:
-        ano = datetime.now().year
-    
-    # Consulta a produção mensal
-    producao_mensal = db.session.query(
-        extract('month', Producao.data).label('mes'),
-        func.count(Producao.id).label('total'),
-        func.sum(Producao.valor_total).label('valor')
-    ).filter(
-        and_(
-            extract('year', Producao.data) == ano,
-            Producao.status == 'finalizada'
-        )
-    ).group_by(
-        extract('month', Producao.data)
-    ).order_by(
-        extract('month', Producao.data)
-    ).all()
-    
-    # Prepara os dados para todos os meses
-    meses = range(1, 13)
-    totais = {mes: 0 for mes in meses}
-    valores = {mes: 0 for mes in meses}
-    
-    for p in producao_mensal:
-        totais[p.mes] = p.total
-        valores[p.mes] = float(p.valor) if p.valor else 0
-    
-    # Cria o gráfico
-    plt.figure(figsize=(10, 6))
-    
-    # Gráfico de barras para quantidade
-    ax1 = plt.subplot(111)
-    ax1.bar(meses, [totais[mes] for mes in meses], color='#6366F1', alpha=0.7, label='Quantidade')
-    ax1.set_xlabel('Mês')
-    ax1.set_ylabel('Quantidade de Produções')
-    ax1.set_xticks(meses)
-    ax1.set_xticklabels(['Jan', 'Fev', 'Mar', 'Abr', 'Mai', 'Jun', 'Jul', 'Ago', 'Set', 'Out', 'Nov', 'Dez'])
-    
-    # Gráfico de linha para valor
-    ax2 = ax1.twinx()
-    ax2.plot(meses, [valores[mes] for mes in meses], color='#F59E0B', marker='o', linewidth=2, label='Valor (R$)')
-    ax2.set_ylabel('Valor Total (R$)')
-    
-    # Título e legenda
-    plt.title(f'Produção Mensal - {ano}')
-    
-    # Combina as legendas
-    lines1, labels1 = ax1.get_legend_handles_labels()
-    lines2, labels2 = ax2.get_legend_handles_labels()
-    ax1.legend(lines1 + lines2, labels1 + labels2, loc='upper left')
-    
-    # Salva o gráfico em um buffer
-    buffer = BytesIO()
-    plt.savefig(buffer, format='png', bbox_inches='tight')
-    buffer.seek(0)
-    
-    # Converte para base64
-    image_png = buffer.getvalue()
-    buffer.close()
-    
-    # Retorna a imagem
-    response = send_file(
-        BytesIO(image_png),
-        mimetype='image/png',
-        as_attachment=False
+    ano = _ano_grafico()
+    
+    def desenhar(fig):
+        # Consulta a produção mensal
+        producao_mensal = db.session.query(
+            extract('month', ResumoProducaoDiario.data).label('mes'),
+            func.sum(ResumoProducaoDiario.producoes).label('total'),
+            func.sum(ResumoProducaoDiario.valor).label('valor')
+        ).filter(
+            and_(
+                extract('year', ResumoProducaoDiario.data) == ano,
+                ResumoProducaoDiario.status == 'finalizada',
+                ResumoProducaoDiario.produto_id.is_(None)
+            )
+        ).group_by(
+            extract('month', ResumoProducaoDiario.data)
+        ).order_by(
+            extract('month', ResumoProducaoDiario.data)
+        ).all()
+        
+        # Prepara os dados para todos os meses
+        meses = range(1, 13)
+        totais = {mes: 0 for mes in meses}
+        valores = {mes: 0 for mes in meses}
+        
+        for p in producao_mensal:
+            totais[p.mes] = p.total
+            valores[p.mes] = float(p.valor) if p.valor else 0
+        
+        # Gráfico de barras para quantidade
+        ax1 = fig.add_subplot(111)
+        ax1.bar(meses, [totais[mes] for mes in meses], color='#6366F1', alpha=0.7, label='Quantidade')
+        ax1.set_xlabel('Mês')
+        ax1.set_ylabel('Quantidade de Produções')
+        ax1.set_xticks(meses)
+        ax1.set_xticklabels(MESES_ABREV)
+        
+        # Gráfico de linha para valor
+        ax2 = ax1.twinx()
+        ax2.plot(meses, [valores[mes] for mes in meses], color='#F59E0B', marker='o', linewidth=2, label='Valor (R$)')
+        ax2.set_ylabel('Valor Total (R$)')
+        
+        # Título e legenda
+        ax1.set_title(f'Produção Mensal - {ano}')
+        
+        # Combina as legendas
+        lines1, labels1 = ax1.get_legend_handles_labels()
+        lines2, labels2 = ax2.get_legend_handles_labels()
+        ax1.legend(lines1 + lines2, labels1 + labels2, loc='upper left')
+    
+    return responder_grafico(
+        'producao_mensal', {'ano': ano},
+        versao_dados(ResumoProducaoDiario),
+        desenhar
     )
-    
-    return response
 
 @dashboard.route('/grafico/financeiro-mensal')
 @login_required
 def grafico_financeiro_mensal():
     """Gera gráfico financeiro mensal."""
-    # Obtém o ano atual ou o ano especificado
-    ano = request.args.get('ano', datetime.now().year)
-    try:
-        ano = int(ano)
-    except ValueError:
-        ano = datetime.now().year
-    
-    # Consulta as movimentações mensais
-    movimentacoes_mensais = db.session.query(
-        extract('month', Movimentacao.data).label('mes'),
-        Movimentacao.tipo,
-        func.sum(Movimentacao.valor).label('valor')
-    ).filter(
-        extract('year', Movimentacao.data) == ano
-    ).group_by(
-        extract('month', Movimentacao.data),
-        Movimentacao.tipo
-    ).order_by(
-        extract('month', Movimentacao.data)
-    ).all()
-    
-    # Prepara os dados para todos os meses
-    meses = range(1, 13)
-    receitas = {mes: 0 for mes in meses}
-    despesas = {mes: 0 for mes in meses}
-    
-    for m in movimentacoes_mensais:
-        if m.tipo == 'receita':
-            receitas[m.mes] = float(m.valor) if m.valor else 0
-        else:
-            despesas[m.mes] = float(m.valor) if m.valor else 0
-    
-    # Cria o gráfico
-    plt.figure(figsize=(10, 6))
-    
-    # Gráfico de barras agrupadas
-    x = np.arange(len(meses))
-    width = 0.35
-    
-    plt.bar(x - width/2, [receitas[mes] for mes in meses], width, color='#10B981', label='Receitas')
-    plt.bar(x + width/2, [despesas[mes] for mes in meses], width, color='#EF4444', label='Despesas')
-    
-    plt.xlabel('Mês')
-    plt.ylabel('Valor (R$)')
-    plt.title(f'Movimentações Financeiras - {ano}')
-    plt.xticks(x, ['Jan', 'Fev', 'Mar', 'Abr', 'Mai', 'Jun', 'Jul', 'Ago', 'Set', 'Out', 'Nov', 'Dez'])
-    plt.legend()
-    
-    # Adiciona os valores de saldo
-    saldos = [receitas[mes] - despesas[mes] for mes in meses]
-    plt.plot(x, saldos, color='#6366F1', marker='o', linewidth=2, label='Saldo')
-    
-    # Salva o gráfico em um buffer
-    buffer = BytesIO()
-    plt.savefig(buffer, format='png', bbox_inches='tight')
-    buffer.seek(0)
-    
-    # Converte para base64
-    image_png = buffer.getvalue()
-    buffer.close()
+    ano = _ano_grafico()
+    
+    def desenhar(fig):
+        # Consulta as movimentações mensais
+        movimentacoes_mensais = db.session.query(
+            extract('month', Movimentacao.data).label('mes'),
+            Movimentacao.tipo,
+            func.sum(Movimentacao.valor).label('valor')
+        ).filter(
+            extract('year', Movimentacao.data) == ano
+        ).group_by(
+            extract('month', Movimentacao.data),
+            Movimentacao.tipo
+        ).order_by(
+            extract('month', Movimentacao.data)
+        ).all()
+        
+        # Prepara os dados para todos os meses
+        meses = range(1, 13)
+        receitas = {mes: 0 for mes in meses}
+        despesas = {mes: 0 for mes in meses}
+        
+        for m in movimentacoes_mensais:
+            if m.tipo == 'receita':
+                receitas[m.mes] = float(m.valor) if m.valor else 0
+            else:
+                despesas[m.mes] = float(m.valor) if m.valor else 0
+        
+        ax = fig.add_subplot(111)
+        
+        # Gráfico de barras agrupadas
+        x = np.arange(len(meses))
+        width = 0.35
+        
+        ax.bar(x - width/2, [receitas[mes] for mes in meses], width, color='#10B981', label='Receitas')
+        ax.bar(x + width/2, [despesas[mes] for mes in meses], width, color='#EF4444', label='Despesas')
+        
+        ax.set_xlabel('Mês')
+        ax.set_ylabel('Valor (R$)')
+        ax.set_title(f'Movimentações Financeiras - {ano}')
+        ax.set_xticks(x)
+        ax.set_xticklabels(MESES_ABREV)
+        ax.legend()
+        
+        # Adiciona os valores de saldo
+        saldos = [receitas[mes] - despesas[mes] for mes in meses]
+        ax.plot(x, saldos, color='#6366F1', marker='o', linewidth=2, label='Saldo')
     
-    # Retorna a imagem
-    response = send_file(
-        BytesIO(image_png),
-        mimetype='image/png',
-        as_attachment=False
+    return responder_grafico(
+        'financeiro_mensal', {'ano': ano},
+        versao_dados(ResumoFinanceiroDiario),
+        desenhar
     )
-    
-    return response
 
 @dashboard.route('/grafico/produtos-mais-produzidos')
 @login_required
@@ -700,73 +805,51 @@ def grafico_produtos_mais_produzidos():
     periodo = request.args.get('periodo', 'ano')
     
     hoje = datetime.now().date()
-    
-    if periodo == 'mes':
-        data_inicio = hoje.replace(day=1)
-    elif periodo == 'trimestre':
-        data_inicio = hoje - timedelta(days=90)
-    elif periodo == 'semestre':
-        data_inicio = hoje - timedelta(days=180)
-    else:  # ano
-        data_inicio = hoje.replace(month=1, day=1)
-    
+    data_inicio = _inicio_periodo(periodo, hoje)
     data_fim = hoje
     
-    # Consulta os produtos mais produzidos
-    produtos_mais_produzidos = db.session.query(
-        Produto.nome,
-        func.sum(ItemProducao.quantidade).label('quantidade')
-    ).join(
-        ItemProducao, ItemProducao.produto_id == Produto.id
-    ).join(
-        Producao, Producao.id == ItemProducao.producao_id
-    ).filter(
-        and_(
-            Producao.data >= data_inicio,
-            Producao.data <= data_fim,
-            Producao.status == 'finalizada'
-        )
-    ).group_by(
-        Produto.id
-    ).order_by(
-        func.sum(ItemProducao.quantidade).desc()
-    ).limit(10).all()
-    
-    # Prepara os dados
-    produtos = [p.nome for p in produtos_mais_produzidos]
-    quantidades = [p.quantidade for p in produtos_mais_produzidos]
-    
-    # Cria o gráfico
-    plt.figure(figsize=(10, 6))
-    
-    # Gráfico de barras horizontais
-    plt.barh(produtos, quantidades, color='#6366F1')
-    
-    plt.xlabel('Quantidade')
-    plt.ylabel('Produto')
-    plt.title(f'Produtos Mais Produzidos - {periodo.capitalize()}')
-    
-    # Adiciona os valores nas barras
-    for i, v in enumerate(quantidades):
-        plt.text(v + 0.1, i, str(v), va='center')
-    
-    # Salva o gráfico em um buffer
-    buffer = BytesIO()
-    plt.savefig(buffer, format='png', bbox_inches='tight')
-    buffer.seek(0)
-    
-    # Converte para base64
-    image_png = buffer.getvalue()
-    buffer.close()
-    
-    # Retorna a imagem
-    response = send_file(
-        BytesIO(image_png),
-        mimetype='image/png',
-        as_attachment=False
+    def desenhar(fig):
+        # Consulta os produtos mais produzidos
+        produtos_mais_produzidos = db.session.query(
+            Produto.nome,
+            func.sum(ItemProducao.quantidade).label('quantidade')
+        ).join(
+            ItemProducao, ItemProducao.produto_id == Produto.id
+        ).join(
+            Producao, Producao.id == ItemProducao.producao_id
+        ).filter(
+            and_(
+                Producao.data >= data_inicio,
+                Producao.data <= data_fim,
+                Producao.status == 'finalizada'
+            )
+        ).group_by(
+            Produto.id
+        ).order_by(
+            func.sum(ItemProducao.quantidade).desc()
+        ).limit(10).all()
+        
+        # Prepara os dados
+        produtos = [p.nome for p in produtos_mais_produzidos]
+        quantidades = [p.quantidade for p in produtos_mais_produzidos]
+        
+        # Gráfico de barras horizontais
+        ax = fig.add_subplot(111)
+        ax.barh(produtos, quantidades, color='#6366F1')
+        
+        ax.set_xlabel('Quantidade')
+        ax.set_ylabel('Produto')
+        ax.set_title(f'Produtos Mais Produzidos - {periodo.capitalize()}')
+        
+        # Adiciona os valores nas barras
+        for i, v in enumerate(quantidades):
+            ax.text(v + 0.1, i, str(v), va='center')
+    
+    return responder_grafico(
+        'produtos_mais_produzidos', {'periodo': periodo, 'inicio': data_inicio, 'fim': data_fim},
+        versao_dados(ResumoProducaoDiario, Produto),
+        desenhar
     )
-    
-    return response
 
 @dashboard.route('/grafico/clientes-mais-atendidos')
 @login_required
@@ -776,545 +859,254 @@ def grafico_clientes_mais_atendidos():
     periodo = request.args.get('periodo', 'ano')
     
     hoje = datetime.now().date()
-    
-    if periodo == 'mes':
-        data_inicio = hoje.replace(day=1)
-    elif periodo == 'trimestre':
-        data_inicio = hoje - timedelta(days=90)
-    elif periodo == 'semestre':
-        data_inicio = hoje - timedelta(days=180)
-    else:  # ano
-        data_inicio = hoje.replace(month=1, day=1)
-    
+    data_inicio = _inicio_periodo(periodo, hoje)
     data_fim = hoje
     
-    # Consulta os clientes mais atendidos
-    clientes_mais_atendidos = db.session.query(
-        Cliente.nome,
-        func.count(Producao.id).label('total'),
-        func.sum(Producao.valor_total).label('valor')
-    ).join(
-        Producao, Producao.cliente_id == Cliente.id
-    ).filter(
-        and_(
-            Producao.data >= data_inicio,
-            Producao.data <= data_fim,
-            Producao.status == 'finalizada'
-        )
-    ).group_by(
-        Cliente.id
-    ).order_by(
-        func.sum(Producao.valor_total).desc()
-    ).limit(10).all()
-    
-    # Prepara os dados
-    clientes = [c.nome for c in clientes_mais_atendidos]
-    valores = [float(c.valor) if c.valor else 0 for c in clientes_mais_atendidos]
-    
-    # Cria o gráfico
-    plt.figure(figsize=(10, 6))
-    
-    # Gráfico de pizza
-    plt.pie(valores, labels=clientes, autopct='%1.1f%%', startangle=90, shadow=True)
-    plt.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle
-    
-    plt.title(f'Clientes Mais Atendidos (por valor) - {periodo.capitalize()}')
-    
-    # Salva o gráfico em um buffer
-    buffer = BytesIO()
-    plt.savefig(buffer, format='png', bbox_inches='tight')
-    buffer.seek(0)
-    
-    # Converte para base64
-    image_png = buffer.getvalue()
-    buffer.close()
-    
-    # Retorna a imagem
-    response = send_file(
-        BytesIO(image_png),
-        mimetype='image/png',
-        as_attachment=False
+    def desenhar(fig):
+        # Consulta os clientes mais atendidos (valor somado dos itens)
+        valor_itens = func.sum(ItemProducao.quantidade * ItemProducao.valor_unitario)
+        clientes_mais_atendidos = db.session.query(
+            Cliente.nome,
+            func.count(func.distinct(Producao.id)).label('total'),
+            valor_itens.label('valor')
+        ).join(
+            Producao, Producao.cliente_id == Cliente.id
+        ).join(
+            ItemProducao, ItemProducao.producao_id == Producao.id
+        ).filter(
+            and_(
+                Producao.data >= data_inicio,
+                Producao.data <= data_fim,
+                Producao.status == 'finalizada'
+            )
+        ).group_by(
+            Cliente.id
+        ).order_by(
+            valor_itens.desc()
+        ).limit(10).all()
+        
+        # Prepara os dados
+        clientes = [c.nome for c in clientes_mais_atendidos]
+        valores = [float(c.valor) if c.valor else 0 for c in clientes_mais_atendidos]
+        
+        # Gráfico de pizza
+        ax = fig.add_subplot(111)
+        ax.pie(valores, labels=clientes, autopct='%1.1f%%', startangle=90, shadow=True)
+        ax.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle
+        
+        ax.set_title(f'Clientes Mais Atendidos (por valor) - {periodo.capitalize()}')
+    
+    return responder_grafico(
+        'clientes_mais_atendidos', {'periodo': periodo, 'inicio': data_inicio, 'fim': data_fim},
+        versao_dados(ResumoProducaoDiario, Cliente),
+        desenhar
     )
+
+# API de dados dos gráficos (JSON em colunas, renderizado no navegador)
+
+def _dados_producao(data_inicio, data_fim, max_pontos, limite):
+    linhas = [(p.data, p.total, p.valor) for p in _producao_diaria(data_inicio, data_fim)]
+    serie = serie_diaria(linhas, data_inicio, data_fim, ('producoes', 'valor'))
+    serie, passo = reduzir_serie(serie, max_pontos)
+    return {'passo': passo, 'colunas': colunas_json(serie)}
+
+def _dados_financeiro(data_inicio, data_fim, max_pontos, limite):
+    linhas = [
+        (m.data, m.valor, 0) if m.tipo == 'receita' else (m.data, 0, m.valor)
+        for m in _financeiro_diario(data_inicio, data_fim)
+    ]
+    serie = serie_diaria(linhas, data_inicio, data_fim, ('receitas', 'despesas'))
+    serie, passo = reduzir_serie(serie, max_pontos)
+    return {'passo': passo, 'colunas': colunas_json(serie)}
+
+def _dados_produtos(data_inicio, data_fim, max_pontos, limite):
+    produtos = _produtos_mais_produzidos(data_inicio, data_fim, limite)
+    return {'colunas': {
+        'produto': [p.nome for p in produtos],
+        'quantidade': [float(p.quantidade or 0) for p in produtos]
+    }}
+
+# Tipo de gráfico: (montagem dos dados, modelos que definem a versão)
+GRAFICOS_JSON = {
+    'producao': (_dados_producao, (ResumoProducaoDiario,)),
+    'financeiro': (_dados_financeiro, (ResumoFinanceiroDiario,)),
+    'produtos': (_dados_produtos, (ResumoProducaoDiario, Produto)),
+}
+
+@dashboard.route('/api/v1/graficos/<tipo>')
+@login_required
+def api_dados_grafico(tipo):
+    """Dados de um gráfico em colunas, com datas em dias desde 1970-01-01.
+
+    Parâmetros: data_inicio e data_fim (AAAA-MM-DD, padrão últimos 30 dias),
+    max_pontos (séries diárias mais longas são somadas em grupos de `passo`
+    dias) e limite (quantidade de produtos).
+    """
+    if tipo not in GRAFICOS_JSON:
+        return jsonify({'success': False, 'message': 'Gráfico não encontrado'}), 404
+    montar, modelos = GRAFICOS_JSON[tipo]
     
-    return response
+    hoje = datetime.now().date()
+    try:
+        data_fim = datetime.strptime(request.args.get('data_fim', hoje.isoformat()), '%Y-%m-%d').date()
+        data_inicio = datetime.strptime(
+            request.args.get('data_inicio', (data_fim - timedelta(days=30)).isoformat()), '%Y-%m-%d'
+        ).date()
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Data inválida (use AAAA-MM-DD)'}), 400
+    if data_inicio > data_fim:
+        return jsonify({'success': False, 'message': 'Data inicial posterior à data final'}), 400
+    
+    max_pontos_padrao = current_app.config.get('CHART_MAX_POINTS', 366)
+    max_pontos = min(max(request.args.get('max_pontos', max_pontos_padrao, type=int), 1), max_pontos_padrao)
+    limite = min(max(request.args.get('limite', 5, type=int), 1), 50)
+    
+    def montar_dados():
+        dados = montar(data_inicio, data_fim, max_pontos, limite)
+        dados.update(inicio=dia_epoca(data_inicio), fim=dia_epoca(data_fim))
+        return dados
+    
+    return responder_dados_grafico(
+        tipo,
+        {'inicio': data_inicio, 'fim': data_fim, 'max_pontos': max_pontos, 'limite': limite},
+        versao_dados(*modelos),
+        montar_dados
+    )
 
 # Funções auxiliares para geração de PDFs
+# Os objetos do ORM são convertidos em tuplas e o PDF é gerado no pool de processos
+def _responder_relatorio_pdf(tipo, args, nome_download):
+    """Agenda o relatório e entrega o PDF se ficar pronto rapidamente."""
+    # Sem pool de processos, o PDF é gerado em memória na própria requisição
+    if not fila_relatorios.ativa:
+        buffer = buffer_relatorio()
+        gerar_relatorio_pdf(tipo, buffer, *args)
+        return enviar_buffer(buffer, 'pdf', nome_download)
+    
+    try:
+        job_id = fila_relatorios.enviar(tipo, args, nome_download, current_user.id)
+    except FilaRelatoriosCheia as e:
+        return jsonify({'success': False, 'message': str(e)}), 503
+    
+    # Relatórios pequenos são entregues na mesma requisição
+    status = fila_relatorios.aguardar(job_id, current_app.config.get('REPORT_SYNC_WAIT', 2))
+    if status == 'pronto':
+        return redirect(url_for('dashboard.relatorio_job_download', job_id=job_id))
+    
+    return jsonify({
+        'success': True,
+        'job_id': job_id,
+        'status': status,
+        'status_url': url_for('dashboard.relatorio_job_status', job_id=job_id),
+        'download_url': url_for('dashboard.relatorio_job_download', job_id=job_id)
+    }), 202
+
+def _obter_job(job_id):
+    """Retorna o job do usuário atual ou None."""
+    info = fila_relatorios.info(job_id)
+    if info is None or info.get('usuario_id') != current_user.id:
+        return None
+    return info
+
+@dashboard.route('/relatorio/job/<job_id>')
+@login_required
+def relatorio_job_status(job_id):
+    """Consulta o andamento de um relatório em geração."""
+    info = _obter_job(job_id)
+    if info is None:
+        return jsonify({'success': False, 'message': 'Relatório não encontrado.'}), 404
+    
+    resposta = {'success': True, 'job_id': job_id, 'status': info['status']}
+    if info['status'] == 'pronto':
+        resposta['download_url'] = url_for('dashboard.relatorio_job_download', job_id=job_id)
+    elif info['status'] == 'erro':
+        resposta['message'] = info.get('erro')
+    
+    return jsonify(resposta)
+
+@dashboard.route('/relatorio/job/<job_id>/download')
+@login_required
+def relatorio_job_download(job_id):
+    """Download de um relatório já gerado."""
+    info = _obter_job(job_id)
+    if info is None or info['status'] != 'pronto':
+        return jsonify({'success': False, 'message': 'Relatório não disponível.'}), 404
+    
+    return send_file(
+        fila_relatorios.caminho(job_id),
+        mimetype='application/pdf',
+        as_attachment=True,
+        download_name=info['nome_download']
+    )
+
 def gerar_pdf_producao(producoes, data_inicio, data_fim):
     """Gera um relatório PDF de produção."""
-    from reportlab.lib.pagesizes import letter
-    from reportlab.lib import colors
-    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-    from reportlab.lib.styles import getSampleStyleSheet
-    
-    # Cria um arquivo temporário
-    with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as temp_file:
-        # Configura o documento
-        doc = SimpleDocTemplate(temp_file.name, pagesize=letter)
-        elements = []
-        
-        # Estilos
-        styles = getSampleStyleSheet()
-        title_style = styles['Heading1']
-        subtitle_style = styles['Heading2']
-        normal_style = styles['Normal']
-        
-        # Título
-        elements.append(Paragraph('Relatório de Produção', title_style))
-        elements.append(Spacer(1, 12))
-        
-        # Período
-        elements.append(Paragraph(f'Período: {data_inicio.strftime("%d/%m/%Y")} a {data_fim.strftime("%d/%m/%Y")}', subtitle_style))
-        elements.append(Spacer(1, 12))
-        
-        # Tabela de produções
-        data = [['Data', 'Cliente', 'Valor Total', 'Status']]
-        
-        for p in producoes:
-            data.append([
-                p.data.strftime('%d/%m/%Y'),
-                p.cliente.nome if p.cliente else '',
-                f'R$ {p.valor_total:.2f}',
-                p.status.capitalize()
-            ])
-        
-        # Adiciona totais
-        valor_total = sum(p.valor_total for p in producoes)
-        data.append(['', 'Total', f'R$ {valor_total:.2f}', ''])
-        
-        # Cria a tabela
-        table = Table(data)
-        
-        # Estilo da tabela
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, -1), (-1, -1), colors.lightgrey),
-            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('ALIGN', (2, 1), (2, -1), 'RIGHT'),
-        ]))
-        
-        elements.append(table)
-        
-        # Constrói o PDF
-        doc.build(elements)
-        
-        # Retorna o arquivo
-        return send_file(
-            temp_file.name,
-            mimetype='application/pdf',
-            as_attachment=True,
-            download_name=f'relatorio_producao_{data_inicio.strftime("%Y%m%d")}_{data_fim.strftime("%Y%m%d")}.pdf'
-        )
+    linhas = [
+        (p.data, p.cliente.nome if p.cliente else '', p.calcular_total(), p.status)
+        for p in producoes
+    ]
+    
+    return _responder_relatorio_pdf(
+        'producao', (linhas, data_inicio, data_fim),
+        f'relatorio_producao_{data_inicio.strftime("%Y%m%d")}_{data_fim.strftime("%Y%m%d")}.pdf'
+    )
 
 def gerar_pdf_financeiro(movimentacoes, data_inicio, data_fim, tipo, categoria):
     """Gera um relatório PDF financeiro."""
-    from reportlab.lib.pagesizes import letter
-    from reportlab.lib import colors
-    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-    from reportlab.lib.styles import getSampleStyleSheet
-    
-    # Cria um arquivo temporário
-    with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as temp_file:
-        # Configura o documento
-        doc = SimpleDocTemplate(temp_file.name, pagesize=letter)
-        elements = []
-        
-        # Estilos
-        styles = getSampleStyleSheet()
-        title_style = styles['Heading1']
-        subtitle_style = styles['Heading2']
-        normal_style = styles['Normal']
-        
-        # Título
-        elements.append(Paragraph('Relatório Financeiro', title_style))
-        elements.append(Spacer(1, 12))
-        
-        # Período
-        elements.append(Paragraph(f'Período: {data_inicio.strftime("%d/%m/%Y")} a {data_fim.strftime("%d/%m/%Y")}', subtitle_style))
-        elements.append(Spacer(1, 12))
-        
-        # Filtros
-        filtros = []
-        if tipo and tipo != 'todos':
-            filtros.append(f'Tipo: {tipo.capitalize()}')
-        if categoria and categoria != 'todas':
-            filtros.append(f'Categoria: {categoria}')
-        
-        if filtros:
-            elements.append(Paragraph('Filtros: ' + ', '.join(filtros), normal_style))
-            elements.append(Spacer(1, 12))
-        
-        # Tabela de movimentações
-        data = [['Data', 'Tipo', 'Categoria', 'Descrição', 'Valor']]
-        
-        for m in movimentacoes:
-            data.append([
-                m.data.strftime('%d/%m/%Y'),
-                m.tipo.capitalize(),
-                m.categoria,
-                m.descricao,
-                f'R$ {m.valor:.2f}'
-            ])
-        
-        # Adiciona totais
-        receitas = sum(m.valor for m in movimentacoes if m.tipo == 'receita')
-        despesas = sum(m.valor for m in movimentacoes if m.tipo == 'despesa')
-        saldo = receitas - despesas
-        
-        data.append(['', '', '', 'Total Receitas', f'R$ {receitas:.2f}'])
-        data.append(['', '', '', 'Total Despesas', f'R$ {despesas:.2f}'])
-        data.append(['', '', '', 'Saldo', f'R$ {saldo:.2f}'])
-        
-        # Cria a tabela
-        table = Table(data)
-        
-        # Estilo da tabela
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, -3), (-1, -1), colors.lightgrey),
-            ('FONTNAME', (0, -3), (-1, -1), 'Helvetica-Bold'),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('ALIGN', (4, 1), (4, -1), 'RIGHT'),
-        ]))
-        
-        elements.append(table)
-        
-        # Constrói o PDF
-        doc.build(elements)
-        
-        # Retorna o arquivo
-        return send_file(
-            temp_file.name,
-            mimetype='application/pdf',
-            as_attachment=True,
-            download_name=f'relatorio_financeiro_{data_inicio.strftime("%Y%m%d")}_{data_fim.strftime("%Y%m%d")}.pdf'
-        )
+    linhas = [
+        (m.data, m.tipo, m.categoria, m.descricao, m.valor)
+        for m in movimentacoes
+    ]
+    
+    return _responder_relatorio_pdf(
+        'financeiro', (linhas, data_inicio, data_fim, tipo, categoria),
+        f'relatorio_financeiro_{data_inicio.strftime("%Y%m%d")}_{data_fim.strftime("%Y%m%d")}.pdf'
+    )
 
 def gerar_pdf_estoque_atual(materiais):
     """Gera um relatório PDF de estoque atual."""
-    from reportlab.lib.pagesizes import letter
-    from reportlab.lib import colors
-    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-    from reportlab.lib.styles import getSampleStyleSheet
-    
-    # Cria um arquivo temporário
-    with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as temp_file:
-        # Configura o documento
-        doc = SimpleDocTemplate(temp_file.name, pagesize=letter)
-        elements = []
-        
-        # Estilos
-        styles = getSampleStyleSheet()
-        title_style = styles['Heading1']
-        subtitle_style = styles['Heading2']
-        normal_style = styles['Normal']
-        
-        # Título
-        elements.append(Paragraph('Relatório de Estoque Atual', title_style))
-        elements.append(Spacer(1, 12))
-        
-        # Data
-        elements.append(Paragraph(f'Data: {datetime.now().strftime("%d/%m/%Y")}', subtitle_style))
-        elements.append(Spacer(1, 12))
-        
-        # Tabela de materiais
-        data = [['Código', 'Material', 'Categoria', 'Estoque Atual', 'Estoque Mínimo', 'Status']]
-        
-        for m in materiais:
-            # Define o status
-            if m.estoque_atual <= m.estoque_minimo:
-                status = 'Baixo'
-            else:
-                status = 'Normal'
-            
-            data.append([
-                m.codigo,
-                m.nome,
-                m.categoria,
-                m.estoque_atual,
-                m.estoque_minimo,
-                status
-            ])
-        
-        # Cria a tabela
-        table = Table(data)
-        
-        # Estilo da tabela
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('ALIGN', (3, 1), (4, -1), 'CENTER'),
-        ]))
-        
-        # Adiciona cores para status
-        for i in range(1, len(data)):
-            if data[i][-1] == 'Baixo':
-                table.setStyle(TableStyle([
-                    ('TEXTCOLOR', (-1, i), (-1, i), colors.red),
-                    ('FONTNAME', (-1, i), (-1, i), 'Helvetica-Bold'),
-                ]))
-        
-        elements.append(table)
-        
-        # Constrói o PDF
-        doc.build(elements)
-        
-        # Retorna o arquivo
-        return send_file(
-            temp_file.name,
-            mimetype='application/pdf',
-            as_attachment=True,
-            download_name=f'relatorio_estoque_atual_{datetime.now().strftime("%Y%m%d")}.pdf'
-        )
+    linhas = [
+        (m.codigo, m.nome, m.categoria, m.estoque_atual, m.estoque_minimo)
+        for m in materiais
+    ]
+    
+    return _responder_relatorio_pdf(
+        'estoque_atual', (linhas,),
+        f'relatorio_estoque_atual_{datetime.now().strftime("%Y%m%d")}.pdf'
+    )
 
 def gerar_pdf_movimentacoes_estoque(movimentacoes, data_inicio, data_fim):
     """Gera um relatório PDF de movimentações de estoque."""
-    from reportlab.lib.pagesizes import letter
-    from reportlab.lib import colors
-    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-    from reportlab.lib.styles import getSampleStyleSheet
-    
-    # Cria um arquivo temporário
-    with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as temp_file:
-        # Configura o documento
-        doc = SimpleDocTemplate(temp_file.name, pagesize=letter)
-        elements = []
-        
-        # Estilos
-        styles = getSampleStyleSheet()
-        title_style = styles['Heading1']
-        subtitle_style = styles['Heading2']
-        normal_style = styles['Normal']
-        
-        # Título
-        elements.append(Paragraph('Relatório de Movimentações de Estoque', title_style))
-        elements.append(Spacer(1, 12))
-        
-        # Período
-        elements.append(Paragraph(f'Período: {data_inicio.strftime("%d/%m/%Y")} a {data_fim.strftime("%d/%m/%Y")}', subtitle_style))
-        elements.append(Spacer(1, 12))
-        
-        # Tabela de movimentações
-        data = [['Data', 'Material', 'Tipo', 'Quantidade', 'Observação']]
-        
-        for m in movimentacoes:
-            data.append([
-                m.data.strftime('%d/%m/%Y'),
-                m.material.nome if m.material else '',
-                m.tipo.capitalize(),
-                m.quantidade,
-                m.observacao or ''
-            ])
-        
-        # Cria a tabela
-        table = Table(data)
-        
-        # Estilo da tabela
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('ALIGN', (3, 1), (3, -1), 'CENTER'),
-        ]))
-        
-        # Adiciona cores para tipo
-        for i in range(1, len(data)):
-            if data[i][2] == 'Entrada':
-                table.setStyle(TableStyle([
-                    ('TEXTCOLOR', (2, i), (2, i), colors.green),
-                ]))
-            elif data[i][2] == 'Saída':
-                table.setStyle(TableStyle([
-                    ('TEXTCOLOR', (2, i), (2, i), colors.red),
-                ]))
-        
-        elements.append(table)
-        
-        # Constrói o PDF
-        doc.build(elements)
-        
-        # Retorna o arquivo
-        return send_file(
-            temp_file.name,
-            mimetype='application/pdf',
-            as_attachment=True,
-            download_name=f'relatorio_movimentacoes_estoque_{data_inicio.strftime("%Y%m%d")}_{data_fim.strftime("%Y%m%d")}.pdf'
-        )
+    linhas = [
+        (m.data_movimentacao, m.material.nome if m.material else '', m.tipo, m.quantidade, m.observacao)
+        for m in movimentacoes
+    ]
+    
+    return _responder_relatorio_pdf(
+        'movimentacoes_estoque', (linhas, data_inicio, data_fim),
+        f'relatorio_movimentacoes_estoque_{data_inicio.strftime("%Y%m%d")}_{data_fim.strftime("%Y%m%d")}.pdf'
+    )
 
 def gerar_pdf_clientes(clientes):
     """Gera um relatório PDF de clientes."""
-    from reportlab.lib.pagesizes import letter
-    from reportlab.lib import colors
-    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-    from reportlab.lib.styles import getSampleStyleSheet
-    
-    # Cria um arquivo temporário
-    with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as temp_file:
-        # Configura o documento
-        doc = SimpleDocTemplate(temp_file.name, pagesize=letter)
-        elements = []
-        
-        # Estilos
-        styles = getSampleStyleSheet()
-        title_style = styles['Heading1']
-        subtitle_style = styles['Heading2']
-        normal_style = styles['Normal']
-        
-        # Título
-        elements.append(Paragraph('Relatório de Clientes', title_style))
-        elements.append(Spacer(1, 12))
-        
-        # Data
-        elements.append(Paragraph(f'Data: {datetime.now().strftime("%d/%m/%Y")}', subtitle_style))
-        elements.append(Spacer(1, 12))
-        
-        # Tabela de clientes
-        data = [['Nome', 'CNPJ', 'Telefone', 'Email', 'Cidade/UF', 'Status']]
-        
-        for c in clientes:
-            data.append([
-                c.nome,
-                c.cnpj,
-                c.telefone,
-                c.email,
-                f'{c.cidade}/{c.estado}',
-                'Ativo' if c.ativo else 'Inativo'
-            ])
-        
-        # Cria a tabela
-        table = Table(data)
-        
-        # Estilo da tabela
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ]))
-        
-        # Adiciona cores para status
-        for i in range(1, len(data)):
-            if data[i][-1] == 'Ativo':
-                table.setStyle(TableStyle([
-                    ('TEXTCOLOR', (-1, i), (-1, i), colors.green),
-                ]))
-            else:
-                table.setStyle(TableStyle([
-                    ('TEXTCOLOR', (-1, i), (-1, i), colors.red),
-                ]))
-        
-        elements.append(table)
-        
-        # Constrói o PDF
-        doc.build(elements)
-        
-        # Retorna o arquivo
-        return send_file(
-            temp_file.name,
-            mimetype='application/pdf',
-            as_attachment=True,
-            download_name=f'relatorio_clientes_{datetime.now().strftime("%Y%m%d")}.pdf'
-        )
+    linhas = [
+        (c.nome, c.cnpj, c.telefone, c.email, c.cidade, c.estado, c.ativo)
+        for c in clientes
+    ]
+    
+    return _responder_relatorio_pdf(
+        'clientes', (linhas,),
+        f'relatorio_clientes_{datetime.now().strftime("%Y%m%d")}.pdf'
+    )
 
 def gerar_pdf_produtos(produtos):
-    """Gera um relatório PDF de produtos."""
-    from reportlab.lib.pagesizes import letter
-    from reportlab.lib import colors
-    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-    from reportlab.lib.styles import getSampleStyleSheet
-    
-    # Cria um arquivo temporário
-    with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as temp_file:
-        # Configura o documento
-        doc = SimpleDocTemplate(temp_file.name, pagesize=letter)
-        elements = []
-        
-        # Estilos
-        styles = getSampleStyleSheet()
-        title_style = styles['Heading1']
-        subtitle_style = styles['Heading2']
-        normal_style = styles['Normal']
-        
-        # Título
-        elements.append(Paragraph('Relatório de Produtos', title_style))
-        elements.append(Spacer(1, 12))
-        
-        # Data
-        elements.append(Paragraph(f'Data: {datetime.now().strftime("%d/%m/%Y")}', subtitle_style))
-        elements.append(Spacer(1, 12))
-        
-        # Tabela de produtos
-        data = [['Código', 'Nome', 'Categoria', 'Preço Venda', 'Estoque', 'Status']]
-        
-        for p in produtos:
-            data.append([
-                p.codigo,
-                p.nome,
-                p.categoria,
-                f'R$ {p.preco_venda:.2f}',
-                p.estoque_atual,
-                'Ativo' if p.ativo else 'Inativo'
-            ])
-        
-        # Cria a tabela
-        table = Table(data)
-        
-        # Estilo da tabela
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('ALIGN', (3, 1), (3, -1), 'RIGHT'),
-            ('ALIGN', (4, 1), (4, -1), 'CENTER'),
-        ]))
-        
-        # Adiciona cores para status
-        for i in range(1, len(data)):
-            if data[i][-1] == 'Ativo':
-                table.setStyle(TableStyle([
-                    ('TEXTCOLOR', (-1, i), (-1, i), colors.green),
-                ]))
-            else:
-                table.setStyle(TableStyle([
-                    ('TEXTCOLOR', (-1, i), (-1, i), colors.red),
-                ]))
-        
-        elements.append(table)
-        
-        # Constrói o PDF
-        doc.build(elements)
-        
-        # Retorna o arquivo
-        return send_file(
-            temp_file.name,
-            mimetype='application/pdf',
-            as_attachment=True,
-            download_name=f'relatorio_produtos_{datetime.now().strftime("%Y%m%d")}.pdf'
-        )
+    """Gera um relatório PDF de produtos.
 
+    produtos: linhas (codigo, nome, categoria, preco_sugerido, estoque_atual, ativo)
+    """
+    linhas = [tuple(p) for p in produtos]
+    
+    return _responder_relatorio_pdf(
+        'produtos', (linhas,),
+        f'relatorio_produtos_{datetime.now().strftime("%Y%m%d")}.pdf'
+    )
@@ -7,6 +7,13 @@ from flask_login import login_required, current_user
 from app import db
 from app.models.material import Material, MovimentacaoEstoque
 from app.forms import MaterialForm, MovimentacaoEstoqueForm
+from app.services.busca_service import aplicar_busca
+from app.utils.autocompletar import autocompletar_materiais, resposta_autocompletar
+from app.utils.paginacao import paginar_requisicao
+from app.models.perfis_carga import perfil_carga
+from app.utils.estoque_atomico import EstoqueInsuficiente
+from app.services.mrp_service import calcular_necessidades, necessidades_para_json
+from app.services.previsao_service import previsao_ruptura, previsao_para_lista
 from datetime import datetime
 
 # Criação do Blueprint
@@ -25,10 +32,7 @@ def index():
     query = Material.query
     
     if search:
-        query = query.filter(
-            Material.nome.contains(search) | 
-            Material.codigo.contains(search)
-        )
+        query = aplicar_busca(query, Material, search)
     
     if status == 'ativo':
         query = query.filter_by(ativo=True)
@@ -86,7 +90,9 @@ def novo():
                 material_id=material.id,
                 tipo='entrada',
                 quantidade=material.estoque_atual,
-                motivo='Estoque inicial',
+                quantidade_anterior=0,
+                quantidade_atual=material.estoque_atual,
+                observacao='Estoque inicial',
                 usuario_id=current_user.id
             )
             db.session.add(movimentacao)
@@ -181,7 +187,6 @@ def toggle_status(id):
 @login_required
 def movimentacoes():
     """Lista todas as movimentações de estoque."""
-    page = request.args.get('page', 1, type=int)
     material_id = request.args.get('material_id', '', type=str)
     tipo = request.args.get('tipo', '', type=str)
     
@@ -193,8 +198,10 @@ def movimentacoes():
     if tipo:
         query = query.filter_by(tipo=tipo)
     
-    movimentacoes_paginadas = query.order_by(MovimentacaoEstoque.data.desc()).paginate(
-        page=page, per_page=20, error_out=False
+    # Paginação por chave (data, id): sem OFFSET nem COUNT(*) a cada página
+    movimentacoes_paginadas = paginar_requisicao(
+        query.options(*perfil_carga('movimentacao_estoque_lista')),
+        (MovimentacaoEstoque.data_movimentacao, MovimentacaoEstoque.id)
     )
     
     # Lista de materiais para o filtro
@@ -215,26 +222,21 @@ def nova_movimentacao():
     if form.validate_on_submit():
         material = Material.query.get(form.material_id.data)
         
-        # Verifica se há estoque suficiente para saída
-        if form.tipo.data == 'saida' and material.estoque_atual < form.quantidade.data:
-            flash(f'Estoque insuficiente. Disponível: {material.estoque_atual} {material.unidade_medida}', 'danger')
-            return render_template('estoque/movimentacao_form.html', form=form, title='Nova Movimentação')
-        
-        movimentacao = MovimentacaoEstoque(
-            material_id=form.material_id.data,
-            tipo=form.tipo.data,
-            quantidade=form.quantidade.data,
-            motivo=form.motivo.data,
-            observacoes=form.observacoes.data,
-            usuario_id=current_user.id
-        )
-        
-        db.session.add(movimentacao)
+        observacao = form.motivo.data
+        if form.observacoes.data:
+            observacao = f'{observacao} - {form.observacoes.data}'
         
-        # Atualiza o estoque do material
-        material.atualizar_estoque(form.quantidade.data, form.tipo.data, form.motivo.data)
-        
-        db.session.commit()
+        # A verificação de saldo e a baixa acontecem no mesmo UPDATE condicional
+        try:
+            material.atualizar_estoque(
+                form.quantidade.data, form.tipo.data, observacao,
+                exigir_saldo=True, usuario_id=current_user.id
+            )
+            db.session.commit()
+        except EstoqueInsuficiente as e:
+            db.session.rollback()
+            flash(f'Estoque insuficiente. Disponível: {e.disponivel} {material.unidade_medida}', 'danger')
+            return render_template('estoque/movimentacao_form.html', form=form, title='Nova Movimentação')
         
         flash(f'Movimentação de estoque registrada com sucesso!', 'success')
         return redirect(url_for('estoque.view', id=material.id))
@@ -247,31 +249,52 @@ def api_buscar():
     """API para buscar materiais (usado em selects)."""
     term = request.args.get('term', '')
     
-    materiais = Material.query.filter(
-        Material.ativo == True,
-        Material.nome.contains(term) | Material.codigo.contains(term)
-    ).limit(10).all()
+    # Prefixos no índice em memória; preço e estoque vêm do banco pelos ids
+    encontrados = autocompletar_materiais.buscar(term)
+    materiais = {}
+    if encontrados:
+        materiais = {m.id: m for m in Material.query.filter(Material.id.in_([i for i, _ in encontrados]))}
     
     results = []
-    for material in materiais:
+    for material_id, rotulo in encontrados:
+        material = materiais.get(material_id)
+        if material is None:
+            continue  # Removido depois da montagem do índice
         results.append({
             'id': material.id,
-            'text': f'{material.codigo} - {material.nome}',
-            'preco': float(material.preco_unitario) if material.preco_unitario else 0,
+            'text': rotulo,
+            'preco': float(material.custo_unitario) if material.custo_unitario else 0,
             'estoque': float(material.estoque_atual),
             'unidade': material.unidade_medida
         })
     
-    return jsonify(results)
+    return resposta_autocompletar(results)
+
+@estoque.route('/api/necessidades')
+@login_required
+def api_necessidades():
+    """API com as necessidades de materiais dos pedidos em aberto (MRP)."""
+    return jsonify(necessidades_para_json(calcular_necessidades()))
+
+@estoque.route('/api/previsao-ruptura')
+@login_required
+def api_previsao_ruptura():
+    """API com a previsão de ruptura dos materiais (todos ou, com ?alertas=1, só os em alerta)."""
+    if request.args.get('alertas', type=int):
+        return jsonify(previsao_ruptura.alertas())
+    return jsonify(previsao_para_lista(previsao_ruptura.previsao()))
 
 @estoque.route('/alertas')
 @login_required
 def alertas():
-    """Página de alertas de estoque baixo."""
+    """Página de alertas de estoque baixo e de ruptura prevista."""
     materiais_baixo_estoque = Material.query.filter(
         Material.ativo == True,
         Material.estoque_atual <= Material.estoque_minimo
     ).order_by(Material.nome).all()
     
-    return render_template('estoque/alertas.html', materiais=materiais_baixo_estoque)
+    # Materiais que devem acabar antes (ou logo depois) do prazo de entrega do fornecedor
+    previsoes = previsao_ruptura.alertas()
+    
+    return render_template('estoque/alertas.html', materiais=materiais_baixo_estoque, previsoes=previsoes)
 
@@ -0,0 +1,89 @@
+"""
+Atualização atômica de saldos de estoque do ERP ROMA
+
+O saldo é alterado no próprio banco, com um UPDATE condicional
+(SET estoque_atual = estoque_atual - :q WHERE estoque_atual >= :q), em vez de
+ler o valor, calcular em Python e gravar de volta. Duas movimentações
+simultâneas do mesmo item não perdem atualizações e a verificação de saldo
+acontece no mesmo comando que faz a baixa.
+
+Depois do UPDATE a linha fica travada até o fim da transação (trava de escrita
+no SQLite, bloqueio de linha nos demais bancos), então o saldo relido em
+seguida é o resultado do próprio comando.
+"""
+
+from datetime import datetime
+from decimal import Decimal
+from sqlalchemy import select, update
+from sqlalchemy.orm.attributes import set_committed_value
+from app import db
+
+
+class EstoqueInsuficiente(Exception):
+    """Saída maior que o saldo disponível."""
+
+    def __init__(self, registro, quantidade, disponivel):
+        self.registro = registro
+        self.quantidade = quantidade
+        self.disponivel = disponivel
+        super().__init__(f'Estoque insuficiente para {registro}: solicitado {quantidade}, disponível {disponivel}')
+
+
+def _converter(modelo, quantidade):
+    """Converte a quantidade para o tipo da coluna de saldo (Decimal ou inteiro)."""
+    if isinstance(modelo.estoque_atual.type, db.Numeric):
+        return Decimal(str(quantidade))
+    return int(quantidade)
+
+
+def _saldo(modelo, registro_id, bloquear=False):
+    consulta = select(modelo.estoque_atual).where(modelo.id == registro_id)
+    if bloquear:
+        consulta = consulta.with_for_update()
+    return db.session.execute(consulta).scalar_one() or 0
+
+
+def alterar_saldo(registro, quantidade, saida=False, exigir_saldo=False):
+    """Soma a quantidade ao saldo do registro (ou subtrai, com saida=True).
+
+    Numa saída sem saldo suficiente, lança EstoqueInsuficiente se exigir_saldo;
+    caso contrário zera o saldo (o estoque nunca fica negativo). Retorna
+    (saldo_anterior, saldo_atual) e atualiza o atributo do objeto sem marcá-lo
+    como alterado. O commit fica a cargo de quem chama.
+    """
+    modelo = type(registro)
+    if registro.id is None:
+        db.session.flush()
+
+    quantidade = _converter(modelo, quantidade)
+    coluna = modelo.estoque_atual
+    agora = datetime.utcnow()
+
+    comando = update(modelo).where(modelo.id == registro.id)
+    if saida:
+        comando = comando.where(coluna >= quantidade).values(
+            estoque_atual=coluna - quantidade, ultima_atualizacao=agora
+        )
+    else:
+        comando = comando.values(estoque_atual=coluna + quantidade, ultima_atualizacao=agora)
+
+    resultado = db.session.execute(comando.execution_options(synchronize_session=False))
+
+    if resultado.rowcount:
+        atual = _saldo(modelo, registro.id)
+        anterior = atual + quantidade if saida else atual - quantidade
+    else:
+        # Saldo insuficiente: a linha é travada antes de decidir entre erro e zerar
+        anterior = _saldo(modelo, registro.id, bloquear=True)
+        if anterior < quantidade and exigir_saldo:
+            raise EstoqueInsuficiente(registro, quantidade, anterior)
+
+        atual = max(anterior - quantidade, 0)
+        db.session.execute(
+            update(modelo).where(modelo.id == registro.id).values(
+                estoque_atual=atual, ultima_atualizacao=agora
+            ).execution_options(synchronize_session=False)
+        )
+
+    set_committed_value(registro, 'estoque_atual', atual)
+    return anterior, atual
@@ -0,0 +1,110 @@
+"""
+Saída de relatórios do ERP ROMA
+
+Os arquivos são montados em memória e só vão para o disco acima de REPORT_SPOOL_THRESHOLD.
+As exportações CSV e XLSX percorrem a consulta em lotes (yield_per), com memória constante.
+"""
+
+import io
+import csv
+import tempfile
+from datetime import date, datetime
+from decimal import Decimal
+from flask import current_app, send_file, Response, stream_with_context
+
+# Quantidade de linhas lidas do banco por lote
+LOTE_EXPORTACAO = 1000
+
+MIMETYPES = {
+    'pdf': 'application/pdf',
+    'csv': 'text/csv',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+}
+
+# Formatos exportados linha a linha pelos relatórios
+FORMATOS_EXPORTACAO = ('csv', 'xlsx')
+
+
+def buffer_relatorio():
+    """Buffer binário em memória que passa para um arquivo temporário anônimo se crescer demais."""
+    limite = current_app.config.get('REPORT_SPOOL_THRESHOLD', 5 * 1024 * 1024)
+    return tempfile.SpooledTemporaryFile(max_size=limite, mode='w+b')
+
+
+def enviar_buffer(buffer, formato, nome_download):
+    """Envia o conteúdo do buffer ao cliente; o buffer é fechado ao final da resposta."""
+    buffer.seek(0)
+    return send_file(
+        buffer,
+        mimetype=MIMETYPES[formato],
+        as_attachment=True,
+        download_name=nome_download
+    )
+
+
+def _valor_planilha(valor):
+    """Converte valores do banco para tipos aceitos em CSV/XLSX."""
+    if isinstance(valor, Decimal):
+        return float(valor)
+    if isinstance(valor, datetime):
+        return valor.strftime('%d/%m/%Y %H:%M')
+    if isinstance(valor, date):
+        return valor.strftime('%d/%m/%Y')
+    if isinstance(valor, bool):
+        return 'Sim' if valor else 'Não'
+    return valor
+
+
+def _linhas(consulta):
+    """Percorre a consulta em lotes, sem carregar o resultado inteiro."""
+    for linha in consulta.yield_per(LOTE_EXPORTACAO):
+        yield [_valor_planilha(valor) for valor in linha]
+
+
+def exportar_csv(consulta, cabecalho, nome_download):
+    """Exporta a consulta em CSV, enviando as linhas conforme são lidas."""
+    def gerar():
+        saida = io.StringIO()
+        # Separador ';' e BOM para abrir corretamente no Excel em português
+        escritor = csv.writer(saida, delimiter=';')
+        saida.write('\ufeff')
+        escritor.writerow(cabecalho)
+
+        for i, linha in enumerate(_linhas(consulta), start=1):
+            escritor.writerow(linha)
+            if i % LOTE_EXPORTACAO == 0:
+                yield saida.getvalue().encode('utf-8')
+                saida.seek(0)
+                saida.truncate()
+
+        yield saida.getvalue().encode('utf-8')
+
+    return Response(
+        stream_with_context(gerar()),
+        mimetype=MIMETYPES['csv'],
+        headers={'Content-Disposition': f'attachment; filename={nome_download}'}
+    )
+
+
+def exportar_xlsx(consulta, cabecalho, nome_download, titulo='Relatório'):
+    """Exporta a consulta em XLSX usando o modo de escrita contínua do openpyxl."""
+    from openpyxl import Workbook
+
+    planilha = Workbook(write_only=True)
+    aba = planilha.create_sheet(title=titulo[:31])
+    aba.append(cabecalho)
+
+    for linha in _linhas(consulta):
+        aba.append(linha)
+
+    buffer = buffer_relatorio()
+    planilha.save(buffer)
+    return enviar_buffer(buffer, 'xlsx', nome_download)
+
+
+def exportar(formato, consulta, cabecalho, nome_base, titulo='Relatório'):
+    """Exporta a consulta no formato solicitado (csv ou xlsx)."""
+    nome_download = f'{nome_base}.{formato}'
+    if formato == 'xlsx':
+        return exportar_xlsx(consulta, cabecalho, nome_download, titulo)
+    return exportar_csv(consulta, cabecalho, nome_download)
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Script para gravar os fechamentos diários de estoque do ERP ROMA e conferir o razão.
+
+Deve ser agendado para rodar uma vez por dia, após a meia-noite (UTC).
+
+Uso:
+    python fechamento_estoque.py                 # fecha os dias pendentes até ontem
+    python fechamento_estoque.py 2024-01-01      # refaz os fechamentos a partir da data
+    python fechamento_estoque.py --verificar     # confere saldos, cadeia e fechamentos
+"""
+
+import os
+import sys
+from datetime import datetime
+
+# Adiciona o diretório raiz ao path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app, db
+from app.services.saldo_estoque_service import fechar_periodo, inicio_pendente, verificar_consistencia
+
+def verificar():
+    """Imprime as divergências encontradas no razão de estoque."""
+    divergencias = verificar_consistencia()
+
+    for linha in divergencias['saldos']:
+        print(f"Material {linha['codigo']}: estoque atual {linha['estoque_atual']}, razão {linha['saldo']}")
+    for linha in divergencias['cadeia']:
+        print(f"Movimentação {linha['id']} (material {linha['material_id']}): "
+              f"saldo anterior {linha['quantidade_anterior']}, esperado {linha['saldo_esperado']}")
+    for linha in divergencias['fechamentos']:
+        print(f"Fechamento {linha['data']} (material {linha['material_id']}): "
+              f"saldo {linha['saldo']}, razão {linha['saldo_razao']}")
+
+    total = sum(len(lista) for lista in divergencias.values())
+    print(f"Divergências encontradas: {total}")
+    return 1 if total else 0
+
+def main():
+    """Função principal."""
+    data_inicio = None
+
+    if len(sys.argv) > 1 and sys.argv[1] != '--verificar':
+        try:
+            data_inicio = datetime.strptime(sys.argv[1], '%Y-%m-%d').date()
+        except ValueError:
+            print("Data inválida. Use o formato AAAA-MM-DD.")
+            return 1
+
+    app = create_app()
+
+    with app.app_context():
+        # Garante que a tabela de fechamentos exista
+        db.create_all()
+
+        if len(sys.argv) > 1 and sys.argv[1] == '--verificar':
+            return verificar()
+
+        dias = fechar_periodo(
+            data_inicio or inicio_pendente(),
+            retencao_dias=app.config.get('STOCK_SNAPSHOT_RETENTION_DAYS')
+        )
+
+        print("Fechamentos de estoque gravados com sucesso!")
+        print(f"Dias fechados: {dias}")
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -7,6 +7,9 @@ from flask_login import login_required, current_user
 from app import db
 from app.models.financeiro import Movimentacao, NotaFiscal
 from app.forms import MovimentacaoForm, NotaFiscalForm
+from app.services.resumo_service import totais_financeiros, totais_financeiros_por_categoria
+from app.utils.paginacao import paginar_requisicao
+from app.services.indicadores_service import categorias_movimentacoes
 from datetime import datetime, timedelta
 from sqlalchemy import func, and_, or_
 from decimal import Decimal
@@ -36,22 +39,10 @@ def index():
         data_inicio = inicio_mes.strftime('%Y-%m-%d')
         data_fim = hoje.strftime('%Y-%m-%d')
     
-    # Consultas financeiras
-    query_base = Movimentacao.query.filter(
-        and_(
-            Movimentacao.data >= data_inicio_obj,
-            Movimentacao.data <= data_fim_obj
-        )
-    )
-    
-    # Totais
-    receitas = query_base.filter_by(tipo='receita').with_entities(
-        func.sum(Movimentacao.valor)
-    ).scalar() or Decimal('0')
-    
-    despesas = query_base.filter_by(tipo='despesa').with_entities(
-        func.sum(Movimentacao.valor)
-    ).scalar() or Decimal('0')
+    # Totais do período, em uma única consulta ao resumo diário
+    totais = totais_financeiros(data_inicio_obj, data_fim_obj)
+    receitas = totais.get('receita', Decimal('0'))
+    despesas = totais.get('despesa', Decimal('0'))
     
     saldo = receitas - despesas
     
@@ -61,16 +52,7 @@ def index():
     ).limit(10).all()
     
     # Movimentações por categoria
-    categorias = db.session.query(
-        Movimentacao.categoria,
-        Movimentacao.tipo,
-        func.sum(Movimentacao.valor).label('total')
-    ).filter(
-        and_(
-            Movimentacao.data >= data_inicio_obj,
-            Movimentacao.data <= data_fim_obj
-        )
-    ).group_by(Movimentacao.categoria, Movimentacao.tipo).all()
+    categorias = totais_financeiros_por_categoria(data_inicio_obj, data_fim_obj)
     
     # Notas fiscais pendentes
     notas_pendentes = NotaFiscal.query.filter_by(status='pendente').count()
@@ -89,7 +71,6 @@ def index():
 @login_required
 def movimentacoes():
     """Lista todas as movimentações financeiras."""
-    page = request.args.get('page', 1, type=int)
     tipo = request.args.get('tipo', '', type=str)
     categoria = request.args.get('categoria', '', type=str)
     data_inicio = request.args.get('data_inicio', '', type=str)
@@ -117,15 +98,11 @@ def movimentacoes():
         except ValueError:
             pass
     
-    movimentacoes_paginadas = query.order_by(Movimentacao.data.desc()).paginate(
-        page=page, per_page=20, error_out=False
-    )
+    # Paginação por chave (data, id): sem OFFSET nem COUNT(*) a cada página
+    movimentacoes_paginadas = paginar_requisicao(query, (Movimentacao.data, Movimentacao.id))
     
     # Lista de categorias para o filtro
-    categorias = db.session.query(Movimentacao.categoria).filter(
-        Movimentacao.categoria != None
-    ).distinct().all()
-    categorias = [c[0] for c in categorias if c[0]]
+    categorias = categorias_movimentacoes()
     
     return render_template('financeiro/movimentacoes.html',
                          movimentacoes=movimentacoes_paginadas,
@@ -2,6 +2,7 @@
 Formulários para o ERP ROMA
 """
 
+from datetime import datetime
 from flask_wtf import FlaskForm
 from wtforms import StringField, PasswordField, BooleanField, SubmitField, SelectField, TextAreaField, DecimalField, IntegerField, DateField
 from wtforms.validators import DataRequired, Email, Length, EqualTo, NumberRange, Optional
@@ -248,7 +249,8 @@ class ProducaoForm(FlaskForm):
         
         # Carrega pedidos para o select (será filtrado via JavaScript)
         from app.models.fornecedor import Pedido
-        pedidos = Pedido.query.order_by(Pedido.numero).all()
+        from app.models.perfis_carga import perfil_carga
+        pedidos = Pedido.query.options(*perfil_carga('pedido_escolhas')).order_by(Pedido.numero).all()
         self.pedido_id.choices = [('', 'Selecione...')] + [(p.id, f'{p.numero} - {p.cliente.nome}') for p in pedidos]
 
 class MovimentacaoEstoqueForm(FlaskForm):
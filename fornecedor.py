@@ -9,6 +9,9 @@ class Fornecedor(db.Model):
     """Modelo de fornecedor para o ERP ROMA."""
     
     __tablename__ = 'fornecedores'
+    __table_args__ = (
+        db.Index('idx_fornecedores_nome', 'nome'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     nome = db.Column(db.String(100), nullable=False)
@@ -39,6 +42,7 @@ class Fornecedor(db.Model):
     
     # Relacionamentos
     materiais = db.relationship('Material', backref='fornecedor', lazy='dynamic')
+    pedidos_compra = db.relationship('PedidoCompra', backref='fornecedor', lazy='dynamic')
     
     def __init__(self, nome, cnpj=None, email=None, telefone=None):
         self.nome = nome
@@ -66,6 +70,10 @@ class Pedido(db.Model):
     """Modelo de pedido para o ERP ROMA."""
     
     __tablename__ = 'pedidos'
+    __table_args__ = (
+        db.Index('idx_pedidos_status_data', 'status', 'data_pedido'),
+        db.Index('idx_pedidos_cliente_data', 'cliente_id', 'data_pedido'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     numero = db.Column(db.String(20), unique=True, nullable=False)
@@ -124,6 +132,10 @@ class ItemPedido(db.Model):
     """Modelo para itens de pedido."""
     
     __tablename__ = 'itens_pedido'
+    __table_args__ = (
+        db.Index('idx_itens_pedido_pedido', 'pedido_id'),
+        db.Index('idx_itens_pedido_produto', 'produto_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     pedido_id = db.Column(db.Integer, db.ForeignKey('pedidos.id'), nullable=False)
@@ -151,3 +163,62 @@ class ItemPedido(db.Model):
     def __repr__(self):
         return f'<ItemPedido {self.produto_id} - {self.quantidade}>'
 
+
+class PedidoCompra(db.Model):
+    """Modelo de pedido de compra de materiais a um fornecedor.
+    
+    Os rascunhos são gerados pelas sugestões de compra e substituídos a cada
+    nova geração; pedidos enviados contam como estoque a receber.
+    """
+    
+    __tablename__ = 'pedidos_compra'
+    __table_args__ = (
+        db.Index('idx_pedidos_compra_fornecedor_status', 'fornecedor_id', 'status'),
+        db.Index('idx_pedidos_compra_status', 'status'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    numero = db.Column(db.String(30), unique=True, nullable=False)
+    fornecedor_id = db.Column(db.Integer, db.ForeignKey('fornecedores.id'), nullable=False)
+    data_pedido = db.Column(db.Date, nullable=False, default=datetime.utcnow().date)
+    data_prevista = db.Column(db.Date)  # data_pedido + prazo de entrega do fornecedor
+    valor_total = db.Column(db.Numeric(10, 2), default=0.00)
+    status = db.Column(db.String(20), default='rascunho')  # rascunho, enviado, recebido, cancelado
+    observacoes = db.Column(db.Text)
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'))
+    data_criacao = db.Column(db.DateTime, default=datetime.utcnow)
+    ultima_atualizacao = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    itens = db.relationship('ItemPedidoCompra', backref='pedido_compra', lazy='dynamic', cascade='all, delete-orphan')
+    
+    def __repr__(self):
+        return f'<PedidoCompra {self.numero}>'
+
+
+class ItemPedidoCompra(db.Model):
+    """Modelo para itens de pedido de compra."""
+    
+    __tablename__ = 'itens_pedido_compra'
+    __table_args__ = (
+        db.Index('idx_itens_pedido_compra_pedido', 'pedido_compra_id'),
+        db.Index('idx_itens_pedido_compra_material', 'material_id'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    pedido_compra_id = db.Column(db.Integer, db.ForeignKey('pedidos_compra.id'), nullable=False)
+    material_id = db.Column(db.Integer, db.ForeignKey('materiais.id'), nullable=False)
+    quantidade = db.Column(db.Numeric(10, 3), nullable=False)
+    custo_unitario = db.Column(db.Numeric(10, 2), default=0.00)
+    
+    # Parâmetros da sugestão, para conferência do comprador
+    ponto_pedido = db.Column(db.Numeric(10, 3))
+    lote_economico = db.Column(db.Numeric(10, 3))
+    
+    material = db.relationship('Material')
+    
+    def calcular_subtotal(self):
+        """Calcula o subtotal do item."""
+        return float(self.custo_unitario or 0) * float(self.quantidade)
+    
+    def __repr__(self):
+        return f'<ItemPedidoCompra {self.material_id} - {self.quantidade}>'
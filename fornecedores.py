@@ -5,8 +5,10 @@ Módulo de fornecedores do ERP ROMA
 from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
 from flask_login import login_required, current_user
 from app import db
-from app.models.fornecedor import Fornecedor
+from app.models.fornecedor import Fornecedor, PedidoCompra
 from app.forms import FornecedorForm
+from app.services.busca_service import aplicar_busca
+from app.services.compras_service import sugestoes_compra, gerar_rascunhos
 
 # Criação do Blueprint
 fornecedores = Blueprint('fornecedores', __name__, url_prefix='/fornecedores')
@@ -22,11 +24,7 @@ def index():
     query = Fornecedor.query
     
     if search:
-        query = query.filter(
-            Fornecedor.nome.contains(search) | 
-            Fornecedor.cnpj.contains(search) |
-            Fornecedor.email.contains(search)
-        )
+        query = aplicar_busca(query, Fornecedor, search)
     
     if status == 'ativo':
         query = query.filter_by(ativo=True)
@@ -134,6 +132,10 @@ def excluir(id):
         flash('Não é possível excluir este fornecedor pois ele possui materiais associados.', 'danger')
         return redirect(url_for('fornecedores.view', id=id))
     
+    if fornecedor.pedidos_compra.first():
+        flash('Não é possível excluir este fornecedor pois ele possui pedidos de compra.', 'danger')
+        return redirect(url_for('fornecedores.view', id=id))
+    
     nome = fornecedor.nome
     db.session.delete(fornecedor)
     db.session.commit()
@@ -159,10 +161,9 @@ def api_buscar():
     """API para buscar fornecedores (usado em selects)."""
     term = request.args.get('term', '')
     
-    fornecedores = Fornecedor.query.filter(
-        Fornecedor.ativo == True,
-        Fornecedor.nome.contains(term)
-    ).limit(10).all()
+    fornecedores = aplicar_busca(
+        Fornecedor.query.filter(Fornecedor.ativo == True), Fornecedor, term, limite=10
+    ).all()
     
     results = []
     for fornecedor in fornecedores:
@@ -174,3 +175,26 @@ def api_buscar():
     
     return jsonify(results)
 
+@fornecedores.route('/sugestoes-compra')
+@login_required
+def sugestoes():
+    """Sugestões de compra agrupadas por fornecedor e pedidos em rascunho."""
+    grupos = sugestoes_compra()
+    rascunhos = PedidoCompra.query.filter_by(status='rascunho').order_by(PedidoCompra.valor_total.desc()).all()
+    
+    return render_template('fornecedores/sugestoes_compra.html', grupos=grupos, rascunhos=rascunhos)
+
+@fornecedores.route('/sugestoes-compra/gerar', methods=['POST'])
+@login_required
+def gerar_pedidos_compra():
+    """Grava as sugestões como pedidos de compra em rascunho (um por fornecedor)."""
+    pedidos = gerar_rascunhos(current_user.id)
+    
+    flash(f'{len(pedidos)} pedidos de compra em rascunho gerados.', 'success')
+    return redirect(url_for('fornecedores.sugestoes'))
+
+@fornecedores.route('/api/sugestoes-compra')
+@login_required
+def api_sugestoes():
+    """API com as sugestões de compra agrupadas por fornecedor."""
+    return jsonify(sugestoes_compra())
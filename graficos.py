@@ -0,0 +1,241 @@
+"""
+Renderização e cache de gráficos do ERP ROMA
+
+Os gráficos são servidos como PNG renderizado no servidor ou como dados em
+colunas (JSON) para renderização no navegador. No formato JSON as datas são
+dias desde 1970-01-01 (inteiros), os dias sem movimento são preenchidos com
+zero e séries longas são reduzidas somando dias consecutivos (`passo`).
+"""
+
+import gzip
+import json
+import math
+import hashlib
+import threading
+from datetime import date
+from collections import OrderedDict
+from io import BytesIO
+from flask import request, Response
+from sqlalchemy import func
+from app import db
+from app.utils.carregador import matplotlib_figure, numpy as np
+
+# Tamanho padrão dos gráficos (polegadas)
+TAMANHO_FIGURA = (10, 6)
+
+# Versão do formato dos dados em JSON; muda a chave de cache quando o formato muda
+VERSAO_DADOS_GRAFICOS = 1
+
+# Data de referência dos dias nos dados em JSON
+EPOCA = date(1970, 1, 1)
+
+
+class CacheGraficos:
+    """Cache LRU limitado com os gráficos já gerados (PNGs e dados JSON compactados)."""
+
+    def __init__(self, app=None, max_itens=256):
+        self.max_itens = max_itens
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Inicializa o cache com a configuração da aplicação."""
+        self.max_itens = app.config.get('CHART_CACHE_SIZE', self.max_itens)
+
+    def get(self, chave):
+        """Retorna o conteúdo em cache ou None."""
+        with self._lock:
+            png = self._itens.get(chave)
+            if png is None:
+                self.misses += 1
+                return None
+            self._itens.move_to_end(chave)
+            self.hits += 1
+            return png
+
+    def set(self, chave, png):
+        """Armazena um conteúdo, descartando os menos usados acima do limite."""
+        with self._lock:
+            self._itens[chave] = png
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+
+    def clear(self):
+        """Esvazia o cache."""
+        with self._lock:
+            self._itens.clear()
+
+    def __len__(self):
+        return len(self._itens)
+
+    def estatisticas(self):
+        """Retorna os contadores do cache."""
+        with self._lock:
+            return {
+                'itens': len(self._itens),
+                'max_itens': self.max_itens,
+                'bytes': sum(len(png) for png in self._itens.values()),
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+
+# Uma figura por thread, reaproveitada entre renderizações
+_local = threading.local()
+
+
+def _figura():
+    """Retorna a figura da thread atual, limpa para uma nova renderização."""
+    figura = getattr(_local, 'figura', None)
+    if figura is None:
+        figura = matplotlib_figure.Figure(figsize=TAMANHO_FIGURA)
+        _local.figura = figura
+    else:
+        figura.clear()
+        figura.set_size_inches(*TAMANHO_FIGURA)
+    return figura
+
+
+def renderizar_png(desenhar):
+    """Renderiza um gráfico em PNG sem usar o estado global do pyplot.
+
+    `desenhar` recebe a Figure e deve montar o gráfico nela.
+    """
+    figura = _figura()
+    try:
+        desenhar(figura)
+        buffer = BytesIO()
+        figura.savefig(buffer, format='png', bbox_inches='tight')
+        return buffer.getvalue()
+    finally:
+        # Libera os artistas para não manter dados da última renderização
+        figura.clear()
+
+
+def versao_dados(*modelos):
+    """Carimbo de versão dos dados a partir de ultima_atualizacao e contagem de linhas."""
+    partes = []
+    for modelo in modelos:
+        ultima, total = db.session.query(
+            func.max(modelo.ultima_atualizacao),
+            func.count(modelo.id)
+        ).one()
+        partes.append(f'{modelo.__tablename__}:{ultima}:{total}')
+    return '|'.join(partes)
+
+
+def chave_grafico(tipo, parametros, versao):
+    """Monta a chave de cache (e o ETag) a partir do tipo, parâmetros e versão dos dados."""
+    texto = '|'.join([tipo, repr(sorted(parametros.items())), versao])
+    return hashlib.sha1(texto.encode('utf-8')).hexdigest()
+
+
+def responder_grafico(tipo, parametros, versao, desenhar):
+    """Responde com o PNG do gráfico, usando cache e revalidação por ETag."""
+    chave = chave_grafico(tipo, parametros, versao)
+
+    # O navegador já possui esta versão do gráfico
+    if chave in request.if_none_match:
+        response = Response(status=304)
+    else:
+        png = cache_graficos.get(chave)
+        if png is None:
+            png = renderizar_png(desenhar)
+            cache_graficos.set(chave, png)
+        response = Response(png, mimetype='image/png')
+
+    response.set_etag(chave)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+# Dados em colunas (JSON)
+
+def dia_epoca(data):
+    """Dias desde 1970-01-01."""
+    return (data - EPOCA).days
+
+
+def serie_diaria(linhas, data_inicio, data_fim, colunas):
+    """Série diária em colunas, com zero nos dias sem registro.
+
+    `linhas` são tuplas (data, valor1, valor2, ...) na ordem de `colunas`.
+    Retorna {'dia': [...], coluna: [...]} com arrays NumPy de data_inicio a data_fim.
+    """
+    total_dias = max((data_fim - data_inicio).days + 1, 0)
+    serie = {'dia': np.arange(dia_epoca(data_inicio), dia_epoca(data_inicio) + total_dias)}
+    for coluna in colunas:
+        serie[coluna] = np.zeros(total_dias, dtype=np.float64)
+
+    for linha in linhas:
+        posicao = (linha[0] - data_inicio).days
+        if 0 <= posicao < total_dias:
+            for coluna, valor in zip(colunas, linha[1:]):
+                serie[coluna][posicao] += float(valor or 0)
+    return serie
+
+
+def reduzir_serie(serie, max_pontos):
+    """Reduz a série a no máximo max_pontos somando dias consecutivos.
+
+    Cada ponto passa a representar `passo` dias e leva o primeiro dia do grupo.
+    Retorna (serie, passo).
+    """
+    total = len(serie['dia'])
+    if not max_pontos or total <= max_pontos:
+        return serie, 1
+
+    passo = math.ceil(total / max_pontos)
+    inicios = np.arange(0, total, passo)
+    reduzida = {'dia': serie['dia'][inicios]}
+    for coluna, valores in serie.items():
+        if coluna != 'dia':
+            reduzida[coluna] = np.add.reduceat(valores, inicios)
+    return reduzida, passo
+
+
+def colunas_json(serie, casas=2):
+    """Converte as colunas em listas serializáveis (dias inteiros, valores arredondados)."""
+    return {
+        coluna: valores.tolist() if coluna == 'dia' else np.round(valores, casas).tolist()
+        for coluna, valores in serie.items()
+    }
+
+
+def responder_dados_grafico(tipo, parametros, versao, montar):
+    """Responde com os dados do gráfico em JSON compactado com gzip, com cache e ETag.
+
+    `montar` retorna o dicionário a ser serializado. O JSON fica em cache já
+    compactado; clientes que não aceitam gzip recebem o conteúdo descompactado.
+    """
+    chave = chave_grafico(f'json:v{VERSAO_DADOS_GRAFICOS}:{tipo}', parametros, versao)
+
+    if chave in request.if_none_match:
+        response = Response(status=304)
+    else:
+        compactado = cache_graficos.get(chave)
+        if compactado is None:
+            dados = dict(montar(), versao=VERSAO_DADOS_GRAFICOS, tipo=tipo)
+            texto = json.dumps(dados, separators=(',', ':'), ensure_ascii=False)
+            compactado = gzip.compress(texto.encode('utf-8'), compresslevel=6)
+            cache_graficos.set(chave, compactado)
+
+        if 'gzip' in request.accept_encodings:
+            response = Response(compactado, mimetype='application/json')
+            response.headers['Content-Encoding'] = 'gzip'
+        else:
+            response = Response(gzip.decompress(compactado), mimetype='application/json')
+
+    response.set_etag(chave)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+# Instância global
+cache_graficos = CacheGraficos()
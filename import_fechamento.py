@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Script para importar o histórico de produção da planilha FechamentoMensal no ERP ROMA.
+
+Uso:
+    python import_fechamento.py fechamento.csv
+    python import_fechamento.py fechamento.xlsx --simular
+    python import_fechamento.py fechamento.xlsx --criar-cadastros --rejeitadas rejeitadas.csv
+"""
+
+import os
+import sys
+import argparse
+
+# Adiciona o diretório raiz ao path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app, db
+from app.services.importacao_service import (
+    importar_fechamento_mensal, salvar_rejeitadas, TAMANHO_LOTE_IMPORTACAO
+)
+
+def main():
+    """Função principal."""
+    parser = argparse.ArgumentParser(description='Importa a planilha FechamentoMensal (CSV ou XLSX).')
+    parser.add_argument('arquivo', help='Arquivo CSV ou XLSX exportado da planilha')
+    parser.add_argument('--simular', action='store_true',
+                        help='Apenas valida as linhas, sem gravar nada')
+    parser.add_argument('--criar-cadastros', action='store_true',
+                        help='Cadastra clientes e produtos que não forem encontrados')
+    parser.add_argument('--rejeitadas', metavar='ARQUIVO',
+                        help='Grava as linhas rejeitadas neste arquivo CSV')
+    parser.add_argument('--lote', type=int, default=TAMANHO_LOTE_IMPORTACAO,
+                        help=f'Linhas por transação (padrão: {TAMANHO_LOTE_IMPORTACAO})')
+    args = parser.parse_args()
+
+    app = create_app()
+
+    with app.app_context():
+        db.create_all()
+
+        try:
+            resultado = importar_fechamento_mensal(
+                args.arquivo,
+                simular=args.simular,
+                criar_cadastros=args.criar_cadastros,
+                tamanho_lote=args.lote
+            )
+        except (FileNotFoundError, ValueError) as e:
+            print(f"Erro: {e}")
+            return 1
+
+        if args.simular:
+            print("Simulação concluída (nenhum dado foi gravado).")
+        else:
+            print("Importação concluída com sucesso!")
+
+        print(f"Linhas lidas: {resultado['linhas']}")
+        print(f"Linhas importadas: {resultado['importadas']}")
+        print(f"Linhas rejeitadas: {len(resultado['rejeitadas'])}")
+        print(f"Produções: {resultado['producoes']}")
+        print(f"Clientes criados: {resultado['clientes_criados']}")
+        print(f"Produtos criados: {resultado['produtos_criados']}")
+
+        tempo = max(resultado['tempo'], 1e-6)
+        print(f"Tempo: {tempo:.1f}s ({resultado['linhas'] / tempo * 60:,.0f} linhas/minuto)")
+
+        if args.rejeitadas and resultado['rejeitadas']:
+            salvar_rejeitadas(resultado['rejeitadas'], args.rejeitadas)
+            print(f"Linhas rejeitadas gravadas em: {args.rejeitadas}")
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
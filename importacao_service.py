@@ -0,0 +1,400 @@
+"""
+Serviço de importação do histórico de produção (planilha FechamentoMensal) do ERP ROMA
+
+Cada linha da planilha vira um ItemProducao; as linhas de uma mesma data e empresa são
+agrupadas em uma única Producao finalizada. Clientes e produtos são resolvidos por
+dicionários carregados uma única vez, e a gravação é feita com bulk_insert_mappings
+em transações por lote.
+"""
+
+import csv
+import os
+import re
+import time
+import logging
+import unicodedata
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from app import db
+from app.models.cliente import Cliente
+from app.models.produto import Produto
+from app.models.producao import Producao, ItemProducao
+from app.models.resumo import ResumoProducaoDiario
+from app.utils.cache_dados import cache_dados
+from app.services.resumo_service import contribuicao_producoes, aplicar_variacao_producoes
+
+logger = logging.getLogger(__name__)
+
+# Linhas gravadas por transação
+TAMANHO_LOTE_IMPORTACAO = 5000
+
+# Diferença aceita entre o valor total informado e quantidade × valor unitário
+TOLERANCIA_VALOR_TOTAL = Decimal('0.05')
+
+# Colunas da planilha (normalizadas) e o campo correspondente
+COLUNAS = {
+    'data': 'data',
+    'empresa': 'empresa',
+    'modelo': 'modelo',
+    'produto': 'produto',
+    'quantidade': 'quantidade',
+    'valor unitario': 'valor_unitario',
+    'valor total': 'valor_total',
+    'mes ano': 'mes_ano'
+}
+
+OBRIGATORIAS = ('data', 'empresa', 'produto', 'quantidade')
+
+
+class LinhaRejeitada(Exception):
+    """Linha da planilha que não pode ser importada."""
+    pass
+
+
+def _normalizar(texto):
+    """Normaliza textos para comparação: minúsculas, sem acentos e espaços repetidos."""
+    if texto is None:
+        return ''
+    texto = unicodedata.normalize('NFKD', str(texto))
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return re.sub(r'\s+', ' ', texto).strip().lower()
+
+
+def _converter_data(valor):
+    """Converte datas no formato DD/MM/AAAA, AAAA-MM-DD ou vindas do Excel."""
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+
+    texto = str(valor or '').strip()
+    for formato in ('%d/%m/%Y', '%Y-%m-%d', '%d/%m/%y', '%d-%m-%Y'):
+        try:
+            return datetime.strptime(texto, formato).date()
+        except ValueError:
+            continue
+
+    raise LinhaRejeitada(f'Data inválida: {texto}')
+
+
+def _converter_decimal(valor, campo):
+    """Converte valores como 'R$ 1.538,23', '1538.23' ou números do Excel."""
+    if valor is None or valor == '':
+        return None
+    if isinstance(valor, (int, float, Decimal)):
+        return Decimal(str(valor))
+
+    texto = str(valor).replace('R$', '').replace(' ', '').strip()
+    if ',' in texto:
+        texto = texto.replace('.', '').replace(',', '.')
+
+    try:
+        return Decimal(texto)
+    except InvalidOperation:
+        raise LinhaRejeitada(f'{campo} inválido: {valor}')
+
+
+def _converter_quantidade(valor):
+    """Converte a quantidade, que deve ser um número inteiro positivo."""
+    quantidade = _converter_decimal(valor, 'Quantidade')
+    if quantidade is None or quantidade <= 0 or quantidade != quantidade.to_integral_value():
+        raise LinhaRejeitada(f'Quantidade inválida: {valor}')
+    return int(quantidade)
+
+
+def _mapear_cabecalho(cabecalho):
+    """Associa cada coluna da planilha ao campo correspondente."""
+    mapa = {}
+    for indice, nome in enumerate(cabecalho):
+        campo = COLUNAS.get(_normalizar(nome).replace('_', ' '))
+        if campo and campo not in mapa:
+            mapa[campo] = indice
+
+    faltando = [c for c in OBRIGATORIAS if c not in mapa]
+    if faltando:
+        raise ValueError(f'Colunas obrigatórias ausentes: {", ".join(faltando)}')
+
+    return mapa
+
+
+def _ler_linhas(caminho):
+    """Lê a planilha (CSV ou XLSX) linha a linha.
+
+    Retorna tuplas (numero_linha, dicionario_de_campos), sem carregar o arquivo inteiro.
+    """
+    if caminho.lower().endswith(('.xlsx', '.xlsm')):
+        from openpyxl import load_workbook
+
+        planilha = load_workbook(caminho, read_only=True, data_only=True)
+        try:
+            aba = planilha['FechamentoMensal'] if 'FechamentoMensal' in planilha.sheetnames else planilha.active
+            linhas = aba.iter_rows(values_only=True)
+            mapa = _mapear_cabecalho(next(linhas, ()))
+            for numero, linha in enumerate(linhas, start=2):
+                if any(v not in (None, '') for v in linha):
+                    yield numero, {campo: linha[i] if i < len(linha) else None for campo, i in mapa.items()}
+        finally:
+            planilha.close()
+        return
+
+    with open(caminho, newline='', encoding='utf-8-sig') as arquivo:
+        amostra = arquivo.read(4096)
+        arquivo.seek(0)
+        try:
+            dialeto = csv.Sniffer().sniff(amostra, delimiters=';,\t')
+        except csv.Error:
+            dialeto = csv.excel
+
+        leitor = csv.reader(arquivo, dialeto)
+        mapa = _mapear_cabecalho(next(leitor, []))
+        for numero, linha in enumerate(leitor, start=2):
+            if any(v.strip() for v in linha):
+                yield numero, {campo: linha[i] if i < len(linha) else None for campo, i in mapa.items()}
+
+
+class _Cadastros:
+    """Dicionários de clientes e produtos usados para resolver as linhas."""
+
+    def __init__(self, criar, simular):
+        self.criar = criar
+        self.simular = simular
+        self.clientes_criados = 0
+        self.produtos_criados = 0
+        self._proximo_simulado = -1
+
+        self.clientes = {
+            _normalizar(nome): cliente_id
+            for cliente_id, nome in db.session.query(Cliente.id, Cliente.nome)
+        }
+
+        self.produtos_codigo = {}
+        self.produtos_nome = {}
+        for produto_id, codigo, nome, modelo in db.session.query(
+            Produto.id, Produto.codigo, Produto.nome, Produto.modelo
+        ):
+            self.produtos_codigo[_normalizar(codigo)] = produto_id
+            self.produtos_nome.setdefault(_normalizar(nome), produto_id)
+            if modelo:
+                self.produtos_nome.setdefault(_normalizar(f'{modelo} {nome}'), produto_id)
+
+    def _novo_id(self, obj):
+        """Grava o cadastro (ou simula um id no modo de simulação)."""
+        if self.simular:
+            self._proximo_simulado -= 1
+            return self._proximo_simulado
+        db.session.add(obj)
+        db.session.flush()
+        return obj.id
+
+    def cliente(self, empresa):
+        chave = _normalizar(empresa)
+        if not chave:
+            raise LinhaRejeitada('Empresa não informada')
+
+        cliente_id = self.clientes.get(chave)
+        if cliente_id is None:
+            if not self.criar:
+                raise LinhaRejeitada(f'Cliente não encontrado: {empresa}')
+            cliente_id = self._novo_id(Cliente(nome=str(empresa).strip()))
+            self.clientes[chave] = cliente_id
+            self.clientes_criados += 1
+
+        return cliente_id
+
+    def produto(self, modelo, produto):
+        chave = _normalizar(produto)
+        if not chave:
+            raise LinhaRejeitada('Produto não informado')
+
+        chave_modelo = _normalizar(f'{modelo} {produto}') if modelo else None
+        produto_id = (
+            self.produtos_codigo.get(chave)
+            or (chave_modelo and self.produtos_nome.get(chave_modelo))
+            or self.produtos_nome.get(chave)
+        )
+
+        if produto_id is None:
+            if not self.criar:
+                raise LinhaRejeitada(f'Produto não encontrado: {produto}')
+
+            # Código sequencial para os produtos vindos da planilha
+            codigo = f'IMP{len(self.produtos_codigo) + 1:05}'
+            while _normalizar(codigo) in self.produtos_codigo:
+                codigo = f'IMP{int(codigo[3:]) + 1:05}'
+
+            produto_id = self._novo_id(Produto(
+                codigo=codigo,
+                nome=str(produto).strip(),
+                modelo=str(modelo).strip() if modelo else None
+            ))
+            self.produtos_codigo[_normalizar(codigo)] = produto_id
+            self.produtos_nome[chave_modelo or chave] = produto_id
+            self.produtos_criados += 1
+
+        return produto_id
+
+
+def _validar_linha(campos, cadastros):
+    """Converte uma linha da planilha nos valores do item de produção."""
+    data = _converter_data(campos.get('data'))
+    quantidade = _converter_quantidade(campos.get('quantidade'))
+    valor_unitario = _converter_decimal(campos.get('valor_unitario'), 'Valor unitário')
+    valor_total = _converter_decimal(campos.get('valor_total'), 'Valor total')
+
+    if valor_unitario is None:
+        if valor_total is None:
+            raise LinhaRejeitada('Valor unitário e valor total não informados')
+        valor_unitario = (valor_total / quantidade).quantize(Decimal('0.01'))
+    elif valor_total is not None and abs(valor_total - valor_unitario * quantidade) > TOLERANCIA_VALOR_TOTAL:
+        raise LinhaRejeitada(
+            f'Valor total ({valor_total}) diferente de quantidade × valor unitário ({valor_unitario * quantidade})'
+        )
+
+    cliente_id = cadastros.cliente(campos.get('empresa'))
+    produto_id = cadastros.produto(campos.get('modelo'), campos.get('produto'))
+
+    return data, cliente_id, produto_id, quantidade, valor_unitario
+
+
+def _gravar_lote(itens, producoes, novas, usuario_id):
+    """Grava um lote de itens, criando as produções que ainda não existem.
+
+    `itens` são tuplas (chave_producao, produto_id, quantidade, valor_unitario) e
+    `producoes` mapeia (data, cliente_id) para o id da produção já gravada.
+    """
+    conn = db.session.connection()
+
+    # Produções de lotes anteriores que vão receber novos itens
+    existentes = {producoes[chave] for chave, _, _, _ in itens if chave in producoes}
+    resumo_antes = contribuicao_producoes(conn, existentes)
+
+    if novas:
+        novas = list(novas)
+        agora = datetime.utcnow()
+        registros = [
+            {
+                'data': data,
+                'cliente_id': cliente_id,
+                'status': 'finalizada',
+                'data_finalizacao': datetime.combine(data, datetime.min.time()),
+                'observacoes': 'Importado da planilha FechamentoMensal',
+                'usuario_id': usuario_id,
+                'data_criacao': agora,
+                'ultima_atualizacao': agora
+            }
+            for data, cliente_id in novas
+        ]
+        db.session.bulk_insert_mappings(Producao, registros, return_defaults=True)
+        for chave, registro in zip(novas, registros):
+            producoes[chave] = registro['id']
+
+    db.session.bulk_insert_mappings(ItemProducao, [
+        {
+            'producao_id': producoes[chave],
+            'produto_id': produto_id,
+            'quantidade': quantidade,
+            'valor_unitario': valor_unitario
+        }
+        for chave, produto_id, quantidade, valor_unitario in itens
+    ])
+
+    # bulk_insert_mappings não passa pelo flush; os resumos são ajustados aqui
+    afetadas = {producoes[chave] for chave, _, _, _ in itens}
+    aplicar_variacao_producoes(conn, resumo_antes, contribuicao_producoes(conn, afetadas))
+
+
+def _confirmar_lote():
+    """Confirma o lote e invalida o cache das tabelas gravadas fora do flush."""
+    db.session.commit()
+    # bulk_insert_mappings e os resumos gravados na conexão não passam pelos eventos da sessão
+    cache_dados.invalidar(Producao, ItemProducao, ResumoProducaoDiario)
+
+
+def importar_fechamento_mensal(caminho, simular=False, criar_cadastros=False,
+                               tamanho_lote=TAMANHO_LOTE_IMPORTACAO, usuario_id=None):
+    """Importa a planilha FechamentoMensal (CSV ou XLSX).
+
+    Com `simular=True` nada é gravado: as linhas são apenas validadas.
+    Com `criar_cadastros=True` clientes e produtos inexistentes são cadastrados.
+    Cada lote de `tamanho_lote` linhas é confirmado em uma transação própria.
+
+    Retorna um dicionário com os totais e a lista de linhas rejeitadas.
+    """
+    if not os.path.exists(caminho):
+        raise FileNotFoundError(f'Arquivo não encontrado: {caminho}')
+
+    inicio = time.time()
+    cadastros = _Cadastros(criar_cadastros, simular)
+    producoes = {}
+    rejeitadas = []
+    itens = []
+    novas = {}
+    total_linhas = 0
+    importadas = 0
+    producoes_criadas = 0
+
+    try:
+        for numero, campos in _ler_linhas(caminho):
+            total_linhas += 1
+
+            try:
+                data, cliente_id, produto_id, quantidade, valor_unitario = _validar_linha(campos, cadastros)
+            except LinhaRejeitada as e:
+                rejeitadas.append({'linha': numero, 'motivo': str(e), **campos})
+                continue
+
+            chave = (data, cliente_id)
+            if chave not in producoes and chave not in novas:
+                novas[chave] = None
+                producoes_criadas += 1
+                if simular:
+                    producoes[chave] = None
+
+            itens.append((chave, produto_id, quantidade, valor_unitario))
+            importadas += 1
+
+            if len(itens) >= tamanho_lote:
+                if not simular:
+                    _gravar_lote(itens, producoes, novas, usuario_id)
+                    _confirmar_lote()
+                itens, novas = [], {}
+
+        if itens and not simular:
+            _gravar_lote(itens, producoes, novas, usuario_id)
+            _confirmar_lote()
+
+        if simular:
+            db.session.rollback()
+
+    except Exception:
+        db.session.rollback()
+        raise
+
+    tempo = time.time() - inicio
+    logger.info(
+        f"Importação de {caminho}: {importadas} linhas importadas, {len(rejeitadas)} rejeitadas "
+        f"em {tempo:.1f}s{' (simulação)' if simular else ''}"
+    )
+
+    return {
+        'linhas': total_linhas,
+        'importadas': importadas,
+        'rejeitadas': rejeitadas,
+        'producoes': producoes_criadas,
+        'clientes_criados': cadastros.clientes_criados,
+        'produtos_criados': cadastros.produtos_criados,
+        'simulacao': simular,
+        'tempo': tempo
+    }
+
+
+def salvar_rejeitadas(rejeitadas, caminho):
+    """Grava o relatório de linhas rejeitadas em CSV."""
+    campos = ['linha', 'motivo'] + list(COLUNAS.values())
+
+    with open(caminho, 'w', newline='', encoding='utf-8-sig') as arquivo:
+        escritor = csv.DictWriter(arquivo, fieldnames=campos, delimiter=';', extrasaction='ignore')
+        escritor.writeheader()
+        escritor.writerows(rejeitadas)
+
+    return len(rejeitadas)
@@ -0,0 +1,95 @@
+"""
+Indicadores compartilhados pelas telas do ERP ROMA
+
+Contagens e listas de filtros usadas pelo dashboard, pela administração, pelas
+listagens e pelo script de otimização. Os resultados ficam no cache de dados e
+são invalidados no commit de alterações nas tabelas de origem.
+"""
+
+from sqlalchemy import select, func, case
+from app import db
+from app.utils.cache_dados import cache_dados
+from app.models.usuario import Usuario
+from app.models.cliente import Cliente
+from app.models.produto import Produto
+from app.models.material import Material
+from app.models.fornecedor import Fornecedor
+from app.models.producao import Producao
+from app.models.financeiro import Movimentacao, NotaFiscal
+
+
+def _total_e_ativos(modelo):
+    """(total, ativos) de um cadastro em uma única consulta."""
+    total, ativos = db.session.execute(
+        select(func.count(), func.coalesce(func.sum(case((modelo.ativo == True, 1), else_=0)), 0))
+        .select_from(modelo)
+    ).one()
+    return total, ativos
+
+
+def _distintos(coluna):
+    """Valores distintos e preenchidos de uma coluna, em ordem alfabética."""
+    valores = db.session.scalars(
+        select(coluna).where(coluna != None).distinct().order_by(coluna)
+    ).all()
+    return [valor for valor in valores if valor]
+
+
+@cache_dados.memorizar(Cliente)
+def total_clientes_ativos():
+    return Cliente.query.filter_by(ativo=True).count()
+
+
+@cache_dados.memorizar(Produto)
+def total_produtos_ativos():
+    return Produto.query.filter_by(ativo=True).count()
+
+
+@cache_dados.memorizar(Material)
+def total_materiais_estoque_baixo():
+    """Materiais com estoque atual no mínimo ou abaixo dele."""
+    return Material.query.filter(Material.estoque_atual <= Material.estoque_minimo).count()
+
+
+@cache_dados.memorizar(Usuario)
+def totais_usuarios():
+    """(total, ativos) dos usuários."""
+    return _total_e_ativos(Usuario)
+
+
+@cache_dados.memorizar(Produto)
+def categorias_produtos():
+    return _distintos(Produto.categoria)
+
+
+@cache_dados.memorizar(Material)
+def categorias_materiais():
+    return _distintos(Material.categoria)
+
+
+@cache_dados.memorizar(Movimentacao)
+def categorias_movimentacoes():
+    return _distintos(Movimentacao.categoria)
+
+
+@cache_dados.memorizar(Usuario, Cliente, Produto, Material, Fornecedor, Producao, Movimentacao, NotaFiscal)
+def estatisticas_cadastros():
+    """Totais de registros (e de ativos) das tabelas principais."""
+    estatisticas = {}
+    for nome, modelo in (
+        ('usuarios', Usuario), ('clientes', Cliente), ('produtos', Produto),
+        ('materiais', Material), ('fornecedores', Fornecedor)
+    ):
+        total, ativos = _total_e_ativos(modelo)
+        estatisticas[f'total_{nome}'] = total
+        estatisticas[f'{nome}_ativos'] = ativos
+
+    total, finalizadas = db.session.execute(
+        select(func.count(), func.coalesce(func.sum(case((Producao.status == 'finalizada', 1), else_=0)), 0))
+        .select_from(Producao)
+    ).one()
+    estatisticas['total_producoes'] = total
+    estatisticas['producoes_finalizadas'] = finalizadas
+    estatisticas['total_movimentacoes'] = db.session.scalar(select(func.count()).select_from(Movimentacao))
+    estatisticas['total_notas_fiscais'] = db.session.scalar(select(func.count()).select_from(NotaFiscal))
+    return estatisticas
@@ -10,6 +10,8 @@ from app.models.produto import Produto
 from app.models.material import Material
 from app.models.producao import Producao
 from app.models.financeiro import Movimentacao
+from app.services.resumo_service import totais_financeiros, totais_producao
+from app.services.indicadores_service import total_clientes_ativos, total_produtos_ativos
 from datetime import datetime, timedelta
 from sqlalchemy import func, and_
 
@@ -26,31 +28,18 @@ def dashboard():
     stats = {}
     
     # Total de clientes
-    stats['total_clientes'] = Cliente.query.filter_by(ativo=True).count()
+    stats['total_clientes'] = total_clientes_ativos()
     
     # Total de produtos
-    stats['total_produtos'] = Produto.query.filter_by(ativo=True).count()
+    stats['total_produtos'] = total_produtos_ativos()
     
-    # Produções este mês
+    # Produções este mês (lidas do resumo diário)
     inicio_mes = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    stats['producoes_mes'] = Producao.query.filter(
-        Producao.data >= inicio_mes.date()
-    ).count()
+    stats['producoes_mes'], _ = totais_producao(data_inicio=inicio_mes.date())
     
-    # Faturamento este mês (simulado - será implementado com dados reais)
-    entradas_mes = db.session.query(func.sum(Movimentacao.valor)).filter(
-        and_(
-            Movimentacao.tipo == 'entrada',
-            Movimentacao.data >= inicio_mes.date()
-        )
-    ).scalar() or 0
-    stats['faturamento_mes'] = float(entradas_mes)
-    
-    # Faturamento total (simulado)
-    faturamento_total = db.session.query(func.sum(Movimentacao.valor)).filter(
-        Movimentacao.tipo == 'entrada'
-    ).scalar() or 0
-    stats['faturamento_total'] = float(faturamento_total)
+    # Faturamento este mês e total (simulado), lidos do resumo diário
+    stats['faturamento_mes'] = float(totais_financeiros(data_inicio=inicio_mes.date()).get('entrada', 0))
+    stats['faturamento_total'] = float(totais_financeiros().get('entrada', 0))
     
     # Últimas produções
     ultimas_producoes = Producao.query.order_by(Producao.data.desc()).limit(5).all()
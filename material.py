@@ -4,11 +4,16 @@ Modelo de Material para o ERP ROMA
 
 from datetime import datetime
 from app import db
+from app.utils.estoque_atomico import alterar_saldo
 
 class Material(db.Model):
     """Modelo de material para controle de estoque."""
     
     __tablename__ = 'materiais'
+    __table_args__ = (
+        db.Index('idx_materiais_nome', 'nome'),
+        db.Index('idx_materiais_fornecedor', 'fornecedor_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     codigo = db.Column(db.String(20), unique=True, nullable=False)
@@ -50,18 +55,19 @@ class Material(db.Model):
         """Verifica se o estoque está abaixo do mínimo."""
         return self.estoque_atual <= self.estoque_minimo
     
-    def atualizar_estoque(self, quantidade, operacao='entrada', observacao=''):
-        """Atualiza o estoque do material e registra a movimentação."""
-        quantidade_anterior = self.estoque_atual
+    def atualizar_estoque(self, quantidade, operacao='entrada', observacao='', exigir_saldo=False, usuario_id=None):
+        """Atualiza o estoque do material e registra a movimentação.
         
-        if operacao == 'entrada':
-            self.estoque_atual += quantidade
-        elif operacao == 'saida':
-            self.estoque_atual -= quantidade
-        
-        # Não permite estoque negativo
-        if self.estoque_atual < 0:
-            self.estoque_atual = 0
+        O saldo é alterado com um UPDATE atômico no banco. Com exigir_saldo, uma
+        saída maior que o saldo lança EstoqueInsuficiente em vez de zerar o estoque.
+        """
+        if operacao in ('entrada', 'saida'):
+            quantidade_anterior, quantidade_atual = alterar_saldo(
+                self, quantidade, saida=operacao == 'saida', exigir_saldo=exigir_saldo
+            )
+        else:
+            # Ajuste: apenas registra a movimentação
+            quantidade_anterior = quantidade_atual = self.estoque_atual
         
         # Registra a movimentação
         movimentacao = MovimentacaoEstoque(
@@ -69,10 +75,12 @@ class Material(db.Model):
             tipo=operacao,
             quantidade=quantidade,
             quantidade_anterior=quantidade_anterior,
-            quantidade_atual=self.estoque_atual,
-            observacao=observacao
+            quantidade_atual=quantidade_atual,
+            observacao=observacao,
+            usuario_id=usuario_id
         )
         db.session.add(movimentacao)
+        return movimentacao
     
     def calcular_valor_estoque(self):
         """Calcula o valor total do estoque atual."""
@@ -102,6 +110,11 @@ class MovimentacaoEstoque(db.Model):
     """Modelo para movimentações de estoque de materiais."""
     
     __tablename__ = 'movimentacoes_estoque'
+    __table_args__ = (
+        # Também atende às consultas só por material_id (prefixo do índice)
+        db.Index('idx_movimentacoes_estoque_material_data', 'material_id', 'data_movimentacao'),
+        db.Index('idx_movimentacoes_estoque_data', 'data_movimentacao'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     material_id = db.Column(db.Integer, db.ForeignKey('materiais.id'), nullable=False)
@@ -116,3 +129,27 @@ class MovimentacaoEstoque(db.Model):
     def __repr__(self):
         return f'<MovimentacaoEstoque {self.tipo} - {self.quantidade}>'
 
+
+class FechamentoEstoque(db.Model):
+    """Saldo de um material no fechamento de um dia (ou mês).
+    
+    O saldo inclui todas as movimentações com data_movimentacao anterior a
+    `ate` (meia-noite do dia seguinte ao fechamento).
+    """
+    
+    __tablename__ = 'fechamentos_estoque'
+    __table_args__ = (
+        db.UniqueConstraint('material_id', 'data', name='uq_fechamentos_estoque_material_data'),
+        db.Index('idx_fechamentos_estoque_data', 'data'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    material_id = db.Column(db.Integer, db.ForeignKey('materiais.id'), nullable=False)
+    data = db.Column(db.Date, nullable=False)
+    ate = db.Column(db.DateTime, nullable=False)
+    tipo = db.Column(db.String(10), nullable=False, default='diario')  # diario, mensal
+    saldo = db.Column(db.Numeric(10, 3), nullable=False, default=0)
+    data_criacao = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<FechamentoEstoque {self.material_id} {self.data}: {self.saldo}>'
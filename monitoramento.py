@@ -0,0 +1,198 @@
+"""
+Monitoramento de consultas SQL por requisição do ERP ROMA
+
+Registra, para uma amostra das requisições, a quantidade de comandos SQL, o tempo
+gasto no banco e os comandos lentos (com o SQL normalizado). Os dados ficam em
+memória, em um buffer circular, e alimentam a página /admin/performance.
+"""
+
+import re
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from flask import g, request, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Normalização do SQL: literais viram '?' e listas IN são compactadas
+_RE_TEXTO = re.compile(r"'(?:[^']|'')*'")
+_RE_NUMERO = re.compile(r'\b\d+(?:\.\d+)?\b')
+_RE_LISTA = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_RE_ESPACOS = re.compile(r'\s+')
+
+
+def normalizar_sql(sql):
+    """Remove literais e espaços do SQL para agrupar comandos equivalentes."""
+    sql = _RE_TEXTO.sub('?', sql)
+    sql = _RE_NUMERO.sub('?', sql)
+    sql = _RE_ESPACOS.sub(' ', sql).strip()
+    return _RE_LISTA.sub('(?...)', sql)
+
+
+class MonitorSQL:
+    """Coletor das estatísticas de SQL por requisição."""
+
+    def __init__(self, app=None):
+        self.ativo = False
+        self.amostragem = 1.0
+        self.limite_lenta_ms = 100
+        self.max_top = 20
+        self._requisicoes = deque(maxlen=500)
+        self._lentas = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Inicializa o monitor com a configuração da aplicação."""
+        self.ativo = app.config.get('SQL_MONITOR_ENABLED', True)
+        self.amostragem = app.config.get('SQL_MONITOR_SAMPLE_RATE', 1.0)
+        self.limite_lenta_ms = app.config.get('SQL_SLOW_QUERY_MS', 100)
+        self.max_top = app.config.get('SQL_MONITOR_TOP', 20)
+        self._requisicoes = deque(maxlen=app.config.get('SQL_MONITOR_BUFFER', 500))
+
+        if not self.ativo:
+            return
+
+        app.before_request(self._inicio_requisicao)
+        app.after_request(self._fim_requisicao)
+
+        if not event.contains(Engine, 'before_cursor_execute', _antes_execucao):
+            event.listen(Engine, 'before_cursor_execute', _antes_execucao)
+            event.listen(Engine, 'after_cursor_execute', _apos_execucao)
+
+    # Ciclo da requisição
+
+    def _inicio_requisicao(self):
+        """Decide se a requisição entra na amostra."""
+        if random.random() < self.amostragem:
+            g.monitor_sql = {
+                'inicio': time.perf_counter(),
+                'consultas': 0,
+                'tempo_db': 0.0,
+                'lentas': []
+            }
+
+    def _fim_requisicao(self, response):
+        """Registra os totais da requisição no buffer."""
+        dados = g.pop('monitor_sql', None)
+        if dados is None:
+            return response
+
+        registro = {
+            'quando': datetime.now().isoformat(timespec='seconds'),
+            'metodo': request.method,
+            'caminho': request.path,
+            'endpoint': request.endpoint,
+            'status': response.status_code,
+            'consultas': dados['consultas'],
+            'tempo_db_ms': round(dados['tempo_db'] * 1000, 2),
+            'tempo_total_ms': round((time.perf_counter() - dados['inicio']) * 1000, 2),
+            'lentas': dados['lentas'][:5]
+        }
+
+        with self._lock:
+            self._requisicoes.append(registro)
+
+        return response
+
+    # Registro dos comandos
+
+    def registrar_consulta(self, sql, duracao):
+        """Soma o comando à requisição atual e guarda os lentos."""
+        dados = g.get('monitor_sql')
+        if dados is None:
+            return
+
+        dados['consultas'] += 1
+        dados['tempo_db'] += duracao
+
+        duracao_ms = duracao * 1000
+        if duracao_ms < self.limite_lenta_ms:
+            return
+
+        normalizado = normalizar_sql(sql)
+        dados['lentas'].append({'sql': normalizado, 'tempo_ms': round(duracao_ms, 2)})
+
+        with self._lock:
+            estatistica = self._lentas.get(normalizado)
+            if estatistica is None:
+                estatistica = self._lentas[normalizado] = {
+                    'sql': normalizado, 'execucoes': 0, 'tempo_total_ms': 0.0, 'tempo_max_ms': 0.0,
+                    'endpoint': request.endpoint
+                }
+            estatistica['execucoes'] += 1
+            estatistica['tempo_total_ms'] += duracao_ms
+            estatistica['tempo_max_ms'] = max(estatistica['tempo_max_ms'], duracao_ms)
+
+            # Mantém apenas os comandos mais custosos
+            if len(self._lentas) > self.max_top * 5:
+                self._podar_lentas()
+
+    def _podar_lentas(self):
+        mantidos = sorted(self._lentas.values(), key=lambda e: e['tempo_total_ms'], reverse=True)
+        self._lentas = {e['sql']: e for e in mantidos[:self.max_top * 2]}
+
+    # Consulta das estatísticas
+
+    def resumo(self):
+        """Retorna as estatísticas agregadas para a página de performance."""
+        with self._lock:
+            requisicoes = list(self._requisicoes)
+            lentas = sorted(self._lentas.values(), key=lambda e: e['tempo_total_ms'], reverse=True)
+
+        por_endpoint = {}
+        for r in requisicoes:
+            item = por_endpoint.setdefault(r['endpoint'] or r['caminho'], {
+                'endpoint': r['endpoint'] or r['caminho'], 'requisicoes': 0,
+                'consultas': 0, 'tempo_db_ms': 0.0, 'max_consultas': 0
+            })
+            item['requisicoes'] += 1
+            item['consultas'] += r['consultas']
+            item['tempo_db_ms'] += r['tempo_db_ms']
+            item['max_consultas'] = max(item['max_consultas'], r['consultas'])
+
+        for item in por_endpoint.values():
+            item['media_consultas'] = round(item['consultas'] / item['requisicoes'], 1)
+            item['media_tempo_db_ms'] = round(item['tempo_db_ms'] / item['requisicoes'], 2)
+
+        total = len(requisicoes)
+        return {
+            'configuracao': {
+                'amostragem': self.amostragem,
+                'limite_lenta_ms': self.limite_lenta_ms,
+                'buffer': self._requisicoes.maxlen
+            },
+            'requisicoes': total,
+            'media_consultas': round(sum(r['consultas'] for r in requisicoes) / total, 1) if total else 0,
+            'media_tempo_db_ms': round(sum(r['tempo_db_ms'] for r in requisicoes) / total, 2) if total else 0,
+            'endpoints': sorted(por_endpoint.values(), key=lambda e: e['tempo_db_ms'], reverse=True)[:self.max_top],
+            'lentas': [
+                dict(e, tempo_total_ms=round(e['tempo_total_ms'], 2), tempo_max_ms=round(e['tempo_max_ms'], 2))
+                for e in lentas[:self.max_top]
+            ],
+            'recentes': requisicoes[-self.max_top:][::-1]
+        }
+
+    def limpar(self):
+        """Descarta as estatísticas coletadas."""
+        with self._lock:
+            self._requisicoes.clear()
+            self._lentas.clear()
+
+
+def _antes_execucao(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and 'monitor_sql' in g:
+        conn.info['monitor_sql_inicio'] = time.perf_counter()
+
+
+def _apos_execucao(conn, cursor, statement, parameters, context, executemany):
+    inicio = conn.info.pop('monitor_sql_inicio', None)
+    if inicio is not None and has_request_context():
+        monitor_sql.registrar_consulta(statement, time.perf_counter() - inicio)
+
+
+# Instância global
+monitor_sql = MonitorSQL()
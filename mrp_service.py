@@ -0,0 +1,141 @@
+"""
+Cálculo de necessidades de materiais (MRP) do ERP ROMA
+
+A demanda em aberto (itens dos pedidos pendentes e em produção) é agregada por
+produto no banco e multiplicada pela matriz de composição produtos × materiais.
+A matriz é esparsa: cada linha da composição explodida (já expandida através
+dos componentes intermediários) é uma célula (produto, material, quantidade)
+e o produto matriz × vetor é feito com NumPy, somando quantidade × demanda por
+material (bincount).
+
+Do consumo bruto é descontado o estoque atual de cada material; o resultado é
+apresentado por material e agrupado por fornecedor.
+"""
+
+from datetime import datetime
+from sqlalchemy import select, func
+from app import db
+from app.utils.carregador import numpy as np
+from app.models.produto import ComposicaoExplodida
+from app.models.material import Material
+from app.models.fornecedor import Fornecedor, Pedido, ItemPedido
+
+# Pedidos cuja demanda ainda não consumiu materiais
+STATUS_ABERTOS = ('pendente', 'em_producao')
+
+
+def demanda_aberta(status=STATUS_ABERTOS):
+    """Consulta da demanda em aberto: (produto_id, quantidade), ordenada por produto."""
+    return (
+        select(ItemPedido.produto_id, func.sum(ItemPedido.quantidade).label('quantidade'))
+        .join(Pedido, Pedido.id == ItemPedido.pedido_id)
+        .where(Pedido.status.in_(status))
+        .group_by(ItemPedido.produto_id)
+        .order_by(ItemPedido.produto_id)
+    )
+
+
+def _vetor(valores, posicao):
+    return np.array([float(linha[posicao] or 0) for linha in valores], dtype=np.float64)
+
+
+def calcular_necessidades(status=STATUS_ABERTOS):
+    """Calcula as necessidades brutas e líquidas de materiais dos pedidos em aberto.
+
+    Retorna um dicionário com as listas 'materiais' (por material, maior
+    necessidade líquida primeiro) e 'fornecedores' (materiais a comprar
+    agrupados por fornecedor), além de totais de controle.
+    """
+    consulta_demanda = demanda_aberta(status)
+    demanda = db.session.execute(consulta_demanda).all()
+
+    resultado = {
+        'gerado_em': datetime.now(),
+        'pedidos': db.session.scalar(
+            select(func.count()).select_from(Pedido).where(Pedido.status.in_(status))
+        ),
+        'produtos': len(demanda),
+        'materiais': [],
+        'fornecedores': [],
+        'valor_compra': 0.0,
+    }
+    if not demanda:
+        return resultado
+
+    produtos_ids = np.array([linha[0] for linha in demanda], dtype=np.int64)
+    vetor_demanda = _vetor(demanda, 1)
+
+    # Células da matriz de composição dos produtos com demanda
+    produtos_demandados = consulta_demanda.with_only_columns(ItemPedido.produto_id).order_by(None)
+    celulas = db.session.execute(
+        select(ComposicaoExplodida.produto_id, ComposicaoExplodida.material_id, ComposicaoExplodida.quantidade)
+        .where(ComposicaoExplodida.produto_id.in_(produtos_demandados))
+    ).all()
+    if not celulas:
+        return resultado
+
+    linhas = np.searchsorted(produtos_ids, np.array([c[0] for c in celulas], dtype=np.int64))
+    materiais_ids, colunas = np.unique(np.array([c[1] for c in celulas], dtype=np.int64), return_inverse=True)
+
+    # Matriz esparsa (COO) transposta × vetor de demanda
+    bruto = np.bincount(colunas, weights=_vetor(celulas, 2) * vetor_demanda[linhas], minlength=len(materiais_ids))
+
+    cadastro = db.session.execute(
+        select(
+            Material.id, Material.codigo, Material.nome, Material.unidade_medida,
+            Material.estoque_atual, Material.custo_unitario,
+            Fornecedor.id, Fornecedor.nome, Fornecedor.prazo_entrega
+        )
+        .outerjoin(Fornecedor, Fornecedor.id == Material.fornecedor_id)
+        .where(Material.id.in_(materiais_ids.tolist()))
+        .order_by(Material.id)
+    ).all()
+
+    # O cadastro vem na mesma ordem de materiais_ids (ambos ordenados por id)
+    estoque = _vetor(cadastro, 4)
+    custo = _vetor(cadastro, 5)
+    liquido = np.maximum(bruto - estoque, 0.0)
+    valor = liquido * custo
+
+    materiais = []
+    fornecedores = {}
+    for i, linha in enumerate(cadastro):
+        material_id, codigo, nome, unidade, _, _, fornecedor_id, fornecedor_nome, prazo = linha
+        item = {
+            'material_id': material_id,
+            'codigo': codigo,
+            'nome': nome,
+            'unidade_medida': unidade,
+            'necessidade_bruta': round(float(bruto[i]), 3),
+            'estoque_atual': round(float(estoque[i]), 3),
+            'necessidade_liquida': round(float(liquido[i]), 3),
+            'custo_unitario': round(float(custo[i]), 2),
+            'valor_compra': round(float(valor[i]), 2),
+            'fornecedor_id': fornecedor_id,
+            'fornecedor': fornecedor_nome,
+        }
+        materiais.append(item)
+
+        if liquido[i] > 0:
+            grupo = fornecedores.setdefault(fornecedor_id, {
+                'fornecedor_id': fornecedor_id,
+                'fornecedor': fornecedor_nome or 'Sem fornecedor',
+                'prazo_entrega': prazo,
+                'valor_compra': 0.0,
+                'materiais': [],
+            })
+            grupo['materiais'].append(item)
+            grupo['valor_compra'] = round(grupo['valor_compra'] + item['valor_compra'], 2)
+
+    materiais.sort(key=lambda m: (-m['necessidade_liquida'], m['nome']))
+    resultado['materiais'] = materiais
+    resultado['fornecedores'] = sorted(fornecedores.values(), key=lambda f: -f['valor_compra'])
+    resultado['valor_compra'] = round(float(valor.sum()), 2)
+    return resultado
+
+
+def necessidades_para_json(resultado):
+    """Versão serializável do resultado (datas em ISO)."""
+    dados = dict(resultado)
+    dados['gerado_em'] = resultado['gerado_em'].isoformat()
+    return dados
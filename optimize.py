@@ -34,6 +34,9 @@ from app.models.material import Material
 from app.models.fornecedor import Fornecedor
 from app.models.producao import Producao
 from app.models.financeiro import Movimentacao, NotaFiscal
+from app.services.plano_consultas import analisar_consultas, consultas_com_varredura
+from app.services.busca_service import reconstruir_indices_busca
+from app.services.indicadores_service import estatisticas_cadastros
 
 class SystemOptimizer:
     """Classe para otimização do sistema."""
@@ -57,6 +60,9 @@ class SystemOptimizer:
             db_file = db_path.replace('sqlite:///', '')
             
             if os.path.exists(db_file):
+                # Cria os índices declarados nos modelos (antes do ANALYZE)
+                self._create_indexes()
+                
                 # Conecta ao banco de dados
                 conn = sqlite3.connect(db_file)
                 cursor = conn.cursor()
@@ -69,70 +75,54 @@ class SystemOptimizer:
                 logger.info("Executando ANALYZE no banco de dados...")
                 cursor.execute('ANALYZE')
                 
-                # Cria índices para melhorar performance
-                self._create_indexes(cursor)
-                
                 # Confirma as alterações
                 conn.commit()
                 conn.close()
                 
+                # Verifica os planos das consultas mais frequentes
+                self._check_query_plans()
+                
                 logger.info("Otimização do banco de dados concluída")
             else:
                 logger.warning("Arquivo do banco de dados não encontrado")
         else:
             logger.warning("Otimização disponível apenas para SQLite")
     
-    def _create_indexes(self, cursor):
-        """Cria índices para melhorar performance."""
+    def _create_indexes(self):
+        """Cria os índices declarados em __table_args__ dos modelos que ainda não existem.
+        
+        Em bancos gerenciados pelo Flask-Migrate os índices chegam pelas migrações;
+        aqui eles são garantidos para bancos criados com db.create_all().
+        """
         logger.info("Criando índices para otimização...")
         
-        indexes = [
-            # Índices para usuários
-            "CREATE INDEX IF NOT EXISTS idx_usuario_email ON usuario(email)",
-            "CREATE INDEX IF NOT EXISTS idx_usuario_ativo ON usuario(ativo)",
-            
-            # Índices para clientes
-            "CREATE INDEX IF NOT EXISTS idx_cliente_cnpj ON cliente(cnpj)",
-            "CREATE INDEX IF NOT EXISTS idx_cliente_ativo ON cliente(ativo)",
-            "CREATE INDEX IF NOT EXISTS idx_cliente_nome ON cliente(nome)",
-            
-            # Índices para produtos
-            "CREATE INDEX IF NOT EXISTS idx_produto_nome ON produto(nome)",
-            "CREATE INDEX IF NOT EXISTS idx_produto_ativo ON produto(ativo)",
-            "CREATE INDEX IF NOT EXISTS idx_produto_estoque ON produto(estoque_atual)",
-            
-            # Índices para materiais
-            "CREATE INDEX IF NOT EXISTS idx_material_nome ON material(nome)",
-            "CREATE INDEX IF NOT EXISTS idx_material_ativo ON material(ativo)",
-            "CREATE INDEX IF NOT EXISTS idx_material_estoque ON material(estoque_atual)",
-            "CREATE INDEX IF NOT EXISTS idx_material_fornecedor ON material(fornecedor_id)",
-            
-            # Índices para fornecedores
-            "CREATE INDEX IF NOT EXISTS idx_fornecedor_cnpj ON fornecedor(cnpj)",
-            "CREATE INDEX IF NOT EXISTS idx_fornecedor_ativo ON fornecedor(ativo)",
-            
-            # Índices para produção
-            "CREATE INDEX IF NOT EXISTS idx_producao_data ON producao(data)",
-            "CREATE INDEX IF NOT EXISTS idx_producao_cliente ON producao(cliente_id)",
-            "CREATE INDEX IF NOT EXISTS idx_producao_status ON producao(status)",
-            
-            # Índices para movimentações financeiras
-            "CREATE INDEX IF NOT EXISTS idx_movimentacao_data ON movimentacao(data)",
-            "CREATE INDEX IF NOT EXISTS idx_movimentacao_tipo ON movimentacao(tipo)",
-            "CREATE INDEX IF NOT EXISTS idx_movimentacao_status ON movimentacao(status)",
-            
-            # Índices para notas fiscais
-            "CREATE INDEX IF NOT EXISTS idx_nota_fiscal_data ON nota_fiscal(data_emissao)",
-            "CREATE INDEX IF NOT EXISTS idx_nota_fiscal_cliente ON nota_fiscal(cliente_id)",
-            "CREATE INDEX IF NOT EXISTS idx_nota_fiscal_status ON nota_fiscal(status)",
-        ]
-        
-        for index_sql in indexes:
-            try:
-                cursor.execute(index_sql)
-                logger.debug(f"Índice criado: {index_sql}")
-            except sqlite3.Error as e:
-                logger.warning(f"Erro ao criar índice: {e}")
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                try:
+                    index.create(bind=db.engine, checkfirst=True)
+                    logger.debug(f"Índice verificado: {index.name}")
+                except Exception as e:
+                    logger.warning(f"Erro ao criar índice {index.name}: {e}")
+        
+        # Índices de busca textual (FTS5)
+        try:
+            reconstruir_indices_busca()
+        except Exception as e:
+            logger.warning(f"Erro ao reconstruir índices de busca: {e}")
+    
+    def _check_query_plans(self):
+        """Executa o consultor de planos e registra as varreduras completas."""
+        resultados = analisar_consultas()
+        
+        for resultado in resultados:
+            if resultado['erro']:
+                logger.warning(f"Plano de {resultado['nome']} não analisado: {resultado['erro']}")
+            elif resultado['varreduras']:
+                logger.warning(
+                    f"Varredura completa em {resultado['nome']}: {', '.join(resultado['varreduras'])}"
+                )
+        
+        return consultas_com_varredura(resultados)
     
     def clean_old_data(self):
         """Limpa dados antigos desnecessários."""
@@ -212,22 +202,7 @@ class SystemOptimizer:
         logger.info("Atualizando estatísticas do sistema...")
         
         # Calcula estatísticas
-        stats = {
-            'total_usuarios': Usuario.query.count(),
-            'usuarios_ativos': Usuario.query.filter_by(ativo=True).count(),
-            'total_clientes': Cliente.query.count(),
-            'clientes_ativos': Cliente.query.filter_by(ativo=True).count(),
-            'total_produtos': Produto.query.count(),
-            'produtos_ativos': Produto.query.filter_by(ativo=True).count(),
-            'total_materiais': Material.query.count(),
-            'materiais_ativos': Material.query.filter_by(ativo=True).count(),
-            'total_fornecedores': Fornecedor.query.count(),
-            'fornecedores_ativos': Fornecedor.query.filter_by(ativo=True).count(),
-            'total_producoes': Producao.query.count(),
-            'producoes_finalizadas': Producao.query.filter_by(status='finalizada').count(),
-            'total_movimentacoes': Movimentacao.query.count(),
-            'total_notas_fiscais': NotaFiscal.query.count(),
-        }
+        stats = estatisticas_cadastros()
         
         # Salva estatísticas em arquivo
         stats_file = Path('instance/statistics.json')
@@ -0,0 +1,172 @@
+"""
+Paginação por chave (keyset) do ERP ROMA
+
+Em vez de OFFSET, cada página começa logo após (ou antes de) a chave do último
+registro mostrado, por exemplo (data, id). O custo de uma página não depende da
+sua profundidade e não há COUNT(*) a cada requisição.
+
+O cursor é um token opaco (base64 de JSON) com a direção, a chave de referência
+e, opcionalmente, o total calculado na primeira página.
+
+Uso:
+    pagina = paginar_requisicao(query, (Movimentacao.data, Movimentacao.id))
+    pagina.items, pagina.url_proxima(), pagina.url_anterior()
+
+As colunas da chave não podem ser nulas e a última deve ser única (id).
+"""
+
+import json
+import base64
+from datetime import date, datetime
+from decimal import Decimal
+from flask import request, url_for
+from sqlalchemy import tuple_
+
+POR_PAGINA_PADRAO = 20
+POR_PAGINA_MAXIMO = 100
+
+
+def _serializar(valor):
+    if isinstance(valor, datetime):
+        return {'t': valor.isoformat()}
+    if isinstance(valor, date):
+        return {'d': valor.isoformat()}
+    if isinstance(valor, Decimal):
+        return {'n': str(valor)}
+    return valor
+
+
+def _desserializar(valor):
+    if isinstance(valor, dict):
+        if 't' in valor:
+            return datetime.fromisoformat(valor['t'])
+        if 'd' in valor:
+            return date.fromisoformat(valor['d'])
+        if 'n' in valor:
+            return Decimal(valor['n'])
+        raise ValueError('Valor de cursor inválido')
+    return valor
+
+
+def codificar_cursor(direcao, chave, total=None):
+    """Gera o token opaco do cursor."""
+    dados = {'d': direcao, 'k': [_serializar(v) for v in chave]}
+    if total is not None:
+        dados['t'] = total
+    texto = json.dumps(dados, separators=(',', ':'))
+    return base64.urlsafe_b64encode(texto.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(token):
+    """Retorna (direção, chave, total) do token. Lança ValueError se for inválido."""
+    try:
+        texto = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode()
+        dados = json.loads(texto)
+        direcao = dados['d']
+        chave = tuple(_desserializar(v) for v in dados['k'])
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError('Cursor de paginação inválido') from e
+
+    if direcao not in ('n', 'p'):
+        raise ValueError('Cursor de paginação inválido')
+
+    return direcao, chave, dados.get('t')
+
+
+class PaginaKeyset:
+    """Página de resultados da paginação por chave."""
+
+    def __init__(self, items, per_page, has_next, has_prev, next_cursor, prev_cursor, total=None):
+        self.items = items
+        self.per_page = per_page
+        self.has_next = has_next
+        self.has_prev = has_prev
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.total = total  # Calculado na primeira página; None se não solicitado
+
+    def _url(self, cursor):
+        argumentos = request.args.to_dict()
+        argumentos['cursor'] = cursor
+        argumentos.update(request.view_args or {})
+        return url_for(request.endpoint, **argumentos)
+
+    def url_proxima(self):
+        """URL da próxima página (mantém os filtros da requisição)."""
+        return self._url(self.next_cursor) if self.has_next else None
+
+    def url_anterior(self):
+        """URL da página anterior (mantém os filtros da requisição)."""
+        return self._url(self.prev_cursor) if self.has_prev else None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def paginar_keyset(query, colunas, cursor=None, per_page=POR_PAGINA_PADRAO,
+                   descendente=True, estimar_total=False):
+    """Pagina a query pelas colunas da chave.
+
+    `descendente` define a ordem da listagem (movimentações: mais recentes
+    primeiro; cadastros: nome em ordem crescente). Com `estimar_total`, o total
+    é contado só na primeira página e levado nos cursores.
+    """
+    direcao, chave, total = 'n', None, None
+    if cursor:
+        direcao, chave, total = decodificar_cursor(cursor)
+        if len(chave) != len(colunas):
+            raise ValueError('Cursor de paginação inválido')
+
+    if estimar_total and total is None:
+        total = query.order_by(None).count()
+
+    # A página anterior é lida na ordem inversa e depois revertida
+    inverter = direcao == 'p'
+    decrescente = descendente != inverter
+    chave_colunas = tuple_(*colunas)
+
+    if chave is not None:
+        limite = tuple_(*chave)
+        query = query.filter(chave_colunas < limite if decrescente else chave_colunas > limite)
+
+    ordem = [c.desc() if decrescente else c.asc() for c in colunas]
+    linhas = query.order_by(None).order_by(*ordem).limit(per_page + 1).all()
+
+    mais = len(linhas) > per_page
+    items = linhas[:per_page]
+    if inverter:
+        items.reverse()
+
+    if direcao == 'n':
+        has_next, has_prev = mais, chave is not None
+    else:
+        has_next, has_prev = True, mais
+
+    next_cursor = prev_cursor = None
+    if items:
+        ultimo = tuple(getattr(items[-1], c.key) for c in colunas)
+        primeiro = tuple(getattr(items[0], c.key) for c in colunas)
+        next_cursor = codificar_cursor('n', ultimo, total)
+        prev_cursor = codificar_cursor('p', primeiro, total)
+
+    return PaginaKeyset(items, per_page, has_next, has_prev, next_cursor, prev_cursor, total)
+
+
+def paginar_requisicao(query, colunas, descendente=True, estimar_total=None):
+    """Pagina a query com o cursor e o tamanho de página da requisição.
+
+    Parâmetros aceitos: cursor, per_page e total=1 (estimativa do total).
+    Um cursor inválido volta para a primeira página.
+    """
+    per_page = min(max(request.args.get('per_page', POR_PAGINA_PADRAO, type=int), 1), POR_PAGINA_MAXIMO)
+    if estimar_total is None:
+        estimar_total = request.args.get('total', '') == '1'
+
+    try:
+        return paginar_keyset(query, colunas, request.args.get('cursor'), per_page,
+                              descendente, estimar_total)
+    except ValueError:
+        return paginar_keyset(query, colunas, None, per_page, descendente, estimar_total)
@@ -0,0 +1,63 @@
+"""
+Perfil de ajuste do SQLite do ERP ROMA
+
+Aplica os PRAGMAs de SQLITE_PRAGMAS (config.py) em toda conexão nova do engine,
+através de um listener de "connect". Cada ambiente define o seu perfil; bancos
+que não são SQLite ignoram a configuração.
+"""
+
+from sqlalchemy import event
+
+# journal_mode vem primeiro: só pode ser alterado fora de uma transação
+ORDEM_PRAGMAS = (
+    'journal_mode',
+    'synchronous',
+    'busy_timeout',
+    'cache_size',
+    'mmap_size',
+    'temp_store',
+    'foreign_keys'
+)
+
+
+def comandos_pragma(pragmas):
+    """Converte o dicionário do perfil nos comandos PRAGMA, na ordem de aplicação."""
+    nomes = [n for n in ORDEM_PRAGMAS if n in pragmas]
+    nomes += sorted(n for n in pragmas if n not in ORDEM_PRAGMAS)
+
+    comandos = []
+    for nome in nomes:
+        valor = pragmas[nome]
+        if isinstance(valor, bool):
+            valor = 'ON' if valor else 'OFF'
+        comandos.append(f'PRAGMA {nome}={valor}')
+    return comandos
+
+
+def registrar_pragmas(engine, pragmas):
+    """Registra no engine o listener que aplica os PRAGMAs em cada conexão."""
+    comandos = comandos_pragma(pragmas)
+
+    def aplicar_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for comando in comandos:
+                cursor.execute(comando)
+        finally:
+            cursor.close()
+
+    event.listen(engine, 'connect', aplicar_pragmas)
+    return aplicar_pragmas
+
+
+def configurar_sqlite(app, db):
+    """Aplica o perfil SQLITE_PRAGMAS da configuração ao engine da aplicação."""
+    pragmas = app.config.get('SQLITE_PRAGMAS')
+    if not pragmas:
+        return
+
+    with app.app_context():
+        engine = db.engine
+
+    if engine.dialect.name == 'sqlite':
+        registrar_pragmas(engine, pragmas)
@@ -0,0 +1,57 @@
+"""
+Perfis de carregamento (eager loading) dos modelos do ERP ROMA
+
+Cada perfil reúne as opções de carregamento necessárias para um caso de uso
+(listagem, detalhe, PDF, opções de formulário), evitando consultas N+1.
+
+Uso:
+    Producao.query.options(*perfil_carga('producao_detalhe')).get(producao_id)
+"""
+
+from sqlalchemy.orm import joinedload, selectinload
+from app.models.producao import Producao, ItemProducao
+from app.models.material import MovimentacaoEstoque
+from app.models.fornecedor import Pedido
+
+
+PERFIS_CARGA = {
+    # Listagem de produções: apenas o cliente de cada linha
+    'producao_lista': (
+        joinedload(Producao.cliente),
+    ),
+
+    # Detalhe / to_dict: cliente, itens e o produto de cada item
+    'producao_detalhe': (
+        joinedload(Producao.cliente),
+        selectinload(Producao.itens).joinedload(ItemProducao.produto),
+    ),
+
+    # Relatório PDF: cliente e itens (para o valor total)
+    'producao_pdf': (
+        joinedload(Producao.cliente),
+        selectinload(Producao.itens),
+    ),
+
+    # Itens avulsos com o produto
+    'item_producao': (
+        joinedload(ItemProducao.produto),
+    ),
+
+    # Opções do select de pedidos ("número - cliente")
+    'pedido_escolhas': (
+        joinedload(Pedido.cliente),
+    ),
+
+    # Listagem e PDF de movimentações de estoque
+    'movimentacao_estoque_lista': (
+        joinedload(MovimentacaoEstoque.material),
+    ),
+}
+
+
+def perfil_carga(nome):
+    """Retorna as opções de carregamento do perfil informado."""
+    try:
+        return PERFIS_CARGA[nome]
+    except KeyError:
+        raise ValueError(f'Perfil de carregamento desconhecido: {nome}')
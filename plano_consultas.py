@@ -0,0 +1,143 @@
+"""
+Consultor de planos de execução do ERP ROMA
+
+Executa EXPLAIN QUERY PLAN sobre o registro das consultas mais frequentes das
+rotas e aponta as varreduras completas de tabela (SCAN sem índice) e as
+ordenações em B-tree temporária. Usado pelo script analisar_consultas.py e
+pelo optimize.py.
+"""
+
+import re
+from datetime import date, timedelta
+from app import db
+from app.models.cliente import Cliente
+from app.models.produto import Produto, ComposicaoProduto
+from app.models.material import Material, MovimentacaoEstoque
+from app.models.fornecedor import Fornecedor, Pedido, ItemPedido
+from app.models.producao import Producao, ItemProducao
+from app.models.financeiro import Movimentacao
+from app.services.busca_service import aplicar_busca
+
+# "SCAN tabela" sem índice (SQLite >= 3.36; versões antigas usam "SCAN TABLE tabela")
+_RE_VARREDURA = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$')
+_RE_ORDENACAO = re.compile(r'USE TEMP B-TREE FOR (ORDER BY|GROUP BY|DISTINCT)')
+
+
+def _inicio_mes():
+    return date.today().replace(day=1)
+
+
+# Consultas das rotas mais acessadas, com parâmetros representativos
+CONSULTAS_QUENTES = {
+    'clientes.index': lambda: Cliente.query.order_by(Cliente.nome).limit(20),
+    'clientes.busca': lambda: aplicar_busca(Cliente.query, Cliente, 'roma').order_by(Cliente.nome).limit(20),
+    'clientes.view.producoes': lambda: (
+        Producao.query.filter_by(cliente_id=1).order_by(Producao.data.desc()).limit(5)
+    ),
+    'clientes.view.pedidos': lambda: (
+        Pedido.query.filter_by(cliente_id=1).order_by(Pedido.data_pedido.desc()).limit(5)
+    ),
+    'produtos.index': lambda: Produto.query.order_by(Produto.nome).limit(20),
+    'produtos.view.composicao': lambda: ComposicaoProduto.query.filter_by(produto_id=1),
+    'produtos.view.producoes': lambda: (
+        ItemProducao.query.filter_by(produto_id=1).order_by(ItemProducao.id.desc()).limit(5)
+    ),
+    'produtos.view.pedidos': lambda: ItemPedido.query.filter_by(produto_id=1),
+    'estoque.index': lambda: Material.query.filter_by(ativo=True).order_by(Material.nome).limit(20),
+    'estoque.view.movimentacoes': lambda: (
+        MovimentacaoEstoque.query.filter_by(material_id=1)
+        .order_by(MovimentacaoEstoque.data_movimentacao.desc()).limit(20)
+    ),
+    'estoque.movimentacoes': lambda: (
+        MovimentacaoEstoque.query.order_by(MovimentacaoEstoque.data_movimentacao.desc()).limit(20)
+    ),
+    'estoque.view.produtos': lambda: ComposicaoProduto.query.filter_by(material_id=1),
+    'fornecedores.index': lambda: Fornecedor.query.order_by(Fornecedor.nome).limit(20),
+    'fornecedores.view.materiais': lambda: Material.query.filter_by(fornecedor_id=1, ativo=True),
+    'producao.index': lambda: (
+        Producao.query.filter_by(status='em_producao').order_by(Producao.data.desc()).limit(20)
+    ),
+    'producao.periodo': lambda: (
+        Producao.query.filter(Producao.status == 'finalizada', Producao.data >= _inicio_mes())
+    ),
+    'producao.view.itens': lambda: ItemProducao.query.filter_by(producao_id=1),
+    'pedidos.itens': lambda: ItemPedido.query.filter_by(pedido_id=1),
+    'pedidos.abertos': lambda: (
+        Pedido.query.filter_by(status='pendente').order_by(Pedido.data_pedido)
+    ),
+    'financeiro.movimentacoes': lambda: (
+        Movimentacao.query.filter(
+            Movimentacao.tipo == 'receita',
+            Movimentacao.data >= _inicio_mes() - timedelta(days=90)
+        ).order_by(Movimentacao.data.desc()).limit(20)
+    ),
+}
+
+
+def _compilar(consulta):
+    """Compila a consulta para o dialeto do banco, com os parâmetros posicionais."""
+    statement = getattr(consulta, 'statement', consulta)
+    compilado = statement.compile(
+        dialect=db.engine.dialect,
+        compile_kwargs={'render_postcompile': True}
+    )
+    parametros = tuple(compilado.params[nome] for nome in compilado.positiontup or ())
+    return str(compilado), parametros
+
+
+def explicar(consulta):
+    """Retorna o SQL e as linhas de EXPLAIN QUERY PLAN da consulta."""
+    sql, parametros = _compilar(consulta)
+    linhas = db.session.connection().exec_driver_sql(f'EXPLAIN QUERY PLAN {sql}', parametros).all()
+    return sql, [linha[3] for linha in linhas]
+
+
+def analisar_plano(plano):
+    """Classifica as linhas do plano: tabelas varridas e ordenações temporárias."""
+    varreduras = []
+    ordenacoes = []
+
+    for detalhe in plano:
+        varredura = _RE_VARREDURA.match(detalhe.strip())
+        if varredura:
+            varreduras.append(varredura.group(1))
+
+        ordenacao = _RE_ORDENACAO.search(detalhe)
+        if ordenacao:
+            ordenacoes.append(ordenacao.group(1))
+
+    return varreduras, ordenacoes
+
+
+def analisar_consultas(nomes=None):
+    """Executa EXPLAIN QUERY PLAN nas consultas registradas.
+
+    Retorna uma lista de dicionários com o nome, o SQL, o plano, as tabelas
+    varridas por completo, as ordenações temporárias e o erro (se houver).
+    """
+    if db.engine.dialect.name != 'sqlite':
+        raise ValueError('O consultor de planos suporta apenas SQLite')
+
+    resultados = []
+
+    for nome in nomes or CONSULTAS_QUENTES:
+        resultado = {'nome': nome, 'sql': None, 'plano': [], 'varreduras': [], 'ordenacoes': [], 'erro': None}
+
+        try:
+            resultado['sql'], resultado['plano'] = explicar(CONSULTAS_QUENTES[nome]())
+            resultado['varreduras'], resultado['ordenacoes'] = analisar_plano(resultado['plano'])
+        except KeyError:
+            resultado['erro'] = 'Consulta não registrada'
+        except Exception as e:
+            # Tabela ausente ou coluna divergente do modelo: reporta e segue
+            db.session.rollback()
+            resultado['erro'] = str(e).splitlines()[0]
+
+        resultados.append(resultado)
+
+    return resultados
+
+
+def consultas_com_varredura(resultados):
+    """Filtra os resultados que fazem varredura completa de alguma tabela."""
+    return [r for r in resultados if r['varreduras']]
@@ -0,0 +1,212 @@
+"""
+Previsão de ruptura de estoque do ERP ROMA
+
+O alerta de estoque mínimo chega tarde para materiais com prazo de entrega
+longo. A partir das saídas registradas em MovimentacaoEstoque, cada processo
+mantém a série de consumo diário de todos os materiais (dias × materiais, uma
+matriz pandas) e calcula de uma vez, por colunas:
+
+- consumo médio dos últimos 7 e 30 dias;
+- consumo previsto por suavização exponencial simples (FORECAST_SMOOTHING) e
+  desvio padrão do consumo diário;
+- dias de cobertura do estoque atual e data prevista de ruptura.
+
+A data de ruptura é comparada com o prazo de entrega do fornecedor: o material
+é crítico se acabar antes de uma compra feita hoje chegar, e fica em atenção
+se acabar até FORECAST_SAFETY_DAYS dias depois disso. O dia corrente, ainda
+incompleto, não entra no cálculo do consumo (o estoque já reflete as saídas dele).
+
+A série é montada uma vez por dia; nas demais consultas só as movimentações com
+id acima do último lido são somadas a ela. A previsão fica em cache até chegar
+uma nova movimentação ou passar FORECAST_TTL segundos (alterações de cadastro).
+"""
+
+import time
+import threading
+from datetime import date, datetime, time as hora, timedelta
+from sqlalchemy import func
+from app import db
+from app.utils.carregador import numpy as np, pandas as pd
+from app.models.material import Material, MovimentacaoEstoque
+from app.models.fornecedor import Fornecedor
+
+# Ordem de gravidade dos status
+STATUS_PREVISAO = ('ruptura', 'critico', 'atencao', 'ok')
+
+
+class PrevisaoRuptura:
+    """Série de consumo e previsão de ruptura de todos os materiais ativos."""
+
+    def __init__(self, app=None, dias_historico=90, suavizacao=0.3, margem_dias=7, prazo_padrao=7, ttl=300):
+        self.dias_historico = dias_historico
+        self.suavizacao = suavizacao
+        self.margem_dias = margem_dias
+        self.prazo_padrao = prazo_padrao
+        self.ttl = ttl
+        self._serie = None
+        self._dia = None
+        self._ultimo_id = 0
+        self._previsao = None
+        self._calculado_em = 0.0
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Inicializa a previsão com a configuração da aplicação."""
+        self.dias_historico = app.config.get('FORECAST_HISTORY_DAYS', self.dias_historico)
+        self.suavizacao = app.config.get('FORECAST_SMOOTHING', self.suavizacao)
+        self.margem_dias = app.config.get('FORECAST_SAFETY_DAYS', self.margem_dias)
+        self.prazo_padrao = app.config.get('FORECAST_DEFAULT_LEAD_TIME', self.prazo_padrao)
+        self.ttl = app.config.get('FORECAST_TTL', self.ttl)
+        self.invalidar()
+
+    def invalidar(self):
+        """Descarta a série e a previsão; ambas são refeitas na próxima consulta."""
+        with self._lock:
+            self._serie = None
+            self._previsao = None
+
+    # Série de consumo
+
+    def _saidas(self, desde, ate_id, acima_de_id=0):
+        """Saídas com id na faixa (acima_de_id, ate_id], agrupadas: DataFrame (dia, material_id, quantidade)."""
+        dia = func.date(MovimentacaoEstoque.data_movimentacao)
+        linhas = db.session.query(
+            dia, MovimentacaoEstoque.material_id,
+            func.sum(MovimentacaoEstoque.quantidade)
+        ).filter(
+            MovimentacaoEstoque.tipo == 'saida',
+            MovimentacaoEstoque.data_movimentacao >= datetime.combine(desde, hora.min),
+            MovimentacaoEstoque.id > acima_de_id,
+            MovimentacaoEstoque.id <= ate_id
+        ).group_by(dia, MovimentacaoEstoque.material_id).all()
+
+        saidas = pd.DataFrame(linhas, columns=['dia', 'material_id', 'quantidade'])
+        saidas['dia'] = pd.to_datetime(saidas['dia'])
+        saidas['quantidade'] = saidas['quantidade'].astype(float)
+        return saidas
+
+    def _somar(self, saidas):
+        """Soma as saídas à série, acrescentando os materiais novos."""
+        if saidas.empty:
+            return
+        tabela = saidas.pivot_table(index='dia', columns='material_id', values='quantidade', aggfunc='sum')
+        colunas = self._serie.columns.union(tabela.columns)
+        self._serie = self._serie.reindex(columns=colunas, fill_value=0.0).add(
+            tabela.reindex(index=self._serie.index, columns=colunas), fill_value=0.0
+        )
+
+    def _atualizar_serie(self, hoje):
+        """Monta a série do dia ou soma a ela as movimentações novas. Retorna se houve mudança."""
+        ultimo_id = db.session.query(func.max(MovimentacaoEstoque.id)).scalar() or 0
+
+        # Remontada a cada dia ou se o banco perdeu movimentações (restauração de backup)
+        if self._serie is None or self._dia != hoje or ultimo_id < self._ultimo_id:
+            inicio = hoje - timedelta(days=self.dias_historico)
+            self._serie = pd.DataFrame(index=pd.date_range(inicio, hoje, freq='D'), dtype=float)
+            self._somar(self._saidas(inicio, ultimo_id))
+            self._dia = hoje
+            self._ultimo_id = ultimo_id
+            return True
+
+        if ultimo_id == self._ultimo_id:
+            return False
+
+        self._somar(self._saidas(hoje - timedelta(days=self.dias_historico), ultimo_id, self._ultimo_id))
+        self._ultimo_id = ultimo_id
+        return True
+
+    # Previsão
+
+    def _calcular(self, hoje):
+        """Calcula a previsão de todos os materiais ativos a partir da série."""
+        cadastro = pd.DataFrame(db.session.query(
+            Material.id, Material.codigo, Material.nome, Material.unidade_medida,
+            Material.estoque_atual, Material.estoque_minimo, Material.custo_unitario,
+            Fornecedor.id, Fornecedor.nome, Fornecedor.prazo_entrega
+        ).outerjoin(
+            Fornecedor, Fornecedor.id == Material.fornecedor_id
+        ).filter(
+            Material.ativo == True
+        ).all(), columns=[
+            'material_id', 'codigo', 'nome', 'unidade_medida', 'estoque_atual', 'estoque_minimo', 'custo_unitario',
+            'fornecedor_id', 'fornecedor', 'prazo_entrega'
+        ]).set_index('material_id')
+
+        # Dias completos (sem hoje), materiais na ordem do cadastro; sem saídas = zero
+        serie = self._serie.iloc[:-1].reindex(columns=cadastro.index, fill_value=0.0)
+
+        consumo_7d = serie.iloc[-7:].mean().to_numpy()
+        consumo_30d = serie.iloc[-30:].mean().to_numpy()
+        previsto = serie.ewm(alpha=self.suavizacao, adjust=False).mean().iloc[-1].to_numpy()
+        desvio = serie.std().fillna(0.0).to_numpy()
+
+        estoque = cadastro['estoque_atual'].fillna(0).astype(float).to_numpy()
+        prazo = cadastro['prazo_entrega'].fillna(self.prazo_padrao).astype(float).to_numpy()
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cobertura = np.where(previsto > 0, np.maximum(estoque, 0.0) / previsto, np.inf)
+
+        status = np.select(
+            [(estoque <= 0) & (previsto > 0), cobertura <= prazo, cobertura <= prazo + self.margem_dias],
+            ['ruptura', 'critico', 'atencao'],
+            default='ok'
+        )
+
+        previsao = cadastro.assign(
+            fornecedor_id=cadastro['fornecedor_id'].astype('Int64'),
+            estoque_atual=estoque,
+            prazo_entrega=prazo.astype(int),
+            consumo_7d=consumo_7d.round(3),
+            consumo_30d=consumo_30d.round(3),
+            consumo_previsto=previsto.round(3),
+            desvio_consumo=desvio.round(3),
+            dias_cobertura=np.floor(cobertura),
+            status=status
+        )
+        previsao['data_ruptura'] = [
+            hoje + timedelta(days=int(dias)) if np.isfinite(dias) else None
+            for dias in previsao['dias_cobertura']
+        ]
+        previsao['gravidade'] = pd.Categorical(previsao['status'], categories=STATUS_PREVISAO, ordered=True)
+        return previsao.sort_values(['gravidade', 'dias_cobertura', 'nome']).drop(columns='gravidade')
+
+    def previsao(self):
+        """Previsão de todos os materiais ativos (DataFrame indexado por material_id).
+
+        Recalculada só quando há movimentações novas ou o TTL expirou.
+        """
+        hoje = date.today()
+        with self._lock:
+            expirado = time.monotonic() - self._calculado_em > self.ttl
+            if self._atualizar_serie(hoje) or self._previsao is None or expirado:
+                self._previsao = self._calcular(hoje)
+                self._calculado_em = time.monotonic()
+            return self._previsao
+
+    def alertas(self, limite=None):
+        """Materiais em ruptura, críticos ou em atenção, do mais grave para o menos grave."""
+        alertas = self.previsao()
+        alertas = alertas[alertas['status'] != 'ok']
+        if limite:
+            alertas = alertas.head(limite)
+        return previsao_para_lista(alertas)
+
+
+def previsao_para_lista(previsao):
+    """Converte a previsão em lista de dicionários (cobertura infinita vira None)."""
+    itens = previsao.reset_index().replace({np.inf: None}).astype(object)
+    itens = itens.where(pd.notna(itens), None)
+    return [
+        {
+            **item,
+            'dias_cobertura': int(item['dias_cobertura']) if item['dias_cobertura'] is not None else None,
+            'data_ruptura': item['data_ruptura'].isoformat() if item['data_ruptura'] else None,
+        }
+        for item in itens.to_dict('records')
+    ]
+
+
+# Instância global
+previsao_ruptura = PrevisaoRuptura()
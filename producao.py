@@ -9,6 +9,11 @@ class Producao(db.Model):
     """Modelo para registro de produção."""
     
     __tablename__ = 'producoes'
+    __table_args__ = (
+        db.Index('idx_producoes_status_data', 'status', 'data'),
+        db.Index('idx_producoes_cliente_data', 'cliente_id', 'data'),
+        db.Index('idx_producoes_data', 'data'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     data = db.Column(db.Date, nullable=False, default=datetime.utcnow().date)
@@ -24,7 +29,8 @@ class Producao(db.Model):
     ultima_atualizacao = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relacionamentos
-    itens = db.relationship('ItemProducao', backref='producao', lazy='dynamic', cascade='all, delete-orphan')
+    cliente = db.relationship('Cliente', backref=db.backref('producoes', lazy='dynamic'))
+    itens = db.relationship('ItemProducao', backref='producao', cascade='all, delete-orphan')
     
     def __init__(self, data, cliente_id, pedido_id=None, observacoes=None):
         self.data = data
@@ -39,19 +45,15 @@ class Producao(db.Model):
     def finalizar(self):
         """Finaliza a produção e atualiza o estoque."""
         if self.status != 'finalizada':
-            self.status = 'finalizada'
-            self.data_finalizacao = datetime.utcnow()
-            
-            # Atualiza o estoque dos produtos
-            for item in self.itens:
-                produto = item.produto
-                produto.atualizar_estoque(item.quantidade, 'adicionar')
-                
-                # Deduz os materiais utilizados
-                for composicao in produto.composicoes:
-                    material = composicao.material
-                    quantidade_usada = composicao.quantidade * item.quantidade
-                    material.atualizar_estoque(quantidade_usada, 'saida', f'Produção #{self.id}')
+            from app.services.producao_service import finalizar_producoes
+
+            # Garante que a produção tenha id antes do cálculo em conjunto
+            if self.id is None:
+                db.session.add(self)
+                db.session.flush()
+
+            # Atualiza o estoque de produtos e materiais com operações em lote
+            finalizar_producoes([self.id], usuario_id=self.usuario_id)
     
     def cancelar(self):
         """Cancela a produção."""
@@ -79,6 +81,10 @@ class ItemProducao(db.Model):
     """Modelo para itens de produção."""
     
     __tablename__ = 'itens_producao'
+    __table_args__ = (
+        db.Index('idx_itens_producao_producao', 'producao_id'),
+        db.Index('idx_itens_producao_produto', 'produto_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     producao_id = db.Column(db.Integer, db.ForeignKey('producoes.id'), nullable=False)
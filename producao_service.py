@@ -0,0 +1,180 @@
+"""
+Serviço de finalização de produções do ERP ROMA
+"""
+
+from datetime import datetime
+from decimal import Decimal
+from sqlalchemy import select, update, func, case
+from app import db
+from app.models.producao import Producao, ItemProducao
+from app.models.produto import Produto, ComposicaoExplodida
+from app.models.material import Material, MovimentacaoEstoque
+from app.models.resumo import ResumoProducaoDiario
+from app.utils.cache_dados import cache_dados
+from app.services.resumo_service import contribuicao_producoes, aplicar_variacao_producoes
+
+
+def calcular_consumo_materiais(producao_ids):
+    """Calcula o consumo de materiais por produção em uma única consulta agregada.
+
+    Retorna uma lista de tuplas (producao_id, material_id, quantidade, estoque_atual),
+    ordenada por produção e material.
+    """
+    if not producao_ids:
+        return []
+
+    consumo = db.session.execute(
+        select(
+            ItemProducao.producao_id,
+            ComposicaoExplodida.material_id,
+            func.sum(ComposicaoExplodida.quantidade * ItemProducao.quantidade).label('quantidade'),
+            Material.estoque_atual
+        ).join(
+            ComposicaoExplodida, ComposicaoExplodida.produto_id == ItemProducao.produto_id
+        ).join(
+            Material, Material.id == ComposicaoExplodida.material_id
+        ).where(
+            ItemProducao.producao_id.in_(producao_ids)
+        ).group_by(
+            ItemProducao.producao_id,
+            ComposicaoExplodida.material_id,
+            Material.estoque_atual
+        ).order_by(
+            ItemProducao.producao_id,
+            ComposicaoExplodida.material_id
+        )
+    ).all()
+
+    return [tuple(linha) for linha in consumo]
+
+
+def finalizar_producoes(producao_ids, usuario_id=None):
+    """Finaliza várias produções em uma única transação.
+
+    O consumo de materiais é calculado com uma consulta agregada, os estoques são
+    atualizados com UPDATEs em conjunto e as movimentações são inseridas em lote.
+    O commit fica a cargo de quem chama. Retorna os ids efetivamente finalizados.
+    """
+    # Garante que itens pendentes na sessão participem do cálculo
+    db.session.flush()
+
+    # Considera apenas produções que ainda não foram finalizadas
+    pendentes = db.session.execute(
+        select(Producao.id).where(
+            Producao.id.in_(list(producao_ids)),
+            Producao.status != 'finalizada'
+        ).order_by(Producao.id)
+    ).scalars().all()
+
+    if not pendentes:
+        return []
+
+    agora = datetime.utcnow()
+
+    # Os UPDATEs em conjunto não passam pelo flush, então o resumo diário é ajustado aqui
+    conn = db.session.connection()
+    resumo_antes = contribuicao_producoes(conn, pendentes)
+
+    # Monta as movimentações a partir do saldo lido junto com o consumo
+    consumo = calcular_consumo_materiais(pendentes)
+    saldos = {}
+    movimentacoes = []
+
+    for producao_id, material_id, quantidade, estoque_atual in consumo:
+        quantidade = Decimal(str(quantidade or 0))
+        saldo_anterior = saldos.get(material_id, Decimal(str(estoque_atual or 0)))
+
+        # Não permite estoque negativo
+        saldo_atual = max(saldo_anterior - quantidade, Decimal('0'))
+        saldos[material_id] = saldo_atual
+
+        movimentacoes.append({
+            'material_id': material_id,
+            'tipo': 'saida',
+            'quantidade': quantidade,
+            'quantidade_anterior': saldo_anterior,
+            'quantidade_atual': saldo_atual,
+            'observacao': f'Produção #{producao_id}',
+            'data_movimentacao': agora,
+            'usuario_id': usuario_id
+        })
+
+    # Deduz os materiais utilizados com um único UPDATE
+    if saldos:
+        consumo_material = select(
+            func.sum(ComposicaoExplodida.quantidade * ItemProducao.quantidade)
+        ).join(
+            ItemProducao, ItemProducao.produto_id == ComposicaoExplodida.produto_id
+        ).where(
+            ItemProducao.producao_id.in_(pendentes),
+            ComposicaoExplodida.material_id == Material.id
+        ).scalar_subquery()
+
+        db.session.execute(
+            update(Material).where(
+                Material.id.in_(list(saldos))
+            ).values(
+                estoque_atual=case(
+                    (Material.estoque_atual > consumo_material, Material.estoque_atual - consumo_material),
+                    else_=0
+                ),
+                ultima_atualizacao=agora
+            ).execution_options(synchronize_session='fetch')
+        )
+
+    # Adiciona os produtos fabricados ao estoque
+    quantidade_produzida = select(
+        func.sum(ItemProducao.quantidade)
+    ).where(
+        ItemProducao.producao_id.in_(pendentes),
+        ItemProducao.produto_id == Produto.id
+    ).scalar_subquery()
+
+    produtos_ids = select(ItemProducao.produto_id).where(
+        ItemProducao.producao_id.in_(pendentes)
+    )
+
+    db.session.execute(
+        update(Produto).where(
+            Produto.id.in_(produtos_ids)
+        ).values(
+            estoque_atual=Produto.estoque_atual + quantidade_produzida,
+            ultima_atualizacao=agora
+        ).execution_options(synchronize_session='fetch')
+    )
+
+    # Registra as movimentações em lote
+    if movimentacoes:
+        db.session.bulk_insert_mappings(MovimentacaoEstoque, movimentacoes)
+
+    # Marca as produções como finalizadas
+    db.session.execute(
+        update(Producao).where(
+            Producao.id.in_(pendentes)
+        ).values(
+            status='finalizada',
+            data_finalizacao=agora,
+            ultima_atualizacao=agora
+        ).execution_options(synchronize_session='fetch')
+    )
+
+    aplicar_variacao_producoes(conn, resumo_antes, contribuicao_producoes(conn, pendentes))
+
+    return pendentes
+
+
+def finalizar_em_lote(producao_ids, usuario_id=None):
+    """Finaliza várias produções e confirma a transação.
+
+    Em caso de erro a transação inteira é desfeita e nenhuma produção é finalizada.
+    """
+    try:
+        finalizadas = finalizar_producoes(producao_ids, usuario_id=usuario_id)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    # bulk_insert_mappings e os resumos gravados na conexão não passam pelos eventos da sessão
+    cache_dados.invalidar(Producao, Material, Produto, MovimentacaoEstoque, ResumoProducaoDiario)
+    return finalizadas
@@ -4,11 +4,15 @@ Modelo de Produto para o ERP ROMA
 
 from datetime import datetime
 from app import db
+from app.utils.estoque_atomico import alterar_saldo
 
 class Produto(db.Model):
     """Modelo de produto para o ERP ROMA."""
     
     __tablename__ = 'produtos'
+    __table_args__ = (
+        db.Index('idx_produtos_nome', 'nome'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     codigo = db.Column(db.String(20), unique=True, nullable=False)
@@ -37,7 +41,10 @@ class Produto(db.Model):
     ultima_atualizacao = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relacionamentos
-    composicoes = db.relationship('ComposicaoProduto', backref='produto', lazy='dynamic', cascade='all, delete-orphan')
+    composicoes = db.relationship('ComposicaoProduto', backref='produto', lazy='dynamic', cascade='all, delete-orphan',
+                                  foreign_keys='ComposicaoProduto.produto_id')
+    materiais_explodidos = db.relationship('ComposicaoExplodida', lazy='dynamic', cascade='all, delete-orphan')
+    historico_custos = db.relationship('HistoricoCustoProduto', backref='produto', lazy='dynamic', cascade='all, delete-orphan')
     itens_producao = db.relationship('ItemProducao', backref='produto', lazy='dynamic')
     
     def __init__(self, codigo, nome, modelo=None, custo_unitario=0.00, preco_minimo=0.00):
@@ -57,16 +64,14 @@ class Produto(db.Model):
         """Verifica se o estoque está abaixo do mínimo."""
         return self.estoque_atual <= self.estoque_minimo
     
-    def atualizar_estoque(self, quantidade, operacao='adicionar'):
-        """Atualiza o estoque do produto."""
-        if operacao == 'adicionar':
-            self.estoque_atual += quantidade
-        elif operacao == 'subtrair':
-            self.estoque_atual -= quantidade
+    def atualizar_estoque(self, quantidade, operacao='adicionar', exigir_saldo=False):
+        """Atualiza o estoque do produto com um UPDATE atômico no banco.
         
-        # Não permite estoque negativo
-        if self.estoque_atual < 0:
-            self.estoque_atual = 0
+        Não permite estoque negativo: sem saldo suficiente, a subtração zera o
+        estoque ou, com exigir_saldo, lança EstoqueInsuficiente.
+        """
+        if operacao in ('adicionar', 'subtrair'):
+            alterar_saldo(self, quantidade, saida=operacao == 'subtrair', exigir_saldo=exigir_saldo)
     
     def to_dict(self):
         """Converte o objeto para dicionário."""
@@ -88,16 +93,76 @@ class Produto(db.Model):
 
 
 class ComposicaoProduto(db.Model):
-    """Modelo para composição de materiais do produto."""
+    """Modelo para composição do produto.
+    
+    Cada linha aponta para um material ou para outro produto usado como
+    componente (alças, forros, painéis pré-cortados), formando uma estrutura de
+    vários níveis.
+    """
     
     __tablename__ = 'composicao_produtos'
+    __table_args__ = (
+        db.Index('idx_composicao_produtos_produto', 'produto_id'),
+        db.Index('idx_composicao_produtos_material', 'material_id'),
+        db.Index('idx_composicao_produtos_componente', 'componente_id'),
+        db.CheckConstraint(
+            '(material_id IS NULL) <> (componente_id IS NULL)', name='ck_composicao_produtos_item'
+        ),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     produto_id = db.Column(db.Integer, db.ForeignKey('produtos.id'), nullable=False)
-    material_id = db.Column(db.Integer, db.ForeignKey('materiais.id'), nullable=False)
+    material_id = db.Column(db.Integer, db.ForeignKey('materiais.id'))
+    componente_id = db.Column(db.Integer, db.ForeignKey('produtos.id'))  # Produto intermediário
     quantidade = db.Column(db.Numeric(10, 3), nullable=False)
     unidade = db.Column(db.String(10), default='UN')
     
+    componente = db.relationship('Produto', foreign_keys=[componente_id])
+    
+    @property
+    def item_nome(self):
+        """Nome do material ou do componente da linha."""
+        item = self.material if self.material_id is not None else self.componente
+        return item.nome if item else None
+    
     def __repr__(self):
-        return f'<ComposicaoProduto {self.produto_id} - {self.material_id}>'
+        return f'<ComposicaoProduto {self.produto_id} - {self.material_id or f"P{self.componente_id}"}>'
 
+
+class ComposicaoExplodida(db.Model):
+    """Composição de cada produto expandida até os materiais (por unidade).
+    
+    Mantida pelo bom_service a cada alteração de composição; os componentes
+    intermediários já aparecem convertidos nos seus materiais.
+    """
+    
+    __tablename__ = 'composicao_explodida'
+    __table_args__ = (
+        db.Index('idx_composicao_explodida_material', 'material_id'),
+    )
+    
+    produto_id = db.Column(db.Integer, db.ForeignKey('produtos.id'), primary_key=True)
+    material_id = db.Column(db.Integer, db.ForeignKey('materiais.id'), primary_key=True)
+    quantidade = db.Column(db.Numeric(14, 6), nullable=False)
+    
+    def __repr__(self):
+        return f'<ComposicaoExplodida {self.produto_id} - {self.material_id}: {self.quantidade}>'
+
+
+class HistoricoCustoProduto(db.Model):
+    """Histórico das alterações do custo unitário calculado do produto."""
+    
+    __tablename__ = 'historico_custos_produtos'
+    __table_args__ = (
+        db.Index('idx_historico_custos_produto_data', 'produto_id', 'data'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    produto_id = db.Column(db.Integer, db.ForeignKey('produtos.id'), nullable=False)
+    custo_anterior = db.Column(db.Numeric(10, 2))
+    custo_novo = db.Column(db.Numeric(10, 2), nullable=False)
+    origem = db.Column(db.String(20), nullable=False)  # material, composicao, recalculo
+    data = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<HistoricoCustoProduto {self.produto_id}: {self.custo_anterior} -> {self.custo_novo}>'
@@ -6,8 +6,12 @@ from flask import Blueprint, render_template, redirect, url_for, flash, request,
 from flask_login import login_required, current_user
 from app import db
 from app.models.produto import Produto, ComposicaoProduto
+from app.services.bom_service import CicloComposicao
 from app.models.material import Material
 from app.forms import ProdutoForm
+from app.services.busca_service import aplicar_busca
+from app.utils.autocompletar import autocompletar_produtos, resposta_autocompletar
+from app.services.indicadores_service import categorias_produtos
 from sqlalchemy import func
 
 # Criação do Blueprint
@@ -25,11 +29,7 @@ def index():
     query = Produto.query
     
     if search:
-        query = query.filter(
-            Produto.nome.contains(search) | 
-            Produto.codigo.contains(search) |
-            Produto.modelo.contains(search)
-        )
+        query = aplicar_busca(query, Produto, search)
     
     if status == 'ativo':
         query = query.filter_by(ativo=True)
@@ -44,8 +44,7 @@ def index():
     )
     
     # Lista de categorias para o filtro
-    categorias = db.session.query(Produto.categoria).filter(Produto.categoria != None).distinct().all()
-    categorias = [c[0] for c in categorias if c[0]]
+    categorias = categorias_produtos()
     
     return render_template('produtos/index.html', 
                          produtos=produtos_paginados,
@@ -156,6 +155,10 @@ def excluir(id):
         flash('Não é possível excluir este produto pois ele possui produções ou pedidos associados.', 'danger')
         return redirect(url_for('produtos.view', id=id))
     
+    if ComposicaoProduto.query.filter_by(componente_id=id).first():
+        flash('Não é possível excluir este produto pois ele é componente de outros produtos.', 'danger')
+        return redirect(url_for('produtos.view', id=id))
+    
     nome = produto.nome
     
     # Remove a composição do produto
@@ -182,41 +185,43 @@ def toggle_status(id):
 @produtos.route('/<int:id>/composicao/adicionar', methods=['POST'])
 @login_required
 def adicionar_composicao(id):
-    """Adiciona um material à composição do produto."""
+    """Adiciona um material ou um produto componente à composição do produto."""
     produto = Produto.query.get_or_404(id)
     
     material_id = request.form.get('material_id', type=int)
+    componente_id = request.form.get('componente_id', type=int)
     quantidade = request.form.get('quantidade', type=float)
     
-    if not material_id or not quantidade or quantidade <= 0:
-        flash('Material e quantidade são obrigatórios.', 'danger')
+    if not (material_id or componente_id) or not quantidade or quantidade <= 0:
+        flash('Material (ou componente) e quantidade são obrigatórios.', 'danger')
         return redirect(url_for('produtos.view', id=id))
     
-    material = Material.query.get_or_404(material_id)
+    if material_id:
+        item = Material.query.get_or_404(material_id)
+        filtro = {'material_id': material_id}
+    else:
+        item = Produto.query.get_or_404(componente_id)
+        filtro = {'componente_id': componente_id}
     
-    # Verifica se o material já está na composição
-    composicao_existente = ComposicaoProduto.query.filter_by(
-        produto_id=id, material_id=material_id
-    ).first()
+    # Verifica se o item já está na composição
+    composicao_existente = ComposicaoProduto.query.filter_by(produto_id=id, **filtro).first()
     
     if composicao_existente:
         composicao_existente.quantidade = quantidade
-        flash(f'Quantidade de {material.nome} atualizada com sucesso!', 'success')
+        mensagem = f'Quantidade de {item.nome} atualizada com sucesso!'
     else:
-        composicao = ComposicaoProduto(
-            produto_id=id,
-            material_id=material_id,
-            quantidade=quantidade
-        )
-        db.session.add(composicao)
-        flash(f'Material {material.nome} adicionado à composição com sucesso!', 'success')
-    
-    db.session.commit()
+        db.session.add(ComposicaoProduto(produto_id=id, quantidade=quantidade, **filtro))
+        mensagem = f'{item.nome} adicionado à composição com sucesso!'
     
-    # Recalcula o custo do produto
-    produto.calcular_custo()
-    db.session.commit()
+    # A composição explodida e o custo são recalculados no flush (bom_service)
+    try:
+        db.session.commit()
+    except CicloComposicao:
+        db.session.rollback()
+        flash(f'{item.nome} não pode ser componente de {produto.nome}: a composição ficaria circular.', 'danger')
+        return redirect(url_for('produtos.view', id=id))
     
+    flash(mensagem, 'success')
     return redirect(url_for('produtos.view', id=id))
 
 @produtos.route('/<int:id>/composicao/<int:composicao_id>/remover', methods=['POST'])
@@ -230,15 +235,12 @@ def remover_composicao(id, composicao_id):
         flash('Material não pertence a este produto.', 'danger')
         return redirect(url_for('produtos.view', id=id))
     
-    material_nome = composicao.material.nome
+    material_nome = composicao.item_nome
     
+    # A composição explodida e o custo são recalculados no flush (bom_service)
     db.session.delete(composicao)
     db.session.commit()
     
-    # Recalcula o custo do produto
-    produto.calcular_custo()
-    db.session.commit()
-    
     flash(f'Material {material_nome} removido da composição com sucesso!', 'success')
     return redirect(url_for('produtos.view', id=id))
 
@@ -248,19 +250,23 @@ def api_buscar():
     """API para buscar produtos (usado em selects)."""
     term = request.args.get('term', '')
     
-    produtos = Produto.query.filter(
-        Produto.ativo == True,
-        Produto.nome.contains(term) | Produto.codigo.contains(term)
-    ).limit(10).all()
+    # Prefixos no índice em memória; preço e estoque vêm do banco pelos ids
+    encontrados = autocompletar_produtos.buscar(term)
+    produtos = {}
+    if encontrados:
+        produtos = {p.id: p for p in Produto.query.filter(Produto.id.in_([i for i, _ in encontrados]))}
     
     results = []
-    for produto in produtos:
+    for produto_id, rotulo in encontrados:
+        produto = produtos.get(produto_id)
+        if produto is None:
+            continue  # Removido depois da montagem do índice
         results.append({
             'id': produto.id,
-            'text': f'{produto.codigo} - {produto.nome}',
+            'text': rotulo,
             'preco': float(produto.preco_minimo),
             'estoque': produto.estoque_atual
         })
     
-    return jsonify(results)
+    return resposta_autocompletar(results)
 
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Script para reconstruir os resumos diários do ERP ROMA a partir do histórico.
+
+Uso:
+    python rebuild_resumos.py                 # reconstrói todo o histórico
+    python rebuild_resumos.py 2024-01-01      # reconstrói a partir da data
+"""
+
+import os
+import sys
+from datetime import datetime
+
+# Adiciona o diretório raiz ao path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app, db
+from app.services.resumo_service import reconstruir_resumos
+
+def main():
+    """Função principal."""
+    data_inicio = None
+
+    if len(sys.argv) > 1:
+        try:
+            data_inicio = datetime.strptime(sys.argv[1], '%Y-%m-%d').date()
+        except ValueError:
+            print("Data inválida. Use o formato AAAA-MM-DD.")
+            return 1
+
+    app = create_app()
+
+    with app.app_context():
+        # Garante que as tabelas de resumo existam
+        db.create_all()
+
+        totais = reconstruir_resumos(data_inicio)
+
+        print("Resumos reconstruídos com sucesso!")
+        print(f"Linhas do resumo financeiro: {totais['financeiro']}")
+        print(f"Linhas do resumo de produção: {totais['producao']}")
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
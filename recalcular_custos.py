@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Script para recalcular o custo de todos os produtos do ERP ROMA a partir da composição.
+
+Antes do custo, refaz a composição explodida (vetores de materiais) de todos os produtos.
+
+Uso:
+    python recalcular_custos.py
+"""
+
+import os
+import sys
+import time
+
+# Adiciona o diretório raiz ao path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app, db
+from app.services.bom_service import reconstruir_composicao_explodida
+from app.services.custo_service import recalcular_todos_custos
+
+def main():
+    """Função principal."""
+    app = create_app()
+
+    with app.app_context():
+        # Garante que as tabelas de histórico e de composição explodida existam
+        db.create_all()
+
+        inicio = time.time()
+        produtos = reconstruir_composicao_explodida()
+        alterados = recalcular_todos_custos()
+
+        print("Custos recalculados com sucesso!")
+        print(f"Produtos com composição: {produtos}")
+        print(f"Produtos com custo alterado: {alterados}")
+        print(f"Tempo: {time.time() - inicio:.2f}s")
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,198 @@
+"""
+Fila de geração de relatórios em segundo plano do ERP ROMA
+
+Os relatórios PDF são gerados em um pool de processos. O estado de cada job fica em
+disco (pasta REPORT_FOLDER), então qualquer processo da aplicação consegue consultar
+o andamento e entregar o arquivo pronto.
+"""
+
+import os
+import json
+import time
+import uuid
+import atexit
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+# Configuração de logging
+logger = logging.getLogger(__name__)
+
+
+class FilaRelatoriosCheia(Exception):
+    """Limite de relatórios em processamento atingido."""
+    pass
+
+
+def _executar_job(pasta, job_id, tipo, args):
+    """Gera o relatório no processo de trabalho.
+
+    O arquivo é escrito com outro nome e renomeado ao final, para que nunca
+    seja entregue um PDF incompleto.
+    """
+    from app.services.relatorios_pdf import gerar_relatorio_pdf
+
+    destino = os.path.join(pasta, f'{job_id}.pdf')
+    temporario = destino + '.tmp'
+
+    try:
+        gerar_relatorio_pdf(tipo, temporario, *args)
+        os.replace(temporario, destino)
+    except Exception as e:
+        with open(os.path.join(pasta, f'{job_id}.erro'), 'w', encoding='utf-8') as f:
+            f.write(str(e))
+        if os.path.exists(temporario):
+            os.remove(temporario)
+        raise
+
+
+class FilaRelatorios:
+    """Gerenciador dos jobs de relatório."""
+
+    def __init__(self, app=None):
+        self.pasta = None
+        self.max_workers = 2
+        self.max_pendentes = 8
+        self.ttl = 3600
+        self._executor = None
+        self._vagas = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Inicializa a fila com a configuração da aplicação."""
+        # Caminho absoluto: send_file resolve caminhos relativos a partir de app.root_path
+        self.pasta = os.path.abspath(app.config.get('REPORT_FOLDER', 'relatorios'))
+        self.max_workers = app.config.get('REPORT_WORKERS', self.max_workers)
+        self.max_pendentes = app.config.get('REPORT_MAX_PENDING', self.max_pendentes)
+        self.ttl = app.config.get('REPORT_TTL', self.ttl)
+        # Jobs ainda em andamento liberam o semáforo com que foram aceitos
+        self._vagas = threading.BoundedSemaphore(self.max_pendentes)
+        os.makedirs(self.pasta, exist_ok=True)
+
+    @property
+    def ativa(self):
+        """Indica se os relatórios são gerados no pool de processos."""
+        return self.max_workers > 0
+
+    def _obter_executor(self):
+        """Cria o pool de processos na primeira utilização."""
+        with self._lock:
+            if self._executor is None:
+                # spawn evita herdar conexões e threads do processo web
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+                atexit.register(self._executor.shutdown, wait=False)
+            return self._executor
+
+    def _arquivo(self, job_id, extensao):
+        return os.path.join(self.pasta, f'{job_id}.{extensao}')
+
+    def enviar(self, tipo, args, nome_download, usuario_id=None):
+        """Agenda a geração de um relatório e retorna o id do job.
+
+        `args` deve conter apenas valores simples (tuplas, datas, números e textos).
+        Lança FilaRelatoriosCheia se o limite de jobs pendentes foi atingido.
+        """
+        self.limpar_antigos()
+
+        vagas = self._vagas
+        if not vagas.acquire(blocking=False):
+            raise FilaRelatoriosCheia('Muitos relatórios em processamento. Tente novamente em instantes.')
+
+        job_id = uuid.uuid4().hex
+
+        try:
+            with open(self._arquivo(job_id, 'json'), 'w', encoding='utf-8') as f:
+                json.dump({
+                    'tipo': tipo,
+                    'nome_download': nome_download,
+                    'usuario_id': usuario_id,
+                    'criado_em': time.time()
+                }, f)
+
+            future = self._obter_executor().submit(_executar_job, self.pasta, job_id, tipo, args)
+        except Exception:
+            vagas.release()
+            raise
+
+        future.add_done_callback(lambda f: self._finalizado(job_id, f, vagas))
+        logger.info(f"Relatório {tipo} agendado: {job_id}")
+        return job_id
+
+    def _finalizado(self, job_id, future, vagas):
+        """Libera a vaga do job e registra falhas."""
+        vagas.release()
+        erro = future.exception()
+        if erro is not None:
+            logger.error(f"Erro ao gerar relatório {job_id}: {erro}")
+
+    def info(self, job_id):
+        """Retorna os dados do job ou None se ele não existir."""
+        # O id vem da URL; só aceita o formato gerado por enviar()
+        if not job_id or len(job_id) != 32 or not job_id.isalnum():
+            return None
+
+        try:
+            with open(self._arquivo(job_id, 'json'), encoding='utf-8') as f:
+                info = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if os.path.exists(self._arquivo(job_id, 'pdf')):
+            info['status'] = 'pronto'
+        elif os.path.exists(self._arquivo(job_id, 'erro')):
+            info['status'] = 'erro'
+            with open(self._arquivo(job_id, 'erro'), encoding='utf-8') as f:
+                info['erro'] = f.read()
+        else:
+            info['status'] = 'processando'
+
+        info['id'] = job_id
+        return info
+
+    def caminho(self, job_id):
+        """Caminho do PDF gerado."""
+        return self._arquivo(job_id, 'pdf')
+
+    def aguardar(self, job_id, timeout):
+        """Aguarda até `timeout` segundos pelo término do job. Retorna o status final."""
+        limite = time.time() + timeout
+        while True:
+            info = self.info(job_id)
+            if info is None or info['status'] != 'processando' or time.time() >= limite:
+                return info['status'] if info else None
+            time.sleep(0.1)
+
+    def limpar_antigos(self):
+        """Remove os arquivos de jobs mais antigos que REPORT_TTL."""
+        limite = time.time() - self.ttl
+        removidos = 0
+
+        try:
+            arquivos = os.listdir(self.pasta)
+        except OSError:
+            return 0
+
+        for nome in arquivos:
+            caminho = os.path.join(self.pasta, nome)
+            try:
+                if os.path.getmtime(caminho) < limite:
+                    os.remove(caminho)
+                    removidos += 1
+            except OSError:
+                # Arquivo removido por outro processo
+                continue
+
+        if removidos:
+            logger.info(f"Arquivos de relatórios antigos removidos: {removidos}")
+
+        return removidos
+
+
+# Instância global
+fila_relatorios = FilaRelatorios()
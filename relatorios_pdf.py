@@ -0,0 +1,318 @@
+"""
+Geração dos relatórios PDF do ERP ROMA
+
+As funções deste módulo recebem apenas tuplas com valores simples (nunca objetos do ORM),
+para que possam ser executadas em outro processo.
+"""
+
+from datetime import datetime
+
+
+def _documento(destino):
+    """Cria o documento e os estilos usados em todos os relatórios."""
+    from reportlab.lib.pagesizes import letter
+    from reportlab.platypus import SimpleDocTemplate
+    from reportlab.lib.styles import getSampleStyleSheet
+
+    doc = SimpleDocTemplate(destino, pagesize=letter)
+    return doc, getSampleStyleSheet()
+
+
+def _estilo_cabecalho():
+    """Estilo comum do cabeçalho das tabelas."""
+    from reportlab.lib import colors
+
+    return [
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 12),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ]
+
+
+def _cabecalho(styles, titulo, subtitulo):
+    """Título e subtítulo do relatório."""
+    from reportlab.platypus import Paragraph, Spacer
+
+    return [
+        Paragraph(titulo, styles['Heading1']),
+        Spacer(1, 12),
+        Paragraph(subtitulo, styles['Heading2']),
+        Spacer(1, 12)
+    ]
+
+
+def _periodo(data_inicio, data_fim):
+    return f'Período: {data_inicio.strftime("%d/%m/%Y")} a {data_fim.strftime("%d/%m/%Y")}'
+
+
+def _data_atual():
+    return f'Data: {datetime.now().strftime("%d/%m/%Y")}'
+
+
+def pdf_producao(destino, linhas, data_inicio, data_fim):
+    """Relatório de produção.
+
+    linhas: (data, cliente, valor_total, status)
+    """
+    from reportlab.lib import colors
+    from reportlab.platypus import Table, TableStyle
+
+    doc, styles = _documento(destino)
+    elements = _cabecalho(styles, 'Relatório de Produção', _periodo(data_inicio, data_fim))
+
+    # Tabela de produções
+    data = [['Data', 'Cliente', 'Valor Total', 'Status']]
+    valor_total = 0
+
+    for data_producao, cliente, valor, status in linhas:
+        data.append([
+            data_producao.strftime('%d/%m/%Y'),
+            cliente or '',
+            f'R$ {valor:.2f}',
+            status.capitalize()
+        ])
+        valor_total += valor
+
+    # Adiciona totais
+    data.append(['', 'Total', f'R$ {valor_total:.2f}', ''])
+
+    table = Table(data)
+    table.setStyle(TableStyle(_estilo_cabecalho() + [
+        ('BACKGROUND', (0, -1), (-1, -1), colors.lightgrey),
+        ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('ALIGN', (2, 1), (2, -1), 'RIGHT'),
+    ]))
+
+    elements.append(table)
+    doc.build(elements)
+
+
+def pdf_financeiro(destino, linhas, data_inicio, data_fim, tipo, categoria):
+    """Relatório financeiro.
+
+    linhas: (data, tipo, categoria, descricao, valor)
+    """
+    from reportlab.lib import colors
+    from reportlab.platypus import Table, TableStyle, Paragraph, Spacer
+
+    doc, styles = _documento(destino)
+    elements = _cabecalho(styles, 'Relatório Financeiro', _periodo(data_inicio, data_fim))
+
+    # Filtros
+    filtros = []
+    if tipo and tipo != 'todos':
+        filtros.append(f'Tipo: {tipo.capitalize()}')
+    if categoria and categoria != 'todas':
+        filtros.append(f'Categoria: {categoria}')
+
+    if filtros:
+        elements.append(Paragraph('Filtros: ' + ', '.join(filtros), styles['Normal']))
+        elements.append(Spacer(1, 12))
+
+    # Tabela de movimentações
+    data = [['Data', 'Tipo', 'Categoria', 'Descrição', 'Valor']]
+    receitas = 0
+    despesas = 0
+
+    for data_movimentacao, tipo_movimentacao, categoria_movimentacao, descricao, valor in linhas:
+        data.append([
+            data_movimentacao.strftime('%d/%m/%Y'),
+            tipo_movimentacao.capitalize(),
+            categoria_movimentacao,
+            descricao,
+            f'R$ {valor:.2f}'
+        ])
+        if tipo_movimentacao == 'receita':
+            receitas += valor
+        elif tipo_movimentacao == 'despesa':
+            despesas += valor
+
+    # Adiciona totais
+    saldo = receitas - despesas
+    data.append(['', '', '', 'Total Receitas', f'R$ {receitas:.2f}'])
+    data.append(['', '', '', 'Total Despesas', f'R$ {despesas:.2f}'])
+    data.append(['', '', '', 'Saldo', f'R$ {saldo:.2f}'])
+
+    table = Table(data)
+    table.setStyle(TableStyle(_estilo_cabecalho() + [
+        ('BACKGROUND', (0, -3), (-1, -1), colors.lightgrey),
+        ('FONTNAME', (0, -3), (-1, -1), 'Helvetica-Bold'),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('ALIGN', (4, 1), (4, -1), 'RIGHT'),
+    ]))
+
+    elements.append(table)
+    doc.build(elements)
+
+
+def pdf_estoque_atual(destino, linhas):
+    """Relatório de estoque atual.
+
+    linhas: (codigo, nome, categoria, estoque_atual, estoque_minimo)
+    """
+    from reportlab.lib import colors
+    from reportlab.platypus import Table, TableStyle
+
+    doc, styles = _documento(destino)
+    elements = _cabecalho(styles, 'Relatório de Estoque Atual', _data_atual())
+
+    # Tabela de materiais
+    data = [['Código', 'Material', 'Categoria', 'Estoque Atual', 'Estoque Mínimo', 'Status']]
+    estilo = _estilo_cabecalho() + [
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('ALIGN', (3, 1), (4, -1), 'CENTER'),
+    ]
+
+    for i, (codigo, nome, categoria, estoque_atual, estoque_minimo) in enumerate(linhas, start=1):
+        # Define o status
+        status = 'Baixo' if estoque_atual <= estoque_minimo else 'Normal'
+        data.append([codigo, nome, categoria, estoque_atual, estoque_minimo, status])
+
+        if status == 'Baixo':
+            estilo.append(('TEXTCOLOR', (-1, i), (-1, i), colors.red))
+            estilo.append(('FONTNAME', (-1, i), (-1, i), 'Helvetica-Bold'))
+
+    table = Table(data)
+    table.setStyle(TableStyle(estilo))
+
+    elements.append(table)
+    doc.build(elements)
+
+
+def pdf_movimentacoes_estoque(destino, linhas, data_inicio, data_fim):
+    """Relatório de movimentações de estoque.
+
+    linhas: (data, material, tipo, quantidade, observacao)
+    """
+    from reportlab.lib import colors
+    from reportlab.platypus import Table, TableStyle
+
+    doc, styles = _documento(destino)
+    elements = _cabecalho(styles, 'Relatório de Movimentações de Estoque', _periodo(data_inicio, data_fim))
+
+    # Tabela de movimentações
+    data = [['Data', 'Material', 'Tipo', 'Quantidade', 'Observação']]
+    estilo = _estilo_cabecalho() + [
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('ALIGN', (3, 1), (3, -1), 'CENTER'),
+    ]
+
+    for i, (data_movimentacao, material, tipo, quantidade, observacao) in enumerate(linhas, start=1):
+        tipo = tipo.capitalize()
+        data.append([
+            data_movimentacao.strftime('%d/%m/%Y'),
+            material or '',
+            tipo,
+            quantidade,
+            observacao or ''
+        ])
+
+        # Adiciona cores para tipo
+        if tipo == 'Entrada':
+            estilo.append(('TEXTCOLOR', (2, i), (2, i), colors.green))
+        elif tipo == 'Saída':
+            estilo.append(('TEXTCOLOR', (2, i), (2, i), colors.red))
+
+    table = Table(data)
+    table.setStyle(TableStyle(estilo))
+
+    elements.append(table)
+    doc.build(elements)
+
+
+def _estilo_status(estilo, data):
+    """Colore a coluna de status (última) de verde ou vermelho."""
+    from reportlab.lib import colors
+
+    for i in range(1, len(data)):
+        cor = colors.green if data[i][-1] == 'Ativo' else colors.red
+        estilo.append(('TEXTCOLOR', (-1, i), (-1, i), cor))
+    return estilo
+
+
+def pdf_clientes(destino, linhas):
+    """Relatório de clientes.
+
+    linhas: (nome, cnpj, telefone, email, cidade, estado, ativo)
+    """
+    from reportlab.lib import colors
+    from reportlab.platypus import Table, TableStyle
+
+    doc, styles = _documento(destino)
+    elements = _cabecalho(styles, 'Relatório de Clientes', _data_atual())
+
+    # Tabela de clientes
+    data = [['Nome', 'CNPJ', 'Telefone', 'Email', 'Cidade/UF', 'Status']]
+
+    for nome, cnpj, telefone, email, cidade, estado, ativo in linhas:
+        data.append([
+            nome,
+            cnpj,
+            telefone,
+            email,
+            f'{cidade}/{estado}',
+            'Ativo' if ativo else 'Inativo'
+        ])
+
+    table = Table(data)
+    table.setStyle(TableStyle(_estilo_status(_estilo_cabecalho() + [
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ], data)))
+
+    elements.append(table)
+    doc.build(elements)
+
+
+def pdf_produtos(destino, linhas):
+    """Relatório de produtos.
+
+    linhas: (codigo, nome, categoria, preco_sugerido, estoque_atual, ativo)
+    """
+    from reportlab.lib import colors
+    from reportlab.platypus import Table, TableStyle
+
+    doc, styles = _documento(destino)
+    elements = _cabecalho(styles, 'Relatório de Produtos', _data_atual())
+
+    # Tabela de produtos
+    data = [['Código', 'Nome', 'Categoria', 'Preço Sugerido', 'Estoque', 'Status']]
+
+    for codigo, nome, categoria, preco_sugerido, estoque_atual, ativo in linhas:
+        data.append([
+            codigo,
+            nome,
+            categoria,
+            f'R$ {preco_sugerido or 0:.2f}',
+            estoque_atual,
+            'Ativo' if ativo else 'Inativo'
+        ])
+
+    table = Table(data)
+    table.setStyle(TableStyle(_estilo_status(_estilo_cabecalho() + [
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('ALIGN', (3, 1), (3, -1), 'RIGHT'),
+        ('ALIGN', (4, 1), (4, -1), 'CENTER'),
+    ], data)))
+
+    elements.append(table)
+    doc.build(elements)
+
+
+# Relatórios disponíveis, indexados pelo tipo usado nos jobs
+RELATORIOS_PDF = {
+    'producao': pdf_producao,
+    'financeiro': pdf_financeiro,
+    'estoque_atual': pdf_estoque_atual,
+    'movimentacoes_estoque': pdf_movimentacoes_estoque,
+    'clientes': pdf_clientes,
+    'produtos': pdf_produtos
+}
+
+
+def gerar_relatorio_pdf(tipo, destino, *args):
+    """Gera o relatório `tipo` em `destino` (caminho ou arquivo binário)."""
+    RELATORIOS_PDF[tipo](destino, *args)
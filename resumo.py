@@ -0,0 +1,60 @@
+"""
+Modelos de resumos diários (tabelas agregadas) para o ERP ROMA
+"""
+
+from datetime import datetime
+from app import db
+
+class ResumoFinanceiroDiario(db.Model):
+    """Totais diários de movimentações financeiras por tipo e categoria."""
+
+    __tablename__ = 'resumo_financeiro_diario'
+    __table_args__ = (
+        db.UniqueConstraint('data', 'tipo', 'categoria', name='uq_resumo_financeiro_chave'),
+        db.Index('idx_resumo_financeiro_tipo_data', 'tipo', 'data'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    data = db.Column(db.Date, nullable=False)
+    tipo = db.Column(db.String(20), nullable=False)  # receita, despesa
+    categoria = db.Column(db.String(50))
+
+    # Agregados
+    total = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    quantidade = db.Column(db.Integer, nullable=False, default=0)  # número de movimentações
+
+    ultima_atualizacao = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<ResumoFinanceiroDiario {self.data} {self.tipo}/{self.categoria}>'
+
+
+class ResumoProducaoDiario(db.Model):
+    """Totais diários de produção por cliente, produto e status.
+
+    As linhas com produto_id nulo guardam o total da produção do dia para o
+    cliente (número de produções e valor), e as demais guardam as quantidades
+    produzidas de cada produto.
+    """
+
+    __tablename__ = 'resumo_producao_diario'
+    __table_args__ = (
+        db.UniqueConstraint('data', 'cliente_id', 'produto_id', 'status', name='uq_resumo_producao_chave'),
+        db.Index('idx_resumo_producao_status_data', 'status', 'data'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    data = db.Column(db.Date, nullable=False)
+    cliente_id = db.Column(db.Integer, db.ForeignKey('clientes.id'), nullable=False)
+    produto_id = db.Column(db.Integer, db.ForeignKey('produtos.id'))
+    status = db.Column(db.String(20), nullable=False)
+
+    # Agregados
+    producoes = db.Column(db.Integer, nullable=False, default=0)
+    quantidade = db.Column(db.Integer, nullable=False, default=0)
+    valor = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+
+    ultima_atualizacao = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<ResumoProducaoDiario {self.data} cliente={self.cliente_id} produto={self.produto_id}>'
@@ -0,0 +1,409 @@
+"""
+Serviço de manutenção dos resumos diários (tabelas agregadas) do ERP ROMA
+
+Os resumos são atualizados de forma incremental a cada flush da sessão, na
+mesma transação das alterações que os originaram. Operações em lote que não
+passam pelo flush (UPDATEs em conjunto) devem usar contribuicao_producoes e
+aplicar_variacao_producoes explicitamente.
+"""
+
+import logging
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+from sqlalchemy import event, select, update, insert, delete, func, and_, null, literal
+from app import db
+from app.utils.sessao import em_lotes, valores_originais, valor_original
+from app.models.producao import Producao, ItemProducao
+from app.models.financeiro import Movimentacao
+from app.models.resumo import ResumoFinanceiroDiario, ResumoProducaoDiario
+
+logger = logging.getLogger(__name__)
+
+# Chave usada em session.info para guardar o estado entre before_flush e after_flush
+_CHAVE_SESSAO = 'resumos_pendentes'
+
+# Campos da movimentação que definem a linha e o total do resumo financeiro
+CAMPOS_MOVIMENTACAO = ('data', 'tipo', 'categoria', 'valor')
+
+
+def _como_data(valor):
+    """Normaliza datas e datetimes para date."""
+    if isinstance(valor, datetime):
+        return valor.date()
+    return valor
+
+
+# Consultas de agregação (usadas tanto na reconstrução quanto nas variações)
+
+def _consulta_producao_por_produto():
+    """Consulta com os totais de produção por dia, cliente, produto e status."""
+    return select(
+        Producao.data.label('data'),
+        Producao.cliente_id.label('cliente_id'),
+        ItemProducao.produto_id.label('produto_id'),
+        Producao.status.label('status'),
+        func.count(func.distinct(Producao.id)).label('producoes'),
+        func.sum(ItemProducao.quantidade).label('quantidade'),
+        func.sum(ItemProducao.quantidade * ItemProducao.valor_unitario).label('valor')
+    ).join(
+        ItemProducao, ItemProducao.producao_id == Producao.id
+    ).group_by(
+        Producao.data,
+        Producao.cliente_id,
+        ItemProducao.produto_id,
+        Producao.status
+    )
+
+
+def _consulta_producao_totais():
+    """Consulta com os totais de produção por dia, cliente e status (produto nulo)."""
+    return select(
+        Producao.data.label('data'),
+        Producao.cliente_id.label('cliente_id'),
+        null().label('produto_id'),
+        Producao.status.label('status'),
+        func.count(func.distinct(Producao.id)).label('producoes'),
+        func.coalesce(func.sum(ItemProducao.quantidade), 0).label('quantidade'),
+        func.coalesce(func.sum(ItemProducao.quantidade * ItemProducao.valor_unitario), 0).label('valor')
+    ).outerjoin(
+        ItemProducao, ItemProducao.producao_id == Producao.id
+    ).group_by(
+        Producao.data,
+        Producao.cliente_id,
+        Producao.status
+    )
+
+
+def _consulta_financeiro():
+    """Consulta com os totais financeiros por dia, tipo e categoria."""
+    return select(
+        Movimentacao.data.label('data'),
+        Movimentacao.tipo.label('tipo'),
+        Movimentacao.categoria.label('categoria'),
+        func.sum(Movimentacao.valor).label('total'),
+        func.count(Movimentacao.id).label('quantidade')
+    ).group_by(
+        Movimentacao.data,
+        Movimentacao.tipo,
+        Movimentacao.categoria
+    )
+
+
+# Variações incrementais
+
+def contribuicao_producoes(conn, producao_ids):
+    """Calcula a contribuição atual das produções informadas para o resumo.
+
+    Retorna {(data, cliente_id, produto_id, status): [producoes, quantidade, valor]}.
+    """
+    contribuicao = defaultdict(lambda: [0, 0, Decimal('0')])
+
+    for lote in em_lotes(producao_ids):
+        for consulta in (_consulta_producao_por_produto(), _consulta_producao_totais()):
+            for linha in conn.execute(consulta.where(Producao.id.in_(lote))):
+                chave = (_como_data(linha.data), linha.cliente_id, linha.produto_id, linha.status)
+                valores = contribuicao[chave]
+                valores[0] += linha.producoes or 0
+                valores[1] += linha.quantidade or 0
+                valores[2] += Decimal(str(linha.valor or 0))
+
+    return contribuicao
+
+
+def aplicar_variacao_producoes(conn, antes, depois):
+    """Aplica ao resumo de produção a diferença entre duas contribuições."""
+    agora = datetime.utcnow()
+    tabela = ResumoProducaoDiario.__table__
+
+    for chave in set(antes) | set(depois):
+        anterior = antes.get(chave, [0, 0, Decimal('0')])
+        atual = depois.get(chave, [0, 0, Decimal('0')])
+        variacao = [atual[i] - anterior[i] for i in range(3)]
+
+        if not any(variacao):
+            continue
+
+        data, cliente_id, produto_id, status = chave
+        condicao = and_(
+            tabela.c.data == data,
+            tabela.c.cliente_id == cliente_id,
+            tabela.c.produto_id == produto_id,
+            tabela.c.status == status
+        )
+
+        resultado = conn.execute(
+            update(tabela).where(condicao).values(
+                producoes=tabela.c.producoes + variacao[0],
+                quantidade=tabela.c.quantidade + variacao[1],
+                valor=tabela.c.valor + variacao[2],
+                ultima_atualizacao=agora
+            )
+        )
+
+        if resultado.rowcount == 0:
+            conn.execute(
+                insert(tabela).values(
+                    data=data,
+                    cliente_id=cliente_id,
+                    produto_id=produto_id,
+                    status=status,
+                    producoes=variacao[0],
+                    quantidade=variacao[1],
+                    valor=variacao[2],
+                    ultima_atualizacao=agora
+                )
+            )
+
+        # Remove linhas que deixaram de ter produções
+        conn.execute(delete(tabela).where(condicao, tabela.c.producoes <= 0))
+
+
+def aplicar_variacao_financeiro(conn, variacoes):
+    """Aplica ao resumo financeiro as variações {(data, tipo, categoria): [total, quantidade]}."""
+    agora = datetime.utcnow()
+    tabela = ResumoFinanceiroDiario.__table__
+
+    for (data, tipo, categoria), (total, quantidade) in variacoes.items():
+        if not total and not quantidade:
+            continue
+
+        condicao = and_(
+            tabela.c.data == data,
+            tabela.c.tipo == tipo,
+            tabela.c.categoria == categoria
+        )
+
+        resultado = conn.execute(
+            update(tabela).where(condicao).values(
+                total=tabela.c.total + total,
+                quantidade=tabela.c.quantidade + quantidade,
+                ultima_atualizacao=agora
+            )
+        )
+
+        if resultado.rowcount == 0:
+            conn.execute(
+                insert(tabela).values(
+                    data=data,
+                    tipo=tipo,
+                    categoria=categoria,
+                    total=total,
+                    quantidade=quantidade,
+                    ultima_atualizacao=agora
+                )
+            )
+
+        # Remove linhas que deixaram de ter movimentações
+        conn.execute(delete(tabela).where(condicao, tabela.c.quantidade <= 0))
+
+
+def _registrar_movimentacao(variacoes, data, tipo, categoria, valor, sinal):
+    """Acumula a variação de uma movimentação financeira."""
+    if data is None or tipo is None:
+        return
+    chave = (_como_data(data), tipo, categoria)
+    variacoes[chave][0] += Decimal(str(valor or 0)) * sinal
+    variacoes[chave][1] += sinal
+
+
+# Eventos da sessão
+
+def _antes_flush(session, flush_context, instances):
+    """Captura o estado anterior das linhas que alimentam os resumos."""
+    variacoes_financeiro = defaultdict(lambda: [Decimal('0'), 0])
+    producao_ids = set()
+
+    for obj in session.new:
+        if isinstance(obj, Movimentacao):
+            _registrar_movimentacao(variacoes_financeiro, obj.data, obj.tipo, obj.categoria, obj.valor, 1)
+        elif isinstance(obj, ItemProducao):
+            # Itens novos em produções já existentes alteram a contribuição delas
+            if obj.producao_id is not None:
+                producao_ids.add(obj.producao_id)
+            elif obj.producao is not None:
+                producao_ids.add(obj.producao.id)
+
+    for obj in session.dirty:
+        if not session.is_modified(obj, include_collections=False):
+            continue
+        if isinstance(obj, Movimentacao):
+            _registrar_movimentacao(
+                variacoes_financeiro, *valores_originais(obj, *CAMPOS_MOVIMENTACAO), -1
+            )
+            _registrar_movimentacao(variacoes_financeiro, obj.data, obj.tipo, obj.categoria, obj.valor, 1)
+        elif isinstance(obj, Producao):
+            producao_ids.add(obj.id)
+        elif isinstance(obj, ItemProducao):
+            producao_ids.add(valor_original(obj, 'producao_id'))
+            producao_ids.add(obj.producao_id)
+
+    for obj in session.deleted:
+        if isinstance(obj, Movimentacao):
+            _registrar_movimentacao(
+                variacoes_financeiro, *valores_originais(obj, *CAMPOS_MOVIMENTACAO), -1
+            )
+        elif isinstance(obj, Producao):
+            producao_ids.add(obj.id)
+        elif isinstance(obj, ItemProducao):
+            producao_ids.add(valor_original(obj, 'producao_id'))
+
+    producao_ids.discard(None)
+
+    if not variacoes_financeiro and not producao_ids and not any(
+        isinstance(obj, (Producao, ItemProducao)) for obj in session.new
+    ):
+        return
+
+    antes = contribuicao_producoes(session.connection(), producao_ids) if producao_ids else {}
+
+    session.info[_CHAVE_SESSAO] = {
+        'financeiro': variacoes_financeiro,
+        'producao_ids': producao_ids,
+        'producao_antes': antes,
+        'novos': [obj for obj in session.new if isinstance(obj, (Producao, ItemProducao))]
+    }
+
+
+def _apos_flush(session, flush_context):
+    """Aplica as variações nos resumos, na mesma transação do flush."""
+    pendentes = session.info.pop(_CHAVE_SESSAO, None)
+    if not pendentes:
+        return
+
+    conn = session.connection()
+
+    if pendentes['financeiro']:
+        aplicar_variacao_financeiro(conn, pendentes['financeiro'])
+
+    # Após o flush os objetos novos já possuem ids
+    producao_ids = set(pendentes['producao_ids'])
+    for obj in pendentes['novos']:
+        producao_ids.add(obj.id if isinstance(obj, Producao) else obj.producao_id)
+    producao_ids.discard(None)
+
+    if producao_ids:
+        depois = contribuicao_producoes(conn, producao_ids)
+        aplicar_variacao_producoes(conn, pendentes['producao_antes'], depois)
+
+
+def _apos_rollback(session):
+    """Descarta variações capturadas de um flush que falhou."""
+    session.info.pop(_CHAVE_SESSAO, None)
+
+
+def registrar_eventos_resumo():
+    """Registra os eventos de sessão que mantêm os resumos atualizados."""
+    if not event.contains(db.session, 'before_flush', _antes_flush):
+        event.listen(db.session, 'before_flush', _antes_flush)
+        event.listen(db.session, 'after_flush', _apos_flush)
+        event.listen(db.session, 'after_soft_rollback', lambda session, previous_transaction: _apos_rollback(session))
+
+
+# Reconstrução completa
+
+def reconstruir_resumos(data_inicio=None):
+    """Reconstrói os resumos diários a partir do histórico.
+
+    Se data_inicio for informada, apenas os dias a partir dela são recalculados.
+    """
+    tabela_financeiro = ResumoFinanceiroDiario.__table__
+    tabela_producao = ResumoProducaoDiario.__table__
+    agora = datetime.utcnow()
+
+    limpar_financeiro = delete(tabela_financeiro)
+    limpar_producao = delete(tabela_producao)
+    consulta_financeiro = _consulta_financeiro()
+    consultas_producao = [_consulta_producao_por_produto(), _consulta_producao_totais()]
+
+    if data_inicio is not None:
+        limpar_financeiro = limpar_financeiro.where(tabela_financeiro.c.data >= data_inicio)
+        limpar_producao = limpar_producao.where(tabela_producao.c.data >= data_inicio)
+        consulta_financeiro = consulta_financeiro.where(Movimentacao.data >= data_inicio)
+        consultas_producao = [c.where(Producao.data >= data_inicio) for c in consultas_producao]
+
+    try:
+        db.session.execute(limpar_financeiro)
+        db.session.execute(limpar_producao)
+
+        db.session.execute(
+            insert(tabela_financeiro).from_select(
+                ['data', 'tipo', 'categoria', 'total', 'quantidade', 'ultima_atualizacao'],
+                select(*consulta_financeiro.subquery().c, literal(agora))
+            )
+        )
+
+        for consulta in consultas_producao:
+            db.session.execute(
+                insert(tabela_producao).from_select(
+                    ['data', 'cliente_id', 'produto_id', 'status', 'producoes', 'quantidade', 'valor', 'ultima_atualizacao'],
+                    select(*consulta.subquery().c, literal(agora))
+                )
+            )
+
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    totais = {
+        'financeiro': db.session.query(func.count(ResumoFinanceiroDiario.id)).scalar(),
+        'producao': db.session.query(func.count(ResumoProducaoDiario.id)).scalar()
+    }
+    logger.info(f"Resumos reconstruídos: {totais['financeiro']} financeiros, {totais['producao']} de produção")
+    return totais
+
+
+# Consultas de leitura usadas pelos dashboards
+
+def totais_financeiros(data_inicio=None, data_fim=None):
+    """Retorna {tipo: total} das movimentações no período, a partir do resumo."""
+    query = db.session.query(
+        ResumoFinanceiroDiario.tipo,
+        func.sum(ResumoFinanceiroDiario.total)
+    )
+
+    if data_inicio is not None:
+        query = query.filter(ResumoFinanceiroDiario.data >= data_inicio)
+    if data_fim is not None:
+        query = query.filter(ResumoFinanceiroDiario.data <= data_fim)
+
+    return {
+        tipo: Decimal(str(total or 0))
+        for tipo, total in query.group_by(ResumoFinanceiroDiario.tipo).all()
+    }
+
+
+def totais_financeiros_por_categoria(data_inicio, data_fim):
+    """Retorna os totais do período agrupados por categoria e tipo, a partir do resumo."""
+    return db.session.query(
+        ResumoFinanceiroDiario.categoria,
+        ResumoFinanceiroDiario.tipo,
+        func.sum(ResumoFinanceiroDiario.total).label('total')
+    ).filter(
+        ResumoFinanceiroDiario.data >= data_inicio,
+        ResumoFinanceiroDiario.data <= data_fim
+    ).group_by(
+        ResumoFinanceiroDiario.categoria,
+        ResumoFinanceiroDiario.tipo
+    ).all()
+
+
+def totais_producao(data_inicio=None, data_fim=None, status=None):
+    """Retorna (número de produções, valor total) no período, a partir do resumo."""
+    query = db.session.query(
+        func.coalesce(func.sum(ResumoProducaoDiario.producoes), 0),
+        func.coalesce(func.sum(ResumoProducaoDiario.valor), 0)
+    ).filter(
+        ResumoProducaoDiario.produto_id.is_(None)
+    )
+
+    if data_inicio is not None:
+        query = query.filter(ResumoProducaoDiario.data >= data_inicio)
+    if data_fim is not None:
+        query = query.filter(ResumoProducaoDiario.data <= data_fim)
+    if status is not None:
+        query = query.filter(ResumoProducaoDiario.status == status)
+
+    producoes, valor = query.one()
+    return int(producoes), Decimal(str(valor))
@@ -0,0 +1,218 @@
+"""
+Serviço de saldos de estoque por data do ERP ROMA
+
+As movimentações de estoque formam o razão de cada material. Para não somar o
+razão inteiro a cada consulta, o saldo de todos os materiais é gravado ao fim de
+cada dia (FechamentoEstoque; o do último dia do mês fica marcado como mensal).
+
+O saldo de uma data é o último fechamento até ela mais as movimentações
+posteriores a esse fechamento, lidas pelo índice (material_id,
+data_movimentacao), tudo em uma única consulta.
+
+A variação de cada movimentação é quantidade_atual - quantidade_anterior (o que
+cobre saídas limitadas a zero e ajustes); linhas sem os saldos usam a
+quantidade com o sinal do tipo. As datas seguem data_movimentacao (UTC).
+Movimentações lançadas com data anterior a um fechamento já gravado exigem
+refazer os fechamentos a partir dela (fechar_periodo).
+"""
+
+import logging
+from datetime import date, datetime, time, timedelta
+from sqlalchemy import select, insert, delete, func, and_, case, literal
+from sqlalchemy.orm import aliased
+from app import db
+from app.models.material import Material, MovimentacaoEstoque, FechamentoEstoque
+
+logger = logging.getLogger(__name__)
+
+# Diferença tolerada entre saldos (arredondamento das colunas numéricas)
+TOLERANCIA = 0.0005
+
+
+def limite_do_dia(data):
+    """Início do dia seguinte: as movimentações do dia são as anteriores a ele."""
+    return datetime.combine(data + timedelta(days=1), time.min)
+
+
+def variacao_movimentacao():
+    """Expressão com a variação de saldo causada por uma movimentação."""
+    return func.coalesce(
+        MovimentacaoEstoque.quantidade_atual - MovimentacaoEstoque.quantidade_anterior,
+        case((MovimentacaoEstoque.tipo == 'saida', -MovimentacaoEstoque.quantidade), else_=MovimentacaoEstoque.quantidade)
+    )
+
+
+def saldo_na_data(data=None):
+    """Expressão do saldo de Material na data e o fechamento que ela usa.
+
+    Retorna (saldo, fechamento, juncao); a consulta deve fazer
+    outerjoin(fechamento, juncao) a partir de Material. Sem data, o saldo
+    considera todas as movimentações.
+    """
+    # Último fechamento do material até a data, buscado pelo índice único (material_id, data)
+    fechamento = aliased(FechamentoEstoque)
+    anterior = aliased(FechamentoEstoque)
+    ultimo = select(func.max(anterior.data)).where(anterior.material_id == Material.id)
+    if data is not None:
+        ultimo = ultimo.where(anterior.data <= data)
+    juncao = and_(fechamento.material_id == Material.id, fechamento.data == ultimo.scalar_subquery())
+
+    # Movimentações posteriores ao fechamento (todas, se não houver), pelo índice (material_id, data_movimentacao)
+    variacao = select(
+        func.coalesce(func.sum(variacao_movimentacao()), 0)
+    ).where(
+        MovimentacaoEstoque.material_id == Material.id,
+        MovimentacaoEstoque.data_movimentacao >= func.coalesce(fechamento.ate, datetime.min)
+    )
+    if data is not None:
+        variacao = variacao.where(MovimentacaoEstoque.data_movimentacao < limite_do_dia(data))
+
+    saldo = func.coalesce(fechamento.saldo, 0) + variacao.scalar_subquery()
+    return saldo, fechamento, juncao
+
+
+def consulta_saldos(data):
+    """Consulta com os materiais e o saldo de cada um ao fim da data.
+
+    As colunas seguem o relatório de estoque atual (código, nome, categoria,
+    unidade, estoque_atual, estoque_minimo, custo_unitario), com o saldo na data
+    no lugar do estoque atual.
+    """
+    saldo, fechamento, juncao = saldo_na_data(data)
+    return db.session.query(
+        Material.codigo, Material.nome, Material.categoria, Material.unidade_medida,
+        saldo.label('estoque_atual'), Material.estoque_minimo, Material.custo_unitario
+    ).select_from(Material).outerjoin(fechamento, juncao)
+
+
+# Fechamentos
+
+def tipo_fechamento(data):
+    """O fechamento do último dia do mês é mensal; os demais, diários."""
+    return 'mensal' if (data + timedelta(days=1)).day == 1 else 'diario'
+
+
+def fechar_dia(data):
+    """Grava o saldo de todos os materiais ao fim da data (substitui o fechamento existente)."""
+    conn = db.session.connection()
+    conn.execute(delete(FechamentoEstoque).where(FechamentoEstoque.data == data))
+
+    saldo, fechamento, juncao = saldo_na_data(data)
+    resultado = conn.execute(
+        insert(FechamentoEstoque).from_select(
+            ['material_id', 'data', 'ate', 'tipo', 'saldo', 'data_criacao'],
+            select(
+                Material.id, literal(data), literal(limite_do_dia(data)),
+                literal(tipo_fechamento(data)), saldo, literal(datetime.utcnow())
+            ).select_from(Material).outerjoin(fechamento, juncao)
+        )
+    )
+    return resultado.rowcount
+
+
+def inicio_pendente():
+    """Primeiro dia sem fechamento: o seguinte ao último fechamento ou o da primeira movimentação."""
+    ultimo = db.session.query(func.max(FechamentoEstoque.data)).scalar()
+    if ultimo:
+        return ultimo + timedelta(days=1)
+
+    primeira = db.session.query(func.min(MovimentacaoEstoque.data_movimentacao)).scalar()
+    return primeira.date() if primeira else date.today() - timedelta(days=1)
+
+
+def fechar_periodo(data_inicio, data_fim=None, retencao_dias=None):
+    """Grava os fechamentos de cada dia do período e confirma a transação.
+
+    Sem data_fim, fecha até ontem. Com retencao_dias, remove os fechamentos
+    diários mais antigos que isso (os mensais são mantidos).
+    """
+    data_fim = data_fim or date.today() - timedelta(days=1)
+    dias = 0
+
+    try:
+        data = data_inicio
+        while data <= data_fim:
+            fechar_dia(data)
+            data += timedelta(days=1)
+            dias += 1
+
+        if retencao_dias:
+            db.session.execute(
+                delete(FechamentoEstoque).where(
+                    FechamentoEstoque.tipo == 'diario',
+                    FechamentoEstoque.data < data_fim - timedelta(days=retencao_dias)
+                )
+            )
+
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    logger.info(f"Fechamentos de estoque gravados: {dias} dias até {data_fim}")
+    return dias
+
+
+# Verificação de consistência
+
+def verificar_consistencia():
+    """Confere o razão de estoque, recalculando os saldos a partir das movimentações.
+
+    Retorna um dicionário com listas de divergências:
+    - 'saldos': materiais cujo estoque_atual difere do saldo do razão;
+    - 'cadeia': movimentações cujo saldo anterior difere do saldo da movimentação
+      anterior do mesmo material;
+    - 'fechamentos': fechamentos que diferem do fechamento anterior do material
+      mais as movimentações entre os dois.
+    """
+    saldo, fechamento, juncao = saldo_na_data()
+    saldos = db.session.query(
+        Material.id, Material.codigo, Material.estoque_atual, saldo.label('saldo')
+    ).select_from(Material).outerjoin(fechamento, juncao).subquery()
+    divergencias_saldo = db.session.execute(
+        select(saldos).where(func.abs(func.coalesce(saldos.c.estoque_atual, 0) - saldos.c.saldo) > TOLERANCIA)
+    ).all()
+
+    anterior = func.lag(MovimentacaoEstoque.quantidade_atual).over(
+        partition_by=MovimentacaoEstoque.material_id,
+        order_by=(MovimentacaoEstoque.data_movimentacao, MovimentacaoEstoque.id)
+    )
+    cadeia = select(
+        MovimentacaoEstoque.id, MovimentacaoEstoque.material_id, MovimentacaoEstoque.data_movimentacao,
+        MovimentacaoEstoque.quantidade_anterior, anterior.label('saldo_esperado')
+    ).subquery()
+    divergencias_cadeia = db.session.execute(
+        select(cadeia).where(
+            cadeia.c.saldo_esperado.isnot(None),
+            cadeia.c.quantidade_anterior.isnot(None),
+            func.abs(cadeia.c.quantidade_anterior - cadeia.c.saldo_esperado) > TOLERANCIA
+        ).order_by(cadeia.c.material_id, cadeia.c.data_movimentacao)
+    ).all()
+
+    # Cada fechamento deve ser o anterior do material mais as movimentações entre os dois
+    janela = {'partition_by': FechamentoEstoque.material_id, 'order_by': FechamentoEstoque.data}
+    sequencia = select(
+        FechamentoEstoque.id, FechamentoEstoque.material_id, FechamentoEstoque.data,
+        FechamentoEstoque.saldo, FechamentoEstoque.ate,
+        func.lag(FechamentoEstoque.saldo).over(**janela).label('saldo_anterior'),
+        func.lag(FechamentoEstoque.ate).over(**janela).label('ate_anterior')
+    ).subquery()
+    razao = func.coalesce(sequencia.c.saldo_anterior, 0) + select(
+        func.coalesce(func.sum(variacao_movimentacao()), 0)
+    ).where(
+        MovimentacaoEstoque.material_id == sequencia.c.material_id,
+        MovimentacaoEstoque.data_movimentacao < sequencia.c.ate,
+        MovimentacaoEstoque.data_movimentacao >= func.coalesce(sequencia.c.ate_anterior, datetime.min)
+    ).scalar_subquery()
+    divergencias_fechamento = db.session.execute(
+        select(
+            sequencia.c.id, sequencia.c.material_id, sequencia.c.data,
+            sequencia.c.saldo, razao.label('saldo_razao')
+        ).where(func.abs(sequencia.c.saldo - razao) > TOLERANCIA)
+    ).all()
+
+    return {
+        'saldos': [dict(linha._mapping) for linha in divergencias_saldo],
+        'cadeia': [dict(linha._mapping) for linha in divergencias_cadeia],
+        'fechamentos': [dict(linha._mapping) for linha in divergencias_fechamento],
+    }
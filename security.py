@@ -6,14 +6,18 @@ import os
 import shutil
 import sqlite3
 import zipfile
+import tempfile
 import schedule
 import time
 import logging
 from datetime import datetime, timedelta
 from pathlib import Path
-from threading import Thread
+from threading import Thread, Lock
 import hashlib
 import json
+import zlib
+from contextlib import contextmanager
+from itertools import chain
 from flask import current_app
 from app import db
 from app.models.usuario import Usuario
@@ -30,11 +34,27 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+# Backups incrementais: os arquivos são divididos em blocos de tamanho fixo, gravados
+# uma única vez no repositório de blocos (endereçados pelo SHA-256 do conteúdo).
+# 64 KiB é múltiplo de qualquer page_size do SQLite, então uma página alterada
+# invalida apenas o bloco que a contém.
+TAMANHO_CHUNK = 64 * 1024
+PASTA_CHUNKS = 'chunks'
+
 class BackupManager:
     """Gerenciador de backup do sistema."""
     
     def __init__(self, app=None):
         self.app = app
+        
+        # Cópia online do SQLite: páginas por passo e pausa entre os passos
+        self.pages_per_step = 1024
+        self.step_sleep = 0.05
+        
+        # Andamento do backup atual (exibido em /admin/api/backup-status)
+        self._progress = {'running': False}
+        self._progress_lock = Lock()
+        
         if app is not None:
             self.init_app(app)
     
@@ -48,6 +68,8 @@ class BackupManager:
         self.backup_interval = app.config.get('BACKUP_INTERVAL', 24)  # horas
         self.icloud_sync = app.config.get('ICLOUD_SYNC', False)
         self.icloud_dir = app.config.get('ICLOUD_DIR', '~/Library/Mobile Documents/com~apple~CloudDocs/ERP_ROMA_Backups')
+        self.pages_per_step = app.config.get('BACKUP_PAGES_PER_STEP', self.pages_per_step)
+        self.step_sleep = app.config.get('BACKUP_STEP_SLEEP', self.step_sleep)
         
         # Cria diretórios necessários
         self._create_directories()
@@ -89,33 +111,47 @@ class BackupManager:
             time.sleep(60)  # Verifica a cada minuto
     
     def create_backup(self, backup_type='incremental'):
-        """Cria um backup do sistema."""
+        """Cria um backup do sistema.
+
+        Backups incrementais geram um manifesto (.json) que referencia blocos do
+        repositório deduplicado; os demais tipos geram um arquivo ZIP completo.
+        """
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        backup_name = f"backup_{backup_type}_{timestamp}"
+        
+        if not self._start_progress(backup_name, backup_type):
+            logger.warning(f"Backup {backup_name} ignorado: já existe um backup em andamento")
+            return None
+        
         try:
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            backup_name = f"backup_{backup_type}_{timestamp}"
-            backup_path = Path(self.backup_dir) / f"{backup_name}.zip"
-            
             logger.info(f"Iniciando backup {backup_type}: {backup_name}")
             
-            with zipfile.ZipFile(backup_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                # Backup do banco de dados
-                self._backup_database(zipf, backup_name)
-                
-                # Backup dos arquivos de configuração
-                self._backup_config_files(zipf)
-                
-                # Backup dos logs (últimos 30 dias)
-                self._backup_logs(zipf)
-                
-                # Backup dos uploads/anexos
-                self._backup_uploads(zipf)
+            if backup_type == 'incremental':
+                backup_path = self._create_incremental_backup(backup_name, backup_type)
+            else:
+                backup_path = Path(self.backup_dir) / f"{backup_name}.zip"
                 
-                # Metadados do backup
-                self._create_backup_metadata(zipf, backup_name, backup_type)
+                with zipfile.ZipFile(backup_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
+                    # Backup do banco de dados
+                    self._backup_database(zipf, backup_name)
+                    
+                    # Backup dos arquivos de configuração
+                    self._backup_config_files(zipf)
+                    
+                    # Backup dos logs (últimos 30 dias)
+                    self._backup_logs(zipf)
+                    
+                    # Backup dos uploads/anexos
+                    self._backup_uploads(zipf)
+                    
+                    # Metadados do backup
+                    self._create_backup_metadata(zipf, backup_name, backup_type)
             
             # Verifica integridade do backup
+            self._update_progress(phase='verifying')
             if self._verify_backup_integrity(backup_path):
                 logger.info(f"Backup criado com sucesso: {backup_path}")
+                self._finish_progress()
                 
                 # Sincroniza com iCloud se habilitado
                 if self.icloud_sync:
@@ -128,52 +164,154 @@ class BackupManager:
             else:
                 logger.error(f"Falha na verificação de integridade do backup: {backup_path}")
                 backup_path.unlink()  # Remove backup corrompido
+                self._finish_progress('Falha na verificação de integridade')
                 return None
                 
         except Exception as e:
             logger.error(f"Erro ao criar backup: {str(e)}")
+            self._finish_progress(str(e))
             return None
     
+    def _start_progress(self, backup_name, backup_type):
+        """Marca o início de um backup. Retorna False se outro já estiver em andamento."""
+        with self._progress_lock:
+            if self._progress.get('running'):
+                return False
+            
+            self._progress = {
+                'running': True,
+                'backup_name': backup_name,
+                'backup_type': backup_type,
+                'phase': 'starting',
+                'pages_total': 0,
+                'pages_copied': 0,
+                'percent': 0.0,
+                'started_at': datetime.now().isoformat(),
+                'finished_at': None,
+                'error': None
+            }
+            return True
+    
+    def _update_progress(self, **values):
+        with self._progress_lock:
+            self._progress.update(values)
+    
+    def _finish_progress(self, error=None):
+        self._update_progress(
+            running=False,
+            phase='error' if error else 'done',
+            finished_at=datetime.now().isoformat(),
+            error=error
+        )
+    
+    def _database_progress(self, status, remaining, total):
+        """Callback do sqlite3 a cada lote de páginas copiado."""
+        copied = total - remaining
+        self._update_progress(
+            pages_total=total,
+            pages_copied=copied,
+            percent=round(copied * 100 / total, 1) if total else 100.0
+        )
+        
+        # O sqlite3 só aplica `sleep` quando o banco está ocupado; a pausa entre
+        # os lotes limita o I/O do backup e é feita aqui
+        if remaining:
+            time.sleep(self.step_sleep)
+    
+    def backup_status(self):
+        """Andamento do backup atual (ou do último executado)."""
+        with self._progress_lock:
+            return dict(self._progress)
+    
     def create_full_backup(self):
         """Cria um backup completo do sistema."""
         return self.create_backup('full')
     
-    def _backup_database(self, zipf, backup_name):
-        """Faz backup do banco de dados."""
+    def _sqlite_file(self):
+        """Caminho do arquivo SQLite, ou None para outros bancos."""
         db_path = self.app.config.get('DATABASE_URL', 'sqlite:///instance/roma.db')
         
         if db_path.startswith('sqlite:///'):
-            # Backup do SQLite
-            db_file = db_path.replace('sqlite:///', '')
+            return db_path.replace('sqlite:///', '')
+        return None
+    
+    @contextmanager
+    def _database_snapshot(self, backup_name):
+        """Gera uma cópia consistente do banco SQLite em um arquivo temporário.
+        
+        A cópia é feita em lotes de `pages_per_step` páginas, com uma pausa entre
+        eles. Com o banco em modo WAL a leitura não bloqueia os escritores da
+        aplicação. O arquivo fica na pasta de backups (não em um /tmp em memória)
+        e é removido ao final; quem usa a cópia lê em blocos de TAMANHO_CHUNK, de
+        modo que a memória usada não cresce com o tamanho do banco. Produz o
+        caminho da cópia ou None.
+        """
+        db_file = self._sqlite_file()
+        
+        if db_file is None:
+            # Para outros bancos (MySQL, PostgreSQL), usar dump
+            logger.warning("Backup de bancos não-SQLite não implementado")
+            yield None
+            return
+        
+        if not os.path.exists(db_file):
+            yield None
+            return
+        
+        self._update_progress(phase='database')
+        
+        fd, snapshot_path = tempfile.mkstemp(prefix=f"{backup_name}_", suffix='.db.tmp', dir=self.backup_dir)
+        os.close(fd)
+        
+        try:
+            source_conn = sqlite3.connect(db_file, timeout=30)
+            snapshot_conn = sqlite3.connect(snapshot_path)
             
-            if os.path.exists(db_file):
-                # Cria uma cópia do banco para backup
-                backup_db_path = f"temp_{backup_name}.db"
+            try:
+                # A cópia é descartável: sem journal na gravação
+                snapshot_conn.execute('PRAGMA journal_mode=OFF')
+                snapshot_conn.execute('PRAGMA synchronous=OFF')
                 
-                # Conecta ao banco original
-                source_conn = sqlite3.connect(db_file)
+                # WAL é persistente no arquivo: leitores e escritores deixam de se bloquear
+                source_conn.execute('PRAGMA journal_mode=WAL')
                 
-                # Cria backup usando o método backup do SQLite
-                backup_conn = sqlite3.connect(backup_db_path)
-                source_conn.backup(backup_conn)
+                # Mantém uma transação de leitura durante toda a cópia: em WAL ela fixa
+                # um snapshot, e as escritas de outras conexões não reiniciam o backup
+                source_conn.execute('BEGIN')
+                source_conn.execute('SELECT COUNT(*) FROM sqlite_master').fetchone()
                 
+                source_conn.backup(
+                    snapshot_conn,
+                    pages=self.pages_per_step,
+                    progress=self._database_progress,
+                    sleep=self.step_sleep
+                )
+            finally:
                 # Fecha conexões
                 source_conn.close()
-                backup_conn.close()
-                
-                # Adiciona ao arquivo ZIP
-                zipf.write(backup_db_path, 'database/roma.db')
-                
-                # Remove arquivo temporário
-                os.remove(backup_db_path)
+                snapshot_conn.close()
+            
+            self._update_progress(phase='files')
+            
+            yield snapshot_path
+        finally:
+            for path in (snapshot_path, f"{snapshot_path}-wal", f"{snapshot_path}-shm"):
+                if os.path.exists(path):
+                    os.remove(path)
+    
+    def _backup_database(self, zipf, backup_name):
+        """Faz backup do banco de dados."""
+        with self._database_snapshot(backup_name) as snapshot_path:
+            if snapshot_path is not None:
+                # Copia a cópia do banco para o ZIP em blocos
+                with zipf.open('database/roma.db', 'w', force_zip64=True) as destination:
+                    for block in self._read_blocks(snapshot_path):
+                        destination.write(block)
                 
                 logger.info("Backup do banco de dados SQLite concluído")
-        else:
-            # Para outros bancos (MySQL, PostgreSQL), usar dump
-            logger.warning("Backup de bancos não-SQLite não implementado")
     
-    def _backup_config_files(self, zipf):
-        """Faz backup dos arquivos de configuração."""
+    def _config_files(self):
+        """Arquivos de configuração incluídos no backup (origem, nome no backup)."""
         config_files = [
             'config.py',
             '.env',
@@ -182,36 +320,160 @@ class BackupManager:
         
         for config_file in config_files:
             if os.path.exists(config_file):
-                zipf.write(config_file, f'config/{config_file}')
-        
-        logger.info("Backup dos arquivos de configuração concluído")
+                yield config_file, f'config/{config_file}'
     
-    def _backup_logs(self, zipf):
-        """Faz backup dos logs recentes."""
+    def _log_files(self):
+        """Logs dos últimos 30 dias incluídos no backup."""
         logs_dir = Path('logs')
         
         if logs_dir.exists():
-            # Backup dos logs dos últimos 30 dias
             cutoff_date = datetime.now() - timedelta(days=30)
             
             for log_file in logs_dir.glob('*.log'):
                 if log_file.stat().st_mtime > cutoff_date.timestamp():
-                    zipf.write(log_file, f'logs/{log_file.name}')
-        
-        logger.info("Backup dos logs concluído")
+                    yield log_file, f'logs/{log_file.name}'
     
-    def _backup_uploads(self, zipf):
-        """Faz backup dos arquivos de upload."""
+    def _upload_files(self):
+        """Arquivos de upload incluídos no backup."""
         uploads_dir = Path('app/static/uploads')
         
         if uploads_dir.exists():
             for upload_file in uploads_dir.rglob('*'):
                 if upload_file.is_file():
                     relative_path = upload_file.relative_to('app/static')
-                    zipf.write(upload_file, f'uploads/{relative_path}')
+                    yield upload_file, f'uploads/{relative_path}'
+    
+    def _backup_config_files(self, zipf):
+        """Faz backup dos arquivos de configuração."""
+        for config_file, arcname in self._config_files():
+            zipf.write(config_file, arcname)
+        
+        logger.info("Backup dos arquivos de configuração concluído")
+    
+    def _backup_logs(self, zipf):
+        """Faz backup dos logs recentes."""
+        for log_file, arcname in self._log_files():
+            zipf.write(log_file, arcname)
+        
+        logger.info("Backup dos logs concluído")
+    
+    def _backup_uploads(self, zipf):
+        """Faz backup dos arquivos de upload."""
+        for upload_file, arcname in self._upload_files():
+            zipf.write(upload_file, arcname)
         
         logger.info("Backup dos uploads concluído")
     
+    # Backup incremental (manifesto + repositório de blocos)
+    
+    def _chunk_path(self, chunk_hash, base_dir=None):
+        """Caminho do bloco no repositório (subpastas pelos 2 primeiros dígitos)."""
+        return Path(base_dir or self.backup_dir) / PASTA_CHUNKS / chunk_hash[:2] / chunk_hash
+    
+    def _store_chunk(self, chunk_hash, data):
+        """Grava o bloco se ele ainda não existir. Retorna os bytes gravados em disco."""
+        chunk_path = self._chunk_path(chunk_hash)
+        
+        if chunk_path.exists():
+            return 0
+        
+        chunk_path.parent.mkdir(parents=True, exist_ok=True)
+        compressed = zlib.compress(data, 6)
+        
+        # Grava com outro nome e renomeia, para nunca deixar um bloco incompleto
+        temp_path = chunk_path.with_name(f"{chunk_hash}.tmp")
+        with open(temp_path, 'wb') as f:
+            f.write(compressed)
+        os.replace(temp_path, chunk_path)
+        
+        return len(compressed)
+    
+    def _read_chunk(self, chunk_hash, base_dir=None):
+        """Lê e valida um bloco do repositório."""
+        with open(self._chunk_path(chunk_hash, base_dir), 'rb') as f:
+            data = zlib.decompress(f.read())
+        
+        if hashlib.sha256(data).hexdigest() != chunk_hash:
+            raise ValueError(f"Bloco corrompido no repositório: {chunk_hash}")
+        
+        return data
+    
+    def _read_blocks(self, file_path):
+        """Lê o arquivo em blocos de TAMANHO_CHUNK."""
+        with open(file_path, 'rb') as f:
+            while True:
+                data = f.read(TAMANHO_CHUNK)
+                if not data:
+                    break
+                yield data
+    
+    def _store_blocks(self, blocks, stats):
+        """Grava os blocos de um arquivo e retorna sua entrada no manifesto."""
+        file_hash = hashlib.sha256()
+        chunks = []
+        size = 0
+        
+        for data in blocks:
+            chunk_hash = hashlib.sha256(data).hexdigest()
+            written = self._store_chunk(chunk_hash, data)
+            
+            stats['chunks_total'] += 1
+            stats['bytes_total'] += len(data)
+            if written:
+                stats['chunks_new'] += 1
+                stats['bytes_written'] += written
+            
+            file_hash.update(data)
+            chunks.append(chunk_hash)
+            size += len(data)
+        
+        return {'size': size, 'sha256': file_hash.hexdigest(), 'chunks': chunks}
+    
+    def _create_incremental_backup(self, backup_name, backup_type):
+        """Cria um backup incremental: grava só os blocos novos e o manifesto."""
+        manifest_path = Path(self.backup_dir) / f"{backup_name}.json"
+        stats = {'bytes_total': 0, 'bytes_written': 0, 'chunks_total': 0, 'chunks_new': 0}
+        files = {}
+        
+        with self._database_snapshot(backup_name) as snapshot_path:
+            if snapshot_path is not None:
+                files['database/roma.db'] = self._store_blocks(self._read_blocks(snapshot_path), stats)
+        
+        for source, arcname in chain(self._config_files(), self._log_files(), self._upload_files()):
+            files[arcname] = self._store_blocks(self._read_blocks(source), stats)
+        
+        manifest = {
+            'backup_name': backup_name,
+            'backup_type': backup_type,
+            'timestamp': datetime.now().isoformat(),
+            'version': '2.0',
+            'format': 'manifest',
+            'system': 'ERP ROMA',
+            'database_type': 'SQLite',
+            'files_count': len(files),
+            'chunk_size': TAMANHO_CHUNK,
+            **stats,
+            'files': files
+        }
+        
+        # O manifesto só aparece depois que todos os blocos foram gravados
+        temp_path = manifest_path.with_suffix('.tmp')
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        os.replace(temp_path, manifest_path)
+        
+        logger.info(
+            f"Manifesto do backup criado: {stats['chunks_new']}/{stats['chunks_total']} blocos novos, "
+            f"{stats['bytes_written']} bytes gravados de {stats['bytes_total']}"
+        )
+        
+        return manifest_path
+    
+    def _load_manifest(self, manifest_path):
+        """Lê o manifesto de um backup incremental."""
+        with open(manifest_path, encoding='utf-8') as f:
+            return json.load(f)
+    
     def _create_backup_metadata(self, zipf, backup_name, backup_type):
         """Cria metadados do backup."""
         metadata = {
@@ -231,6 +493,9 @@ class BackupManager:
     
     def _verify_backup_integrity(self, backup_path):
         """Verifica a integridade do backup."""
+        if Path(backup_path).suffix == '.json':
+            return self._verify_manifest_integrity(backup_path)
+        
         try:
             with zipfile.ZipFile(backup_path, 'r') as zipf:
                 # Testa se o arquivo ZIP está válido
@@ -254,12 +519,44 @@ class BackupManager:
             logger.error(f"Erro na verificação de integridade: {str(e)}")
             return False
     
+    def _verify_manifest_integrity(self, manifest_path):
+        """Verifica se o manifesto é válido e se todos os blocos existem."""
+        try:
+            manifest = self._load_manifest(manifest_path)
+            files = manifest.get('files', {})
+            
+            if 'database/roma.db' not in files:
+                logger.error("Arquivo essencial ausente no backup: database/roma.db")
+                return False
+            
+            base_dir = Path(manifest_path).parent
+            for name, entry in files.items():
+                for chunk_hash in entry['chunks']:
+                    if not self._chunk_path(chunk_hash, base_dir).exists():
+                        logger.error(f"Bloco ausente no backup ({name}): {chunk_hash}")
+                        return False
+            
+            return True
+            
+        except Exception as e:
+            logger.error(f"Erro na verificação de integridade: {str(e)}")
+            return False
+    
     def _sync_to_icloud(self, backup_path):
         """Sincroniza backup com iCloud."""
         try:
             icloud_path = Path(self.icloud_dir).expanduser()
             
             if icloud_path.exists():
+                # Backups incrementais: copia os blocos que faltam antes do manifesto
+                if backup_path.suffix == '.json':
+                    for entry in self._load_manifest(backup_path)['files'].values():
+                        for chunk_hash in entry['chunks']:
+                            chunk_destination = self._chunk_path(chunk_hash, icloud_path)
+                            if not chunk_destination.exists():
+                                chunk_destination.parent.mkdir(parents=True, exist_ok=True)
+                                shutil.copy2(self._chunk_path(chunk_hash), chunk_destination)
+                
                 destination = icloud_path / backup_path.name
                 shutil.copy2(backup_path, destination)
                 logger.info(f"Backup sincronizado com iCloud: {destination}")
@@ -269,32 +566,64 @@ class BackupManager:
         except Exception as e:
             logger.error(f"Erro na sincronização com iCloud: {str(e)}")
     
+    def _backup_files(self, directory):
+        """Backups (ZIP e manifestos) de um diretório."""
+        directory = Path(directory)
+        return list(chain(directory.glob('backup_*.zip'), directory.glob('backup_*.json')))
+    
     def _cleanup_old_backups(self):
         """Remove backups antigos."""
         try:
-            backup_dir = Path(self.backup_dir)
-            backup_files = sorted(backup_dir.glob('backup_*.zip'), key=lambda x: x.stat().st_mtime, reverse=True)
-            
-            # Remove backups excedentes
-            if len(backup_files) > self.max_backups:
-                for old_backup in backup_files[self.max_backups:]:
-                    old_backup.unlink()
-                    logger.info(f"Backup antigo removido: {old_backup}")
+            self._cleanup_backup_dir(Path(self.backup_dir), "Backup antigo removido")
             
             # Remove backups do iCloud também
             if self.icloud_sync:
                 icloud_path = Path(self.icloud_dir).expanduser()
                 if icloud_path.exists():
-                    icloud_backups = sorted(icloud_path.glob('backup_*.zip'), key=lambda x: x.stat().st_mtime, reverse=True)
-                    
-                    if len(icloud_backups) > self.max_backups:
-                        for old_backup in icloud_backups[self.max_backups:]:
-                            old_backup.unlink()
-                            logger.info(f"Backup antigo removido do iCloud: {old_backup}")
+                    self._cleanup_backup_dir(icloud_path, "Backup antigo removido do iCloud")
                             
         except Exception as e:
             logger.error(f"Erro na limpeza de backups antigos: {str(e)}")
     
+    def _cleanup_backup_dir(self, directory, message):
+        """Mantém os max_backups mais recentes e remove blocos sem referência."""
+        backup_files = sorted(self._backup_files(directory), key=lambda x: x.stat().st_mtime, reverse=True)
+        
+        # Remove backups excedentes
+        if len(backup_files) > self.max_backups:
+            for old_backup in backup_files[self.max_backups:]:
+                old_backup.unlink()
+                logger.info(f"{message}: {old_backup}")
+        
+        if (directory / PASTA_CHUNKS).exists():
+            self._collect_unreferenced_chunks(directory)
+    
+    def _collect_unreferenced_chunks(self, directory):
+        """Remove do repositório os blocos que nenhum manifesto referencia."""
+        referenced = set()
+        
+        for manifest_path in Path(directory).glob('backup_*.json'):
+            try:
+                for entry in self._load_manifest(manifest_path)['files'].values():
+                    referenced.update(entry['chunks'])
+            except Exception as e:
+                # Sem a lista completa de referências nada pode ser removido com segurança
+                logger.error(f"Manifesto ilegível, limpeza de blocos cancelada ({manifest_path}): {str(e)}")
+                return 0
+        
+        removed = 0
+        for chunk_path in (Path(directory) / PASTA_CHUNKS).glob('*/*'):
+            # Ignora arquivos temporários de uma gravação em andamento
+            if chunk_path.suffix or chunk_path.name in referenced:
+                continue
+            chunk_path.unlink()
+            removed += 1
+        
+        if removed:
+            logger.info(f"Blocos sem referência removidos: {removed}")
+        
+        return removed
+    
     def restore_backup(self, backup_path, restore_database=True, restore_config=False):
         """Restaura um backup do sistema."""
         try:
@@ -306,6 +635,9 @@ class BackupManager:
             
             logger.info(f"Iniciando restauração do backup: {backup_path}")
             
+            if backup_path.suffix == '.json':
+                return self._restore_manifest(backup_path, restore_database, restore_config)
+            
             with zipfile.ZipFile(backup_path, 'r') as zipf:
                 # Verifica integridade antes da restauração
                 if not self._verify_backup_integrity(backup_path):
@@ -330,6 +662,77 @@ class BackupManager:
             logger.error(f"Erro na restauração do backup: {str(e)}")
             return False
     
+    def _restore_manifest(self, manifest_path, restore_database, restore_config):
+        """Restaura um backup incremental remontando os arquivos a partir dos blocos."""
+        if not self._verify_backup_integrity(manifest_path):
+            logger.error("Backup corrompido, restauração cancelada")
+            return False
+        
+        files = self._load_manifest(manifest_path)['files']
+        base_dir = manifest_path.parent
+        
+        # Restaura banco de dados
+        db_file = self._sqlite_file()
+        if restore_database and db_file:
+            if os.path.exists(db_file):
+                backup_current = f"{db_file}.backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+                self._checkpoint_wal(db_file)
+                shutil.copy2(db_file, backup_current)
+                logger.info(f"Backup do banco atual criado: {backup_current}")
+            
+            self._restore_file(files['database/roma.db'], db_file, base_dir)
+            self._remove_wal_files(db_file)
+            logger.info("Banco de dados restaurado")
+        
+        for name, entry in files.items():
+            # Restaura configurações
+            if name.startswith('config/') and restore_config:
+                destination = name.replace('config/', '', 1)
+                self._restore_file(entry, destination, base_dir)
+                logger.info(f"Arquivo de configuração restaurado: {destination}")
+            
+            # Restaura uploads
+            elif name.startswith('uploads/'):
+                self._restore_file(entry, f"app/static/{name}", base_dir)
+        
+        logger.info("Restauração concluída com sucesso")
+        return True
+    
+    def _restore_file(self, entry, destination, base_dir):
+        """Remonta um arquivo do manifesto, conferindo o hash antes de substituí-lo."""
+        Path(destination).parent.mkdir(parents=True, exist_ok=True)
+        temp_path = f"{destination}.restore_tmp"
+        file_hash = hashlib.sha256()
+        
+        try:
+            with open(temp_path, 'wb') as f:
+                for chunk_hash in entry['chunks']:
+                    data = self._read_chunk(chunk_hash, base_dir)
+                    file_hash.update(data)
+                    f.write(data)
+            
+            if file_hash.hexdigest() != entry['sha256']:
+                raise ValueError(f"Hash divergente ao restaurar {destination}")
+            
+            os.replace(temp_path, destination)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+    
+    def _checkpoint_wal(self, db_file):
+        """Grava no arquivo principal as páginas pendentes no WAL."""
+        conn = sqlite3.connect(db_file, timeout=30)
+        try:
+            conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        finally:
+            conn.close()
+    
+    def _remove_wal_files(self, db_file):
+        """Remove o WAL do banco substituído, que não pertence ao arquivo restaurado."""
+        for suffix in ('-wal', '-shm'):
+            if os.path.exists(f"{db_file}{suffix}"):
+                os.remove(f"{db_file}{suffix}")
+    
     def _restore_database(self, zipf):
         """Restaura o banco de dados."""
         db_path = self.app.config.get('DATABASE_URL', 'sqlite:///instance/roma.db')
@@ -340,12 +743,14 @@ class BackupManager:
             # Cria backup do banco atual antes da restauração
             if os.path.exists(db_file):
                 backup_current = f"{db_file}.backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+                self._checkpoint_wal(db_file)
                 shutil.copy2(db_file, backup_current)
                 logger.info(f"Backup do banco atual criado: {backup_current}")
             
             # Extrai e restaura o banco
             zipf.extract('database/roma.db', 'temp_restore')
             shutil.move('temp_restore/database/roma.db', db_file)
+            self._remove_wal_files(db_file)
             
             # Remove diretório temporário
             shutil.rmtree('temp_restore')
@@ -408,7 +813,7 @@ class BackupManager:
         # Backups locais
         backup_dir = Path(self.backup_dir)
         if backup_dir.exists():
-            for backup_file in backup_dir.glob('backup_*.zip'):
+            for backup_file in self._backup_files(backup_dir):
                 backup_info = self._get_backup_info(backup_file)
                 backup_info['location'] = 'local'
                 backups.append(backup_info)
@@ -417,7 +822,7 @@ class BackupManager:
         if self.icloud_sync:
             icloud_path = Path(self.icloud_dir).expanduser()
             if icloud_path.exists():
-                for backup_file in icloud_path.glob('backup_*.zip'):
+                for backup_file in self._backup_files(icloud_path):
                     backup_info = self._get_backup_info(backup_file)
                     backup_info['location'] = 'icloud'
                     backups.append(backup_info)
@@ -440,11 +845,24 @@ class BackupManager:
                 'size_mb': round(stat.st_size / (1024 * 1024), 2)
             }
             
+            # Backup incremental: o espaço ocupado é o dos blocos novos
+            if backup_path.suffix == '.json':
+                manifest = self._load_manifest(backup_path)
+                manifest.pop('files', None)
+                manifest.pop('timestamp', None)
+                size = stat.st_size + manifest.get('bytes_written', 0)
+                backup_info.update(manifest)
+                backup_info['size'] = size
+                backup_info['size_mb'] = round(size / (1024 * 1024), 2)
+                backup_info['total_size_mb'] = round(manifest.get('bytes_total', 0) / (1024 * 1024), 2)
+                return backup_info
+            
             # Tenta ler metadados do backup
             try:
                 with zipfile.ZipFile(backup_path, 'r') as zipf:
                     metadata_content = zipf.read('metadata.json')
                     metadata = json.loads(metadata_content)
+                    metadata.pop('timestamp', None)
                     backup_info.update(metadata)
             except:
                 # Metadados não disponíveis
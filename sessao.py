@@ -0,0 +1,53 @@
+"""
+Utilitários de sessão do ERP ROMA
+
+Funções usadas pelos serviços mantidos por eventos de sessão (resumos diários,
+custos e composição explodida): divisão de ids em lotes para cláusulas IN e
+leitura dos valores anteriores às alterações pendentes de um objeto.
+"""
+
+from sqlalchemy import inspect, select
+
+# Tamanho máximo das listas usadas em cláusulas IN
+TAMANHO_LOTE = 500
+
+
+def em_lotes(ids, tamanho=TAMANHO_LOTE):
+    """Divide uma lista de ids (sem repetição e sem None) em lotes para cláusulas IN."""
+    ids = sorted(set(i for i in ids if i is not None))
+    for inicio in range(0, len(ids), tamanho):
+        yield ids[inicio:inicio + tamanho]
+
+
+def valores_originais(obj, *atributos):
+    """Valores dos atributos antes das alterações pendentes.
+
+    Após um commit os atributos expiram: um valor atribuído depois disso não
+    deixa o anterior no histórico, e o valor gravado é lido do banco.
+    """
+    estado = inspect(obj)
+    valores = {}
+    ler_do_banco = []
+    for atributo in atributos:
+        historico = estado.attrs[atributo].history
+        if historico.deleted:
+            valores[atributo] = historico.deleted[0]
+        elif historico.added and estado.has_identity:
+            ler_do_banco.append(atributo)
+        else:
+            valores[atributo] = getattr(obj, atributo)
+
+    if ler_do_banco:
+        mapper = estado.mapper
+        linha = estado.session.connection().execute(
+            select(*[mapper.get_property(atributo).columns[0] for atributo in ler_do_banco])
+            .where(*[coluna == valor for coluna, valor in zip(mapper.primary_key, estado.identity)])
+        ).one()
+        valores.update(zip(ler_do_banco, linha))
+
+    return tuple(valores[atributo] for atributo in atributos)
+
+
+def valor_original(obj, atributo):
+    """Retorna o valor do atributo antes das alterações pendentes."""
+    return valores_originais(obj, atributo)[0]
@@ -12,7 +12,10 @@ import random
 import string
 import logging
 from datetime import datetime, timedelta
+from decimal import Decimal
 from pathlib import Path
+from contextlib import contextmanager
+from sqlalchemy import event
 
 # Configuração de logging
 logging.basicConfig(
@@ -30,17 +33,20 @@ logger = logging.getLogger('tests')
 sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
 
 # Importa a aplicação Flask
+from config import Config
 from app import create_app, db
 from app.models.usuario import Usuario
 from app.models.cliente import Cliente
-from app.models.produto import Produto
-from app.models.material import Material
+from app.models.produto import Produto, ComposicaoProduto
+from app.models.material import Material, MovimentacaoEstoque
 from app.models.fornecedor import Fornecedor
 from app.models.producao import Producao, ItemProducao
 from app.models.financeiro import Movimentacao, NotaFiscal
 from app.utils.security import backup_manager, security_manager
+from app.services.busca_service import aplicar_busca
+from app.utils.autocompletar import autocompletar_materiais, autocompletar_produtos
 
-class TestConfig:
+class TestConfig(Config):
     """Configuração para testes."""
     TESTING = True
     DEBUG = False
@@ -53,6 +59,38 @@ class TestConfig:
     MAX_BACKUPS = 5
     BACKUP_INTERVAL = 24
     ICLOUD_SYNC = False
+    REPORT_FOLDER = 'test_relatorios'
+    REPORT_MAX_PENDING = 2
+
+# Benchmarks (TestPerformance) só rodam com RUN_BENCHMARKS=1: as cargas levam minutos
+RODAR_BENCHMARKS = os.environ.get('RUN_BENCHMARKS') == '1'
+
+# Orçamento de tempo das importações feitas por create_app(), em ms (ajustável no CI)
+ORCAMENTO_IMPORTACAO_MS = int(os.environ.get('IMPORT_TIME_BUDGET_MS', 1500))
+
+# Bibliotecas que só devem ser carregadas no primeiro uso
+BIBLIOTECAS_SOB_DEMANDA = ('numpy', 'pandas', 'matplotlib', 'seaborn', 'reportlab', 'openpyxl')
+
+class ContadorConsultas:
+    """Conta os comandos SQL executados no banco enquanto estiver ativo."""
+    
+    def __init__(self, engine):
+        self.engine = engine
+        self.consultas = []
+    
+    def _registrar(self, conn, cursor, statement, parameters, context, executemany):
+        self.consultas.append(statement)
+    
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._registrar)
+        return self
+    
+    def __exit__(self, *args):
+        event.remove(self.engine, 'before_cursor_execute', self._registrar)
+    
+    @property
+    def total(self):
+        return len(self.consultas)
 
 class ERPRomaTestCase(unittest.TestCase):
     """Classe base para testes do ERP ROMA."""
@@ -84,13 +122,7 @@ class ERPRomaTestCase(unittest.TestCase):
     
     def create_test_user(self):
         """Cria um usuário de teste."""
-        user = Usuario(
-            nome='Admin Teste',
-            email='admin@romaconfeccoes.com',
-            perfil='administrador',
-            ativo=True
-        )
-        user.set_password('admin123')
+        user = Usuario('Admin Teste', 'admin@romaconfeccoes.com', 'admin123', tipo='administrador')
         db.session.add(user)
         db.session.commit()
         logger.info("Usuário de teste criado")
@@ -99,13 +131,24 @@ class ERPRomaTestCase(unittest.TestCase):
         """Faz login no sistema."""
         return self.client.post('/auth/login', data={
             'email': email,
-            'password': password
+            'senha': password
         }, follow_redirects=True)
     
     def logout(self):
         """Faz logout do sistema."""
         return self.client.get('/auth/logout', follow_redirects=True)
     
+    @contextmanager
+    def assertMaxQueries(self, limite):
+        """Falha se o bloco executar mais de `limite` comandos SQL."""
+        with ContadorConsultas(db.engine) as contador:
+            yield contador
+        
+        self.assertLessEqual(
+            contador.total, limite,
+            f"{contador.total} comandos SQL executados (limite {limite}):\n" + '\n'.join(contador.consultas)
+        )
+    
     def random_string(self, length=10):
         """Gera uma string aleatória."""
         return ''.join(random.choices(string.ascii_letters + string.digits, k=length))
@@ -113,100 +156,90 @@ class ERPRomaTestCase(unittest.TestCase):
     def create_test_data(self):
         """Cria dados de teste para todos os módulos."""
         # Cria clientes
+        clientes = []
         for i in range(5):
             cliente = Cliente(
-                nome=f'Cliente Teste {i+1}',
-                tipo='juridica',
+                f'Cliente Teste {i+1}',
                 cnpj=f'12345678901{i:03}',
                 email=f'cliente{i+1}@teste.com',
-                telefone=f'1198765432{i}',
-                endereco=f'Rua Teste, {i+1}',
-                cidade='São Paulo',
-                estado='SP',
-                cep=f'0123456{i}',
-                ativo=True
+                telefone=f'1198765432{i}'
             )
+            cliente.cidade = 'São Paulo'
+            cliente.estado = 'SP'
             db.session.add(cliente)
+            clientes.append(cliente)
         
         # Cria fornecedores
+        fornecedores = []
         for i in range(3):
             fornecedor = Fornecedor(
-                nome=f'Fornecedor Teste {i+1}',
-                tipo='juridica',
+                f'Fornecedor Teste {i+1}',
                 cnpj=f'98765432101{i:03}',
                 email=f'fornecedor{i+1}@teste.com',
-                telefone=f'1187654321{i}',
-                endereco=f'Av. Teste, {i+1}',
-                cidade='São Paulo',
-                estado='SP',
-                cep=f'0654321{i}',
-                ativo=True
+                telefone=f'1187654321{i}'
             )
             db.session.add(fornecedor)
+            fornecedores.append(fornecedor)
+        
+        db.session.flush()
         
         # Cria materiais
         materiais = []
         for i in range(10):
-            material = Material(
-                nome=f'Material Teste {i+1}',
-                descricao=f'Descrição do material {i+1}',
-                unidade='un',
-                preco_unitario=10.0 + i,
-                estoque_atual=100,
-                estoque_minimo=20,
-                fornecedor_id=random.randint(1, 3),
-                ativo=True
-            )
+            material = Material(f'MAT-T{i+1:03}', f'Material Teste {i+1}', 'tecido', 'UN', 10.0 + i)
+            material.estoque_atual = 100
+            material.estoque_minimo = 20
+            material.fornecedor_id = fornecedores[i % len(fornecedores)].id
             db.session.add(material)
             materiais.append(material)
         
         # Cria produtos
         produtos = []
         for i in range(5):
-            produto = Produto(
-                nome=f'Produto Teste {i+1}',
-                descricao=f'Descrição do produto {i+1}',
-                preco_venda=50.0 + (i * 10),
-                estoque_atual=50,
-                estoque_minimo=10,
-                ncm='62092000',
-                origem=0,
-                ativo=True
-            )
+            produto = Produto(f'PRD-T{i+1:03}', f'Produto Teste {i+1}', 'Modelo', 0.00, 50.0 + (i * 10))
+            produto.estoque_atual = 50
+            produto.estoque_minimo = 10
+            produto.ncm = '62092000'
             db.session.add(produto)
             produtos.append(produto)
-            
-            # Adiciona materiais ao produto
+        
+        db.session.flush()
+        
+        # Adiciona materiais aos produtos
+        for i, produto in enumerate(produtos):
             for j in range(3):
-                material_id = random.randint(1, 10)
-                quantidade = random.randint(1, 5)
-                produto.adicionar_material(material_id, quantidade)
+                db.session.add(ComposicaoProduto(
+                    produto_id=produto.id,
+                    material_id=materiais[(i + j) % len(materiais)].id,
+                    quantidade=1 + j
+                ))
         
         # Cria produções
         for i in range(3):
             producao = Producao(
-                data=datetime.now() - timedelta(days=i),
-                cliente_id=random.randint(1, 5),
-                observacao=f'Produção teste {i+1}',
-                status='finalizada'
+                (datetime.now() - timedelta(days=i)).date(),
+                clientes[i % len(clientes)].id,
+                observacoes=f'Produção teste {i+1}'
             )
+            producao.status = 'finalizada'
             db.session.add(producao)
+            db.session.flush()
             
             # Adiciona itens à produção
             for j in range(2):
-                produto_id = random.randint(1, 5)
-                quantidade = random.randint(10, 50)
-                producao.adicionar_item(produto_id, quantidade)
+                item = ItemProducao(produtos[(i + j) % len(produtos)].id, 10 + j * 5, 50.00)
+                item.producao_id = producao.id
+                db.session.add(item)
         
         # Cria movimentações financeiras
         for i in range(10):
             tipo = 'receita' if i % 2 == 0 else 'despesa'
             movimentacao = Movimentacao(
-                data=datetime.now() - timedelta(days=i),
+                data=(datetime.now() - timedelta(days=i)).date(),
                 tipo=tipo,
                 categoria='Venda' if tipo == 'receita' else 'Compra',
                 descricao=f'Movimentação teste {i+1}',
-                valor=random.randint(100, 1000) + random.random(),
+                valor=100 + i * 10,
                 forma_pagamento='pix',
                 status='confirmado'
             )
@@ -217,9 +250,9 @@ class ERPRomaTestCase(unittest.TestCase):
             nota = NotaFiscal(
                 numero=f'NF-{i+1}',
                 serie='1',
-                data_emissao=datetime.now() - timedelta(days=i),
-                cliente_id=random.randint(1, 5),
-                valor_total=random.randint(500, 2000) + random.random(),
+                data_emissao=(datetime.now() - timedelta(days=i)).date(),
+                cliente_id=clientes[i].id,
+                valor_total=500 + i * 100,
                 status='emitida'
             )
             db.session.add(nota)
@@ -227,6 +260,55 @@ class ERPRomaTestCase(unittest.TestCase):
         db.session.commit()
         logger.info("Dados de teste criados com sucesso")
 
+    def create_composicao_data(self, total_produtos=5, total_materiais=10, materiais_por_produto=3, estoque=1000):
+        """Cria um catálogo de produtos com composição de materiais."""
+        cliente = Cliente('Cliente Composição')
+        db.session.add(cliente)
+
+        materiais = []
+        for i in range(total_materiais):
+            material = Material(f'MAT{i:05}', f'Material Composição {i+1}', 'tecido', 'M', 10.0 + i)
+            material.estoque_atual = estoque
+            material.estoque_minimo = 10
+            db.session.add(material)
+            materiais.append(material)
+
+        produtos = []
+        for i in range(total_produtos):
+            produto = Produto(f'PRD{i:05}', f'Produto Composição {i+1}', 'Modelo', 0.00, 50.00)
+            produto.estoque_atual = 0
+            db.session.add(produto)
+            produtos.append(produto)
+
+        db.session.flush()
+
+        for i, produto in enumerate(produtos):
+            for j in range(materiais_por_produto):
+                material = materiais[(i + j) % total_materiais]
+                db.session.add(ComposicaoProduto(
+                    produto_id=produto.id,
+                    material_id=material.id,
+                    quantidade=0.5 + j
+                ))
+
+        db.session.commit()
+        return cliente, produtos, materiais
+
+    def create_producao_com_itens(self, cliente, produtos, total_itens):
+        """Cria uma produção em andamento com itens distribuídos entre os produtos."""
+        producao = Producao(datetime.now().date(), cliente.id)
+        db.session.add(producao)
+        db.session.flush()
+
+        for i in range(total_itens):
+            produto = produtos[i % len(produtos)]
+            item = ItemProducao(produto.id, 1 + (i % 3), 50.00)
+            item.producao_id = producao.id
+            db.session.add(item)
+
+        db.session.commit()
+        return producao
+
 
 class TestUsuarios(ERPRomaTestCase):
     """Testes para o módulo de usuários."""
@@ -370,6 +452,69 @@ class TestClientes(ERPRomaTestCase):
         
         logger.info("Teste de edição de cliente concluído com sucesso")
 
+    def test_busca_textual_clientes(self):
+        """A busca ignora acentos, aceita prefixos e acompanha as alterações."""
+        roma = Cliente(nome='Roma Confecções Ltda', cnpj='11111111000111', email='contato@roma.com')
+        joao = Cliente(nome='Malharia São João', cnpj='22222222000122', email='sj@malharia.com')
+        db.session.add_all([roma, joao])
+        db.session.commit()
+
+        response = self.client.get('/clientes/?search=confeccoes')
+        self.assertIn('Roma Confecções'.encode(), response.data)
+        self.assertNotIn('Malharia São João'.encode(), response.data)
+
+        response = self.client.get('/clientes/api/buscar?term=sao jo')
+        self.assertEqual([c['id'] for c in response.get_json()], [joao.id])
+
+        # O índice acompanha a edição e a exclusão do cadastro
+        roma.nome = 'Roma Modas'
+        db.session.commit()
+        self.assertEqual(aplicar_busca(Cliente.query, Cliente, 'confec').count(), 0)
+        self.assertEqual(aplicar_busca(Cliente.query, Cliente, 'moda').one().id, roma.id)
+
+        db.session.delete(joao)
+        db.session.commit()
+        self.assertEqual(aplicar_busca(Cliente.query, Cliente, 'malharia').count(), 0)
+
+    def test_busca_textual_limite_com_filtros(self):
+        """Os filtros da rota valem antes do limite: inativos não ocupam as vagas."""
+        inativos = [Cliente(nome=f'Roma Inativo {i}', cnpj=f'{i:014d}', email=f'inativo{i}@roma.com') for i in range(15)]
+        for cliente in inativos:
+            cliente.ativo = False
+        db.session.add_all(inativos)
+        ativos = [
+            Cliente(nome=f'Roma Ativo {i}', cnpj=f'{100 + i:014d}', email=f'ativo{i}@roma.com')
+            for i in range(3)
+        ]
+        db.session.add_all(ativos)
+        db.session.commit()
+
+        encontrados = aplicar_busca(Cliente.query.filter(Cliente.ativo == True), Cliente, 'roma', limite=10).all()
+        self.assertEqual(sorted(c.id for c in encontrados), sorted(c.id for c in ativos))
+
+        response = self.client.get('/clientes/api/buscar?term=roma')
+        self.assertEqual(sorted(c['id'] for c in response.get_json()), sorted(c.id for c in ativos))
+
+    def test_busca_textual_banco_sem_indice(self):
+        """Em bancos anteriores ao FTS a busca usa LIKE até os índices serem criados."""
+        from app.services import busca_service
+
+        cliente = Cliente(nome='Roma Confecções Ltda', cnpj='11111111000111', email='contato@roma.com')
+        db.session.add(cliente)
+        db.session.commit()
+
+        with db.engine.begin() as conn:
+            for sufixo in ('ai', 'ad', 'au'):
+                conn.exec_driver_sql(f'DROP TRIGGER clientes_fts_{sufixo}')
+            conn.exec_driver_sql('DROP TABLE clientes_fts')
+        busca_service._indices_existentes.clear()
+
+        self.assertEqual(aplicar_busca(Cliente.query, Cliente, 'Confec').one().id, cliente.id)
+
+        self.assertEqual(busca_service.garantir_indices_busca(), len(busca_service.COLUNAS_BUSCA))
+        self.assertEqual(busca_service.garantir_indices_busca(), 0)
+        self.assertEqual(aplicar_busca(Cliente.query, Cliente, 'confeccoes').one().id, cliente.id)
+
 
 class TestProdutos(ERPRomaTestCase):
     """Testes para o módulo de produtos."""
@@ -435,6 +580,158 @@ class TestProdutos(ERPRomaTestCase):
         
         logger.info("Teste de adição de material ao produto concluído com sucesso")
 
+    def test_autocompletar_produtos(self):
+        """O autocompletar busca por prefixo e é invalidado no commit."""
+        camisa = Produto(codigo='CAM-001', nome='Camisa Social Algodão')
+        calca = Produto(codigo='CAL-002', nome='Calça Jeans')
+        db.session.add_all([camisa, calca])
+        db.session.commit()
+
+        response = self.client.get('/produtos/api/buscar?term=cam alg')
+        self.assertEqual([p['id'] for p in response.get_json()], [camisa.id])
+        self.assertIn('max-age=', response.headers['Cache-Control'])
+
+        # Acentos e código completo
+        self.assertEqual([i for i, _ in autocompletar_produtos.buscar('calca')], [calca.id])
+        self.assertEqual([i for i, _ in autocompletar_produtos.buscar('cal-002')], [calca.id])
+
+        # Resultados na ordem do nome, limitados
+        self.assertEqual([i for i, _ in autocompletar_produtos.buscar('ca')], [calca.id, camisa.id])
+        self.assertEqual([i for i, _ in autocompletar_produtos.buscar('ca', limite=1)], [calca.id])
+
+        # Renomear ou inativar invalida o índice
+        camisa.nome = 'Camiseta Básica'
+        calca.ativo = False
+        db.session.commit()
+        self.assertEqual(autocompletar_produtos.buscar('camisa social'), [])
+        self.assertEqual([i for i, _ in autocompletar_produtos.buscar('basi')], [camisa.id])
+        self.assertEqual(autocompletar_produtos.buscar('calca'), [])
+
+    def test_custo_produto_pela_composicao(self):
+        """O custo do produto acompanha a composição e o custo dos materiais."""
+        from app.models.produto import HistoricoCustoProduto
+
+        tecido = Material('TEC-001', 'Tecido Algodão', 'tecido', 'M', 10.00)
+        linha = Material('LIN-001', 'Linha Poliéster', 'aviamento', 'UN', 2.00)
+        produto = Produto('CAM-CUSTO', 'Camisa Custo')
+        db.session.add_all([tecido, linha, produto])
+        db.session.flush()
+
+        db.session.add_all([
+            ComposicaoProduto(produto_id=produto.id, material_id=tecido.id, quantidade=1.5),
+            ComposicaoProduto(produto_id=produto.id, material_id=linha.id, quantidade=3)
+        ])
+        db.session.commit()
+        self.assertEqual(produto.custo_unitario, Decimal('21.00'))
+
+        # Aumento de preço do fornecedor: só o custo do material é alterado
+        tecido.custo_unitario = 12.00
+        db.session.commit()
+        self.assertEqual(produto.custo_unitario, Decimal('24.00'))
+
+        historico = produto.historico_custos.order_by(HistoricoCustoProduto.id).all()
+        self.assertEqual(
+            [(h.custo_anterior, h.custo_novo, h.origem) for h in historico],
+            [(Decimal('0.00'), Decimal('21.00'), 'composicao'), (Decimal('21.00'), Decimal('24.00'), 'material')]
+        )
+
+        # Remoção pela rota da composição
+        composicao = ComposicaoProduto.query.filter_by(produto_id=produto.id, material_id=linha.id).first()
+        self.client.post(f'/produtos/{produto.id}/composicao/{composicao.id}/remover')
+        db.session.expire_all()
+        self.assertEqual(produto.custo_unitario, Decimal('18.00'))
+
+    def test_composicao_multinivel(self):
+        """Componentes intermediários são expandidos em materiais e ciclos são recusados."""
+        from app.services.bom_service import CicloComposicao, vetor_materiais
+
+        couro = Material('COU-001', 'Couro Sintético', 'tecido', 'M', 40.00)
+        linha = Material('LIN-002', 'Linha Náilon', 'aviamento', 'UN', 1.00)
+        couro.estoque_atual = 100
+        linha.estoque_atual = 100
+        alca = Produto('ALC-001', 'Alça Acolchoada')
+        mochila = Produto('MOC-001', 'Mochila Escolar')
+        mala = Produto('MAL-001', 'Mala de Viagem')
+        db.session.add_all([couro, linha, alca, mochila, mala])
+        db.session.flush()
+
+        db.session.add_all([
+            ComposicaoProduto(produto_id=alca.id, material_id=couro.id, quantidade=0.5),
+            ComposicaoProduto(produto_id=alca.id, material_id=linha.id, quantidade=2),
+            ComposicaoProduto(produto_id=mochila.id, componente_id=alca.id, quantidade=2),
+            ComposicaoProduto(produto_id=mochila.id, material_id=couro.id, quantidade=1),
+            ComposicaoProduto(produto_id=mala.id, componente_id=mochila.id, quantidade=1)
+        ])
+        db.session.commit()
+
+        self.assertEqual(vetor_materiais(mala.id), {couro.id: Decimal('2'), linha.id: Decimal('4')})
+        self.assertEqual(mala.custo_unitario, Decimal('84.00'))
+
+        # Alterar a alça refaz o vetor da mochila e da mala
+        ComposicaoProduto.query.filter_by(produto_id=alca.id, material_id=couro.id).first().quantidade = 1
+        db.session.commit()
+        self.assertEqual(vetor_materiais(mala.id), {couro.id: Decimal('3'), linha.id: Decimal('4')})
+        self.assertEqual(mala.custo_unitario, Decimal('124.00'))
+
+        # A alça não pode conter a mala, que já contém a alça
+        db.session.add(ComposicaoProduto(produto_id=alca.id, componente_id=mala.id, quantidade=1))
+        with self.assertRaises(CicloComposicao):
+            db.session.commit()
+        db.session.rollback()
+        self.assertEqual(alca.composicoes.count(), 2)
+
+        # A finalização da produção consome os materiais expandidos
+        cliente = Cliente('Cliente Multinível')
+        db.session.add(cliente)
+        db.session.flush()
+        producao = Producao(datetime.now().date(), cliente.id)
+        producao.itens.append(ItemProducao(mala.id, 2, 500.00))
+        db.session.add(producao)
+        producao.finalizar()
+        db.session.commit()
+
+        self.assertEqual(couro.estoque_atual, Decimal('94'))
+        self.assertEqual(linha.estoque_atual, Decimal('92'))
+
+    def test_composicao_banco_anterior(self):
+        """Bancos anteriores aos componentes têm a tabela atualizada e os vetores refeitos."""
+        from app.services.bom_service import garantir_composicao_explodida, vetor_materiais
+
+        tecido = Material('TEC-002', 'Tecido Brim', 'tecido', 'M', 10.00)
+        alca = Produto('ALC-002', 'Alça Simples')
+        bolsa = Produto('BOL-001', 'Bolsa Brim')
+        db.session.add_all([tecido, alca, bolsa])
+        db.session.commit()
+
+        # Esquema antigo: material obrigatório, sem componente e sem vetores
+        with db.engine.begin() as conn:
+            conn.exec_driver_sql('DROP TABLE composicao_produtos')
+            conn.exec_driver_sql(
+                'CREATE TABLE composicao_produtos (id INTEGER PRIMARY KEY, '
+                'produto_id INTEGER NOT NULL REFERENCES produtos (id), '
+                'material_id INTEGER NOT NULL REFERENCES materiais (id), '
+                'quantidade NUMERIC(10, 3) NOT NULL, unidade VARCHAR(10))'
+            )
+            conn.exec_driver_sql('CREATE INDEX idx_composicao_produtos_produto ON composicao_produtos (produto_id)')
+            conn.exec_driver_sql(
+                f'INSERT INTO composicao_produtos (produto_id, material_id, quantidade, unidade) '
+                f"VALUES ({bolsa.id}, {tecido.id}, 2, 'M')"
+            )
+            conn.exec_driver_sql('DELETE FROM composicao_explodida')
+
+        self.assertEqual(garantir_composicao_explodida(), 1)
+        self.assertEqual(garantir_composicao_explodida(), 0)
+        db.session.expire_all()
+        self.assertEqual(vetor_materiais(bolsa.id), {tecido.id: Decimal('2')})
+        self.assertEqual(bolsa.custo_unitario, Decimal('20.00'))
+
+        # A tabela recriada aceita componentes
+        db.session.add(ComposicaoProduto(produto_id=alca.id, material_id=tecido.id, quantidade=0.5))
+        db.session.add(ComposicaoProduto(produto_id=bolsa.id, componente_id=alca.id, quantidade=2))
+        db.session.commit()
+        self.assertEqual(vetor_materiais(bolsa.id), {tecido.id: Decimal('3')})
+        self.assertEqual(bolsa.custo_unitario, Decimal('30.00'))
+
 
 class TestProducao(ERPRomaTestCase):
     """Testes para o módulo de produção."""
@@ -489,9 +786,136 @@ class TestProducao(ERPRomaTestCase):
         self.assertEqual(len(producao.itens), 1)
         self.assertEqual(producao.itens[0].produto_id, 1)
         self.assertEqual(producao.itens[0].quantidade, 10)
-        
+
         logger.info("Teste de adição de item à produção concluído com sucesso")
 
+    def test_finalizar_producoes_em_lote(self):
+        """Testa a finalização em lote de várias produções."""
+        from app.services.producao_service import finalizar_em_lote
+        from app.utils.cache_dados import cache_dados
+
+        cliente, produtos, materiais = self.create_composicao_data(
+            total_produtos=2, total_materiais=3, materiais_por_produto=2, estoque=100
+        )
+        producoes = [self.create_producao_com_itens(cliente, produtos, 4) for _ in range(3)]
+
+        def total_movimentacoes():
+            return cache_dados.obter('teste_movimentacoes', MovimentacaoEstoque.query.count, [MovimentacaoEstoque])
+
+        self.assertEqual(total_movimentacoes(), 0)
+
+        finalizadas = finalizar_em_lote([p.id for p in producoes])
+        self.assertEqual(sorted(finalizadas), sorted(p.id for p in producoes))
+
+        # As movimentações gravadas em lote invalidam o cache
+        self.assertEqual(total_movimentacoes(), 3 * 3)
+
+        # Produções e estoques atualizados
+        for producao in producoes:
+            self.assertEqual(Producao.query.get(producao.id).status, 'finalizada')
+
+        # Cada produção tem 4 itens (quantidades 1, 2, 3, 1) alternando os 2 produtos
+        self.assertEqual(Produto.query.get(produtos[0].id).estoque_atual, 3 * (1 + 3))
+        self.assertEqual(Produto.query.get(produtos[1].id).estoque_atual, 3 * (2 + 1))
+
+        # Uma movimentação por produção e material consumido
+        self.assertEqual(MovimentacaoEstoque.query.count(), 3 * 3)
+
+        # Reprocessar não altera nada
+        self.assertEqual(finalizar_em_lote([p.id for p in producoes]), [])
+        self.assertEqual(MovimentacaoEstoque.query.count(), 3 * 3)
+
+        logger.info("Teste de finalização em lote concluído com sucesso")
+
+    def test_perfis_carga_sem_n_mais_1(self):
+        """Testa que os perfis de carregamento evitam consultas N+1."""
+        from app.forms import ProducaoForm
+        from app.models.fornecedor import Pedido
+        from app.models.perfis_carga import perfil_carga
+
+        cliente, produtos, materiais = self.create_composicao_data(total_produtos=5)
+        for _ in range(20):
+            self.create_producao_com_itens(cliente, produtos, 3)
+        for i in range(20):
+            db.session.add(Pedido(f'PED{i:04}', cliente.id))
+        db.session.commit()
+        db.session.expunge_all()
+
+        # Detalhe: produções, itens e produtos em 2 consultas, para qualquer quantidade de linhas
+        with self.assertMaxQueries(2):
+            producoes = Producao.query.options(*perfil_carga('producao_detalhe')).all()
+            dados = [p.to_dict() for p in producoes]
+
+        self.assertEqual(len(dados), 20)
+        self.assertEqual(dados[0]['cliente'], 'Cliente Composição')
+        self.assertEqual(len(dados[0]['itens']), 3)
+
+        # Opções do formulário: clientes e pedidos com o nome do cliente
+        with self.app.test_request_context():
+            with self.assertMaxQueries(2):
+                form = ProducaoForm()
+
+        self.assertEqual(len(form.pedido_id.choices), 21)
+
+        logger.info("Teste de perfis de carregamento concluído com sucesso")
+
+    def test_importar_fechamento_mensal(self):
+        """Testa a importação da planilha FechamentoMensal."""
+        import tempfile
+        from app.services.importacao_service import importar_fechamento_mensal
+        from app.utils.cache_dados import cache_dados
+
+        cliente = Cliente(nome='Dona Chica')
+        produto = Produto(codigo='1006', nome='Necessaire Siena', modelo='Necessaire')
+        db.session.add_all([cliente, produto])
+        db.session.commit()
+
+        def total_itens():
+            return cache_dados.obter('teste_itens_producao', ItemProducao.query.count, [ItemProducao])
+
+        self.assertEqual(total_itens(), 0)
+
+        linhas = [
+            'Data;Empresa;Modelo;Produto;Quantidade;Valor unitário;Valor total;mes_ano',
+            '02/09/2024;DONA CHICA;Necessaire;Necessaire Siena;10;R$ 39,00;R$ 390,00;09/2024',
+            '02/09/2024;Dona Chica;;1006;5;39,00;195,00;09/2024',
+            '03/09/2024;Dona Chica;Necessaire;Necessaire Siena;2;;78,00;09/2024',
+            '03/09/2024;Criaturas;Pocket;Pocket;3;12,00;36,00;09/2024',
+            '31/02/2024;Dona Chica;Necessaire;Necessaire Siena;1;39,00;39,00;02/2024',
+            '04/09/2024;Dona Chica;Necessaire;Necessaire Siena;1,5;39,00;58,50;09/2024',
+            '04/09/2024;Dona Chica;Necessaire;Necessaire Siena;2;39,00;100,00;09/2024',
+        ]
+
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', encoding='utf-8', delete=False) as arquivo:
+            arquivo.write('\n'.join(linhas))
+
+        try:
+            # A simulação valida sem gravar
+            resultado = importar_fechamento_mensal(arquivo.name, simular=True)
+            self.assertEqual(resultado['importadas'], 3)
+            self.assertEqual(Producao.query.count(), 0)
+
+            resultado = importar_fechamento_mensal(arquivo.name, tamanho_lote=2)
+        finally:
+            os.remove(arquivo.name)
+
+        # Cliente desconhecido, data inválida, quantidade fracionada e total divergente
+        self.assertEqual(resultado['linhas'], 7)
+        self.assertEqual(resultado['importadas'], 3)
+        self.assertEqual([r['linha'] for r in resultado['rejeitadas']], [5, 6, 7, 8])
+
+        # Linhas da mesma data e empresa formam uma única produção finalizada
+        self.assertEqual(resultado['producoes'], 2)
+        producoes = Producao.query.order_by(Producao.data).all()
+        self.assertEqual([p.status for p in producoes], ['finalizada', 'finalizada'])
+        self.assertEqual(producoes[0].calcular_total(), Decimal('585.00'))
+        self.assertEqual(producoes[1].itens[0].valor_unitario, Decimal('39.00'))
+
+        # Os itens gravados em lote invalidam o cache
+        self.assertEqual(total_itens(), 3)
+
+        logger.info("Teste de importação do fechamento mensal concluído com sucesso")
+
 
 class TestFinanceiro(ERPRomaTestCase):
     """Testes para o módulo financeiro."""
@@ -545,6 +969,134 @@ class TestFinanceiro(ERPRomaTestCase):
         logger.info("Teste de criação de nota fiscal concluído com sucesso")
 
 
+class TestResumos(ERPRomaTestCase):
+    """Testes para os resumos diários (tabelas agregadas)."""
+
+    def _nova_movimentacao(self, tipo, categoria, valor, dias_atras=0):
+        movimentacao = Movimentacao(
+            data=(datetime.now() - timedelta(days=dias_atras)).date(),
+            tipo=tipo,
+            categoria=categoria,
+            descricao=f'Movimentação {tipo} {categoria}',
+            valor=valor,
+            forma_pagamento='pix',
+            status='confirmado'
+        )
+        db.session.add(movimentacao)
+        return movimentacao
+
+    def test_resumo_financeiro_incremental(self):
+        """Testa a manutenção incremental do resumo financeiro."""
+        from app.services.resumo_service import totais_financeiros
+
+        receita = self._nova_movimentacao('receita', 'vendas', 100)
+        self._nova_movimentacao('receita', 'vendas', 50)
+        despesa = self._nova_movimentacao('despesa', 'aluguel', 30, dias_atras=1)
+        db.session.commit()
+
+        totais = totais_financeiros()
+        self.assertEqual(totais['receita'], 150)
+        self.assertEqual(totais['despesa'], 30)
+
+        # Alteração de valor e de tipo
+        receita.valor = 120
+        despesa.tipo = 'receita'
+        db.session.commit()
+
+        totais = totais_financeiros()
+        self.assertEqual(totais['receita'], 200)
+        self.assertNotIn('despesa', totais)
+
+        # Exclusão
+        db.session.delete(receita)
+        db.session.commit()
+        self.assertEqual(totais_financeiros()['receita'], 80)
+
+        logger.info("Teste de resumo financeiro incremental concluído com sucesso")
+
+    def test_resumo_producao_incremental_e_reconstrucao(self):
+        """Testa o resumo de produção incremental contra a reconstrução completa."""
+        from app.models.resumo import ResumoProducaoDiario
+        from app.services.resumo_service import totais_producao, reconstruir_resumos
+
+        cliente, produtos, materiais = self.create_composicao_data(total_produtos=3)
+        producoes = [self.create_producao_com_itens(cliente, produtos, 5) for _ in range(2)]
+
+        # Produções em andamento não contam como finalizadas
+        self.assertEqual(totais_producao(status='finalizada'), (0, 0))
+        self.assertEqual(totais_producao()[0], 2)
+
+        producoes[0].finalizar()
+        db.session.commit()
+
+        total, valor = totais_producao(status='finalizada')
+        self.assertEqual(total, 1)
+        self.assertEqual(valor, Decimal(str(producoes[0].calcular_total())))
+
+        def linhas_resumo():
+            return sorted(
+                (r.data, r.cliente_id, r.produto_id or 0, r.status, r.producoes, r.quantidade, float(r.valor))
+                for r in ResumoProducaoDiario.query.all()
+            )
+
+        incremental = linhas_resumo()
+        reconstruir_resumos()
+        self.assertEqual(linhas_resumo(), incremental)
+
+        logger.info("Teste de resumo de produção concluído com sucesso")
+
+    def test_api_dados_grafico_financeiro(self):
+        """Testa a API JSON dos gráficos: colunas, dias sem movimento, redução e gzip."""
+        import gzip
+        import json
+
+        self._nova_movimentacao('receita', 'vendas', 100)
+        self._nova_movimentacao('despesa', 'aluguel', 30, dias_atras=3)
+        db.session.commit()
+
+        hoje = datetime.now().date()
+        url = f'/dashboard/api/v1/graficos/financeiro?data_inicio={hoje - timedelta(days=9)}&data_fim={hoje}'
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        dados = response.get_json()
+        dia_hoje = (hoje - datetime(1970, 1, 1).date()).days
+        self.assertEqual(dados['versao'], 1)
+        self.assertEqual(dados['colunas']['dia'], list(range(dia_hoje - 9, dia_hoje + 1)))
+        self.assertEqual(dados['colunas']['receitas'], [0.0] * 9 + [100.0])
+        self.assertEqual(dados['colunas']['despesas'], [0.0] * 6 + [30.0, 0.0, 0.0, 0.0])
+
+        # Dez dias em cinco pontos: cada ponto soma dois dias
+        dados = self.client.get(url + '&max_pontos=5').get_json()
+        self.assertEqual(dados['passo'], 2)
+        self.assertEqual(dados['colunas']['dia'], list(range(dia_hoje - 9, dia_hoje + 1, 2)))
+        self.assertEqual(dados['colunas']['despesas'], [0.0, 0.0, 0.0, 30.0, 0.0])
+
+        # Compactado com gzip e revalidado pelo ETag
+        response = self.client.get(url, headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(json.loads(gzip.decompress(response.data))['colunas']['receitas'][-1], 100.0)
+        response = self.client.get(url, headers={'If-None-Match': response.headers['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+        logger.info("Teste da API de dados de gráficos concluído com sucesso")
+
+    def test_graficos_png_revalidados_por_etag(self):
+        """Testa os gráficos PNG do dashboard e a revalidação pelo ETag."""
+        self.create_test_data()
+
+        for rota in ('producao-mensal', 'financeiro-mensal', 'produtos-mais-produzidos', 'clientes-mais-atendidos'):
+            url = f'/dashboard/grafico/{rota}'
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            self.assertEqual(response.mimetype, 'image/png')
+
+            response = self.client.get(url, headers={'If-None-Match': response.headers['ETag']})
+            self.assertEqual(response.status_code, 304, url)
+
+        logger.info("Teste de revalidação dos gráficos concluído com sucesso")
+
+
 class TestBackupSeguranca(ERPRomaTestCase):
     """Testes para o módulo de backup e segurança."""
     
@@ -566,6 +1118,81 @@ class TestBackupSeguranca(ERPRomaTestCase):
         
         logger.info("Teste de criação de backup concluído com sucesso")
     
+    def test_backup_online_nao_bloqueia_escrita(self):
+        """O backup copia o banco em lotes e as escritas continuam durante a cópia."""
+        import sqlite3
+        import shutil
+        import tempfile
+        import threading
+        import zipfile
+        from app.utils.security import BackupManager
+
+        pasta = tempfile.mkdtemp()
+        db_file = os.path.join(pasta, 'roma.db')
+
+        conn = sqlite3.connect(db_file)
+        conn.execute('CREATE TABLE itens (id INTEGER PRIMARY KEY, descricao TEXT)')
+        conn.executemany('INSERT INTO itens (descricao) VALUES (?)', (('x' * 200,) for _ in range(20000)))
+        conn.commit()
+        conn.close()
+
+        gerenciador = BackupManager()
+        gerenciador.app = self.app
+        gerenciador.backup_dir = os.path.join(pasta, 'backups')
+        gerenciador.max_backups = 5
+        gerenciador.icloud_sync = False
+        gerenciador.pages_per_step = 64
+        gerenciador.step_sleep = 0.01
+        Path(gerenciador.backup_dir).mkdir()
+        self.app.config['DATABASE_URL'] = f'sqlite:///{db_file}'
+
+        # Escritor concorrente: mede a maior espera por um commit
+        parar = threading.Event()
+        esperas = []
+
+        def escrever():
+            escritor = sqlite3.connect(db_file, timeout=30)
+            while not parar.is_set():
+                inicio = time.time()
+                escritor.execute("INSERT INTO itens (descricao) VALUES ('concorrente')")
+                escritor.commit()
+                esperas.append(time.time() - inicio)
+                time.sleep(0.005)
+            escritor.close()
+
+        thread = threading.Thread(target=escrever)
+        thread.start()
+        try:
+            backup_path = gerenciador.create_backup('full')
+        finally:
+            parar.set()
+            thread.join()
+
+        try:
+            self.assertIsNotNone(backup_path)
+            self.assertEqual(list(Path('.').glob('temp_backup_*.db')), [])
+
+            status = gerenciador.backup_status()
+            self.assertFalse(status['running'])
+            self.assertEqual(status['phase'], 'done')
+            self.assertEqual(status['percent'], 100.0)
+            self.assertGreater(status['pages_total'], 64)
+
+            # O banco passou para WAL e as escritas não esperaram a cópia inteira
+            journal = sqlite3.connect(db_file).execute('PRAGMA journal_mode').fetchone()[0]
+            self.assertEqual(journal, 'wal')
+            self.assertTrue(esperas)
+            self.assertLess(max(esperas), 0.5)
+
+            # A cópia no ZIP é um banco válido
+            with zipfile.ZipFile(backup_path) as zipf:
+                zipf.extract('database/roma.db', pasta)
+            copia = sqlite3.connect(os.path.join(pasta, 'database', 'roma.db'))
+            self.assertGreaterEqual(copia.execute('SELECT COUNT(*) FROM itens').fetchone()[0], 20000)
+            copia.close()
+        finally:
+            shutil.rmtree(pasta, ignore_errors=True)
+
     def test_validacao_senha(self):
         """Testa validação de força de senha."""
         # Senha fraca
@@ -709,7 +1336,439 @@ class TestIntegracao(ERPRomaTestCase):
         
         logger.info("Teste de fluxo completo concluído com sucesso")
 
+    def test_relatorio_pdf_em_segundo_plano(self):
+        """Testa a geração de relatório PDF no pool de processos."""
+        from app.services.relatorio_jobs import fila_relatorios, FilaRelatoriosCheia
+
+        linhas = [
+            (f'Cliente {i}', f'{i:014}', '11999999999', f'cliente{i}@teste.com', 'São Paulo', 'SP', i % 2 == 0)
+            for i in range(200)
+        ]
+
+        job_id = fila_relatorios.enviar('clientes', (linhas,), 'relatorio_clientes.pdf', usuario_id=1)
+        self.assertEqual(fila_relatorios.aguardar(job_id, 30), 'pronto')
+
+        with open(fila_relatorios.caminho(job_id), 'rb') as f:
+            self.assertEqual(f.read(4), b'%PDF')
+
+        # O status e o download respeitam o dono do job
+        response = self.client.get(f'/dashboard/relatorio/job/{job_id}')
+        self.assertEqual(response.get_json()['status'], 'pronto')
+        response = self.client.get(f'/dashboard/relatorio/job/{job_id}/download')
+        self.assertEqual(response.mimetype, 'application/pdf')
+        self.assertEqual(self.client.get('/dashboard/relatorio/job/inexistente').status_code, 404)
+
+        # A quantidade de jobs simultâneos é limitada
+        with self.assertRaises(FilaRelatoriosCheia):
+            for _ in range(fila_relatorios.max_pendentes + 1):
+                fila_relatorios.enviar('clientes', (linhas,), 'relatorio_clientes.pdf', usuario_id=1)
+
+        # Arquivos vencidos são removidos
+        fila_relatorios.ttl = -1
+        self.assertGreater(fila_relatorios.limpar_antigos(), 0)
+        self.assertIsNone(fila_relatorios.info(job_id))
+
+        logger.info("Teste de relatório em segundo plano concluído com sucesso")
+
+    def test_relatorio_pdf_produtos(self):
+        """Testa o PDF de produtos montado a partir das colunas da consulta."""
+        self.create_test_data()
+
+        response = self.client.post('/dashboard/relatorio/produtos', data={
+            'categoria': 'todas', 'ativo': 'sim', 'formato': 'pdf'
+        }, follow_redirects=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'application/pdf')
+        self.assertEqual(response.data[:4], b'%PDF')
+
+        logger.info("Teste de relatório PDF de produtos concluído com sucesso")
+
+    def test_monitoramento_sql(self):
+        """Testa o registro de comandos SQL por requisição."""
+        from app.utils.monitoramento import monitor_sql, normalizar_sql
 
+        self.assertEqual(
+            normalizar_sql("SELECT * FROM clientes WHERE id IN (1, 2, 3) AND nome = 'Ana'"),
+            'SELECT * FROM clientes WHERE id IN (?...) AND nome = ?'
+        )
+
+        monitor_sql.limpar()
+        monitor_sql.limite_lenta_ms = 0
+
+        self.create_test_data()
+        self.client.get('/clientes/')
+
+        resumo = monitor_sql.resumo()
+        self.assertEqual(resumo['requisicoes'], 1)
+        self.assertGreater(resumo['recentes'][0]['consultas'], 0)
+        self.assertGreater(len(resumo['lentas']), 0)
+
+        # A própria consulta das estatísticas é registrada ao final da requisição
+        response = self.client.get('/admin/api/performance')
+        self.assertEqual(response.get_json()['requisicoes'], 1)
+        self.assertIn('taxa_acerto', response.get_json()['cache'])
+        self.assertEqual(monitor_sql.resumo()['requisicoes'], 2)
+
+        # Sem amostragem nada é registrado
+        monitor_sql.amostragem = 0
+        self.client.get('/clientes/')
+        self.assertEqual(monitor_sql.resumo()['requisicoes'], 2)
+
+        logger.info("Teste de monitoramento de SQL concluído com sucesso")
+
+    def test_paginacao_keyset(self):
+        """Percorre as movimentações de estoque por cursor, nos dois sentidos."""
+        from app.utils.paginacao import paginar_keyset, decodificar_cursor
+
+        material = Material(codigo='MAT-PAG', nome='Material Paginação', categoria='tecido')
+        db.session.add(material)
+        db.session.commit()
+
+        # Várias movimentações com a mesma data: o id desempata a chave
+        inicio = datetime(2024, 1, 1, 8, 0)
+        db.session.add_all([
+            MovimentacaoEstoque(material_id=material.id, tipo='entrada', quantidade=1,
+                                data_movimentacao=inicio + timedelta(hours=i // 3))
+            for i in range(47)
+        ])
+        db.session.commit()
+
+        esperado = [m.id for m in MovimentacaoEstoque.query.order_by(
+            MovimentacaoEstoque.data_movimentacao.desc(), MovimentacaoEstoque.id.desc()
+        )]
+        colunas = (MovimentacaoEstoque.data_movimentacao, MovimentacaoEstoque.id)
+
+        # Para a frente, contando o total só na primeira página
+        paginas = [paginar_keyset(MovimentacaoEstoque.query, colunas, per_page=10, estimar_total=True)]
+        while paginas[-1].has_next:
+            paginas.append(paginar_keyset(MovimentacaoEstoque.query, colunas, paginas[-1].next_cursor, per_page=10))
+
+        self.assertEqual([m.id for p in paginas for m in p.items], esperado)
+        self.assertEqual(len(paginas), 5)
+        self.assertFalse(paginas[0].has_prev)
+        self.assertEqual(paginas[-1].total, 47)
+        self.assertEqual(decodificar_cursor(paginas[2].next_cursor)[2], 47)
+
+        # Para trás, a partir da última página
+        pagina = paginas[-1]
+        anteriores = []
+        while pagina.has_prev:
+            pagina = paginar_keyset(MovimentacaoEstoque.query, colunas, pagina.prev_cursor, per_page=10)
+            anteriores.append([m.id for m in pagina.items])
+        self.assertEqual(anteriores, [[m.id for m in p.items] for p in reversed(paginas[:-1])])
+
+        # Rota com cursor inválido volta à primeira página
+        response = self.client.get('/estoque/movimentacoes?cursor=invalido')
+        self.assertEqual(response.status_code, 200)
+
+    def test_exportacao_relatorios(self):
+        """Testa a exportação CSV em streaming e o PDF gerado em memória."""
+        from app.services.relatorios_pdf import gerar_relatorio_pdf
+        from app.utils.exportacao import buffer_relatorio
+
+        db.session.bulk_insert_mappings(Cliente, [
+            {'nome': f'Cliente Exportação {i:05}', 'cnpj': f'{i:014}', 'cidade': 'São Paulo', 'estado': 'SP', 'ativo': True}
+            for i in range(5000)
+        ])
+        db.session.commit()
+
+        response = self.client.post('/dashboard/relatorio/clientes', data={'ativo': 'sim', 'formato': 'csv'})
+        self.assertTrue(response.is_streamed)
+        self.assertEqual(response.mimetype, 'text/csv')
+
+        linhas = response.get_data().decode('utf-8-sig').splitlines()
+        self.assertEqual(len(linhas), 5001)
+        self.assertTrue(linhas[1].startswith('Cliente Exportação 00000;'))
+
+        # PDFs pequenos ficam inteiramente em memória
+        buffer = buffer_relatorio()
+        gerar_relatorio_pdf('clientes', buffer, [('Cliente', '', '', '', 'São Paulo', 'SP', True)])
+        self.assertFalse(buffer._rolled)
+        buffer.seek(0)
+        self.assertEqual(buffer.read(4), b'%PDF')
+        buffer.close()
+
+        logger.info("Teste de exportação de relatórios concluído com sucesso")
+
+    def test_exportacao_movimentacoes_estoque(self):
+        """Testa a exportação CSV e XLSX do relatório de movimentações pelo período."""
+        from io import BytesIO
+        from openpyxl import load_workbook
+
+        material = Material(codigo='MAT-EXP', nome='Material Exportação', categoria='tecido')
+        db.session.add(material)
+        db.session.commit()
+
+        # O último dia do período entra inteiro; os dias vizinhos ficam de fora
+        for data_movimentacao in (datetime(2024, 2, 29, 23, 0), datetime(2024, 3, 1, 0, 0),
+                                  datetime(2024, 3, 10, 23, 30), datetime(2024, 3, 11, 0, 0)):
+            db.session.add(MovimentacaoEstoque(material_id=material.id, tipo='entrada', quantidade=1,
+                                               data_movimentacao=data_movimentacao))
+        db.session.commit()
+
+        dados = {'tipo_relatorio': 'movimentacoes', 'data_inicio': '2024-03-01', 'data_fim': '2024-03-10'}
+
+        response = self.client.post('/dashboard/relatorio/estoque', data=dict(dados, formato='csv'))
+        self.assertEqual(response.mimetype, 'text/csv')
+        linhas = response.get_data().decode('utf-8-sig').splitlines()
+        self.assertEqual(len(linhas), 3)
+        self.assertTrue(linhas[1].startswith('10/03/2024 23:30;'))
+        self.assertTrue(linhas[2].startswith('01/03/2024 00:00;'))
+
+        response = self.client.post('/dashboard/relatorio/estoque', data=dict(dados, formato='xlsx'))
+        planilha = load_workbook(BytesIO(response.get_data()), read_only=True).active
+        linhas = list(planilha.iter_rows(values_only=True))
+        self.assertEqual(len(linhas), 3)
+        self.assertEqual(linhas[1][1:3], ('MAT-EXP', 'Material Exportação'))
+
+        logger.info("Teste de exportação de movimentações de estoque concluído com sucesso")
+
+    def test_relatorio_pdf_movimentacoes_estoque_sem_n_mais_1(self):
+        """Testa o PDF de movimentações com os materiais carregados na mesma consulta."""
+        materiais = [Material(codigo=f'MAT-PDF{i}', nome=f'Material PDF {i}', categoria='tecido') for i in range(5)]
+        db.session.add_all(materiais)
+        db.session.flush()
+        db.session.add_all([
+            MovimentacaoEstoque(material_id=materiais[i % 5].id, tipo='entrada', quantidade=1,
+                                data_movimentacao=datetime(2024, 3, 1 + i % 10, 12, 0))
+            for i in range(40)
+        ])
+        db.session.commit()
+        db.session.expire_all()
+
+        # Usuário da sessão e movimentações com materiais, para qualquer quantidade de linhas
+        with self.assertMaxQueries(2):
+            response = self.client.post('/dashboard/relatorio/estoque', data={
+                'tipo_relatorio': 'movimentacoes', 'data_inicio': '2024-03-01', 'data_fim': '2024-03-31',
+                'formato': 'pdf'
+            }, follow_redirects=True)
+
+        self.assertEqual(response.mimetype, 'application/pdf')
+        self.assertEqual(response.data[:4], b'%PDF')
+
+        logger.info("Teste do relatório PDF de movimentações concluído com sucesso")
+
+    def test_estoque_concorrente_sem_perda(self):
+        """Movimentações simultâneas do mesmo material não perdem atualizações."""
+        import shutil
+        import tempfile
+        import threading
+        from app.utils.estoque_atomico import EstoqueInsuficiente
+
+        pasta = tempfile.mkdtemp()
+
+        class ConfigArquivo(TestConfig):
+            SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(pasta, 'roma.db')}"
+            SQLITE_PRAGMAS = {'journal_mode': 'WAL', 'busy_timeout': 30000}
+
+        app = create_app(ConfigArquivo)
+        with app.app_context():
+            db.create_all()
+            material = Material('MAT-CONC', 'Tecido Concorrência', 'tecido')
+            material.estoque_atual = 10
+            db.session.add(material)
+            db.session.commit()
+            material_id = material.id
+
+        # Threads pares dão entrada de 1; ímpares tentam saídas de 1,5 exigindo saldo
+        aceitas, recusadas, erros = [], [], []
+
+        def movimentar(indice):
+            saida = indice % 2 == 1
+            with app.app_context():
+                try:
+                    for _ in range(25):
+                        material = db.session.get(Material, material_id)
+                        try:
+                            material.atualizar_estoque(
+                                Decimal('1.5') if saida else 1,
+                                'saida' if saida else 'entrada',
+                                f'Thread {indice}', exigir_saldo=True
+                            )
+                            db.session.commit()
+                            if saida:
+                                aceitas.append(indice)
+                        except EstoqueInsuficiente:
+                            db.session.rollback()
+                            recusadas.append(indice)
+                except Exception as e:
+                    erros.append(repr(e))
+
+        threads = [threading.Thread(target=movimentar, args=(i,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        try:
+            self.assertEqual(erros, [])
+            with app.app_context():
+                saldo = db.session.get(Material, material_id).estoque_atual
+                movimentacoes = MovimentacaoEstoque.query.filter_by(material_id=material_id).all()
+
+                # Saldo final = inicial + entradas - saídas aceitas, nunca negativo
+                self.assertEqual(saldo, Decimal('10') + 100 - Decimal('1.5') * len(aceitas))
+                self.assertGreaterEqual(saldo, 0)
+                self.assertEqual(len(movimentacoes), 100 + len(aceitas))
+                self.assertEqual(len(aceitas) + len(recusadas), 100)
+
+                # Cada movimentação registra o saldo antes e depois do próprio UPDATE
+                for mov in movimentacoes:
+                    sinal = -1 if mov.tipo == 'saida' else 1
+                    self.assertEqual(mov.quantidade_atual - mov.quantidade_anterior, sinal * mov.quantidade)
+                db.engine.dispose()
+        finally:
+            shutil.rmtree(pasta, ignore_errors=True)
+
+        logger.info(f"Teste de estoque concorrente concluído: {len(aceitas)} saídas aceitas, {len(recusadas)} recusadas")
+
+    def test_previsao_ruptura(self):
+        """Prevê a ruptura pelo consumo diário e compara com o prazo do fornecedor."""
+        from sqlalchemy import insert
+        from app.services.previsao_service import previsao_ruptura
+
+        fornecedor = Fornecedor('Tecelagem Prazo Longo')
+        fornecedor.prazo_entrega = 30
+        db.session.add(fornecedor)
+        db.session.flush()
+
+        # Mesmo estoque e consumo: só o prazo de entrega muda o status
+        tecido = Material('PRV-TEC', 'Tecido Importado', 'tecido')
+        tecido.fornecedor_id = fornecedor.id
+        linha = Material('PRV-LIN', 'Linha Nacional', 'aviamento')
+        parado = Material('PRV-PAR', 'Material Parado', 'aviamento')
+        for material in (tecido, linha):
+            material.estoque_atual = 40
+        db.session.add_all([tecido, linha, parado])
+        db.session.commit()
+
+        hoje = datetime.now().date()
+        db.session.execute(insert(MovimentacaoEstoque), [
+            {
+                'material_id': material.id, 'tipo': 'saida', 'quantidade': 2,
+                'data_movimentacao': datetime.combine(hoje - timedelta(days=dia), datetime.min.time()) + timedelta(hours=10)
+            }
+            for dia in range(1, 61) for material in (tecido, linha)
+        ])
+        db.session.commit()
+
+        response = self.client.get('/estoque/api/previsao-ruptura')
+        self.assertEqual(response.status_code, 200)
+        previsoes = {item['codigo']: item for item in response.get_json()}
+
+        self.assertEqual(previsoes['PRV-TEC']['consumo_previsto'], 2.0)
+        self.assertEqual(previsoes['PRV-TEC']['dias_cobertura'], 20)
+        self.assertEqual(previsoes['PRV-TEC']['data_ruptura'], (hoje + timedelta(days=20)).isoformat())
+        self.assertEqual(previsoes['PRV-TEC']['status'], 'critico')
+        self.assertEqual(previsoes['PRV-LIN']['status'], 'ok')
+        self.assertIsNone(previsoes['PRV-PAR']['dias_cobertura'])
+
+        # Uma saída nova entra na previsão sem esperar o TTL
+        linha.atualizar_estoque(36, 'saida')
+        db.session.commit()
+        alertas = {item['codigo']: item['status'] for item in previsao_ruptura.alertas()}
+        self.assertEqual(alertas, {'PRV-TEC': 'critico', 'PRV-LIN': 'critico'})
+
+        logger.info("Teste de previsão de ruptura concluído com sucesso")
+
+    def test_sugestoes_compra(self):
+        """Sugere compras pelo ponto de pedido e lote econômico e gera rascunhos por fornecedor."""
+        from sqlalchemy import insert
+        from app.models.fornecedor import PedidoCompra, ItemPedidoCompra
+
+        fornecedor = Fornecedor('Tecelagem Compras')
+        fornecedor.prazo_entrega = 10
+        db.session.add(fornecedor)
+        db.session.flush()
+
+        baixo = Material('CMP-BX', 'Tecido Estoque Baixo', 'tecido', custo_unitario=10)
+        folgado = Material('CMP-OK', 'Tecido Estoque Folgado', 'tecido', custo_unitario=10)
+        baixo.estoque_atual, folgado.estoque_atual = 15, 100
+        for material in (baixo, folgado):
+            material.fornecedor_id = fornecedor.id
+        db.session.add_all([baixo, folgado])
+        db.session.commit()
+
+        hoje = datetime.now().date()
+        db.session.execute(insert(MovimentacaoEstoque), [
+            {
+                'material_id': material.id, 'tipo': 'saida', 'quantidade': 2,
+                'data_movimentacao': datetime.combine(hoje - timedelta(days=dia), datetime.min.time()) + timedelta(hours=10)
+            }
+            for dia in range(1, 91) for material in (baixo, folgado)
+        ])
+        db.session.commit()
+
+        # Consumo constante de 2/dia: ponto de pedido 20; lote econômico √(2 × 730 × 50 / 2,5) ≈ 170,9
+        grupos = self.client.get('/fornecedores/api/sugestoes-compra').get_json()
+        self.assertEqual(len(grupos), 1)
+        item, = grupos[0]['materiais']
+        self.assertEqual(item['codigo'], 'CMP-BX')
+        self.assertEqual(item['ponto_pedido'], 20.0)
+        self.assertAlmostEqual(item['lote_economico'], 170.88, places=2)
+        self.assertEqual(item['quantidade_sugerida'], 176.0)
+
+        response = self.client.post('/fornecedores/sugestoes-compra/gerar')
+        self.assertEqual(response.status_code, 302)
+        pedido = PedidoCompra.query.filter_by(status='rascunho').one()
+        self.assertEqual(pedido.fornecedor_id, fornecedor.id)
+        self.assertEqual(pedido.data_prevista, hoje + timedelta(days=10))
+        self.assertEqual(pedido.itens.one().quantidade, Decimal('176'))
+        self.assertEqual(self.client.get('/fornecedores/sugestoes-compra').status_code, 200)
+
+        # O pedido enviado passa a contar como estoque a receber
+        pedido.status = 'enviado'
+        db.session.commit()
+        self.assertEqual(self.client.get('/fornecedores/api/sugestoes-compra').get_json(), [])
+        self.assertEqual(ItemPedidoCompra.query.count(), 1)
+
+        logger.info("Teste de sugestões de compra concluído com sucesso")
+
+    def test_cache_dados(self):
+        """Reaproveita as contagens entre as telas e invalida no commit, também entre processos."""
+        import tempfile
+        from app.utils.cache_dados import cache_dados, CacheDados
+        from app.services.indicadores_service import total_clientes_ativos, categorias_produtos
+
+        self.assertEqual(total_clientes_ativos(), 0)
+        hits = cache_dados.estatisticas()['hits']
+        with ContadorConsultas(db.engine) as contador:
+            self.assertEqual(total_clientes_ativos(), 0)
+        self.assertEqual(contador.total, 0)
+        self.assertEqual(cache_dados.estatisticas()['hits'], hits + 1)
+
+        # O commit de um cliente invalida a contagem, mas não as categorias de produtos
+        categorias_produtos()
+        db.session.add(Cliente('Cliente Cache'))
+        self.assertEqual(total_clientes_ativos(), 1)  # Transação atual: sem cache
+        db.session.commit()
+        misses = cache_dados.estatisticas()['misses']
+        self.assertEqual(total_clientes_ativos(), 1)
+        categorias_produtos()
+        self.assertEqual(cache_dados.estatisticas()['misses'], misses + 1)
+
+        # Dois processos com o mesmo arquivo: a invalidação de um vale para o outro
+        with tempfile.TemporaryDirectory() as pasta:
+            self.app.config['DATA_CACHE_SHARED_PATH'] = os.path.join(pasta, 'cache.db')
+            worker_a, worker_b = CacheDados(self.app), CacheDados(self.app)
+            calculos = []
+
+            def calcular():
+                calculos.append(1)
+                return len(calculos)
+
+            self.assertEqual(worker_a.obter('contagem', calcular, ['clientes']), 1)
+            self.assertEqual(worker_b.obter('contagem', calcular, ['clientes']), 1)
+            self.assertEqual(worker_b.estatisticas()['hits_compartilhado'], 1)
+
+            worker_a.invalidar(Cliente)
+            self.assertEqual(worker_b.obter('contagem', calcular, ['clientes']), 2)
+            self.assertEqual(worker_a.obter('contagem', calcular, ['clientes']), 2)
+
+        logger.info("Teste de cache de dados concluído com sucesso")
+
+
+@unittest.skipUnless(RODAR_BENCHMARKS, 'benchmarks desativados (defina RUN_BENCHMARKS=1)')
 class TestPerformance(ERPRomaTestCase):
     """Testes de performance do sistema."""
     
@@ -777,6 +1836,656 @@ class TestPerformance(ERPRomaTestCase):
         
         logger.info(f"Teste de carga concluído em {execution_time:.2f} segundos")
 
+    def _finalizar_item_a_item(self, producao):
+        """Finalização antiga, item a item, mantida como referência para o benchmark."""
+        producao.status = 'finalizada'
+        producao.data_finalizacao = datetime.utcnow()
+
+        for item in producao.itens:
+            produto = item.produto
+            produto.atualizar_estoque(item.quantidade, 'adicionar')
+
+            for composicao in produto.composicoes:
+                material = composicao.material
+                quantidade_usada = composicao.quantidade * item.quantidade
+                material.atualizar_estoque(quantidade_usada, 'saida', f'Produção #{producao.id}')
+
+    def test_benchmark_finalizacao_producao(self):
+        """Compara a finalização item a item com a finalização em conjunto."""
+        from app.services.producao_service import finalizar_em_lote
+
+        # Pedido de 300 itens de produtos com 12 materiais cada
+        cliente, produtos, materiais = self.create_composicao_data(
+            total_produtos=20, total_materiais=60, materiais_por_produto=12, estoque=1000000
+        )
+        producao_antiga = self.create_producao_com_itens(cliente, produtos, 300)
+        producao_nova = self.create_producao_com_itens(cliente, produtos, 300)
+
+        estoque_inicial = {m.id: m.estoque_atual for m in Material.query.all()}
+
+        start_time = time.time()
+        self._finalizar_item_a_item(producao_antiga)
+        db.session.commit()
+        tempo_antigo = time.time() - start_time
+
+        consumo_antigo = {
+            m.id: estoque_inicial[m.id] - m.estoque_atual for m in Material.query.all()
+        }
+
+        start_time = time.time()
+        finalizar_em_lote([producao_nova.id])
+        tempo_novo = time.time() - start_time
+
+        db.session.expire_all()
+        consumo_total = {
+            m.id: estoque_inicial[m.id] - m.estoque_atual for m in Material.query.all()
+        }
+
+        # As duas finalizações consomem a mesma quantidade de material
+        for material_id, consumo in consumo_antigo.items():
+            self.assertEqual(consumo_total[material_id], 2 * consumo)
+
+        self.assertLess(tempo_novo, tempo_antigo)
+
+        logger.info(
+            f"Finalização de 300 itens: item a item {tempo_antigo:.3f}s, "
+            f"em conjunto {tempo_novo:.3f}s ({tempo_antigo / max(tempo_novo, 1e-6):.1f}x)"
+        )
+
+    def test_benchmark_importacao_fechamento(self):
+        """Importa 50 mil linhas da planilha FechamentoMensal em menos de um minuto."""
+        import tempfile
+        from app.services.importacao_service import importar_fechamento_mensal
+
+        total_linhas = 50000
+        clientes = [Cliente(nome=f'Empresa {i}') for i in range(20)]
+        produtos = [Produto(codigo=f'{1000 + i}', nome=f'Produto {i}', modelo=f'Modelo {i % 5}') for i in range(50)]
+        db.session.add_all(clientes + produtos)
+        db.session.commit()
+
+        inicio = datetime(2020, 1, 1)
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', encoding='utf-8', delete=False) as arquivo:
+            arquivo.write('Data;Empresa;Modelo;Produto;Quantidade;Valor unitário;Valor total;mes_ano\n')
+            for i in range(total_linhas):
+                data = inicio + timedelta(days=i // 40)
+                quantidade = 1 + i % 30
+                arquivo.write(
+                    f'{data.strftime("%d/%m/%Y")};Empresa {i % 20};Modelo {i % 5};Produto {i % 50};'
+                    f'{quantidade};12.50;{quantidade * 12.5:.2f};{data.strftime("%m/%Y")}\n'
+                )
+
+        try:
+            resultado = importar_fechamento_mensal(arquivo.name)
+        finally:
+            os.remove(arquivo.name)
+
+        linhas_por_minuto = resultado['linhas'] / max(resultado['tempo'], 1e-6) * 60
+
+        self.assertEqual(resultado['importadas'], total_linhas)
+        self.assertEqual(ItemProducao.query.count(), total_linhas)
+        self.assertGreaterEqual(linhas_por_minuto, 50000)
+
+        logger.info(
+            f"Importação de {total_linhas} linhas em {resultado['tempo']:.1f}s "
+            f"({linhas_por_minuto:,.0f} linhas/minuto)"
+        )
+
+    def test_benchmark_memoria_graficos(self):
+        """Renderiza 10 mil gráficos e verifica que a memória não cresce sem limite."""
+        import psutil
+        from app.utils.graficos import CacheGraficos, chave_grafico, renderizar_png
+
+        total_graficos = 10000
+        cache = CacheGraficos(max_itens=64)
+        processo = psutil.Process()
+
+        def desenhar(fig, i):
+            ax = fig.add_subplot(111)
+            ax.bar(range(12), [(i + mes) % 7 for mes in range(12)], color='#6366F1')
+            ax.set_title(f'Gráfico {i}')
+
+        # Aquece o matplotlib antes da medição
+        for i in range(100):
+            renderizar_png(lambda fig: desenhar(fig, i))
+        memoria_inicial = processo.memory_info().rss
+
+        start_time = time.time()
+        for i in range(total_graficos):
+            chave = chave_grafico('benchmark', {'i': i}, 'v1')
+            cache.set(chave, renderizar_png(lambda fig: desenhar(fig, i)))
+        execution_time = time.time() - start_time
+
+        crescimento = (processo.memory_info().rss - memoria_inicial) / (1024 * 1024)
+
+        # O cache respeita o limite e o crescimento de memória é limitado
+        self.assertEqual(len(cache), 64)
+        self.assertLess(crescimento, 50, f"Memória cresceu {crescimento:.1f} MB")
+
+        # Uma renderização repetida é servida pelo cache
+        self.assertIsNotNone(cache.get(chave_grafico('benchmark', {'i': total_graficos - 1}, 'v1')))
+        self.assertIsNone(cache.get(chave_grafico('benchmark', {'i': 0}, 'v1')))
+
+        logger.info(
+            f"{total_graficos} gráficos renderizados em {execution_time:.1f}s, "
+            f"crescimento de memória {crescimento:.1f} MB"
+        )
+
+    def test_benchmark_backup_incremental(self):
+        """Backups incrementais gravam apenas os blocos alterados e restauram o banco."""
+        import sqlite3
+        import shutil
+        import tempfile
+        from app.utils.security import BackupManager
+
+        pasta = tempfile.mkdtemp()
+        db_file = os.path.join(pasta, 'roma.db')
+
+        conn = sqlite3.connect(db_file)
+        conn.execute('CREATE TABLE itens (id INTEGER PRIMARY KEY, descricao TEXT)')
+        conn.executemany(
+            'INSERT INTO itens (descricao) VALUES (?)',
+            ((os.urandom(100).hex(),) for _ in range(50000))
+        )
+        conn.commit()
+
+        gerenciador = BackupManager()
+        gerenciador.app = self.app
+        gerenciador.backup_dir = os.path.join(pasta, 'backups')
+        gerenciador.max_backups = 5
+        gerenciador.icloud_sync = False
+        Path(gerenciador.backup_dir).mkdir()
+        self.app.config['DATABASE_URL'] = f'sqlite:///{db_file}'
+
+        try:
+            primeiro = gerenciador.create_backup('incremental')
+
+            # Pequena alteração entre os backups
+            conn.execute("UPDATE itens SET descricao = 'alterado' WHERE id = 25000")
+            conn.commit()
+            time.sleep(1)  # nomes de backup têm resolução de segundos
+
+            start_time = time.time()
+            segundo = gerenciador.create_backup('incremental')
+            execution_time = time.time() - start_time
+
+            info_primeiro = gerenciador._load_manifest(primeiro)
+            info_segundo = gerenciador._load_manifest(segundo)
+
+            # O segundo backup grava uma fração dos bytes do primeiro
+            self.assertGreater(info_segundo['chunks_new'], 0)
+            self.assertLess(info_segundo['bytes_written'], info_primeiro['bytes_written'] / 10)
+            self.assertEqual(len(gerenciador.list_backups()), 2)
+
+            # Restaura o primeiro backup e confere o conteúdo
+            conn.close()
+            self.assertTrue(gerenciador.restore_backup(primeiro, restore_database=True))
+            conn = sqlite3.connect(db_file)
+            descricao = conn.execute('SELECT descricao FROM itens WHERE id = 25000').fetchone()[0]
+            self.assertNotEqual(descricao, 'alterado')
+
+            # A limpeza remove os blocos que só o backup excluído usava
+            gerenciador.max_backups = 1
+            gerenciador._cleanup_old_backups()
+            self.assertTrue(gerenciador._verify_backup_integrity(segundo))
+        finally:
+            conn.close()
+            shutil.rmtree(pasta, ignore_errors=True)
+
+        logger.info(
+            f"Backup incremental em {execution_time:.2f}s: "
+            f"{info_primeiro['bytes_written']} bytes no primeiro, {info_segundo['bytes_written']} no segundo"
+        )
+
+    def test_consultor_planos_consultas(self):
+        """As consultas quentes usam os índices declarados nos modelos."""
+        from app.services.plano_consultas import analisar_consultas, analisar_plano
+
+        # O classificador reconhece varreduras e ordenações temporárias
+        self.assertEqual(
+            analisar_plano(['SCAN producoes', 'USE TEMP B-TREE FOR ORDER BY']),
+            (['producoes'], ['ORDER BY'])
+        )
+        self.assertEqual(analisar_plano(['SCAN clientes USING INDEX idx_clientes_nome']), ([], []))
+
+        resultados = analisar_consultas([
+            'producao.index',
+            'producao.view.itens',
+            'produtos.view.composicao',
+            'estoque.view.movimentacoes',
+            'clientes.index'
+        ])
+
+        for resultado in resultados:
+            self.assertIsNone(resultado['erro'], resultado['nome'])
+            self.assertEqual(resultado['varreduras'], [], f"{resultado['nome']}: {resultado['plano']}")
+            self.assertEqual(resultado['ordenacoes'], [], f"{resultado['nome']}: {resultado['plano']}")
+
+        # A busca parte do índice FTS e ordena apenas os registros encontrados
+        busca, = analisar_consultas(['clientes.busca'])
+        self.assertIsNone(busca['erro'])
+        self.assertEqual(busca['varreduras'], [], busca['plano'])
+        self.assertTrue(any('clientes_fts VIRTUAL TABLE' in linha for linha in busca['plano']), busca['plano'])
+        self.assertNotIn('rank', busca['sql'])
+
+    def test_benchmark_busca_textual(self):
+        """Compara a busca FTS5 com o LIKE em 100 mil clientes."""
+        from sqlalchemy import insert
+
+        total = 100000
+        nomes = ['Roma', 'Confecções', 'Malharia', 'São João', 'Têxtil', 'Moda', 'Tecidos', 'Estamparia']
+        db.session.execute(insert(Cliente), [
+            {
+                'nome': f'{nomes[i % 8]} {nomes[(i // 8) % 8]} {i}',
+                'cnpj': f'{i:014d}',
+                'email': f'cliente{i}@empresa.com',
+                'ativo': True
+            }
+            for i in range(total)
+        ])
+        db.session.commit()
+
+        termos = ['confec', 'malha', 'joao', 'textil 99', 'estamp', 'moda roma']
+
+        # Mesma consulta da listagem (/clientes/?search=): primeira página e total
+        start_time = time.time()
+        for termo in termos:
+            Cliente.query.filter(
+                Cliente.nome.contains(termo) | Cliente.cnpj.contains(termo) | Cliente.email.contains(termo)
+            ).order_by(Cliente.nome).paginate(page=1, per_page=20, error_out=False)
+        tempo_like = time.time() - start_time
+
+        start_time = time.time()
+        for termo in termos:
+            resultado = aplicar_busca(Cliente.query, Cliente, termo).order_by(Cliente.nome).paginate(
+                page=1, per_page=20, error_out=False
+            )
+        tempo_fts = time.time() - start_time
+
+        # Acentos e prefixos: "joao" encontra "São João"
+        self.assertTrue(resultado.items)
+        esperados = sum(1 for i in range(total) if 3 in (i % 8, (i // 8) % 8))
+        self.assertEqual(aplicar_busca(Cliente.query, Cliente, 'sao joao').count(), esperados)
+        self.assertLess(tempo_fts, tempo_like)
+
+        logger.info(
+            f"Busca em {total} clientes ({len(termos)} termos): LIKE {tempo_like:.3f}s, "
+            f"FTS5 {tempo_fts:.3f}s ({tempo_like / max(tempo_fts, 1e-6):.1f}x)"
+        )
+
+    def test_benchmark_autocompletar(self):
+        """O autocompletar de materiais responde em menos de 5 ms no p99 com 100 mil itens."""
+        from sqlalchemy import insert
+
+        total = 100000
+        nomes = ['Tecido', 'Linha', 'Botão', 'Zíper', 'Etiqueta', 'Elástico', 'Malha', 'Viés']
+        cores = ['Azul', 'Preto', 'Branco', 'Vermelho', 'Verde', 'Cinza', 'Amarelo', 'Rosa']
+        db.session.execute(insert(Material), [
+            {
+                'codigo': f'MAT-{i:06d}',
+                'nome': f'{nomes[i % 8]} {cores[(i // 8) % 8]} {i}',
+                'ativo': True
+            }
+            for i in range(total)
+        ])
+        db.session.commit()
+        autocompletar_materiais.invalidar()
+
+        start_time = time.time()
+        autocompletar_materiais.buscar('')
+        tempo_construcao = time.time() - start_time
+
+        termos = ['t', 'te', 'tec', 'tecido az', 'bot', 'zip pre', 'mat-0001', 'elast verm 9', 'x']
+        tempos = []
+        for i in range(2000):
+            inicio = time.perf_counter()
+            autocompletar_materiais.buscar(termos[i % len(termos)])
+            tempos.append(time.perf_counter() - inicio)
+
+        tempos.sort()
+        p99 = tempos[int(len(tempos) * 0.99)] * 1000
+
+        self.assertEqual(len(autocompletar_materiais), total)
+        self.assertLess(p99, 5)
+
+        # A rota completa também responde com cache HTTP
+        response = self.client.get('/estoque/api/buscar?term=tecido azul')
+        self.assertEqual(len(response.get_json()), 10)
+        self.assertIn('max-age=', response.headers['Cache-Control'])
+
+        logger.info(
+            f"Autocompletar com {total} materiais: índice montado em {tempo_construcao:.2f}s, "
+            f"p99 da busca {p99:.3f} ms"
+        )
+
+    def test_benchmark_perfil_sqlite(self):
+        """Compara leituras e escritas concorrentes com e sem o perfil SQLITE_PRAGMAS."""
+        import shutil
+        import tempfile
+        import threading
+        from sqlalchemy import create_engine, text
+        from sqlalchemy.exc import OperationalError
+        from config import ProductionConfig
+        from app.utils.perfil_sqlite import registrar_pragmas
+
+        def medir(pragmas, duracao=3.0, escritores=2, leitores=6):
+            pasta = tempfile.mkdtemp()
+            engine = create_engine(
+                f"sqlite:///{os.path.join(pasta, 'benchmark.db')}",
+                pool_size=escritores + leitores, max_overflow=0
+            )
+            if pragmas:
+                registrar_pragmas(engine, pragmas)
+
+            with engine.begin() as conn:
+                conn.execute(text('CREATE TABLE itens (id INTEGER PRIMARY KEY, valor REAL, criado REAL)'))
+                conn.execute(
+                    text('INSERT INTO itens (valor, criado) VALUES (:valor, 0)'),
+                    [{'valor': i} for i in range(5000)]
+                )
+                journal = conn.execute(text('PRAGMA journal_mode')).scalar()
+
+            contadores = {'leituras': 0, 'escritas': 0, 'erros': 0}
+            lock = threading.Lock()
+            fim = time.time() + duracao
+
+            def somar(chave):
+                with lock:
+                    contadores[chave] += 1
+
+            def escrever():
+                while time.time() < fim:
+                    try:
+                        with engine.begin() as conn:
+                            conn.execute(
+                                text('INSERT INTO itens (valor, criado) VALUES (:valor, :criado)'),
+                                {'valor': random.random(), 'criado': time.time()}
+                            )
+                        somar('escritas')
+                    except OperationalError:
+                        somar('erros')
+
+            def ler():
+                while time.time() < fim:
+                    try:
+                        with engine.connect() as conn:
+                            conn.execute(text('SELECT COUNT(*), SUM(valor) FROM itens')).one()
+                        somar('leituras')
+                    except OperationalError:
+                        somar('erros')
+
+            threads = [threading.Thread(target=escrever) for _ in range(escritores)]
+            threads += [threading.Thread(target=ler) for _ in range(leitores)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            engine.dispose()
+            shutil.rmtree(pasta, ignore_errors=True)
+            return journal, contadores
+
+        journal_padrao, padrao = medir(None)
+        journal_perfil, perfil = medir(ProductionConfig.SQLITE_PRAGMAS)
+
+        self.assertEqual(journal_padrao, 'delete')
+        self.assertEqual(journal_perfil, 'wal')
+        self.assertEqual(perfil['erros'], 0)
+        self.assertGreater(
+            perfil['leituras'] + perfil['escritas'],
+            padrao['leituras'] + padrao['escritas']
+        )
+
+        logger.info(
+            f"SQLite padrão: {padrao['leituras']} leituras, {padrao['escritas']} escritas, "
+            f"{padrao['erros']} erros; perfil de produção: {perfil['leituras']} leituras, "
+            f"{perfil['escritas']} escritas, {perfil['erros']} erros (3s, 2 escritores, 6 leitores)"
+        )
+
+
+    def test_benchmark_mrp(self):
+        """Calcula as necessidades de materiais de 5 mil pedidos em aberto."""
+        from sqlalchemy import insert, select, func
+        from app.models.fornecedor import Pedido, ItemPedido
+        from app.services.mrp_service import calcular_necessidades
+        from app.services.bom_service import reconstruir_composicao_explodida
+
+        total_fornecedores, total_materiais, total_produtos, total_pedidos = 10, 300, 2000, 5000
+
+        cliente = Cliente('Cliente MRP')
+        db.session.add(cliente)
+        db.session.flush()
+
+        db.session.execute(insert(Fornecedor), [
+            {'id': i + 1, 'nome': f'Fornecedor MRP {i}', 'prazo_entrega': 5 + i} for i in range(total_fornecedores)
+        ])
+        db.session.execute(insert(Material), [
+            {
+                'id': i + 1, 'codigo': f'MRP-M{i:04}', 'nome': f'Material MRP {i}', 'categoria': 'tecido',
+                'estoque_atual': 50 * (i % 4), 'custo_unitario': 2 + i % 7,
+                'fornecedor_id': (i % total_fornecedores) + 1 if i % 50 else None
+            }
+            for i in range(total_materiais)
+        ])
+        db.session.execute(insert(Produto), [
+            {'id': i + 1, 'codigo': f'MRP-P{i:05}', 'nome': f'Produto MRP {i}'} for i in range(total_produtos)
+        ])
+        db.session.execute(insert(ComposicaoProduto), [
+            {'produto_id': p + 1, 'material_id': (p * 7 + j * 13) % total_materiais + 1, 'quantidade': 0.25 * (j + 1)}
+            for p in range(total_produtos) for j in range(3)
+        ])
+        status = ['pendente', 'em_producao', 'finalizado', 'cancelado']
+        db.session.execute(insert(Pedido), [
+            {'id': i + 1, 'numero': f'MRP{i:05}', 'cliente_id': cliente.id, 'status': status[i % 4]}
+            for i in range(total_pedidos)
+        ])
+        db.session.execute(insert(ItemPedido), [
+            {'pedido_id': i + 1, 'produto_id': (i * 3 + k) % total_produtos + 1, 'quantidade': 1 + k, 'valor_unitario': 10}
+            for i in range(total_pedidos) for k in range(3)
+        ])
+        db.session.commit()
+        # As inserções em lote não passam pelo flush
+        reconstruir_composicao_explodida()
+
+        start_time = time.time()
+        necessidades = calcular_necessidades()
+        tempo = time.time() - start_time
+
+        # Referência calculada inteiramente em SQL
+        esperado = dict(db.session.execute(
+            select(ComposicaoProduto.material_id, func.sum(ComposicaoProduto.quantidade * ItemPedido.quantidade))
+            .join(ItemPedido, ItemPedido.produto_id == ComposicaoProduto.produto_id)
+            .join(Pedido, Pedido.id == ItemPedido.pedido_id)
+            .where(Pedido.status.in_(['pendente', 'em_producao']))
+            .group_by(ComposicaoProduto.material_id)
+        ).all())
+
+        self.assertEqual(necessidades['pedidos'], total_pedidos // 2)
+        self.assertEqual(len(necessidades['materiais']), len(esperado))
+        for item in necessidades['materiais']:
+            self.assertAlmostEqual(item['necessidade_bruta'], float(esperado[item['material_id']]), places=3)
+            self.assertAlmostEqual(item['necessidade_liquida'], max(item['necessidade_bruta'] - item['estoque_atual'], 0), places=3)
+
+        # Só materiais a comprar entram no agrupamento por fornecedor, inclusive os sem fornecedor
+        agrupados = sum(len(f['materiais']) for f in necessidades['fornecedores'])
+        self.assertEqual(agrupados, sum(1 for m in necessidades['materiais'] if m['necessidade_liquida'] > 0))
+        self.assertIn(None, [f['fornecedor_id'] for f in necessidades['fornecedores']])
+        self.assertLess(tempo, 1.0)
+
+        response = self.client.get('/estoque/api/necessidades')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['valor_compra'], necessidades['valor_compra'])
+
+        logger.info(f"MRP de {total_pedidos // 2} pedidos em aberto calculado em {tempo * 1000:.1f} ms")
+
+
+    def test_benchmark_recalculo_custos(self):
+        """Recalcula o custo de 10 mil produtos e propaga o aumento de um material."""
+        from sqlalchemy import insert
+        from app.models.produto import HistoricoCustoProduto
+        from app.services.custo_service import recalcular_todos_custos
+        from app.services.bom_service import reconstruir_composicao_explodida
+
+        total_produtos, total_materiais = 10000, 200
+        db.session.execute(insert(Material), [
+            {'id': i + 1, 'codigo': f'CST-M{i:04}', 'nome': f'Material Custo {i}', 'categoria': 'tecido',
+             'custo_unitario': 1 + i % 9}
+            for i in range(total_materiais)
+        ])
+        db.session.execute(insert(Produto), [
+            {'id': i + 1, 'codigo': f'CST-P{i:05}', 'nome': f'Produto Custo {i}', 'custo_unitario': 0}
+            for i in range(total_produtos)
+        ])
+        db.session.execute(insert(ComposicaoProduto), [
+            {'produto_id': p + 1, 'material_id': (p * 7 + j * 13) % total_materiais + 1, 'quantidade': 0.5 * (j + 1)}
+            for p in range(total_produtos) for j in range(4)
+        ])
+        db.session.commit()
+        reconstruir_composicao_explodida()
+
+        start_time = time.time()
+        alterados = recalcular_todos_custos()
+        tempo_completo = time.time() - start_time
+
+        self.assertEqual(alterados, total_produtos)
+        # Sem mudanças, o recálculo não altera nada nem grava histórico
+        self.assertEqual(recalcular_todos_custos(), 0)
+
+        produto = db.session.get(Produto, 1)
+        esperado = sum(
+            Decimal(str(0.5 * (j + 1))) * (1 + ((j * 13) % total_materiais) % 9) for j in range(4)
+        )
+        self.assertEqual(produto.custo_unitario, esperado)
+
+        # Aumento de um material: só os produtos que o utilizam são recalculados
+        usados = ComposicaoProduto.query.filter_by(material_id=1).with_entities(ComposicaoProduto.produto_id).distinct().count()
+        material = db.session.get(Material, 1)
+        material.custo_unitario = 50
+
+        start_time = time.time()
+        db.session.commit()
+        tempo_incremental = time.time() - start_time
+
+        self.assertEqual(HistoricoCustoProduto.query.filter_by(origem='material').count(), usados)
+        self.assertLess(tempo_completo, 5.0)
+        self.assertLess(tempo_incremental, 1.0)
+
+        logger.info(
+            f"Recálculo de custos: {total_produtos} produtos em {tempo_completo:.2f}s, "
+            f"{usados} produtos afetados por um material em {tempo_incremental * 1000:.1f} ms"
+        )
+
+    def test_benchmark_saldo_por_data(self):
+        """Consulta o estoque de 200 materiais numa data a partir dos fechamentos diários."""
+        from datetime import date
+        from sqlalchemy import insert, select, func
+        from app.models.material import FechamentoEstoque
+        from app.services.saldo_estoque_service import consulta_saldos, fechar_periodo, verificar_consistencia
+
+        total_materiais, dias = 200, 365
+        inicio = date(2024, 1, 1)
+
+        db.session.execute(insert(Material), [
+            {'id': i + 1, 'codigo': f'SLD-M{i:04}', 'nome': f'Material Saldo {i}', 'categoria': 'tecido'}
+            for i in range(total_materiais)
+        ])
+
+        # Um ano de movimentações encadeadas: entrada de 5 a cada dia e saída de 3 a cada três dias
+        movimentacoes, saldos = [], [Decimal('0')] * total_materiais
+        for dia in range(dias):
+            momento = datetime.combine(inicio + timedelta(days=dia), datetime.min.time()) + timedelta(hours=10)
+            for i in range(total_materiais):
+                for tipo, quantidade in (('entrada', 5), ('saida', 3)):
+                    if tipo == 'saida' and (dia + i) % 3:
+                        continue
+                    anterior = saldos[i]
+                    saldos[i] += quantidade if tipo == 'entrada' else -quantidade
+                    movimentacoes.append({
+                        'material_id': i + 1, 'tipo': tipo, 'quantidade': quantidade,
+                        'quantidade_anterior': anterior, 'quantidade_atual': saldos[i],
+                        'data_movimentacao': momento
+                    })
+        db.session.execute(insert(MovimentacaoEstoque), movimentacoes)
+        db.session.execute(
+            Material.__table__.update().values(estoque_atual=select(MovimentacaoEstoque.quantidade_atual).where(
+                MovimentacaoEstoque.material_id == Material.id
+            ).order_by(MovimentacaoEstoque.data_movimentacao.desc(), MovimentacaoEstoque.id.desc()).limit(1).scalar_subquery())
+        )
+        db.session.commit()
+
+        start_time = time.time()
+        fechar_periodo(inicio, date(2024, 12, 20), retencao_dias=90)
+        tempo_fechamento = time.time() - start_time
+
+        # Diários dos últimos 90 dias, mais os mensais de janeiro a novembro
+        self.assertEqual(
+            FechamentoEstoque.query.filter_by(tipo='mensal').count(), 11 * total_materiais
+        )
+
+        # Data entre fechamentos e data posterior ao último fechamento
+        for data in (date(2024, 6, 15), date(2024, 12, 30)):
+            limite = datetime.combine(data + timedelta(days=1), datetime.min.time())
+            esperado = dict(db.session.execute(
+                select(Material.codigo, func.sum(MovimentacaoEstoque.quantidade_atual - MovimentacaoEstoque.quantidade_anterior))
+                .join(MovimentacaoEstoque, MovimentacaoEstoque.material_id == Material.id)
+                .where(MovimentacaoEstoque.data_movimentacao < limite)
+                .group_by(Material.codigo)
+            ).all())
+
+            start_time = time.time()
+            saldos_data = consulta_saldos(data).all()
+            tempo_consulta = time.time() - start_time
+
+            self.assertEqual(len(saldos_data), total_materiais)
+            for linha in saldos_data:
+                self.assertEqual(linha.estoque_atual, esperado[linha.codigo])
+            self.assertLess(tempo_consulta, 0.5)
+
+        # Razão consistente; um saldo alterado por fora do razão é apontado
+        self.assertEqual(verificar_consistencia(), {'saldos': [], 'cadeia': [], 'fechamentos': []})
+        db.session.execute(Material.__table__.update().where(Material.id == 1).values(estoque_atual=0))
+        divergencias = verificar_consistencia()
+        self.assertEqual([linha['id'] for linha in divergencias['saldos']], [1])
+
+        response = self.client.post('/dashboard/relatorio/estoque', data={
+            'tipo_relatorio': 'atual', 'data_referencia': '2024-06-15', 'formato': 'csv'
+        })
+        self.assertEqual(len(response.get_data().decode('utf-8-sig').splitlines()), total_materiais + 1)
+
+        logger.info(
+            f"Saldo por data: fechamentos de {total_materiais} materiais em {tempo_fechamento:.2f}s, "
+            f"consulta em {tempo_consulta * 1000:.1f} ms"
+        )
+
+    def test_tempo_importacao_create_app(self):
+        """create_app() em um processo novo não carrega bibliotecas pesadas e cabe no orçamento."""
+        import subprocess
+
+        ambiente = dict(os.environ, PYTHONPATH=os.pathsep.join(p for p in sys.path if p))
+        resultado = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', "from app import create_app; create_app('testing')"],
+            capture_output=True, text=True, env=ambiente, cwd=os.path.dirname(os.path.abspath(__file__))
+        )
+        self.assertEqual(resultado.returncode, 0, resultado.stderr[-2000:])
+
+        # Linhas "import time: self [us] | cumulative | pacote"
+        tempos = {}
+        for linha in resultado.stderr.splitlines():
+            if not linha.startswith('import time:') or 'self [us]' in linha:
+                continue
+            proprio, _, pacote = linha[len('import time:'):].split('|')
+            tempos[pacote.strip()] = int(proprio)
+
+        carregadas = sorted(
+            pacote for pacote in tempos if pacote.split('.')[0] in BIBLIOTECAS_SOB_DEMANDA
+        )
+        self.assertEqual(carregadas, [])
+
+        total_ms = sum(tempos.values()) / 1000
+        mais_lentos = sorted(tempos.items(), key=lambda item: -item[1])[:5]
+        self.assertLess(total_ms, ORCAMENTO_IMPORTACAO_MS, f'Importações mais lentas: {mais_lentos}')
+
+        logger.info(f"Importações de create_app(): {len(tempos)} módulos em {total_ms:.0f} ms")
+
 
 def run_tests():
     """Executa todos os testes."""
@@ -790,6 +2499,7 @@ def run_tests():
     test_suite.addTest(unittest.makeSuite(TestProdutos))
     test_suite.addTest(unittest.makeSuite(TestProducao))
     test_suite.addTest(unittest.makeSuite(TestFinanceiro))
+    test_suite.addTest(unittest.makeSuite(TestResumos))
     test_suite.addTest(unittest.makeSuite(TestBackupSeguranca))
     test_suite.addTest(unittest.makeSuite(TestIntegracao))
     test_suite.addTest(unittest.makeSuite(TestPerformance))